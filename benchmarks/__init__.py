@@ -0,0 +1,8 @@
+"""
+Headless performance benchmarks for Schnauzer.
+
+Run ``python -m benchmarks.run`` from the repository root to time every
+stage a graph passes on its way from a NetworkX object to the viewers, and
+``python -m benchmarks.compare`` to compare two result files. See the
+Benchmarks section of the README.
+"""
@@ -0,0 +1,106 @@
+"""
+Compare benchmark results against a baseline.
+
+Usage::
+
+    python -m benchmarks.compare results.json benchmarks/baseline.json
+
+Exits with status 1 if any stage got slower than the tolerance allows, so
+it can gate a CI job. Timings only compare meaningfully between runs on
+the same machine.
+"""
+import argparse
+import json
+import sys
+
+DEFAULT_TOLERANCE = 0.25
+
+# Differences below this are timer noise, whatever the ratio
+MIN_SECONDS = 0.002
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE, min_seconds=MIN_SECONDS):
+    """
+    Match the timings of two result documents.
+
+    Args:
+        results (dict): Result document written by benchmarks.run.
+        baseline (dict): Result document to compare against.
+        tolerance (float, optional): Allowed slowdown as a fraction,
+            0.25 flags stages that take more than 125% of the baseline.
+            Defaults to 0.25.
+        min_seconds (float, optional): Slowdowns smaller than this are
+            never flagged. Defaults to MIN_SECONDS.
+
+    Returns:
+        list: One ``(key, baseline_seconds, seconds, ratio, status)`` row
+            per timing in either document, where status is 'ok',
+            'faster', 'regression', 'new' or 'missing'.
+    """
+    current = results['results']
+    previous = baseline['results']
+    rows = []
+    for key in sorted(set(current) | set(previous)):
+        if key not in previous:
+            rows.append((key, None, current[key]['seconds'], None, 'new'))
+            continue
+        if key not in current:
+            rows.append((key, previous[key]['seconds'], None, None, 'missing'))
+            continue
+
+        before = previous[key]['seconds']
+        after = current[key]['seconds']
+        ratio = after / before if before else float('inf')
+        if ratio > 1 + tolerance and after - before > min_seconds:
+            status = 'regression'
+        elif ratio < 1 / (1 + tolerance) and before - after > min_seconds:
+            status = 'faster'
+        else:
+            status = 'ok'
+        rows.append((key, before, after, ratio, status))
+    return rows
+
+
+def format_rows(rows):
+    """
+    Render comparison rows as a text table.
+
+    Args:
+        rows (list): Rows as returned by compare().
+
+    Returns:
+        str: The table.
+    """
+    def seconds(value):
+        return '-' if value is None else f'{value * 1000:.2f} ms'
+
+    width = max([len(row[0]) for row in rows] + [5])
+    lines = [f"{'stage':<{width}}  {'baseline':>12}  {'current':>12}  {'ratio':>7}  status"]
+    for key, before, after, ratio, status in rows:
+        ratio = '-' if ratio is None else f'{ratio:.2f}x'
+        lines.append(f'{key:<{width}}  {seconds(before):>12}  {seconds(after):>12}  {ratio:>7}  {status}')
+    return '\n'.join(lines)
+
+
+def load(path):
+    """Read a result document."""
+    with open(path) as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    """Compare two result files and exit with 1 on regressions."""
+    parser = argparse.ArgumentParser(description='Compare Schnauzer benchmark results against a baseline')
+    parser.add_argument('results', help='Result file written by benchmarks.run')
+    parser.add_argument('baseline', help='Result file to compare against')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Allowed slowdown as a fraction (default: 0.25)')
+    args = parser.parse_args(argv)
+
+    rows = compare(load(args.results), load(args.baseline), args.tolerance)
+    print(format_rows(rows))
+    return 1 if any(row[4] == 'regression' for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+Synthetic graphs for the benchmarks.
+
+Every shape is generated from a seed, so runs on different machines and
+revisions time the same graphs. Sizes count nodes plus edges; all shapes
+have about three edges per node and carry a few node and edge attributes
+of the kinds real graphs have: categories, numbers and free text.
+"""
+import random
+
+import networkx as nx
+
+SHAPES = ('random', 'scale_free', 'dag', 'multigraph')
+
+# Edges per node, so a graph of n nodes has about (1 + DEGREE) * n elements
+DEGREE = 3
+
+_TYPES = ('sensor', 'processor', 'storage', 'output', 'service')
+
+
+def make_graph(shape, size, seed=0):
+    """
+    Generate a graph with attributes.
+
+    Args:
+        shape (str): One of SHAPES. 'random' is a directed G(n, m) graph,
+            'scale_free' a Barabási-Albert graph, 'dag' a random directed
+            acyclic graph and 'multigraph' a directed multigraph with
+            parallel edges.
+        size (int): Approximate number of nodes plus edges.
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        networkx.Graph: The generated graph.
+
+    Raises:
+        ValueError: If shape is unknown.
+    """
+    rng = random.Random(seed)
+    n = max(size // (1 + DEGREE), DEGREE + 1)
+
+    if shape == 'random':
+        graph = nx.gnm_random_graph(n, DEGREE * n, seed=seed, directed=True)
+    elif shape == 'scale_free':
+        graph = nx.barabasi_albert_graph(n, DEGREE, seed=seed)
+    elif shape == 'dag':
+        # Edges only point from lower to higher numbers, so there are no cycles
+        pairs = set()
+        while len(pairs) < DEGREE * n:
+            u, v = rng.randrange(n), rng.randrange(n)
+            if u != v:
+                pairs.add((min(u, v), max(u, v)))
+        graph = nx.DiGraph()
+        graph.add_nodes_from(range(n))
+        graph.add_edges_from(sorted(pairs))
+    elif shape == 'multigraph':
+        graph = nx.MultiDiGraph()
+        graph.add_nodes_from(range(n))
+        graph.add_edges_from((rng.randrange(n), rng.randrange(n)) for _ in range(DEGREE * n))
+    else:
+        raise ValueError(f"Unknown graph shape {shape!r}, expected one of {', '.join(SHAPES)}")
+
+    _add_attributes(graph, rng)
+    return graph
+
+
+def _add_attributes(graph, rng):
+    """Give every node and edge a category, a number and a text attribute."""
+    for node, data in graph.nodes(data=True):
+        data['type'] = rng.choice(_TYPES)
+        data['weight'] = round(rng.random(), 3)
+        data['description'] = f'component {node} of the {data["type"]} tier'
+
+    for msg_id, (_, _, data) in enumerate(graph.edges(data=True), 1):
+        data['msg_id'] = msg_id
+        data['weight'] = round(rng.random(), 3)
+        data['kind'] = rng.choice(('data', 'control'))
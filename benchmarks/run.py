@@ -0,0 +1,131 @@
+"""
+Run the benchmark suite.
+
+Usage::
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --sizes 1000 1000000 --shapes scale_free --viewers 50
+    python -m benchmarks.run --baseline benchmarks/baseline.json
+
+Every stage of benchmarks.stages is timed for every combination of graph
+shape and size. The median of the repetitions is reported, so a single
+hiccup does not fail a comparison. Results are printed as a table and
+optionally written as JSON; with --baseline they are compared against a
+stored result file and the exit status is 1 if a stage regressed.
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+
+from schnauzer import __version__
+from schnauzer.payload import available_encodings
+
+from benchmarks.compare import DEFAULT_TOLERANCE, compare, format_rows, load
+from benchmarks.graphs import SHAPES, make_graph
+from benchmarks.stages import STAGES, Pipeline
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+# Version of the result document layout
+SCHEMA = 1
+
+
+def run(shapes=SHAPES, sizes=DEFAULT_SIZES, viewers=10, repeat=3, backend_port=18686, progress=None):
+    """
+    Time every stage for every shape and size.
+
+    Args:
+        shapes (iterable, optional): Graph shapes from benchmarks.graphs.
+            Defaults to all of them.
+        sizes (iterable, optional): Graph sizes in nodes plus edges.
+            Defaults to DEFAULT_SIZES.
+        viewers (int, optional): Number of simulated viewers for the
+            fan-out stage. Defaults to 10.
+        repeat (int, optional): Repetitions per graph. Defaults to 3.
+        backend_port (int, optional): Port of the ZeroMQ backend of the
+            benchmarked server. Defaults to 18686.
+        progress (callable, optional): Called with a status line before
+            each graph.
+
+    Returns:
+        dict: Result document with 'schema', 'environment', 'config',
+            'graphs' (node and edge count per graph) and 'results', which
+            maps ``'<shape>/<size>/<stage>'`` to the median 'seconds', the
+            fastest repetition as 'min' and, where it applies, 'bytes'.
+    """
+    document = {
+        'schema': SCHEMA,
+        'environment': {
+            'schnauzer': __version__,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'encodings': available_encodings(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        },
+        'config': {'shapes': list(shapes), 'sizes': list(sizes), 'viewers': viewers, 'repeat': repeat},
+        'graphs': {},
+        'results': {},
+    }
+
+    with Pipeline(viewers=viewers, backend_port=backend_port) as pipeline:
+        for shape in shapes:
+            for size in sizes:
+                graph = make_graph(shape, size)
+                name = f'{shape}/{size}'
+                document['graphs'][name] = {'nodes': graph.number_of_nodes(), 'edges': graph.number_of_edges()}
+                if progress:
+                    progress(f'{name}: {graph.number_of_nodes()} nodes, {graph.number_of_edges()} edges')
+
+                runs = [pipeline.run(graph) for _ in range(repeat)]
+                for stage in STAGES:
+                    timings = [result[stage]['seconds'] for result in runs]
+                    entry = {'seconds': statistics.median(timings), 'min': min(timings)}
+                    if 'bytes' in runs[0][stage]:
+                        entry['bytes'] = runs[0][stage]['bytes']
+                    document['results'][f'{name}/{stage}'] = entry
+    return document
+
+
+def main(argv=None):
+    """Run the suite from the command line."""
+    parser = argparse.ArgumentParser(description='Benchmark the Schnauzer client, transport, server and fan-out')
+    parser.add_argument('--shapes', nargs='+', choices=SHAPES, default=list(SHAPES),
+                        help='Graph shapes to generate (default: all)')
+    parser.add_argument('--sizes', nargs='+', type=int, default=list(DEFAULT_SIZES),
+                        help='Graph sizes in nodes plus edges (default: 1000 10000 100000)')
+    parser.add_argument('--viewers', type=int, default=10,
+                        help='Number of simulated viewers (default: 10)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Repetitions per graph, the median is reported (default: 3)')
+    parser.add_argument('--backend-port', type=int, default=18686,
+                        help='Port for the benchmarked server backend (default: 18686)')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--baseline', help='Compare against this result file and exit with 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Allowed slowdown against the baseline as a fraction (default: 0.25)')
+    args = parser.parse_args(argv)
+
+    document = run(args.shapes, args.sizes, args.viewers, args.repeat, args.backend_port,
+                   progress=lambda line: print(line, file=sys.stderr))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+    if args.baseline:
+        rows = compare(document, load(args.baseline), args.tolerance)
+        print(format_rows(rows))
+        return 1 if any(row[4] == 'regression' for row in rows) else 0
+
+    for key, entry in sorted(document['results'].items()):
+        size = f"  {entry['bytes']} bytes" if 'bytes' in entry else ''
+        print(f"{key:<32} {entry['seconds'] * 1000:10.2f} ms{size}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
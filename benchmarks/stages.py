@@ -0,0 +1,180 @@
+"""
+The timed stages of a graph update.
+
+A Pipeline runs an in-process Server with its ZeroMQ backend and a number
+of simulated viewers, which are Socket.IO test clients connected to a
+channel of their own. It then times each stage a graph passes through, in
+order:
+
+- convert: NetworkX graph to Cytoscape elements, as send_graph() does
+- encode: NetworkX graph to a columnar wire message
+- decode: wire message back to the message dict the server consumes
+- ingest: message dict into a fresh server-side graph state
+- roundtrip: wire message to the server over ZeroMQ until the
+  acknowledgement arrives, including server-side decode, ingest and
+  serialization for the (absent) viewers of the channel
+- graph_data: first GET of /graph-data after an update, which
+  serializes the graph
+- fanout: broadcast of the already serialized graph to all viewers, until
+  each of them has received it
+"""
+import json
+import logging
+import time
+
+import zmq
+
+from schnauzer.convert import encode_graph, to_elements
+from schnauzer.server import Server
+from schnauzer.store import GraphState
+from schnauzer.wire import decode_message
+
+STAGES = ('convert', 'encode', 'decode', 'ingest', 'roundtrip', 'graph_data', 'fanout')
+
+# Channel that receives the round trips; the viewers watch another one, so
+# round trips do not include the broadcast to them
+INGEST_CHANNEL = 'bench'
+FANOUT_CHANNEL = 'bench-viewers'
+
+
+def timed(function, *args, **kwargs):
+    """
+    Call a function and measure its wall time.
+
+    Returns:
+        tuple: ``(seconds, result)``.
+    """
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+class Pipeline:
+    """
+    Server and viewers to push benchmark graphs through.
+
+    Use it as a context manager, so the server is stopped afterwards.
+
+    Attributes:
+        server (Server): The server under test, with summaries, chunking,
+            history, server-side layout and the viewers' frame rate limit
+            disabled so every stage handles the whole graph.
+        viewers (list): Socket.IO test clients viewing FANOUT_CHANNEL.
+    """
+
+    def __init__(self, viewers=10, backend_port=18686, timeout=120):
+        """
+        Start the server backend and connect the viewers.
+
+        Args:
+            viewers (int, optional): Number of simulated viewers.
+                Defaults to 10.
+            backend_port (int, optional): Port of the ZeroMQ backend.
+                Defaults to 18686.
+            timeout (float, optional): Seconds to wait for an
+                acknowledgement. Defaults to 120.
+        """
+        self.server = Server(backend_port=backend_port, log_level=logging.ERROR,
+                             history_size=0, lod_threshold=0, chunk_threshold=0, max_fps=0)
+        self.server._start_backend()
+        self.http = self.server.app.test_client()
+        self.viewers = [
+            self.server.socketio.test_client(self.server.app, query_string=f'channel={FANOUT_CHANNEL}')
+            for _ in range(viewers)
+        ]
+        for viewer in self.viewers:
+            self._acknowledge(viewer, viewer.get_received())
+        self.timeout = timeout
+
+        self.context = zmq.Context()
+        self.socket = self.context.socket(zmq.REQ)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        self.socket.setsockopt(zmq.RCVTIMEO, int(timeout * 1000))
+        self.socket.connect(f'tcp://localhost:{backend_port}')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Disconnect the viewers and stop the server."""
+        for viewer in self.viewers:
+            viewer.disconnect()
+        self.socket.close()
+        self.context.term()
+        self.server.stop()
+
+    def run(self, graph):
+        """
+        Push a graph through every stage once.
+
+        Args:
+            graph (networkx.Graph): Graph to time.
+
+        Returns:
+            dict: Mapping of stage name to ``{'seconds': ...}``, plus
+                'bytes' for the stages that produce a serialized form.
+        """
+        results = {}
+
+        seconds, _ = timed(to_elements, graph)
+        results['convert'] = {'seconds': seconds}
+
+        header = {'title': 'Benchmark', 'channel': INGEST_CHANNEL}
+        seconds, frames = timed(encode_graph, graph, header)
+        results['encode'] = {'seconds': seconds, 'bytes': sum(len(frame) for frame in frames)}
+
+        seconds, message = timed(decode_message, frames)
+        results['decode'] = {'seconds': seconds}
+
+        seconds, _ = timed(GraphState().replace, message)
+        results['ingest'] = {'seconds': seconds}
+
+        seconds, _ = timed(self._roundtrip, frames)
+        results['roundtrip'] = {'seconds': seconds}
+
+        # Updating the state directly does not serialize the graph yet
+        self.server.channels.get(FANOUT_CHANNEL, create=True).replace(decode_message(frames))
+        seconds, response = timed(self.http.get, f'/graph-data/{FANOUT_CHANNEL}',
+                                  headers={'Accept-Encoding': 'identity'})
+        results['graph_data'] = {'seconds': seconds, 'bytes': len(response.data)}
+
+        # Reuses the payload serialized for /graph-data, like a real update
+        seconds, _ = timed(self._fanout)
+        results['fanout'] = {'seconds': seconds}
+        return results
+
+    def _roundtrip(self, frames):
+        """Send a message to the backend and wait for its acknowledgement."""
+        self.socket.send_multipart(frames)
+        reply = json.loads(self.socket.recv())
+        if reply.get('status') != 'ok':
+            raise RuntimeError(f"Server rejected the benchmark graph: {reply}")
+
+    def _fanout(self):
+        """Broadcast the current graph and collect it at every viewer."""
+        self.server._on_graph_update(FANOUT_CHANNEL)
+        deadline = time.monotonic() + self.timeout
+        for viewer in self.viewers:
+            # The broadcaster sends from its own thread
+            while not self._acknowledge(viewer, viewer.get_received()):
+                if time.monotonic() > deadline:
+                    raise RuntimeError("A viewer did not receive the graph update")
+                time.sleep(0.001)
+
+    @staticmethod
+    def _acknowledge(viewer, packets):
+        """
+        Acknowledge the graph updates among a viewer's packets, like browsers do.
+
+        Returns:
+            bool: True if there was a graph update.
+        """
+        updates = [packet for packet in packets if packet['name'] == 'graph_update']
+        for packet in updates:
+            data = packet['args'][0]
+            version = json.loads(data)['version'] if isinstance(data, bytes) else data['version']
+            viewer.emit('graph_ack', {'version': version})
+        return bool(updates)
@@ -1,8 +1,10 @@
 """Schnauzer - NetworkX Graph visualization library."""
 
+from schnauzer.aio import AsyncServer
 from schnauzer.client import VisualizationClient
+from schnauzer.replication import IngestServer, WebWorker
 from schnauzer.server import Server
 
 __version__ = "0.3.0"
 
-__all__ = ["VisualizationClient", "Server"]
+__all__ = ["VisualizationClient", "Server", "AsyncServer", "IngestServer", "WebWorker"]
@@ -0,0 +1,418 @@
+"""
+Level-of-detail aggregation of large graphs.
+
+Graphs with hundreds of thousands of nodes cannot be rendered in a browser,
+so the server sends them as a summary: nodes are grouped into clusters,
+each cluster is shown as one meta-node with its size, and the edges between
+clusters are merged into one edge per pair with a count. Viewers expand a
+cluster on demand and receive only its contents.
+
+Clusters form a hierarchy. The top level groups the nodes by an attribute,
+by connected component or by communities found with label propagation.
+Expanding a cluster that is still too large splits it into communities of
+its own subgraph, and levels with too many clusters pack the smaller ones
+into buckets, so every level stays small enough to render. The hierarchy is
+built lazily and kept for the graph version it was computed for.
+"""
+import logging
+import math
+import threading
+from collections import Counter, defaultdict, deque
+
+from schnauzer.convert import _gc_paused
+from schnauzer.payload import Payload
+
+log = logging.getLogger(__name__)
+
+#: Structural groupings; any other group_by value is an attribute name.
+GROUPINGS = ('component', 'community')
+
+DEFAULT_GROUP_BY = 'community'
+DEFAULT_MAX_CLUSTERS = 50
+DEFAULT_MAX_SIZE = 500
+
+#: Prefix of meta-node ids, which share the id space with graph nodes. A
+#: cluster id that is also a node id gets another prefix character.
+CLUSTER_PREFIX = 'cluster:'
+
+_PROPAGATION_ROUNDS = 5
+_META_COLOR = '#6c757d'
+_META_EDGE_COLOR = '#adb5bd'
+
+
+def _value_label(value):
+    """Display form of an attribute value used as a group label."""
+    if value is None or value == '':
+        return '(none)'
+    if isinstance(value, (list, dict)):
+        return str(value)
+    return value if isinstance(value, str) else str(value)
+
+
+class _Cluster:
+    """One node of the cluster hierarchy."""
+
+    __slots__ = ('id', 'label', 'nodes', 'groups', 'children', 'parent', 'depth')
+
+    def __init__(self, cid, label, nodes, groups, parent):
+        self.id = cid
+        self.label = label
+        self.nodes = nodes
+        self.groups = groups
+        self.children = None
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent is not None else 0
+
+
+class Aggregation:
+    """
+    Cluster hierarchy of one graph version.
+
+    Attributes:
+        group_by (str): 'component', 'community' or the attribute the top
+            level is grouped by.
+        directed (bool): Whether merged edges keep their direction.
+        max_clusters (int): Maximum number of clusters per level.
+        max_size (int): Clusters with at most this many nodes expand into
+            their nodes instead of sub-clusters.
+        roots (list): Ids of the top-level clusters.
+        version (int): Graph version from the header, or None.
+        dangling (int): Edges left out because their source or target is
+            not a node of the graph.
+    """
+
+    def __init__(self, nodes, edges, group_by=DEFAULT_GROUP_BY, directed=False,
+                 max_clusters=DEFAULT_MAX_CLUSTERS, max_size=DEFAULT_MAX_SIZE, header=None):
+        """
+        Build the top level of the hierarchy.
+
+        Args:
+            nodes (dict): Mapping of node id to Cytoscape node element. The
+                dict is kept, so it must not change afterwards.
+            edges (dict): Mapping of edge id to Cytoscape edge element, with
+                the same restriction.
+            group_by (str, optional): 'component', 'community' or an
+                attribute name. Defaults to 'community'.
+            directed (bool, optional): Keep the direction of merged edges.
+            max_clusters (int, optional): Clusters per level. Defaults to 50.
+            max_size (int, optional): Largest cluster that expands into its
+                nodes. Defaults to 500.
+            header (dict, optional): Top-level keys such as 'title' and
+                'version' for the summary graph.
+        """
+        self.group_by = group_by
+        self.directed = directed
+        self.max_clusters = max(max_clusters, 2)
+        self.max_size = max_size
+        self._nodes = nodes
+        self._edges = edges
+        self._header = dict(header or {})
+        self.version = self._header.get('version')
+        self._clusters = {}
+        self._owner = {}
+        self._lock = threading.Lock()
+        self._payload = None
+        self.dangling = 0
+
+        # Node id -> (edge id, source, target) of its edges
+        self._adjacent = defaultdict(list)
+        self._linked = []
+        with _gc_paused():
+            for eid, element in edges.items():
+                data = element['data']
+                entry = (eid, str(data['source']), str(data['target']))
+                if entry[1] not in nodes or entry[2] not in nodes:
+                    self.dangling += 1
+                    continue
+                self._linked.append(entry)
+                self._adjacent[entry[1]].append(entry)
+                if entry[2] != entry[1]:
+                    self._adjacent[entry[2]].append(entry)
+
+            self.roots = self._bound(self._group(list(nodes), group_by), None)
+        if self.dangling:
+            log.warning(f"Left out {self.dangling} edges whose source or target is not a node")
+        log.debug(f"Aggregated {len(nodes)} nodes into {len(self.roots)} clusters by {group_by}")
+
+    def _neighbours(self, nid, members):
+        """Neighbours of a node within a set of nodes."""
+        for _, source, target in self._adjacent.get(nid, ()):
+            other = target if source == nid else source
+            if other in members and other != nid:
+                yield other
+
+    def _group(self, node_ids, group_by):
+        """Split nodes into ``(label, node_ids)`` groups, largest first."""
+        if group_by == 'component':
+            groups = [(f'Component {i + 1}', nodes) for i, nodes in enumerate(self._components(node_ids))]
+        elif group_by == 'community':
+            groups = [(f'Community {i + 1}', nodes) for i, nodes in enumerate(self._communities(node_ids))]
+        else:
+            by_value = defaultdict(list)
+            for nid in node_ids:
+                by_value[_value_label(self._nodes[nid]['data'].get(group_by))].append(nid)
+            groups = [(f'{group_by}: {value}', nodes) for value, nodes in by_value.items()]
+        groups.sort(key=lambda group: len(group[1]), reverse=True)
+        return groups
+
+    def _components(self, node_ids):
+        """Connected components, ignoring edge direction."""
+        members = set(node_ids)
+        seen = set()
+        components = []
+        for start in node_ids:
+            if start in seen:
+                continue
+            seen.add(start)
+            component = [start]
+            queue = deque([start])
+            while queue:
+                for other in self._neighbours(queue.popleft(), members):
+                    if other not in seen:
+                        seen.add(other)
+                        component.append(other)
+                        queue.append(other)
+            components.append(component)
+        return components
+
+    def _communities(self, node_ids):
+        """Communities found by a few rounds of label propagation."""
+        members = set(node_ids)
+        labels = {nid: nid for nid in node_ids}
+        for _ in range(_PROPAGATION_ROUNDS):
+            changed = 0
+            for nid in node_ids:
+                counts = Counter(labels[other] for other in self._neighbours(nid, members))
+                if not counts:
+                    continue
+                # Ties go to the smallest label, so results are deterministic
+                best = min(counts, key=lambda label: (-counts[label], label))
+                if best != labels[nid] and counts[best] > counts.get(labels[nid], 0):
+                    labels[nid] = best
+                    changed += 1
+            if not changed:
+                break
+
+        communities = defaultdict(list)
+        for nid in node_ids:
+            communities[labels[nid]].append(nid)
+        return list(communities.values())
+
+    def _chunks(self, node_ids):
+        """Split nodes into max_clusters parts of neighbouring nodes."""
+        members = set(node_ids)
+        order = []
+        seen = set()
+        for start in node_ids:
+            if start in seen:
+                continue
+            seen.add(start)
+            queue = deque([start])
+            while queue:
+                nid = queue.popleft()
+                order.append(nid)
+                for other in self._neighbours(nid, members):
+                    if other not in seen:
+                        seen.add(other)
+                        queue.append(other)
+
+        size = math.ceil(len(order) / self.max_clusters)
+        return [(f'Part {i // size + 1}', order[i:i + size]) for i in range(0, len(order), size)]
+
+    def _bound(self, groups, parent):
+        """Create the clusters of one level, packing small groups into buckets."""
+        if len(groups) > self.max_clusters:
+            total = sum(len(nodes) for _, nodes in groups)
+            head = [group for group in groups[:self.max_clusters // 2]
+                    if len(group[1]) >= total / self.max_clusters]
+            tail = groups[len(head):]
+            per_bucket = math.ceil(sum(len(nodes) for _, nodes in tail) / (self.max_clusters - len(head)))
+
+            buckets = []
+            bucket = []
+            size = 0
+            for group in tail:
+                bucket.append(group)
+                size += len(group[1])
+                if size >= per_bucket:
+                    buckets.append(bucket)
+                    bucket = []
+                    size = 0
+            if bucket:
+                buckets.append(bucket)
+        else:
+            head = groups
+            buckets = []
+
+        created = [self._create(label, nodes, None, parent) for label, nodes in head]
+        for bucket in buckets:
+            if len(bucket) == 1:
+                created.append(self._create(bucket[0][0], bucket[0][1], None, parent))
+            else:
+                nodes = [nid for _, members in bucket for nid in members]
+                created.append(self._create(f'{len(bucket)} smaller groups', nodes, bucket, parent))
+        return created
+
+    def _create(self, label, nodes, groups, parent):
+        """Register a cluster and make it the owner of its nodes."""
+        prefix = CLUSTER_PREFIX
+        cid = f'{prefix}{len(self._clusters) + 1}'
+        while cid in self._nodes:
+            prefix += ':'
+            cid = f'{prefix}{len(self._clusters) + 1}'
+        cluster = _Cluster(cid, label, nodes, groups, parent)
+        self._clusters[cid] = cluster
+        for nid in nodes:
+            self._owner[nid] = cluster
+        return cid
+
+    def _split(self, cluster):
+        """Compute the sub-clusters of a cluster if it is too large to show its nodes."""
+        if cluster.children is not None or len(cluster.nodes) <= self.max_size:
+            return
+        groups = cluster.groups or self._group(cluster.nodes, 'community')
+        if len(groups) <= 1:
+            groups = self._chunks(cluster.nodes)
+        cluster.children = self._bound(groups, cluster)
+
+    def _unit(self, nid, expanded):
+        """The meta-node or node that represents a node for a set of expanded clusters."""
+        path = []
+        cluster = self._owner[nid]
+        while cluster is not None:
+            path.append(cluster.id)
+            cluster = cluster.parent
+        for cid in reversed(path):
+            if cid not in expanded:
+                return cid
+        return nid
+
+    def _meta_node(self, cid):
+        """Cytoscape element of a cluster."""
+        cluster = self._clusters[cid]
+        return {'data': {
+            'id': cid,
+            'name': cluster.label,
+            'count': len(cluster.nodes),
+            'meta': True,
+            'color': _META_COLOR,
+        }}
+
+    def _merged_edges(self, counts):
+        """Cytoscape elements of merged edges from a Counter of endpoint pairs."""
+        return [
+            {'data': {
+                'id': f'{source}->{target}',
+                'source': source,
+                'target': target,
+                'count': count,
+                'name': str(count) if count > 1 else '',
+                'meta': True,
+                'color': _META_EDGE_COLOR,
+            }}
+            for (source, target), count in counts.items()
+        ]
+
+    def _connect(self, node_ids, expanded):
+        """
+        Edges of some nodes, with endpoints mapped to the visible units.
+
+        Edges between two graph nodes are sent as they are, all others are
+        merged per pair of endpoints.
+        """
+        counts = Counter()
+        originals = []
+        seen = set()
+        for nid in node_ids:
+            for eid, source, target in self._adjacent.get(nid, ()):
+                if eid in seen:
+                    continue
+                seen.add(eid)
+                source = self._unit(source, expanded)
+                target = self._unit(target, expanded)
+                if source == target:
+                    continue
+                if source not in self._clusters and target not in self._clusters:
+                    originals.append(self._edges[eid])
+                else:
+                    if not self.directed and target < source:
+                        source, target = target, source
+                    counts[(source, target)] += 1
+        return originals + self._merged_edges(counts)
+
+    def summary(self):
+        """
+        Build the summary graph of the top-level clusters.
+
+        Returns:
+            dict: Graph in Cytoscape.js format with the header keys and a
+                'lod' key describing the aggregation.
+        """
+        with self._lock:
+            counts = Counter()
+            for _, source, target in self._linked:
+                source = self._unit(source, ())
+                target = self._unit(target, ())
+                if source != target:
+                    if not self.directed and target < source:
+                        source, target = target, source
+                    counts[(source, target)] += 1
+
+            graph = {
+                'elements': {
+                    'nodes': [self._meta_node(cid) for cid in self.roots],
+                    'edges': self._merged_edges(counts),
+                },
+                'lod': {
+                    'group_by': self.group_by,
+                    'nodes': len(self._nodes),
+                    'edges': len(self._edges),
+                    'dangling': self.dangling,
+                },
+            }
+        graph.update(self._header)
+        return graph
+
+    def payload(self):
+        """
+        Serialized summary graph, built once.
+
+        Returns:
+            Payload: JSON of summary().
+        """
+        if self._payload is None:
+            self._payload = Payload.from_graph(self.summary())
+        return self._payload
+
+    def expand(self, cid, expanded=()):
+        """
+        Compute what replaces a meta-node when a viewer expands it.
+
+        Args:
+            cid (str): Id of the cluster to expand.
+            expanded (iterable, optional): Ids of the clusters the viewer
+                has expanded before.
+
+        Returns:
+            dict: 'cluster' (the expanded id), 'nodes' with the meta-nodes
+                or graph nodes that replace it and 'edges' with all edges
+                between those and the rest of the viewer's graph. None if
+                the cluster does not exist.
+        """
+        with self._lock:
+            cluster = self._clusters.get(cid)
+            if cluster is None:
+                return None
+
+            expanded = {eid for eid in expanded if eid in self._clusters} | {cid}
+            with _gc_paused():
+                for eid in sorted(expanded, key=lambda eid: self._clusters[eid].depth):
+                    self._split(self._clusters[eid])
+
+            units = {}
+            for nid in cluster.nodes:
+                units.setdefault(self._unit(nid, expanded), None)
+
+            nodes = [self._meta_node(unit) if unit in self._clusters else self._nodes[unit] for unit in units]
+            edges = self._connect(cluster.nodes, expanded)
+            return {'cluster': cid, 'nodes': nodes, 'edges': edges}
@@ -0,0 +1,365 @@
+"""
+Asyncio server mode.
+
+The default Server runs Flask-SocketIO in threading mode on the Werkzeug
+development server, which dedicates an OS thread to every connected viewer.
+AsyncServer serves the same web interface, Socket.IO events and ZeroMQ
+backend from a single asyncio event loop instead:
+
+- viewers connect to an ASGI python-socketio server run by uvicorn, so an
+  idle viewer costs a coroutine rather than a thread
+- the backend ROUTER socket is read with zmq.asyncio on the same loop
+- small messages are ingested on the loop; large ones are decoded and
+  applied in a dedicated worker thread, one at a time and in order, so
+  the loop keeps serving viewers meanwhile
+- viewer requests that build snapshots, chunks or clusters run in a thread
+  pool, as do cluster summaries; layouts still run in worker processes
+- all Socket.IO emits, including those of the broadcaster and the layout
+  engine, are executed on the loop
+
+The Flask routes are served through asgiref's WSGI adapter. Both uvicorn
+and asgiref are optional dependencies (``pip install schnauzer[asyncio]``).
+"""
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import socketio
+import zmq
+import zmq.asyncio
+
+from schnauzer.server import Server
+from schnauzer.shm import is_shared
+from schnauzer.store import ChannelStore
+
+try:
+    import uvicorn
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError:
+    uvicorn = None
+    WsgiToAsgi = None
+
+log = logging.getLogger(__name__)
+
+#: Messages up to this many bytes are ingested on the event loop itself.
+INLINE_MESSAGE_BYTES = 64 * 1024
+
+# Viewer requests cheap enough to answer on the event loop
+_INLINE_REQUESTS = frozenset({'clock_sync', 'latency_report', 'graph_ack'})
+
+
+class AsyncServer(Server):
+    """
+    Visualization server running on a single asyncio event loop.
+
+    Takes the same arguments and serves the same web interface, backend
+    protocol and metrics as Server, but scales to thousands of concurrent
+    viewers. Run it with start(), or await serve() from an application
+    that has an event loop of its own.
+
+    Attributes:
+        asgi_app (socketio.ASGIApp): ASGI application serving Socket.IO and
+            the Flask routes, for running the web interface under another
+            ASGI server. The backend only runs within serve().
+        executor_workers (int): Threads for viewer requests and summaries.
+
+    Examples:
+        >>> from schnauzer.aio import AsyncServer
+        >>>
+        >>> server = AsyncServer(web_port=8080, backend_port=8086)
+        >>> server.start()  # Blocks until stopped
+
+        >>> # Inside a running event loop
+        >>> await AsyncServer().serve()
+    """
+
+    def __init__(self, *args, executor_workers=4, **kwargs):
+        """
+        Initialize the server; see Server for the arguments.
+
+        Args:
+            *args: Positional arguments of Server.
+            executor_workers (int, optional): Threads for viewer requests
+                and summaries. Defaults to 4.
+            **kwargs: Keyword arguments of Server.
+
+        Raises:
+            ImportError: If uvicorn or asgiref are not installed.
+        """
+        if uvicorn is None or WsgiToAsgi is None:
+            raise ImportError("AsyncServer needs uvicorn and asgiref, "
+                              "install them with: pip install schnauzer[asyncio]")
+        self.executor_workers = executor_workers
+        self._loop = None
+        self._web = None
+        self._backend_task = None
+        self._executor = None
+        self._ingest_executor = None
+        self._loop_thread = None
+        super().__init__(*args, **kwargs)
+        # Same verbosity as the log_level given to Server
+        log.setLevel(logging.getLogger('schnauzer.server').level)
+        self.asgi_app = socketio.ASGIApp(self.socketio, other_asgi_app=WsgiToAsgi(self.app))
+
+    def _create_socketio(self):
+        """
+        Create the Socket.IO server viewers connect to.
+
+        Returns:
+            socketio.AsyncServer: ASGI Socket.IO server.
+        """
+        return socketio.AsyncServer(
+            async_mode='asgi',
+            cors_allowed_origins="*",
+            ping_timeout=60,
+            ping_interval=25
+        )
+
+    def _setup_socketio_handlers(self):
+        """
+        Set up the Socket.IO event handlers as coroutines.
+
+        The handlers are the same as Server's; the ones that may take long
+        run in the thread pool.
+        """
+
+        @self.socketio.on('connect')
+        async def handle_connect(sid, environ, auth=None):
+            query = parse_qs(environ.get('QUERY_STRING', ''))
+            try:
+                channel = ChannelStore.validate_name((query.get('channel') or [None])[0])
+            except ValueError:
+                log.warning('Rejected web client with invalid channel name')
+                return False
+
+            # Updates are only sent to the room of the viewed channel
+            await self.socketio.enter_room(sid, channel)
+            payload, version = await self._in_executor(self._viewer_connected, sid, channel)
+            await self.socketio.emit('graph_update', payload.body, to=sid)
+            self.broadcaster.add_viewer(sid, channel, version)
+
+        @self.socketio.on('disconnect')
+        async def handle_disconnect(sid, *args):
+            self._viewer_disconnected(sid)
+
+        for event, handler in self._viewer_requests().items():
+            self.socketio.on(event, self._bind_async_request(handler, inline=event in _INLINE_REQUESTS))
+
+    def _bind_async_request(self, handler, inline):
+        """Adapt a viewer request handler to python-socketio, in the pool unless it is inline."""
+        async def handle(sid, request_data=None, *args):
+            if inline:
+                return handler(sid, request_data)
+            return await self._in_executor(handler, sid, request_data)
+        return handle
+
+    async def _in_executor(self, function, *args):
+        """Run a function in the thread pool and wait for its result."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    def _emit(self, event, data, to, label=None):
+        """
+        Send a Socket.IO event to a room or a single viewer.
+
+        Safe to call from any thread; the event is sent by the event loop.
+        Events emitted while the server is not running are dropped.
+
+        Args:
+            event (str): Event name.
+            data: Event data.
+            to (str): Channel room or session id of a viewer.
+            label (str, optional): Event label of the broadcast duration
+                metric. Defaults to the event name.
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            log.debug(f"Dropped {event} event, the server is not running")
+            return
+
+        async def send():
+            with self._broadcast_seconds.time(event=label or event):
+                await self.socketio.emit(event, data, to=to)
+
+        asyncio.run_coroutine_threadsafe(send(), loop)
+
+    def _background(self, function):
+        """
+        Run a function in the thread pool, e.g. to summarize a large graph.
+
+        Args:
+            function (callable): Called without arguments.
+        """
+        self._executor.submit(function)
+
+    def start(self, background=False):
+        """
+        Run the server until it is stopped.
+
+        Blocks the calling thread, which runs the event loop. Stop the
+        server with Ctrl+C or stop() from another thread.
+
+        Args:
+            background (bool, optional): Run the event loop in a thread of
+                its own and return once the server accepts connections.
+                Defaults to False.
+        """
+        if self.running:
+            return
+
+        if background:
+            self._loop_thread = threading.Thread(target=asyncio.run, args=(self.serve(),), name='schnauzer-loop',
+                                                 daemon=True)
+            self._loop_thread.start()
+            while self._loop_thread.is_alive() and not (self._web is not None and self._web.started):
+                time.sleep(0.01)
+            if self.web_port == 0 and self._web is not None and self._web.servers:
+                self.web_port = self._web.servers[0].sockets[0].getsockname()[1]
+            return
+
+        print("="*50)
+        print(f"Starting visualization server at http://localhost:{self.web_port}/")
+        print(f"Backend listener running on port {self.backend_port}")
+        print("="*50)
+        asyncio.run(self.serve())
+
+    async def serve(self):
+        """
+        Serve the web interface and the backend on the running event loop.
+
+        Returns once the server is stopped.
+        """
+        if self.running:
+            return
+        self.running = True
+        self._start_archive()
+        self._loop = asyncio.get_running_loop()
+        self._executor = ThreadPoolExecutor(self.executor_workers, thread_name_prefix='schnauzer')
+        self._ingest_executor = ThreadPoolExecutor(1, thread_name_prefix='schnauzer-ingest')
+
+        self.context = zmq.asyncio.Context()
+        self.socket = self.context.socket(zmq.ROUTER)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        if self.backend_port == 0:
+            self.backend_port = self.socket.bind_to_random_port('tcp://*')
+        else:
+            self.socket.bind(f"tcp://*:{self.backend_port}")
+        self.socket.bind(self.inproc_endpoint)
+        self._open_local_transport()
+        self.broadcaster.start()
+        self._backend_task = asyncio.create_task(self._run_backend())
+
+        config = uvicorn.Config(self.asgi_app, host='0.0.0.0', port=self.web_port,
+                                log_level=logging.getLevelName(log.getEffectiveLevel()).lower(), access_log=False)
+        self._web = uvicorn.Server(config)
+        try:
+            await self._web.serve()
+        finally:
+            self.running = False
+            self._backend_task.cancel()
+            try:
+                await self._backend_task
+            except asyncio.CancelledError:
+                pass
+            self._shutdown()
+
+    async def _run_backend(self):
+        """
+        Answer backend messages until cancelled.
+
+        Like Server._run_backend_server(), but waits for messages on the
+        event loop, so it neither blocks nor occupies a thread while idle.
+        """
+        loop = asyncio.get_running_loop()
+        idle_timeout = self.channels.idle_timeout
+        eviction_interval = None if idle_timeout is None else min(idle_timeout / 4, 60)
+        next_eviction = None if idle_timeout is None else time.monotonic() + eviction_interval
+
+        while True:
+            try:
+                timeout = None
+                if next_eviction is not None:
+                    timeout = max(0, int((next_eviction - time.monotonic()) * 1000))
+
+                events = await self.socket.poll(timeout)
+
+                if next_eviction is not None and time.monotonic() >= next_eviction:
+                    self.channels.evict_idle()
+                    next_eviction = time.monotonic() + eviction_interval
+
+                if not events:
+                    continue
+
+                # Drain everything that arrived while we were busy
+                pending = []
+                while True:
+                    try:
+                        frames = await self.socket.recv_multipart(flags=zmq.NOBLOCK)
+                    except zmq.error.Again:
+                        break
+                    pending.append((time.time(), frames))
+
+                for index, (received, frames) in enumerate(pending):
+                    self._backend_queue = len(pending) - index
+                    envelope, payload = self._split_envelope(frames)
+                    # Shared-memory descriptors are small but stand for large messages
+                    if not is_shared(payload) and sum(len(frame) for frame in payload) <= INLINE_MESSAGE_BYTES:
+                        reply = self._handle_message(payload, received)
+                    else:
+                        # One at a time, so updates are applied in the order they arrived
+                        reply = await loop.run_in_executor(
+                            self._ingest_executor, self._handle_message, payload, received)
+                    await self.socket.send_multipart(envelope + [reply.encode('utf-8')])
+                self._backend_queue = 0
+
+            except asyncio.CancelledError:
+                raise
+
+            except Exception as e:
+                log.error(f"Error in server loop: {e}")
+
+    def _shutdown(self):
+        """Release the backend socket, threads and worker processes."""
+        # Their sockets would keep the context from terminating
+        for client in list(self._clients):
+            client.disconnect()
+        self.socket.close()
+        self.socket = None
+        self._close_local_transport()
+        self.context.term()
+        self.context = None
+        self.broadcaster.stop()
+        if self.archive is not None:
+            self.archive.stop()
+        self._executor.shutdown(wait=False)
+        self._ingest_executor.shutdown(wait=False)
+        if self.layout_engine is not None:
+            self.layout_engine.shutdown()
+        self._loop = None
+        self._web = None
+        print("Backend listener stopped")
+
+    def stop(self):
+        """
+        Stop the server; serve() and start() return once it has shut down.
+
+        Clients created with client() are disconnected first. For a server
+        started in the background, waits until it has shut down.
+
+        Note:
+            Safe to call multiple times and from any thread.
+        """
+        web, loop = self._web, self._loop
+        if not self.running or web is None:
+            return
+        for client in list(self._clients):
+            client.disconnect()
+        web.should_exit = True
+        if self._backend_task is not None:
+            loop.call_soon_threadsafe(self._backend_task.cancel)
+        thread = self._loop_thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+            self._loop_thread = None
@@ -0,0 +1,366 @@
+"""
+Persistent on-disk store of graph versions.
+
+A GraphArchive keeps the latest versions of every channel on disk, so a
+restarted server shows the last graphs right away instead of an empty page
+until every producer has sent again.
+
+Every version is one immutable file, written to a temporary name and
+renamed into place, so a crash never leaves a torn file behind and
+retention only ever deletes whole files::
+
+    <directory>/<channel>.versions/<version>.schz
+
+    FILE_MAGIC | header length (uint32, little-endian) | header JSON
+    | columnar frames | gzip compressed viewer payload
+
+- the header holds the version, title, element counts and the offset and
+  length of every section, each aligned to 8 bytes
+- the frames are the graph in the columnar wire format of schnauzer.wire,
+  decoded straight from a memory map of the file to restore the state
+- the payload is the /graph-data JSON of that version, already gzip
+  compressed, so it is served without decoding the graph at all
+
+Writing happens in a thread of its own. save() only records that a channel
+changed; when the writer gets to it, it writes the channel's version at
+that time, so under load intermediate versions are skipped rather than
+queued, and ingest never waits for the disk.
+"""
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+from schnauzer.payload import Payload
+from schnauzer.wire import decode_message, encode_message
+
+log = logging.getLogger(__name__)
+
+FILE_MAGIC = b'SCHF\x01'
+
+#: Versions kept per channel by default.
+MAX_VERSIONS = 10
+
+_SUFFIX = '.schz'
+_CHANNEL_SUFFIX = '.versions'
+_LENGTH = struct.Struct('<I')
+_ALIGNMENT = 8
+
+
+class ArchiveError(ValueError):
+    """Raised when an archived version cannot be read."""
+
+
+class ArchivedGraph:
+    """
+    One version of a channel on disk, read lazily.
+
+    Only the header is read when the archive is opened; payload() and
+    graph() read the file when called.
+
+    Attributes:
+        channel (str): Channel name.
+        version (int): Graph version.
+        path (str): Path of the file.
+        title (str): Title of the graph.
+        nodes (int): Number of nodes.
+        edges (int): Number of edges.
+        written (float): When the version was written, in seconds since
+            the epoch.
+    """
+
+    def __init__(self, channel, path, header):
+        self.channel = channel
+        self.path = path
+        self.version = header['version']
+        self.title = header.get('title')
+        self.nodes = header.get('nodes', 0)
+        self.edges = header.get('edges', 0)
+        self.written = header.get('time')
+        self._header = header
+
+    @classmethod
+    def open(cls, channel, path):
+        """
+        Read the header of an archived version.
+
+        Args:
+            channel (str): Channel the file belongs to.
+            path (str): Path of the file.
+
+        Returns:
+            ArchivedGraph: The version.
+
+        Raises:
+            ArchiveError: If the file is not a valid archive file.
+        """
+        try:
+            with open(path, 'rb') as file:
+                prefix = file.read(len(FILE_MAGIC) + _LENGTH.size)
+                if len(prefix) < len(FILE_MAGIC) + _LENGTH.size or not prefix.startswith(FILE_MAGIC):
+                    raise ArchiveError(f"Not an archive file: {path}")
+                (length,) = _LENGTH.unpack_from(prefix, len(FILE_MAGIC))
+                header = json.loads(file.read(length))
+        except (OSError, ValueError) as e:
+            raise ArchiveError(f"Cannot read {path}: {e}") from e
+        return cls(channel, path, header)
+
+    def payload(self):
+        """
+        The viewer payload of this version, without decoding the graph.
+
+        Returns:
+            Payload: JSON as served by /graph-data, gzip compressed.
+
+        Raises:
+            ArchiveError: If the file cannot be read.
+        """
+        offset, length = self._header['payload']
+        try:
+            with open(self.path, 'rb') as file:
+                file.seek(offset)
+                data = file.read(length)
+        except OSError as e:
+            raise ArchiveError(f"Cannot read {self.path}: {e}") from e
+        return Payload.from_gzip(data, self._header['payload_size'], self._header['etag'])
+
+    def graph(self):
+        """
+        Decode the graph of this version from a memory map of the file.
+
+        Returns:
+            dict: Graph for GraphState.replace() with 'version', 'positions'
+                and 'layout_version', as GraphState.export() returns it.
+
+        Raises:
+            ArchiveError: If the file cannot be read or decoded.
+        """
+        try:
+            with open(self.path, 'rb') as file, \
+                    mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with memoryview(mapped) as view:
+                    frames = [view[offset:offset + length] for offset, length in self._header['frames']]
+                    try:
+                        graph = decode_message(frames)
+                    finally:
+                        for frame in frames:
+                            frame.release()
+        except (OSError, ValueError) as e:
+            raise ArchiveError(f"Cannot decode {self.path}: {e}") from e
+        graph.pop('type', None)
+        return graph
+
+
+class GraphArchive:
+    """
+    Writes channel versions to disk in the background and finds the latest.
+
+    Thread-safe: save() may be called from any thread and returns at once.
+
+    Attributes:
+        directory (str): Directory holding one subdirectory per channel.
+        max_versions (int): Versions kept per channel; the latest one is
+            always kept.
+        max_bytes (int): Disk budget per channel; the oldest versions are
+            deleted first once it is exceeded. None for no budget.
+        stats (dict): Versions 'written', 'skipped' because a newer one
+            was saved first, 'errors' and 'bytes' written.
+    """
+
+    def __init__(self, directory, max_versions=MAX_VERSIONS, max_bytes=None):
+        """
+        Initialize the archive; call start() to run the writer.
+
+        Args:
+            directory (str): Directory to keep the versions in, created if
+                it does not exist.
+            max_versions (int, optional): Versions kept per channel.
+                Defaults to MAX_VERSIONS.
+            max_bytes (int, optional): Disk budget per channel. Defaults
+                to None, no budget.
+
+        Raises:
+            ValueError: If max_versions is smaller than 1.
+        """
+        if max_versions < 1:
+            raise ValueError("max_versions must be at least 1")
+        self.directory = directory
+        self.max_versions = max_versions
+        self.max_bytes = max_bytes
+        self.stats = {'written': 0, 'skipped': 0, 'errors': 0, 'bytes': 0}
+        self._pending = {}
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self):
+        """Start the writer thread."""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name='schnauzer-archive', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Write what is still pending, then stop the writer thread."""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def save(self, channel, snapshot):
+        """
+        Schedule writing the current version of a channel.
+
+        Args:
+            channel (str): Channel name.
+            snapshot (callable): Called by the writer thread without
+                arguments. Returns ``(graph, payload)`` - the channel's
+                GraphState.export() and its viewer Payload of the same
+                version - or None if there is nothing to write.
+        """
+        with self._condition:
+            if channel in self._pending:
+                self.stats['skipped'] += 1
+            self._pending[channel] = snapshot
+            self._condition.notify_all()
+
+    def latest(self):
+        """
+        Find the latest readable version of every channel.
+
+        Returns:
+            dict: Channel name to ArchivedGraph.
+        """
+        found = {}
+        for entry in sorted(os.listdir(self.directory)):
+            if not entry.endswith(_CHANNEL_SUFFIX):
+                continue
+            channel = entry[:-len(_CHANNEL_SUFFIX)]
+            for version, path in reversed(self._versions(channel)):
+                try:
+                    found[channel] = ArchivedGraph.open(channel, path)
+                    break
+                except ArchiveError as e:
+                    log.warning(f"Skipping unreadable version {version} of channel {channel!r}: {e}")
+        return found
+
+    def _channel_directory(self, channel):
+        """Directory of a channel; the suffix keeps names like '..' harmless."""
+        return os.path.join(self.directory, channel + _CHANNEL_SUFFIX)
+
+    def _versions(self, channel):
+        """``(version, path)`` of the files of a channel, oldest first."""
+        directory = self._channel_directory(channel)
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return []
+        versions = []
+        for name in names:
+            if name.endswith(_SUFFIX) and name[:-len(_SUFFIX)].isdigit():
+                versions.append((int(name[:-len(_SUFFIX)]), os.path.join(directory, name)))
+        return sorted(versions)
+
+    def _run(self):
+        """Write pending channels until stopped and nothing is pending."""
+        while True:
+            with self._condition:
+                while self._running and not self._pending:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                channel = next(iter(self._pending))
+                snapshot = self._pending.pop(channel)
+
+            try:
+                taken = snapshot()
+                if taken is not None:
+                    self._write(channel, *taken)
+                    self._retain(channel)
+            except Exception as e:
+                self.stats['errors'] += 1
+                log.error(f"Error archiving channel {channel!r}: {e}")
+
+    def _write(self, channel, graph, payload):
+        """
+        Write one version of a channel.
+
+        Args:
+            channel (str): Channel name.
+            graph (dict): The channel's GraphState.export().
+            payload (Payload): Viewer payload of the same version.
+        """
+        frames = encode_message(dict(graph, type='full'))
+        compressed = payload.encoded('gzip')
+        elements = graph['elements']
+        header = {
+            'version': graph['version'],
+            'title': graph.get('title'),
+            'nodes': len(elements['nodes']),
+            'edges': len(elements['edges']),
+            'time': time.time(),
+            'etag': payload.etag,
+            'payload_size': payload.size,
+        }
+
+        # The offsets depend on the header length, which depends on the offsets
+        sections = [len(frame) for frame in frames] + [len(compressed)]
+        start = 0
+        while True:
+            layout = []
+            offset = start
+            for length in sections:
+                layout.append([offset, length])
+                offset = _aligned(offset + length)
+            header.update(frames=layout[:-1], payload=layout[-1])
+            encoded = json.dumps(header).encode('utf-8')
+            needed = _aligned(len(FILE_MAGIC) + _LENGTH.size + len(encoded))
+            if needed <= start:
+                break
+            start = needed
+
+        directory = self._channel_directory(channel)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{graph['version']:016d}{_SUFFIX}")
+        temporary = f"{path}.tmp"
+        with open(temporary, 'wb') as file:
+            file.write(FILE_MAGIC + _LENGTH.pack(len(encoded)) + encoded)
+            for data, (offset, length) in zip(list(frames) + [compressed], layout):
+                file.write(b'\x00' * (offset - file.tell()))
+                file.write(data)
+        os.replace(temporary, path)
+
+        written = os.path.getsize(path)
+        with self._condition:
+            self.stats['written'] += 1
+            self.stats['bytes'] += written
+        log.debug(f"Archived version {graph['version']} of channel {channel!r}, {written} bytes")
+
+    def _retain(self, channel):
+        """Delete the oldest versions of a channel beyond the limits."""
+        versions = self._versions(channel)
+        sizes = {path: os.path.getsize(path) for _, path in versions}
+        total = sum(sizes.values())
+        # The latest version is always kept
+        for index, (version, path) in enumerate(versions[:-1]):
+            remaining = len(versions) - index
+            if remaining <= self.max_versions and (self.max_bytes is None or total <= self.max_bytes):
+                break
+            try:
+                os.remove(path)
+            except OSError as e:
+                log.warning(f"Could not delete version {version} of channel {channel!r}: {e}")
+            total -= sizes[path]
+
+
+def _aligned(offset):
+    """Round offset up to the next multiple of _ALIGNMENT."""
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
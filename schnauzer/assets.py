@@ -0,0 +1,518 @@
+"""
+Self-hosted, precompressed static asset bundles.
+
+Usage::
+
+    python -m schnauzer.assets vendor   # Download the pinned third-party libraries
+    python -m schnauzer.assets build    # Bundle, hash and compress into static/dist
+
+The viewer consists of about a dozen ES modules and a stylesheet of our own
+plus Socket.IO, Bootstrap, Bootstrap Icons, Cytoscape.js and its layout
+extensions. Loaded one by one from their CDNs and from /static, a first
+visit takes many round trips, and on networks without internet access the
+page does not work at all.
+
+``vendor`` downloads the third-party files pinned in VENDOR into
+static/vendor, once, by whoever updates them. ``build`` turns the sources
+into three bundles:
+
+- vendor.js: the third-party scripts, concatenated in load order
+- app.js: our ES modules, resolved from static/js/app.js into one module
+- app.css: the third-party stylesheets and ours, with the files they
+  reference (the icon fonts) copied next to them
+
+Scripts are minified with ``rjsmin``, which building requires; vendored
+files that ship minified (``*.min.js``) are taken as they are.
+
+Every output file is named after a hash of its content and is written
+together with gzip and, if the optional ``brotli`` package is installed,
+brotli variants compressed at the highest levels. static/dist/manifest.json
+maps the logical names to the hashed files and records a digest of the
+sources, so a server notices when the sources were edited after the build
+and serves them unbundled instead. Hashed files never change, so the
+server lets browsers cache them forever; after the first visit a page load
+only requests the HTML.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+import shutil
+import sys
+import urllib.request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+log = logging.getLogger(__name__)
+
+#: Third-party files as ``(path in static/vendor, URL)``, pinned to exact versions.
+VENDOR = [
+    ('socket.io.min.js', 'https://cdn.socket.io/4.7.2/socket.io.min.js'),
+    ('bootstrap.bundle.min.js',
+     'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0-alpha1/dist/js/bootstrap.bundle.min.js'),
+    ('cytoscape.min.js', 'https://cdnjs.cloudflare.com/ajax/libs/cytoscape/3.28.1/cytoscape.min.js'),
+    ('layout-base.js', 'https://unpkg.com/layout-base@2.0.1/layout-base.js'),
+    ('cose-base.js', 'https://unpkg.com/cose-base@2.2.0/cose-base.js'),
+    ('cytoscape-fcose.js', 'https://unpkg.com/cytoscape-fcose@2.2.0/cytoscape-fcose.js'),
+    ('dagre.min.js', 'https://cdnjs.cloudflare.com/ajax/libs/dagre/0.8.5/dagre.min.js'),
+    ('cytoscape-dagre.js', 'https://unpkg.com/cytoscape-dagre@2.5.0/cytoscape-dagre.js'),
+    ('bootstrap.min.css', 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0-alpha1/dist/css/bootstrap.min.css'),
+    ('bootstrap-icons.css', 'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.8.1/font/bootstrap-icons.css'),
+    ('fonts/bootstrap-icons.woff2',
+     'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.8.1/font/fonts/bootstrap-icons.woff2'),
+    ('fonts/bootstrap-icons.woff',
+     'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.8.1/font/fonts/bootstrap-icons.woff'),
+]
+
+# Entry module and stylesheet of the viewer, relative to the static folder
+_ENTRY = 'js/app.js'
+_STYLESHEET = 'css/styles.css'
+_VENDOR_DIR = 'vendor'
+_DIST_DIR = 'dist'
+_MANIFEST = 'manifest.json'
+
+# Text files are compressed; fonts and images already are
+_COMPRESSED_TYPES = ('.js', '.css', '.json', '.svg')
+# Variants are served in this order of preference
+_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_IMPORT = re.compile(r"^import\s*\{([^}]*)\}\s*from\s*['\"](\.{1,2}/[^'\"]+)['\"];?[ \t]*$", re.M)
+_EXPORT_DECLARATION = re.compile(
+    r"^export\s+((?:async\s+)?(?:class|function\*?|const|let|var)\s+([A-Za-z_$][\w$]*))", re.M)
+_EXPORT_LIST = re.compile(r"^export\s*\{([^}]*)\};?[ \t]*$", re.M)
+_UNSUPPORTED = re.compile(r"^\s*(?:import|export)\b.*$", re.M)
+_SOURCE_MAP = re.compile(r"^\s*(?://[#@] sourceMappingURL=.*|/\*[#@] sourceMappingURL=.*?\*/)\s*$", re.M)
+_CSS_URL = re.compile(r"""url\(\s*(?:"([^"]*)"|'([^']*)'|([^)'"\s]+))\s*\)""")
+
+
+class BundleError(ValueError):
+    """Raised when the sources cannot be bundled."""
+
+
+class StaticAssets:
+    """
+    The bundles of a build, as listed in its manifest.
+
+    Attributes:
+        directory (str): Directory holding the built files.
+        vendored (bool): True if the bundles include the third-party
+            libraries; otherwise pages load them from their CDNs.
+    """
+
+    def __init__(self, directory, manifest):
+        """
+        Wrap a loaded manifest; use load() to read and check one.
+
+        Args:
+            directory (str): Directory holding the built files.
+            manifest (dict): Parsed manifest.json.
+        """
+        self.directory = directory
+        self.vendored = manifest.get('vendored', False)
+        self._bundles = manifest['bundles']
+        self._files = manifest['files']
+        self._cache = {}
+
+    @classmethod
+    def load(cls, static_folder):
+        """
+        Read the manifest of the bundles built from a static folder.
+
+        Args:
+            static_folder (str): Static folder of the web app.
+
+        Returns:
+            StaticAssets: The bundles, or None if there are none or they
+                were built from other sources than the current ones. Pages
+                then load the sources unbundled.
+        """
+        directory = os.path.join(static_folder, _DIST_DIR)
+        try:
+            with open(os.path.join(directory, _MANIFEST), encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            log.debug("No static asset bundles, serving the sources")
+            return None
+        except (OSError, ValueError) as e:
+            log.warning(f"Cannot read the static asset manifest, serving the sources: {e}")
+            return None
+
+        if manifest.get('sources') != sources_digest(static_folder):
+            log.warning("Static asset bundles are out of date, serving the sources instead; "
+                        "run `python -m schnauzer.assets build`")
+            return None
+        return cls(directory, manifest)
+
+    def filename(self, name):
+        """
+        Hashed file name of a bundle.
+
+        Args:
+            name (str): 'vendor.js', 'app.js' or 'app.css'.
+
+        Returns:
+            str: File name in the build directory.
+
+        Raises:
+            KeyError: If the build has no such bundle.
+        """
+        return self._bundles[name]
+
+    def has(self, name):
+        """
+        Check whether the build has a bundle.
+
+        Args:
+            name (str): 'vendor.js', 'app.js' or 'app.css'.
+
+        Returns:
+            bool: True if filename() knows the bundle.
+        """
+        return name in self._bundles
+
+    def get(self, filename, accept_encodings):
+        """
+        Read a built file in the best encoding a request accepts.
+
+        Files are read once and kept in memory.
+
+        Args:
+            filename (str): Hashed file name, as in a URL.
+            accept_encodings: The request's parsed Accept-Encoding header,
+                e.g. ``flask.request.accept_encodings``.
+
+        Returns:
+            tuple: ``(data, encoding, mimetype)`` with encoding 'br', 'gzip'
+                or 'identity'.
+
+        Raises:
+            KeyError: If the file is not part of the build.
+        """
+        encodings = self._files[filename]
+        encoding = accept_encodings.best_match([name for name, _ in _ENCODINGS if name in encodings])
+        encoding = encoding or 'identity'
+
+        key = (filename, encoding)
+        data = self._cache.get(key)
+        if data is None:
+            suffix = dict(_ENCODINGS).get(encoding, '')
+            with open(os.path.join(self.directory, filename + suffix), 'rb') as f:
+                data = self._cache[key] = f.read()
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        return data, encoding, mimetype
+
+
+def sources_digest(static_folder):
+    """
+    Digest of every source the bundles are built from.
+
+    Args:
+        static_folder (str): Static folder of the web app.
+
+    Returns:
+        str: Hex digest over the paths and contents of the JavaScript and
+            CSS sources and the vendored files.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for directory in ('js', 'css', _VENDOR_DIR):
+        root = os.path.join(static_folder, directory)
+        for base, dirs, files in os.walk(root):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(base, name)
+                digest.update(os.path.relpath(path, static_folder).replace(os.sep, '/').encode('utf-8'))
+                with open(path, 'rb') as f:
+                    digest.update(f.read())
+    return digest.hexdigest()
+
+
+def bundle_modules(entry):
+    """
+    Combine an ES module and everything it imports into one module.
+
+    Every module becomes a function scope returning its exports, placed
+    after the modules it imports, so top-level names of different modules
+    never clash. Only the forms the viewer uses are supported: named
+    imports of relative paths, exported declarations and export lists.
+
+    Args:
+        entry (str): Path of the entry module.
+
+    Returns:
+        str: Source of the bundle, itself an ES module without imports.
+
+    Raises:
+        BundleError: On circular or unsupported imports and exports.
+    """
+    order = []
+    variables = {}
+
+    def visit(path, chain):
+        if path in variables:
+            return
+        if path in chain:
+            raise BundleError(f"Circular import: {' -> '.join(chain + [path])}")
+        with open(path, encoding='utf-8') as f:
+            source = f.read()
+
+        imports = []
+        for names, target in _IMPORT.findall(source):
+            target = os.path.normpath(os.path.join(os.path.dirname(path), target))
+            visit(target, chain + [path])
+            imports.append((names, target))
+        source = _IMPORT.sub('', source)
+
+        exports = [name for _, name in _EXPORT_DECLARATION.findall(source)]
+        source = _EXPORT_DECLARATION.sub(r'\1', source)
+        for names in _EXPORT_LIST.findall(source):
+            exports.extend(_bindings(names))
+        source = _EXPORT_LIST.sub('', source)
+
+        unsupported = _UNSUPPORTED.search(source)
+        if unsupported:
+            raise BundleError(f"Unsupported statement in {path}: {unsupported.group().strip()}")
+
+        variable = f"__schnauzer_{re.sub(r'[^A-Za-z0-9_]', '_', os.path.splitext(os.path.basename(path))[0])}"
+        while variable in variables.values():
+            variable += '_'
+        variables[path] = variable
+        header = ''.join(f"const {{ {', '.join(_bindings(names, imported=True))} }} = {variables[target]};\n"
+                         for names, target in imports)
+        order.append(f"const {variable} = (() => {{\n{header}{source.strip()}\n"
+                     f"return {{ {', '.join(exports)} }};\n}})();\n")
+
+    visit(os.path.normpath(entry), [])
+    return '\n'.join(order)
+
+
+def _bindings(names, imported=False):
+    """
+    Turn ``a, b as c`` from an import or export list into object bindings.
+
+    Args:
+        names (str): The list between the braces.
+        imported (bool, optional): True for an import list, which becomes
+            the destructuring ``b: c``; False for an export list, which
+            becomes the object ``c: b``. Defaults to False.
+
+    Returns:
+        list: One binding per name.
+
+    Raises:
+        BundleError: If a name is neither ``a`` nor ``a as b``.
+    """
+    bindings = []
+    for name in filter(None, (name.strip() for name in names.split(','))):
+        parts = name.split()
+        if len(parts) == 1:
+            bindings.append(parts[0])
+        elif len(parts) == 3 and parts[1] == 'as':
+            bindings.append(f"{parts[0]}: {parts[2]}" if imported else f"{parts[2]}: {parts[0]}")
+        else:
+            raise BundleError(f"Unsupported binding {name!r}")
+    return bindings
+
+
+def _minify(script):
+    """Strip the comments and whitespace of a script, keeping ``/*! ... */`` license headers."""
+    return rjsmin.jsmin(script, keep_bang_comments=True)
+
+
+def _hashed(name, data):
+    """File name with a content hash, e.g. ``app.1a2b3c4d5e6f7a8b.js``."""
+    stem, extension = os.path.splitext(name)
+    return f"{stem}.{hashlib.blake2b(data, digest_size=8).hexdigest()}{extension}"
+
+
+def _write(output, name, data, files):
+    """
+    Write one built file and its compressed variants.
+
+    Args:
+        output (str): Build directory.
+        name (str): Logical file name.
+        data (bytes): Content.
+        files (dict): Hashed file name to list of encodings, updated.
+
+    Returns:
+        str: The hashed file name.
+    """
+    filename = _hashed(name, data)
+    with open(os.path.join(output, filename), 'wb') as f:
+        f.write(data)
+    encodings = []
+    if filename.endswith(_COMPRESSED_TYPES):
+        variants = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants['br'] = brotli.compress(data, quality=11)
+        for encoding, suffix in _ENCODINGS:
+            compressed = variants.get(encoding)
+            if compressed is not None and len(compressed) < len(data):
+                with open(os.path.join(output, filename + suffix), 'wb') as f:
+                    f.write(compressed)
+                encodings.append(encoding)
+    files[filename] = encodings
+    return filename
+
+
+def _stylesheet(path, output, files):
+    """
+    Read a stylesheet and copy the local files it references into the build.
+
+    Args:
+        path (str): Path of the stylesheet.
+        output (str): Build directory.
+        files (dict): Hashed file name to list of encodings, updated.
+
+    Returns:
+        str: The stylesheet with url() references to the hashed copies.
+    """
+    with open(path, encoding='utf-8') as f:
+        source = _SOURCE_MAP.sub('', f.read())
+
+    def replace(match):
+        url = next(group for group in match.groups() if group is not None)
+        if re.match(r'^(?:[a-z]+:|/|#)', url, re.I):
+            return match.group()
+        local = os.path.normpath(os.path.join(os.path.dirname(path), re.split(r'[?#]', url)[0]))
+        try:
+            with open(local, 'rb') as f:
+                data = f.read()
+        except OSError as e:
+            raise BundleError(f"{path} references {url}, which cannot be read: {e}") from e
+        return f'url("{_write(output, os.path.basename(local), data, files)}")'
+
+    return _CSS_URL.sub(replace, source)
+
+
+def build(static_folder):
+    """
+    Build the bundles of a static folder into its dist directory.
+
+    Files of an earlier build are removed first.
+
+    Args:
+        static_folder (str): Static folder of the web app.
+
+    Returns:
+        dict: The manifest that was written.
+
+    Raises:
+        BundleError: If the sources cannot be bundled, only some of the
+            VENDOR files are present or rjsmin is not installed.
+    """
+    vendor = os.path.join(static_folder, _VENDOR_DIR)
+    present = [name for name, _ in VENDOR if os.path.exists(os.path.join(vendor, name))]
+    if present and len(present) < len(VENDOR):
+        missing = sorted(set(name for name, _ in VENDOR) - set(present))
+        raise BundleError(f"Vendored files missing: {', '.join(missing)}; run `python -m schnauzer.assets vendor`")
+    vendored = bool(present)
+    if not vendored:
+        log.warning("No vendored libraries, pages will load them from their CDNs")
+    if rjsmin is None:
+        raise BundleError("rjsmin is not installed, it is needed to minify the scripts; "
+                          "pip install 'schnauzer[assets]'")
+    if brotli is None:
+        log.warning("brotli is not installed, building gzip variants only")
+
+    output = os.path.join(static_folder, _DIST_DIR)
+    shutil.rmtree(output, ignore_errors=True)
+    os.makedirs(output)
+
+    files = {}
+    bundles = {}
+    if vendored:
+        scripts = []
+        for name, _ in VENDOR:
+            if name.endswith('.js'):
+                with open(os.path.join(vendor, name), encoding='utf-8') as f:
+                    script = _SOURCE_MAP.sub('', f.read())
+                if not name.endswith('.min.js'):
+                    script = _minify(script)
+                scripts.append(f"/* {name} */\n{script.strip()}\n")
+        # Separate the scripts, one may end without a semicolon
+        bundles['vendor.js'] = _write(output, 'vendor.js', ';\n'.join(scripts).encode('utf-8'), files)
+
+    app = _minify(bundle_modules(os.path.join(static_folder, _ENTRY)))
+    bundles['app.js'] = _write(output, 'app.js', app.encode('utf-8'), files)
+
+    stylesheets = [os.path.join(vendor, name) for name, _ in VENDOR if vendored and name.endswith('.css')]
+    stylesheets.append(os.path.join(static_folder, _STYLESHEET))
+    css = '\n'.join(_stylesheet(path, output, files) for path in stylesheets)
+    bundles['app.css'] = _write(output, 'app.css', css.encode('utf-8'), files)
+
+    manifest = {
+        'sources': sources_digest(static_folder),
+        'vendored': vendored,
+        'bundles': bundles,
+        'files': dict(sorted(files.items())),
+    }
+    with open(os.path.join(output, _MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+        f.write('\n')
+    return manifest
+
+
+def vendor(static_folder):
+    """
+    Download the VENDOR files into the vendor directory of a static folder.
+
+    Args:
+        static_folder (str): Static folder of the web app.
+
+    Raises:
+        OSError: If a file cannot be downloaded or written.
+    """
+    for name, url in VENDOR:
+        path = os.path.join(static_folder, _VENDOR_DIR, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with urllib.request.urlopen(url, timeout=30) as response:
+            data = response.read()
+        with open(path, 'wb') as f:
+            f.write(data)
+        log.info(f"Downloaded {url} to {path}, {len(data)} bytes")
+
+
+def main(argv=None):
+    """Vendor or build the static assets from the command line."""
+    parser = argparse.ArgumentParser(description='Build the static assets of the Schnauzer viewer')
+    parser.add_argument('command', choices=['vendor', 'build'],
+                        help="'vendor' downloads the pinned third-party libraries, "
+                             "'build' bundles, hashes and compresses the assets")
+    parser.add_argument('--static-folder', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'),
+                        help='Static folder to work on (default: the one of this package)')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    if args.command == 'vendor':
+        vendor(args.static_folder)
+        return 0
+
+    try:
+        manifest = build(args.static_folder)
+    except BundleError as e:
+        log.error(str(e))
+        return 1
+    output = os.path.join(args.static_folder, _DIST_DIR)
+    for name, filename in manifest['bundles'].items():
+        sizes = ', '.join(f"{encoding} {os.path.getsize(os.path.join(output, filename + suffix))}"
+                          for encoding, suffix in _ENCODINGS if encoding in manifest['files'][filename])
+        print(f"{name:10} {filename:32} {os.path.getsize(os.path.join(output, filename))} bytes"
+              f"{f' ({sizes})' if sizes else ''}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
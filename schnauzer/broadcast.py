@@ -0,0 +1,368 @@
+"""
+Per-viewer scheduling of graph updates.
+
+The backend thread only tells the Broadcaster that a channel has a new
+version. A scheduler thread of its own then decides, for every viewer
+separately, what to send and when:
+
+- at most max_fps updates per second per viewer
+- nothing while max_unacked updates to the viewer are unacknowledged
+- a viewer that fell behind skips the versions in between: it receives
+  one patch composed of all patches it missed, or the latest complete
+  graph if those patches are no longer known
+
+Viewers acknowledge every update they have drawn, so a slow browser is
+simply sent fewer, larger updates. It never builds up a queue, never
+delays the viewers of other channels and never blocks ingest.
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+from schnauzer.delta import compose
+
+log = logging.getLogger(__name__)
+
+#: Updates a viewer may have unacknowledged before it is skipped.
+MAX_UNACKED = 2
+
+#: Seconds after which an unacknowledged update no longer holds back a viewer.
+ACK_TIMEOUT = 10.0
+
+#: Recent patches kept per channel to bring lagging viewers up to date.
+MAX_PATCHES = 32
+
+
+class _Viewer:
+    """Delivery state of one viewer."""
+
+    __slots__ = ('channel', 'version', 'unacked', 'next_send', 'stale', 'missed')
+
+    def __init__(self, channel, version):
+        self.channel = channel
+        self.version = version  # Last version sent to the viewer
+        self.unacked = {}  # Version -> time.monotonic() it was sent
+        self.next_send = 0.0  # Earliest time.monotonic() of the next send
+        self.stale = False  # The channel has a version the viewer was not sent yet
+        self.missed = 0  # Versions announced since the last send
+
+
+class _Channel:
+    """Latest version of one channel and the patches that led to it."""
+
+    __slots__ = ('version', 'patches', 'viewers')
+
+    def __init__(self, max_patches):
+        self.version = None
+        self.patches = deque(maxlen=max_patches)
+        self.viewers = set()
+
+
+class Broadcaster:
+    """
+    Sends every viewer the latest version of its channel at its own pace.
+
+    Thread-safe: the backend thread announces versions, Socket.IO handlers
+    add and acknowledge viewers, and the scheduler thread sends.
+
+    Attributes:
+        max_fps (float): Most updates per second sent to one viewer, 0 for
+            no limit.
+        max_unacked (int): Unacknowledged updates after which a viewer is
+            skipped until it catches up.
+        ack_timeout (float): Seconds after which an unacknowledged update
+            no longer counts, so a viewer that lost an acknowledgement
+            is not skipped forever.
+        stats (dict): Updates sent as 'full' graphs and as 'patch'es,
+            patches 'composed' of several versions, versions 'skipped' by
+            lagging viewers and 'ack_timeouts'.
+    """
+
+    def __init__(self, send, full_state, max_fps=20, max_unacked=MAX_UNACKED, ack_timeout=ACK_TIMEOUT,
+                 max_patches=MAX_PATCHES):
+        """
+        Initialize the broadcaster; call start() to run the scheduler.
+
+        Args:
+            send (callable): Called as ``send(event, data, viewer)`` to emit
+                a 'graph_update' or 'graph_patch' event to one viewer.
+            full_state (callable): Called with a channel name, returns
+                ``(data, version)`` of the complete current graph for a
+                'graph_update' event, or None if the broadcaster should
+                not send the channel's graph.
+            max_fps (float, optional): Most updates per second per viewer.
+                Defaults to 20, 0 for no limit.
+            max_unacked (int, optional): Defaults to MAX_UNACKED.
+            ack_timeout (float, optional): Defaults to ACK_TIMEOUT.
+            max_patches (int, optional): Recent patches kept per channel.
+                Defaults to MAX_PATCHES.
+        """
+        self.max_fps = max_fps
+        self.max_unacked = max_unacked
+        self.ack_timeout = ack_timeout
+        self.stats = {'full': 0, 'patch': 0, 'composed': 0, 'skipped': 0, 'ack_timeouts': 0}
+        self._send = send
+        self._full_state = full_state
+        self._max_patches = max_patches
+        self._interval = 1 / max_fps if max_fps else 0.0
+        self._viewers = {}
+        self._channels = {}
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """Start the scheduler thread."""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name='schnauzer-broadcast', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the scheduler thread. Updates not sent yet are dropped."""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _channel(self, name):
+        """Delivery state of a channel, created on first use. Caller holds the lock."""
+        channel = self._channels.get(name)
+        if channel is None:
+            channel = self._channels[name] = _Channel(self._max_patches)
+        return channel
+
+    def add_viewer(self, viewer, channel, version):
+        """
+        Register a viewer that was just sent the graph of a channel.
+
+        Args:
+            viewer (str): Viewer id, e.g. the Socket.IO session id.
+            channel (str): Channel the viewer watches.
+            version (int): Version the viewer was sent; it counts as
+                unacknowledged until the viewer acknowledges it.
+        """
+        with self._condition:
+            previous = self._viewers.get(viewer)
+            if previous is not None:
+                self._channels[previous.channel].viewers.discard(viewer)
+            state = _Viewer(channel, version)
+            state.unacked[version] = time.monotonic()
+            self._viewers[viewer] = state
+            info = self._channel(channel)
+            info.viewers.add(viewer)
+            state.stale = info.version is not None and info.version > version
+            self._condition.notify_all()
+
+    def remove_viewer(self, viewer):
+        """
+        Forget a viewer that disconnected.
+
+        Args:
+            viewer (str): Viewer id.
+        """
+        with self._condition:
+            state = self._viewers.pop(viewer, None)
+            if state is not None:
+                self._channels[state.channel].viewers.discard(viewer)
+
+    def forget(self, channel):
+        """
+        Drop the patches of a channel that was evicted.
+
+        Args:
+            channel (str): Channel name.
+        """
+        with self._condition:
+            info = self._channels.get(channel)
+            if info is not None and not info.viewers:
+                del self._channels[channel]
+
+    def channels(self):
+        """
+        Channels the broadcaster keeps state for.
+
+        Returns:
+            set: Channel names.
+        """
+        with self._condition:
+            return set(self._channels)
+
+    def acknowledge(self, viewer, version):
+        """
+        Record that a viewer has drawn a version and all earlier ones.
+
+        Args:
+            viewer (str): Viewer id.
+            version (int): Version the viewer acknowledges.
+        """
+        with self._condition:
+            state = self._viewers.get(viewer)
+            if state is None:
+                return
+            for sent in [sent for sent in state.unacked if sent <= version]:
+                del state.unacked[sent]
+            self._condition.notify_all()
+
+    def notify(self, channel, version, patch=None):
+        """
+        Announce a new version of a channel.
+
+        Only marks the channel's viewers as out of date; the scheduler
+        thread sends the updates, so this never blocks on viewers.
+
+        Args:
+            channel (str): Channel that was updated.
+            version (int): The channel's new version.
+            patch (dict, optional): 'graph_patch' event data leading from
+                the previous version to this one, with 'base_version',
+                'version' and 'delta'. None for a complete new graph.
+        """
+        with self._condition:
+            info = self._channel(channel)
+            if patch is None:
+                info.patches.clear()
+            else:
+                if info.patches and info.patches[-1]['version'] != patch['base_version']:
+                    # Patches must form a chain ending at the current version
+                    info.patches.clear()
+                info.patches.append(patch)
+            info.version = version
+
+            for viewer in info.viewers:
+                state = self._viewers[viewer]
+                if state.version != version:
+                    state.stale = True
+                    state.missed += 1
+            self._condition.notify_all()
+
+    def lagging(self):
+        """
+        Number of viewers that are skipped for unacknowledged updates.
+
+        Returns:
+            int: Viewers with max_unacked unacknowledged updates.
+        """
+        with self._condition:
+            return sum(1 for state in self._viewers.values() if len(state.unacked) >= self.max_unacked)
+
+    def _run(self):
+        """Send updates to the viewers that are due until stopped."""
+        while True:
+            with self._condition:
+                due = self._wait_due()
+                if due is None:
+                    return
+                work = []
+                for viewer, state in due:
+                    state.stale = False
+                    work.append((viewer, state.channel, state.version))
+
+            # Viewers at the same version of a channel get the same update
+            frames = {}
+            for viewer, channel, base in work:
+                key = (channel, base)
+                if key not in frames:
+                    frames[key] = self._frame(channel, base)
+                frame = frames[key]
+                if frame is None:
+                    continue
+
+                event, data, version = frame
+                try:
+                    self._send(event, data, viewer)
+                except Exception as e:
+                    log.error(f"Error sending {event} to viewer {viewer}: {e}")
+                    continue
+
+                with self._condition:
+                    state = self._viewers.get(viewer)
+                    if state is None:
+                        continue
+                    now = time.monotonic()
+                    self.stats['full' if event == 'graph_update' else 'patch'] += 1
+                    self.stats['skipped'] += max(0, state.missed - 1)
+                    state.missed = 0
+                    state.version = version
+                    state.unacked[version] = now
+                    state.next_send = now + self._interval
+                    if self._channels[channel].version > version:
+                        state.stale = True
+
+    def _wait_due(self):
+        """
+        Wait until viewers are due for an update. Caller holds the lock.
+
+        Returns:
+            list: ``(viewer, state)`` pairs, or None once stopped.
+        """
+        while self._running:
+            now = time.monotonic()
+            due = []
+            wake = None
+            for viewer, state in self._viewers.items():
+                if not state.stale:
+                    continue
+                for sent, at in list(state.unacked.items()):
+                    if now - at > self.ack_timeout:
+                        del state.unacked[sent]
+                        self.stats['ack_timeouts'] += 1
+
+                if len(state.unacked) >= self.max_unacked:
+                    ready = min(state.unacked.values()) + self.ack_timeout
+                elif state.next_send > now:
+                    ready = state.next_send
+                else:
+                    due.append((viewer, state))
+                    continue
+                wake = ready if wake is None else min(wake, ready)
+
+            if due:
+                return due
+            self._condition.wait(None if wake is None else max(0.0, wake - now))
+        return None
+
+    def _frame(self, channel, base):
+        """
+        Build the update that brings a viewer from base to the latest version.
+
+        Args:
+            channel (str): Channel of the viewer.
+            base (int): Version the viewer was sent last.
+
+        Returns:
+            tuple: ``(event, data, version)``, or None if there is nothing
+                to send.
+        """
+        with self._condition:
+            info = self._channels.get(channel)
+            if info is None or info.version is None or info.version <= base:
+                return None
+            chain = None
+            for index, patch in enumerate(info.patches):
+                if patch['base_version'] == base:
+                    chain = list(info.patches)[index:]
+                    break
+
+        if chain:
+            if len(chain) == 1:
+                return 'graph_patch', chain[0], chain[0]['version']
+            with self._condition:
+                self.stats['composed'] += 1
+            patch = dict(chain[-1], base_version=base, delta=compose([patch['delta'] for patch in chain]))
+            for step in reversed(chain):
+                if 'trace_count' in step:
+                    patch['trace_count'] = step['trace_count']
+                    break
+            return 'graph_patch', patch, patch['version']
+
+        state = self._full_state(channel)
+        if state is None:
+            return None
+        data, version = state
+        return 'graph_update', data, version
@@ -4,12 +4,25 @@ Client module for connecting to the visualization server using ZeroMQ.
 This module provides a client interface to send NetworkX graph data to the
 Schnauzer visualization server for interactive rendering with Cytoscape.js.
 """
-import networkx as nx
 import zmq
 import json
 import atexit
+import copy
 import networkx
 import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from schnauzer.convert import to_elements, node_data, edge_data, encode_graph
+from schnauzer.delta import diff, delta_size, snapshot
+from schnauzer.protocol import HELLO, REQUEST_TIMEOUT_MS, parse_hello, parse_ack
+from schnauzer.shm import SHM_MIN_BYTES, SegmentWriter, same_host
+from schnauzer.store import ChannelStore, DEFAULT_CHANNEL
+from schnauzer.stream import GraphStream
+from schnauzer.wire import encode_message, is_columnar
 
 log = logging.getLogger(__name__)
 
@@ -19,14 +32,38 @@ class VisualizationClient:
 
     This class handles the connection to a running Schnauzer visualization server
     and provides methods to convert and send NetworkX graph data for display.
-    The client uses ZeroMQ REQ-REP pattern for communication.
+    By default the client uses the ZeroMQ REQ-REP pattern and send_graph()
+    blocks until the server acknowledged the graph. With ``blocking=False``
+    a background thread sends graphs over a DEALER socket instead, and
+    send_graph() returns a Future right away.
+
+    Producers that change a graph one element at a time open a stream()
+    instead, which batches the changes without keeping a graph around.
 
     Attributes:
         host (str): Hostname or IP address of the visualization server.
         port (int): Port number the server is listening on.
+        endpoint (str): ZeroMQ endpoint the client connects to.
         context (zmq.Context): ZeroMQ context for socket creation.
-        socket (zmq.Socket): ZeroMQ REQ socket for communication.
+        socket (zmq.Socket): ZeroMQ REQ (or DEALER) socket for communication.
         connected (bool): Connection status flag.
+        blocking (bool): Whether send_graph() waits for the acknowledgement.
+        queue_size (int): Maximum number of unsent graphs per channel kept
+            in non-blocking mode before the oldest one is coalesced.
+        stats (dict): Counters for non-blocking mode: 'sent', 'failed',
+            'coalesced' and 'dropped' graphs.
+        delta (bool): Whether incremental patches are sent when the
+            server supports them.
+        encoding (str): Requested wire encoding, 'auto', 'columnar' or 'json'.
+        shared_memory (bool): Whether large columnar messages go through
+            shared memory if the server runs on the same host.
+        capabilities (dict): Capabilities announced by the server during
+            the handshake.
+        version (int): Last graph version acknowledged by the server,
+            or None if no graph has been acknowledged yet.
+        clock_offset (float): Seconds to add to the local clock to get the
+            server's, estimated during the handshake. Updates are stamped
+            in server time, so the server can trace their latency.
 
     Examples:
         >>> import networkx as nx
@@ -40,9 +77,20 @@ class VisualizationClient:
         >>> # Send to visualization server
         >>> client = VisualizationClient()
         >>> client.send_graph(G, title="My Graph")
+        >>>
+        >>> # Don't wait for the server inside a simulation loop
+        >>> client = VisualizationClient(blocking=False)
+        >>> future = client.send_graph(G, title="Step 1")
+        >>> client.flush()
+        >>>
+        >>> # Stream single changes, sent in batches every 50 ms
+        >>> with client.stream(channel="events") as stream:
+        ...     stream.add_edge("A", "B", weight=1)
+        ...     stream.update_attrs("A", load=0.5)
     """
 
-    def __init__(self, host='localhost', port=8086, log_level = logging.INFO):
+    def __init__(self, host='localhost', port=8086, log_level = logging.INFO, delta=True,
+                 encoding='auto', blocking=True, queue_size=1, shared_memory=True, endpoint=None, context=None):
         """
         Initialize the visualization client.
 
@@ -56,17 +104,78 @@ class VisualizationClient:
                 Defaults to 8086.
             log_level (int, optional): Logging level for this client.
                 Defaults to logging.INFO.
+            delta (bool, optional): Send only the changes since the last
+                acknowledged version instead of the whole graph, if the
+                server supports it. Defaults to True.
+            encoding (str, optional): Wire encoding for graph messages.
+                'columnar' uses the compact binary format from
+                schnauzer.wire, 'json' sends a JSON document and 'auto'
+                picks columnar if the server announces support for it.
+                Defaults to 'auto'.
+            blocking (bool, optional): If False, send_graph() only
+                converts the graph and hands it to a background sender
+                thread. Defaults to True.
+            queue_size (int, optional): Number of graphs per channel that
+                may wait for the sender thread. When a new graph arrives
+                and the queue is full, the oldest waiting graph of the same
+                channel is replaced (latest wins). Defaults to 1.
+            shared_memory (bool, optional): If the server runs on the same
+                host, talk to it over its ipc:// endpoint and hand over
+                large columnar messages in a shared-memory segment instead
+                of sending their frames (see schnauzer.shm). Defaults to
+                True.
+            endpoint (str, optional): ZeroMQ endpoint of the server's
+                backend, overriding host and port, e.g. the inproc://
+                endpoint of a server in this process. Defaults to None.
+            context (zmq.Context, optional): ZeroMQ context to create the
+                sockets in, required for inproc:// endpoints. It is not
+                terminated by disconnect(). Defaults to None, which creates
+                a context of the client's own.
+
+        Raises:
+            ValueError: If encoding is not one of the supported values
+                or queue_size is smaller than 1.
 
         Note:
             The client automatically registers cleanup on program exit to
             ensure proper socket closure.
         """
+        if encoding not in ('auto', 'columnar', 'json'):
+            raise ValueError(f"Unknown encoding {encoding!r}, expected 'auto', 'columnar' or 'json'")
+        if queue_size < 1:
+            raise ValueError("queue_size must be at least 1")
+
         log.setLevel(log_level)
         self.host = host
         self.port = port
-        self.context = zmq.Context()
+        self.endpoint = endpoint or f"tcp://{host}:{port}"
+        self.context = context if context is not None else zmq.Context()
+        self._owns_context = context is None
         self.socket = None
         self.connected = False
+        self.delta = delta
+        self.encoding = encoding
+        self.shared_memory = shared_memory
+        self.capabilities = {}
+        self.version = None
+        self.clock_offset = 0.0
+
+        # Last acknowledged graph per channel, used as the base for delta patches
+        self._acked = {}
+
+        # Shared-memory segment for large messages, if the server is local
+        self._segments = None
+
+        # Non-blocking mode: latest-wins queue drained by a sender thread
+        self.blocking = blocking
+        self.queue_size = queue_size
+        self.stats = {'sent': 0, 'failed': 0, 'coalesced': 0, 'dropped': 0}
+        self._pending = deque()
+        self._in_flight = False
+        self._closed = False
+        self._condition = threading.Condition()
+        self._sender = None
+        self._streams = set()
 
         # Ensure proper cleanup on program exit
         atexit.register(self.disconnect)
@@ -76,8 +185,12 @@ class VisualizationClient:
         """
         Establish a non-blocking connection to the visualization server.
 
-        Creates a ZeroMQ REQ socket and connects to the server. Sets a 5-second
-        timeout for future operations to prevent indefinite blocking.
+        Creates a ZeroMQ REQ socket (DEALER in non-blocking mode) and connects
+        to the server. Sets a 5-second timeout for future operations to
+        prevent indefinite blocking, then performs a HELLO handshake to learn
+        which protocol features the server supports. If the server turns
+        out to run on the same host, the client switches to its ipc://
+        endpoint and shared-memory transfer.
 
         Returns:
             bool: True if connection was successful, False otherwise.
@@ -90,34 +203,121 @@ class VisualizationClient:
             return True
 
         try:
-            self.socket = self.context.socket(zmq.REQ)
-            self.socket.setsockopt(zmq.LINGER, 0)
-            self.socket.setsockopt(zmq.RCVTIMEO, 5000)
+            log.info(f"Trying to connect to visualization server at {self.endpoint} ... ")
 
-            log.info(f"Trying to connect to visualization server at {self.host}:{self.port} ... ")
+            self.socket = self._open_socket(self.endpoint)
 
-            self.socket.connect(f"tcp://{self.host}:{self.port}")
+            start = time.time()
+            self.capabilities = parse_hello(self._exchange([HELLO.encode('utf-8')]))
+            if 'time' in self.capabilities:
+                # The server read its clock about halfway through the round trip
+                self.clock_offset = self.capabilities['time'] - (start + time.time()) / 2
             log.info("Success!")
+            log.debug(f"Server capabilities: {self.capabilities}")
+            self._use_local_transport()
 
             self.connected = True
             return True
         except zmq.error.ZMQError as e:
-            log.error(f"Could not create socket: {e}")
-            self.socket = None
+            log.error(f"Could not connect to visualization server: {e}")
+            self._reset()
             return False
 
 
+    def _open_socket(self, endpoint):
+        """
+        Create the socket for requests and connect it.
+
+        Args:
+            endpoint (str): ZeroMQ endpoint of the server's backend.
+
+        Returns:
+            zmq.Socket: REQ socket, or DEALER socket in non-blocking mode.
+        """
+        socket = self.context.socket(zmq.REQ if self.blocking else zmq.DEALER)
+        socket.setsockopt(zmq.LINGER, 0)
+        socket.setsockopt(zmq.RCVTIMEO, REQUEST_TIMEOUT_MS)
+        socket.connect(endpoint)
+        return socket
+
+    def _use_local_transport(self):
+        """
+        Switch to shared-memory transfer if the server shares memory with us.
+
+        The server's HELLO reply names a probe segment; only if this process
+        can read the server's token from it are large messages written to
+        shared memory, and the ipc:// endpoint is used if its socket file
+        is visible here as well.
+        """
+        local = self.capabilities.get('local')
+        if not self.shared_memory or not isinstance(local, dict) or not same_host(local):
+            return
+
+        self._segments = SegmentWriter()
+        endpoint = local.get('ipc')
+        if endpoint and os.path.exists(endpoint[len('ipc://'):]):
+            self.socket.close()
+            self.socket = self._open_socket(endpoint)
+            log.info(f"Server runs on this host, using {endpoint} and shared memory")
+        else:
+            log.info("Server runs on this host, using shared memory")
+
+    def _reset(self):
+        """
+        Drop the current socket so the next send reconnects.
+
+        A REQ socket that timed out waiting for a reply cannot send again,
+        and a DEALER socket would receive the late reply in place of the
+        next one, so the socket is closed and the acknowledged base version
+        is forgotten.
+        """
+        if self.socket:
+            try:
+                self.socket.close()
+            except zmq.error.ZMQError:
+                pass
+        self.socket = None
+        self.connected = False
+        self._acked = {}
+        self.version = None
+
+        # The server may still be reading the segment of the failed request
+        if self._segments is not None:
+            self._segments.discard()
+            self._segments = None
+
+
     def disconnect(self):
         """
         Close the connection to the visualization server.
 
-        Properly closes the ZeroMQ socket and terminates the context.
+        Properly closes the ZeroMQ socket, unlinks the shared-memory
+        segment if there is one and terminates the context, unless it
+        was passed in.
         This method is automatically called on program exit but can
         also be called manually if needed.
 
+        In non-blocking mode, graphs still waiting in the queue are given
+        one request timeout to be sent; whatever is left afterwards is
+        dropped and its futures resolve to False.
+
+        Open streams are closed first, which sends their buffered changes.
+
         Note:
             Safe to call multiple times - subsequent calls have no effect.
         """
+        for stream in list(self._streams):
+            stream.close()
+
+        if self._sender is not None:
+            self.flush(timeout=REQUEST_TIMEOUT_MS / 1000)
+            with self._condition:
+                self._closed = True
+                self._drop_pending()
+                self._condition.notify_all()
+            self._sender.join()
+            self._sender = None
+
         if self.socket:
             try:
                 self.socket.close()
@@ -126,16 +326,33 @@ class VisualizationClient:
                 pass
             self.socket = None
             self.connected = False
+        if self._segments is not None:
+            self._segments.discard()
+            self._segments = None
         if hasattr(self, 'context') and self.context:
-            self.context.term()
+            if self._owns_context:
+                self.context.term()
+            self.context = None
 
-    def send_graph(self, graph: networkx.Graph, title=None, traces=None):
+    def send_graph(self, graph: networkx.Graph, title=None, traces=None, node_attrs=None, edge_attrs=None,
+                   callback=None, channel=None):
         """
         Send NetworkX graph data to the visualization server.
 
         Converts the NetworkX graph to Cytoscape.js format and sends it
         to the visualization server for rendering. The graph will be
         displayed in the web interface with interactive features.
+        Conversion uses schnauzer.convert, which walks the graph once
+        instead of going through nx.cytoscape_data.
+
+        Once the server has acknowledged a graph, subsequent calls only
+        send the nodes and edges that were added, changed or removed since
+        that version. If another producer updated the server in between,
+        the server asks for a resync and the full graph is sent instead.
+
+        Each channel holds its own graph on the server. Viewers watch a
+        channel at http://<server>/g/<channel>; graphs sent without a
+        channel are shown on the server's root page.
 
         Args:
             graph (networkx.Graph): NetworkX graph object to visualize.
@@ -144,10 +361,24 @@ class VisualizationClient:
                 Defaults to 'NetworkX Graph Visualization with Cytoscape'.
             traces (dict, optional): Optional trace data for edge
                 origin tracking. Used for graph analysis features.
+            node_attrs (iterable, optional): Node attribute keys to send.
+                Defaults to None, which sends all attributes.
+            edge_attrs (iterable, optional): Edge attribute keys to send.
+                Defaults to None, which sends all attributes.
+            callback (callable, optional): Non-blocking mode only. Called
+                with the returned Future once the graph was acknowledged.
+            channel (str, optional): Name of the channel to update, made of
+                letters, digits, '_', '.' and '-'. Defaults to None, which
+                updates the default channel.
 
         Returns:
             bool: True if graph was successfully sent, False if there was
-                an error connecting or sending.
+                an error connecting or sending. In non-blocking mode a
+                concurrent.futures.Future resolving to that bool is
+                returned immediately instead.
+
+        Raises:
+            ValueError: If channel is not a valid channel name.
 
         Examples:
             >>> # Simple graph
@@ -160,24 +391,443 @@ class VisualizationClient:
             >>> DG.add_node("B", color="#00ff00", size=30)
             >>> DG.add_edge("A", "B", weight=2.5, color="#0000ff")
             >>> client.send_graph(DG, title="Colored Graph")
+
+            >>> # Separate graph viewed at /g/pipeline-a
+            >>> client.send_graph(DG, channel="pipeline-a")
         """
+        if channel is not None:
+            channel = ChannelStore.validate_name(channel)
+
+        header = {
+            'title': title or 'NetworkX Graph Visualization with Cytoscape',
+            'directed': graph.is_directed(),
+            'multigraph': graph.is_multigraph(),
+            # Local clock, converted to the server's when the graph is sent
+            'produced_at': time.time(),
+        }
+        if traces:
+            header['traces'] = traces
+        if channel is not None:
+            header['channel'] = channel
+
+        if not self.blocking:
+            # Converting takes the snapshot, everything else happens later
+            nodes, edges = to_elements(graph, node_attrs, edge_attrs)
+            return self._enqueue(header, nodes, edges, callback)
+
         if not self.connected:
             success = self._connect()
             if not success:
                 return False
 
-        # Convert to GraphML string using NetworkX built-in
-        cytoscape_data = nx.cytoscape_data(graph)
-        cytoscape_data['title'] = title or 'NetworkX Graph Visualization with Cytoscape'
-        if traces:
-            cytoscape_data['traces'] = traces
+        if not self.delta:
+            # Nothing will be diffed against this graph, so skip the index
+            return self._transmit(header, graph=graph, node_attrs=node_attrs, edge_attrs=edge_attrs)
+
+        nodes, edges = to_elements(graph, node_attrs, edge_attrs)
+        return self._transmit(header, nodes, edges)
+
+    def stream(self, channel=None, title=None, interval_ms=50, max_events=1000, directed=None, multigraph=None):
+        """
+        Open a stream of fine-grained changes to a graph.
+
+        Instead of sending whole graphs, the returned stream takes single
+        node and edge changes and sends them in batches: at the latest
+        interval_ms after the first buffered change, or as soon as
+        max_events changes are buffered. The server applies each batch
+        atomically and forwards it to the viewers as one patch. Nothing is
+        sent before the first change, and the stream uses a socket of its
+        own, so it can be used next to send_graph() and from any thread.
+
+        Args:
+            channel (str, optional): Name of the channel to change.
+                Defaults to None, the default channel.
+            title (str, optional): Title to show above the graph.
+                Defaults to None, which keeps the current title.
+            interval_ms (float, optional): Maximum delay of a change in
+                milliseconds. Defaults to 50.
+            max_events (int, optional): Batch size that is sent without
+                waiting for the interval. Defaults to 1000.
+            directed (bool, optional): Whether edges are directed. Defaults
+                to None, which keeps the setting of the graph on the server
+                (directed for new channels).
+            multigraph (bool, optional): Whether parallel edges get keys.
+                Defaults to None, which keeps the setting of the graph on
+                the server.
+
+        Returns:
+            GraphStream: The stream; close it, or use it as a context
+                manager, to send the last batch.
+
+        Raises:
+            ValueError: If channel is not a valid channel name, interval_ms
+                is negative or max_events is smaller than 1.
 
+        Examples:
+            >>> with client.stream(channel="simulation") as stream:
+            ...     for step in simulation:
+            ...         stream.add_edge(step.sender, step.receiver, msg_id=step.id)
+            ...         stream.update_attrs(step.receiver, queue=step.queue_length)
+        """
+        if channel is not None:
+            channel = ChannelStore.validate_name(channel)
+        stream = GraphStream(self, channel=channel, title=title, interval_ms=interval_ms,
+                             max_events=max_events, directed=directed, multigraph=multigraph)
+        self._streams.add(stream)
+        return stream
+
+    def _transmit(self, header, nodes=None, edges=None, graph=None, node_attrs=None, edge_attrs=None):
+        """
+        Send one graph and process the server's acknowledgement.
 
+        Args:
+            header (dict): Graph metadata such as 'title' and 'traces'.
+            nodes (dict, optional): Node index from to_elements().
+            edges (dict, optional): Edge index from to_elements().
+            graph (networkx.Graph, optional): Graph to stream directly
+                if no element index is given.
+            node_attrs (iterable, optional): Node attribute projection
+                used with graph.
+            edge_attrs (iterable, optional): Edge attribute projection
+                used with graph.
+
+        Returns:
+            bool: True if the server accepted the graph.
+        """
         try:
-            self.socket.send_string(json.dumps(cytoscape_data))
-            ack = self.socket.recv_string()
+            if nodes is None:
+                ack = self._send_full(graph, header, node_attrs, edge_attrs)
+            else:
+                message = self._build_patch(header, nodes, edges) if self.delta else None
+                ack = self._request(message or self._full_message(header, nodes, edges))
+
+                if ack.get('status') == 'resync':
+                    # Another producer moved the server to a different version
+                    log.debug(f"Server at version {ack.get('version')}, resending full graph")
+                    ack = self._request(self._full_message(header, nodes, edges))
+
+            channel = header.get('channel', DEFAULT_CHANNEL)
+            if ack.get('status') == 'error':
+                log.error(f"Server rejected graph: {ack.get('error') or ack.get('message')}")
+                self._acked.pop(channel, None)
+                return False
+
             log.debug(f"Server response: {ack}")
+            self.version = ack.get('version')
+            if nodes is None or not self.delta:
+                self._acked.pop(channel, None)
+            else:
+                self._acked[channel] = {
+                    'version': self.version,
+                    'nodes': snapshot(nodes),
+                    'edges': snapshot(edges),
+                    'title': header['title'],
+                    'traces': copy.deepcopy(header.get('traces')),
+                }
             return True
         except zmq.error.ZMQError as e:
             log.error(f"Error sending graph data: {e}")
-            return False
\ No newline at end of file
+            self._reset()
+            return False
+        except (TypeError, ValueError) as e:
+            # Raised while encoding, before anything was sent
+            log.error(f"Could not encode graph data: {e}")
+            return False
+
+    def _enqueue(self, header, nodes, edges, callback=None):
+        """
+        Queue a converted graph for the background sender thread.
+
+        If the queue already holds queue_size graphs for the same channel,
+        the oldest of them is discarded in favour of this one; its futures
+        are resolved together with the new graph's acknowledgement. Graphs
+        of other channels are never coalesced with this one.
+
+        Args:
+            header (dict): Graph metadata such as 'title' and 'traces'.
+            nodes (dict): Node index from to_elements().
+            edges (dict): Edge index from to_elements().
+            callback (callable, optional): Called with the Future once
+                the graph was acknowledged or failed.
+
+        Returns:
+            Future: Resolves to True if the server accepted the graph
+                (or a newer one that replaced it), False otherwise.
+        """
+        future = Future()
+        if callback is not None:
+            future.add_done_callback(callback)
+
+        with self._condition:
+            if self._closed:
+                self.stats['dropped'] += 1
+                future.set_result(False)
+                return future
+
+            entry = {'header': header, 'nodes': nodes, 'edges': edges, 'futures': [future]}
+            channel = header.get('channel')
+            queued = [queued for queued in self._pending if queued['header'].get('channel') == channel]
+            if len(queued) >= self.queue_size:
+                stale = queued[0]
+                self._pending.remove(stale)
+                entry['futures'][:0] = stale['futures']
+                self.stats['coalesced'] += 1
+            self._pending.append(entry)
+
+            if self._sender is None:
+                self._sender = threading.Thread(target=self._run_sender, daemon=True)
+                self._sender.start()
+            self._condition.notify_all()
+
+        return future
+
+    def _run_sender(self):
+        """
+        Send queued graphs until the client is disconnected.
+
+        Runs in the background thread of non-blocking mode, which is the
+        only thread that touches the socket in that mode.
+        """
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending:
+                    break
+                entry = self._pending.popleft()
+                self._in_flight = True
+
+            success = (self.connected or self._connect()) and \
+                self._transmit(entry['header'], entry['nodes'], entry['edges'])
+
+            with self._condition:
+                self._in_flight = False
+                self.stats['sent' if success else 'failed'] += 1
+                self._condition.notify_all()
+
+            for future in entry['futures']:
+                future.set_result(success)
+
+    def _drop_pending(self):
+        """Resolve all queued graphs as failed. Caller holds the condition."""
+        while self._pending:
+            entry = self._pending.popleft()
+            self.stats['dropped'] += 1
+            for future in entry['futures']:
+                future.set_result(False)
+
+    def flush(self, timeout=None):
+        """
+        Wait until all queued graphs were sent in non-blocking mode.
+
+        Args:
+            timeout (float, optional): Maximum number of seconds to wait.
+                Defaults to None, which waits indefinitely.
+
+        Returns:
+            bool: True if the queue is empty and nothing is in flight.
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._pending and not self._in_flight, timeout=timeout)
+
+    @staticmethod
+    def _full_message(header, nodes, edges):
+        """
+        Build a message carrying the complete graph.
+
+        Args:
+            header (dict): Graph metadata such as 'title' and 'traces'.
+            nodes (dict): Node index from schnauzer.convert.to_elements().
+            edges (dict): Edge index from schnauzer.convert.to_elements().
+
+        Returns:
+            dict: The 'full' message.
+        """
+        return dict(header, type='full', elements={
+            'nodes': list(nodes.values()),
+            'edges': list(edges.values()),
+        })
+
+    def _send_full(self, graph, header, node_attrs, edge_attrs):
+        """
+        Convert and send a complete graph without keeping an element index.
+
+        With the columnar encoding the graph is streamed straight into the
+        wire format in chunks.
+
+        Args:
+            graph (networkx.Graph): Graph to send.
+            header (dict): Graph metadata such as 'title' and 'traces'.
+            node_attrs (iterable): Node attribute projection, or None.
+            edge_attrs (iterable): Edge attribute projection, or None.
+
+        Returns:
+            dict: The parsed acknowledgement.
+        """
+        if self._use_columnar():
+            return parse_ack(self._exchange(encode_graph(graph, self._stamped(header), node_attrs, edge_attrs)))
+
+        return self._request(dict(header, type='full', elements={
+            'nodes': [{'data': data} for data in node_data(graph, node_attrs)],
+            'edges': [{'data': data} for data in edge_data(graph, edge_attrs)],
+        }))
+
+    def _build_patch(self, header, nodes, edges):
+        """
+        Build a patch message against the last acknowledged version.
+
+        Args:
+            header (dict): Graph metadata such as 'title' and 'traces'.
+            nodes (dict): Node index from schnauzer.convert.to_elements().
+            edges (dict): Edge index from schnauzer.convert.to_elements().
+
+        Returns:
+            dict: The patch message, or None if a full graph should be sent
+                instead (no acknowledged base, no server support, or a
+                change so large that a patch would not be smaller).
+        """
+        acked = self._acked.get(header.get('channel', DEFAULT_CHANNEL))
+        if (acked is None or acked['version'] is None
+                or 'delta' not in self.capabilities.get('features', [])):
+            return None
+
+        delta = diff(acked['nodes'], acked['edges'], nodes, edges)
+        if delta_size(delta) > (len(nodes) + len(edges)) // 2:
+            return None
+
+        patch = {
+            'type': 'patch',
+            'base_version': acked['version'],
+            'title': header['title'],
+            'delta': delta,
+        }
+        if 'channel' in header:
+            patch['channel'] = header['channel']
+        if 'produced_at' in header:
+            patch['produced_at'] = header['produced_at']
+        if header.get('traces') != acked['traces']:
+            patch['traces'] = header.get('traces')
+        return patch
+
+    def _use_columnar(self):
+        """
+        Decide whether graph messages use the columnar wire format.
+
+        Returns:
+            bool: True for 'columnar', or for 'auto' if the server
+                announced support during the handshake.
+        """
+        if self.encoding == 'auto':
+            return 'columnar' in self.capabilities.get('features', [])
+        return self.encoding == 'columnar'
+
+    def _request(self, message):
+        """
+        Send one message and wait for the server's acknowledgement.
+
+        Args:
+            message (dict): Message to send, encoded as JSON or in the
+                columnar format depending on the negotiated encoding.
+
+        Returns:
+            dict: The parsed acknowledgement.
+
+        Raises:
+            zmq.error.ZMQError: If sending fails or no reply arrives
+                within the socket timeout.
+        """
+        message = self._stamped(message)
+        if self._use_columnar():
+            frames = encode_message(message)
+        else:
+            frames = [json.dumps(message).encode('utf-8')]
+        return parse_ack(self._exchange(frames))
+
+    def _stamped(self, message):
+        """
+        Copy of a message stamped for latency tracing.
+
+        Adds 'sent_at' and converts 'produced_at' to the server's clock.
+
+        Args:
+            message (dict): Message or header to send.
+
+        Returns:
+            dict: The stamped copy.
+        """
+        stamped = dict(message, sent_at=time.time() + self.clock_offset)
+        if 'produced_at' in message:
+            stamped['produced_at'] = message['produced_at'] + self.clock_offset
+        return stamped
+
+    def latency(self, channel=None):
+        """
+        Ask the server how long updates take to reach the viewers.
+
+        Uses a separate short-lived socket, so it works in blocking and
+        non-blocking mode alike and never waits behind queued graphs.
+
+        Args:
+            channel (str, optional): Channel to report on. Defaults to
+                None, the default channel.
+
+        Returns:
+            dict: Percentiles per stage in seconds, see
+                schnauzer.latency.LatencyTracker.summary(). None if the
+                server could not be reached or does not trace latency.
+
+        Raises:
+            ValueError: If channel is not a valid channel name.
+            ConnectionError: If the client has been disconnected.
+
+        Examples:
+            >>> client.latency()['all_viewers']['total']
+            {'count': 12, 'p50': 0.041, 'p95': 0.120, 'p99': 0.187}
+        """
+        channel = ChannelStore.validate_name(channel)
+        if self.context is None:
+            raise ConnectionError("Client is disconnected")
+        socket = self.context.socket(zmq.REQ)
+        socket.setsockopt(zmq.LINGER, 0)
+        socket.setsockopt(zmq.RCVTIMEO, REQUEST_TIMEOUT_MS)
+        try:
+            socket.connect(self.endpoint)
+            socket.send_string(json.dumps({'type': 'latency', 'channel': channel}))
+            ack = parse_ack(socket.recv_string())
+        except zmq.error.ZMQError as e:
+            log.error(f"Error requesting latency: {e}")
+            return None
+        finally:
+            socket.close()
+        return ack.get('latency')
+
+    def _exchange(self, frames):
+        """
+        Send a multipart message and wait for the single-frame reply.
+
+        A DEALER socket has to add the empty delimiter frame that a REQ
+        socket adds implicitly, so both talk to the server the same way.
+        Large columnar messages to a server on the same host are written
+        to shared memory and only their descriptor is sent.
+
+        Args:
+            frames (list): Frames to send.
+
+        Returns:
+            str: The decoded reply.
+
+        Raises:
+            zmq.error.ZMQError: If sending fails or no reply arrives
+                within the socket timeout.
+        """
+        if (self._segments is not None and is_columnar(frames)
+                and sum(len(frame) for frame in frames) >= SHM_MIN_BYTES):
+            frames = self._segments.write(frames)
+
+        if self.socket.socket_type == zmq.DEALER:
+            self.socket.send_multipart([b''] + list(frames))
+            return self.socket.recv_multipart()[-1].decode('utf-8')
+
+        self.socket.send_multipart(frames)
+        return self.socket.recv_string()
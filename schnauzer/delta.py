@@ -0,0 +1,233 @@
+"""
+Delta computation for incremental graph updates.
+
+This module computes the difference between two versions of a graph in
+Cytoscape.js element format. Both the client (to build a patch against the
+last acknowledged version) and the server (to apply it) rely on the same
+element identity rules defined here.
+
+A delta has the following shape::
+
+    {
+        'nodes': {'added': [...], 'changed': [...], 'removed': [...]},
+        'edges': {'added': [...], 'changed': [...], 'removed': [...]}
+    }
+
+where ``added`` and ``changed`` hold complete Cytoscape elements
+(``{'data': {...}}``) and ``removed`` holds element ids.
+"""
+import copy
+
+# Attribute values that cannot change in place and need no copy
+_IMMUTABLE = (str, int, float, bool, type(None))
+
+
+def node_id(data):
+    """
+    Return the Cytoscape id of a node from its data dict.
+
+    Args:
+        data (dict): The ``data`` dict of a Cytoscape node element.
+
+    Returns:
+        str: The node id as a string.
+    """
+    return str(data['id'])
+
+
+def edge_id(data):
+    """
+    Return a stable id for an edge from its data dict.
+
+    Edges produced by ``nx.cytoscape_data`` carry no id of their own, so one
+    is derived from the endpoints (and the key for multigraphs). An explicit
+    ``id`` attribute always takes precedence.
+
+    Args:
+        data (dict): The ``data`` dict of a Cytoscape edge element.
+
+    Returns:
+        str: The edge id as a string.
+    """
+    if data.get('id') is not None:
+        return str(data['id'])
+    if 'key' in data:
+        return f"{data['source']}->{data['target']}#{data['key']}"
+    return f"{data['source']}->{data['target']}"
+
+
+def index_elements(elements):
+    """
+    Index Cytoscape elements by their id.
+
+    Edges without an explicit id get the derived id from edge_id() written
+    into their data, so the browser can address them in later patches.
+
+    Args:
+        elements (dict): Cytoscape elements with 'nodes' and 'edges' lists.
+
+    Returns:
+        tuple: ``(nodes, edges)`` - two dicts mapping id to element,
+            preserving the original order.
+    """
+    nodes = {}
+    for element in elements.get('nodes') or []:
+        nodes[node_id(element['data'])] = element
+
+    edges = {}
+    for element in elements.get('edges') or []:
+        data = element['data']
+        eid = edge_id(data)
+        data['id'] = eid
+        edges[eid] = element
+
+    return nodes, edges
+
+
+def snapshot(index):
+    """
+    Copy an element index so that later changes to the graph do not alter it.
+
+    Element data converted from a graph shares attribute values with it. A
+    list or dict value changed in place would change the copy kept as the
+    base of the next diff as well, and the change would never show up in a
+    delta. Mutable values are therefore deep-copied; immutable ones are
+    shared.
+
+    Args:
+        index (dict): Element index as returned by index_elements().
+
+    Returns:
+        dict: Independent copy of index.
+    """
+    copied = {}
+    for eid, element in index.items():
+        data = {key: value if isinstance(value, _IMMUTABLE) else copy.deepcopy(value)
+                for key, value in element['data'].items()}
+        copied[eid] = dict(element, data=data)
+    return copied
+
+
+def _diff_group(old, new):
+    """Diff two id -> element dicts of the same element group."""
+    added = []
+    changed = []
+    for eid, element in new.items():
+        previous = old.get(eid)
+        if previous is None:
+            added.append(element)
+        elif previous['data'] != element['data']:
+            changed.append(element)
+
+    removed = [eid for eid in old if eid not in new]
+    return {'added': added, 'changed': changed, 'removed': removed}
+
+
+def diff(old_nodes, old_edges, new_nodes, new_edges):
+    """
+    Compute the delta between two indexed graph versions.
+
+    Args:
+        old_nodes (dict): Previous node index from index_elements().
+        old_edges (dict): Previous edge index from index_elements().
+        new_nodes (dict): New node index from index_elements().
+        new_edges (dict): New edge index from index_elements().
+
+    Returns:
+        dict: Delta with 'nodes' and 'edges' sections.
+    """
+    return {
+        'nodes': _diff_group(old_nodes, new_nodes),
+        'edges': _diff_group(old_edges, new_edges),
+    }
+
+
+def delta_size(delta):
+    """
+    Count the number of element operations in a delta.
+
+    Args:
+        delta (dict): Delta as returned by diff().
+
+    Returns:
+        int: Total number of added, changed and removed elements.
+    """
+    return sum(
+        len(group.get(op) or [])
+        for group in (delta.get('nodes') or {}, delta.get('edges') or {})
+        for op in ('added', 'changed', 'removed')
+    )
+
+
+def invert(delta, old_nodes, old_edges):
+    """
+    Build the delta that undoes another one.
+
+    Args:
+        delta (dict): Delta about to be applied, as returned by diff().
+        old_nodes (dict): Node index before applying delta.
+        old_edges (dict): Edge index before applying delta.
+
+    Returns:
+        dict: Delta that turns the graph after applying delta back into
+            old_nodes and old_edges. Elements that delta 'changes' without
+            them existing count as additions, removals of unknown ids are
+            ignored.
+    """
+    inverse = {}
+    for group, index, id_of in (('nodes', old_nodes, node_id), ('edges', old_edges, edge_id)):
+        section = delta.get(group) or {}
+        added, changed, removed = [], [], []
+        for element in (section.get('added') or []) + (section.get('changed') or []):
+            eid = id_of(element['data'])
+            if eid in index:
+                changed.append(index[eid])
+            else:
+                removed.append(eid)
+        for eid in section.get('removed') or []:
+            if eid in index:
+                added.append(index[eid])
+        inverse[group] = {'added': added, 'changed': changed, 'removed': removed}
+    return inverse
+
+
+def compose(deltas):
+    """
+    Combine consecutive deltas into one with the same effect.
+
+    Args:
+        deltas (list): Deltas as returned by diff(), in application order,
+            each one computed against the result of the previous one.
+
+    Returns:
+        dict: Single delta that turns the graph before the first delta into
+            the graph after the last one. Elements that were added and
+            removed again do not appear at all.
+    """
+    composed = {}
+    for group, id_of in (('nodes', node_id), ('edges', edge_id)):
+        # id -> (existed before the first delta, final element or None)
+        elements = {}
+        for delta in deltas:
+            section = delta.get(group) or {}
+            # Same order in which GraphState applies a delta
+            for eid in section.get('removed') or []:
+                existed = elements[eid][0] if eid in elements else True
+                elements[eid] = (existed, None)
+            for op in ('added', 'changed'):
+                for element in section.get(op) or []:
+                    eid = id_of(element['data'])
+                    existed = elements[eid][0] if eid in elements else op == 'changed'
+                    elements[eid] = (existed, element)
+
+        added, changed, removed = [], [], []
+        for eid, (existed, element) in elements.items():
+            if element is None:
+                if existed:
+                    removed.append(eid)
+            elif existed:
+                changed.append(element)
+            else:
+                added.append(element)
+        composed[group] = {'added': added, 'changed': changed, 'removed': removed}
+    return composed
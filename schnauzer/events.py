@@ -0,0 +1,245 @@
+"""
+Fine-grained graph mutations.
+
+Producers that change a graph one node or edge at a time send those
+changes as events instead of whole graphs (see schnauzer.stream). The
+server turns a batch of events into an ordinary delta against its current
+graph (see schnauzer.delta), so the batch is applied atomically, recorded
+in the history like any patch and forwarded to the viewers as one
+'graph_patch'.
+
+Events are JSON arrays:
+
+- ``['add_node', id, value, attrs]`` adds a node, or updates the
+  attributes of an existing one like networkx does
+- ``['add_edge', source, target, key, attrs]`` adds an edge and any
+  missing endpoint, or updates the attributes of an existing edge
+- ``['update_node', id, attrs]`` updates the attributes of a node
+- ``['update_edge', source, target, key, attrs]`` updates the attributes
+  of an edge
+- ``['remove_node', id]`` removes a node and its edges
+- ``['remove_edge', source, target, key]`` removes an edge
+
+Nodes are addressed by their Cytoscape id and edges by their endpoints
+and multigraph key, from which the same edge ids are derived as for
+complete graphs. Updates and removals of elements that do not exist are
+ignored, so a stream does not fail because another producer replaced the
+graph in between.
+"""
+
+# Number of fields of every event, including the operation
+_ARITY = {
+    'add_node': 4,
+    'add_edge': 5,
+    'update_node': 3,
+    'update_edge': 5,
+    'remove_node': 2,
+    'remove_edge': 4,
+}
+
+OPERATIONS = tuple(_ARITY)
+
+
+class EventError(ValueError):
+    """Raised when a batch of events is malformed."""
+
+
+def validate_events(events):
+    """
+    Check the structure of a batch of events.
+
+    Args:
+        events (list): Events as described in the module documentation.
+
+    Raises:
+        EventError: If the batch is not a list, or an event has an unknown
+            operation, the wrong number of fields, ids that are not
+            strings, a key that is not a string or integer, or attributes
+            that are not a dict.
+    """
+    if not isinstance(events, list):
+        raise EventError("Events must be a list")
+
+    for index, event in enumerate(events):
+        if not isinstance(event, list) or not event or event[0] not in _ARITY:
+            raise EventError(f"Event {index} has no known operation")
+        op = event[0]
+        if len(event) != _ARITY[op]:
+            raise EventError(f"Event {index} ({op}) needs {_ARITY[op] - 1} fields, got {len(event) - 1}")
+
+        endpoints = event[1:2] if op.endswith('_node') else event[1:3]
+        if not all(isinstance(element_id, str) for element_id in endpoints):
+            raise EventError(f"Event {index} ({op}) must address elements by string ids")
+        if op.endswith('_edge'):
+            key = event[3]
+            if key is not None and (isinstance(key, bool) or not isinstance(key, (str, int))):
+                raise EventError(f"Event {index} ({op}) has an invalid edge key")
+        if not op.startswith('remove_') and not isinstance(event[-1], dict):
+            raise EventError(f"Event {index} ({op}) must carry an attribute dict")
+
+
+def events_to_delta(nodes, edges, events, directed=True, multigraph=False):
+    """
+    Compute the delta that applying a batch of events amounts to.
+
+    The events are applied in order to an overlay of the graph, which is
+    left untouched; an element changed several times appears once in the
+    delta, in its final state.
+
+    Args:
+        nodes (dict): Current node index, mapping id to element.
+        edges (dict): Current edge index, mapping id to element.
+        events (list): Events validated by validate_events().
+        directed (bool, optional): For undirected graphs, an edge may be
+            addressed with its endpoints in either order. Defaults to True.
+        multigraph (bool, optional): Edges added without a key get the
+            lowest unused integer key, like networkx assigns them.
+            Defaults to False.
+
+    Returns:
+        dict: Delta with 'nodes' and 'edges' sections, see schnauzer.delta.
+    """
+    # id -> data of every element touched so far, None once removed
+    node_changes = {}
+    edge_changes = {}
+    incident = None
+
+    def node(nid):
+        if nid in node_changes:
+            return node_changes[nid]
+        element = nodes.get(nid)
+        return element['data'] if element is not None else None
+
+    def edge(eid):
+        if eid in edge_changes:
+            return edge_changes[eid]
+        element = edges.get(eid)
+        return element['data'] if element is not None else None
+
+    def find_edge(source, target, key):
+        eid = _edge_id(source, target, key)
+        if not directed and edge(eid) is None:
+            reverse = _edge_id(target, source, key)
+            if edge(reverse) is not None:
+                return reverse
+        return eid
+
+    for event in events:
+        op = event[0]
+
+        if op == 'add_node':
+            _, nid, value, attrs = event
+            current = node(nid)
+            if current is None:
+                node_changes[nid] = {**attrs, 'id': nid, 'value': value, 'name': attrs.get('name') or nid}
+            else:
+                node_changes[nid] = _merged_node(nid, current, attrs)
+
+        elif op == 'update_node':
+            _, nid, attrs = event
+            current = node(nid)
+            if current is not None:
+                node_changes[nid] = _merged_node(nid, current, attrs)
+
+        elif op == 'add_edge':
+            _, source, target, key, attrs = event
+            for endpoint in (source, target):
+                if node(endpoint) is None:
+                    node_changes[endpoint] = {'id': endpoint, 'value': endpoint, 'name': endpoint}
+            if key is None and multigraph:
+                key = 0
+                while edge(find_edge(source, target, key)) is not None:
+                    key += 1
+            eid = find_edge(source, target, key)
+            current = edge(eid)
+            if current is None:
+                data = {**attrs, 'source': source, 'target': target, 'id': eid}
+                if key is not None:
+                    data['key'] = key
+                edge_changes[eid] = data
+                if incident is not None:
+                    incident.setdefault(source, set()).add(eid)
+                    incident.setdefault(target, set()).add(eid)
+            else:
+                edge_changes[eid] = _merged_edge(eid, current, attrs)
+
+        elif op == 'update_edge':
+            _, source, target, key, attrs = event
+            eid = find_edge(source, target, key)
+            current = edge(eid)
+            if current is not None:
+                edge_changes[eid] = _merged_edge(eid, current, attrs)
+
+        elif op == 'remove_node':
+            nid = event[1]
+            if node(nid) is None:
+                continue
+            node_changes[nid] = None
+            if incident is None:
+                # Built once per batch, on the first removal that needs it
+                incident = _incident_edges(edges, edge_changes)
+            for eid in incident.pop(nid, ()):
+                if edge(eid) is not None:
+                    edge_changes[eid] = None
+
+        elif op == 'remove_edge':
+            _, source, target, key = event
+            eid = find_edge(source, target, key)
+            if edge(eid) is not None:
+                edge_changes[eid] = None
+
+    return {
+        'nodes': _section(nodes, node_changes),
+        'edges': _section(edges, edge_changes),
+    }
+
+
+def _edge_id(source, target, key):
+    """Edge id as derived by schnauzer.delta.edge_id()."""
+    if key is None:
+        return f"{source}->{target}"
+    return f"{source}->{target}#{key}"
+
+
+def _merged_node(nid, current, attrs):
+    """Node data with updated attributes; id and value stay as they are."""
+    return {**current, **attrs, 'id': nid, 'value': current.get('value', nid),
+            'name': attrs.get('name') or current.get('name') or nid}
+
+
+def _merged_edge(eid, current, attrs):
+    """Edge data with updated attributes; id and endpoints stay as they are."""
+    merged = {**current, **attrs, 'id': eid, 'source': current['source'], 'target': current['target']}
+    if 'key' in current:
+        merged['key'] = current['key']
+    return merged
+
+
+def _incident_edges(edges, edge_changes):
+    """Map node id to the ids of the edges touching it in the overlay."""
+    incident = {}
+    for eid, element in edges.items():
+        if eid not in edge_changes:
+            data = element['data']
+            incident.setdefault(data['source'], set()).add(eid)
+            incident.setdefault(data['target'], set()).add(eid)
+    for eid, data in edge_changes.items():
+        if data is not None:
+            incident.setdefault(data['source'], set()).add(eid)
+            incident.setdefault(data['target'], set()).add(eid)
+    return incident
+
+
+def _section(index, changes):
+    """Turn the overlay of one element group into a delta section."""
+    added, changed, removed = [], [], []
+    for eid, data in changes.items():
+        original = index.get(eid)
+        if data is None:
+            if original is not None:
+                removed.append(eid)
+        elif original is None:
+            added.append({'data': data})
+        elif original['data'] != data:
+            changed.append({'data': data})
+    return {'added': added, 'changed': changed, 'removed': removed}
@@ -0,0 +1,194 @@
+"""
+Bounded version history of a graph.
+
+The history keeps the deltas between successive versions of a channel's
+graph, so earlier versions can be inspected after the fact. The current
+graph state serves as the base snapshot: every entry stores the delta that
+led to its version and the inverse delta that leads back to the version
+before it. An older version is reconstructed by applying inverse deltas to
+a copy of the current graph, and viewers step between neighbouring versions
+by receiving one delta at a time, which costs O(delta) instead of O(graph).
+
+The history is bounded both by a number of versions and by an estimated
+memory budget; the oldest versions are evicted first.
+"""
+import time
+from collections import deque
+
+# Rough per-element and per-attribute memory cost used for the budget
+_ELEMENT_BYTES = 200
+_ATTRIBUTE_BYTES = 100
+
+
+def estimate_size(delta):
+    """
+    Estimate the memory held by a delta.
+
+    Args:
+        delta (dict): Delta as returned by schnauzer.delta.diff().
+
+    Returns:
+        int: Approximate size in bytes.
+    """
+    size = 0
+    for group in (delta.get('nodes') or {}, delta.get('edges') or {}):
+        for element in (group.get('added') or []) + (group.get('changed') or []):
+            size += _ELEMENT_BYTES + _ATTRIBUTE_BYTES * len(element.get('data') or {})
+        size += _ATTRIBUTE_BYTES * len(group.get('removed') or [])
+    return size
+
+
+class History:
+    """
+    Deltas of the most recent versions of one graph.
+
+    Entries are ordered from oldest to newest; the newest entry always
+    describes the current version of the graph. Each entry is a dict with
+    'version', 'base_version', 'time', 'title', 'traces', 'meta', 'nodes'
+    and 'edges' (element counts), 'forward', 'inverse' and 'size'.
+
+    Attributes:
+        max_versions (int): Maximum number of versions kept.
+        max_bytes (int): Estimated memory budget for the stored deltas,
+            or None for no budget.
+        size (int): Estimated memory held by the stored deltas.
+    """
+
+    def __init__(self, max_versions=50, max_bytes=None):
+        """
+        Initialize an empty history.
+
+        Args:
+            max_versions (int, optional): Number of versions to keep.
+                Defaults to 50.
+            max_bytes (int, optional): Estimated memory budget in bytes.
+                Defaults to None (only max_versions applies).
+        """
+        self.max_versions = max_versions
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = deque()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def record(self, version, base_version, forward, inverse, title=None, traces=None, meta=None,
+               nodes=0, edges=0):
+        """
+        Add a new version, evicting the oldest ones if over budget.
+
+        Args:
+            version (int): The new version.
+            base_version (int): The version it was derived from.
+            forward (dict): Delta from base_version to version.
+            inverse (dict): Delta from version back to base_version.
+            title (str, optional): Graph title at this version.
+            traces (dict, optional): Trace data at this version.
+            meta (dict, optional): Graph-level keys at this version.
+            nodes (int, optional): Number of nodes at this version.
+            edges (int, optional): Number of edges at this version.
+        """
+        if self._entries and self._entries[-1]['version'] != base_version:
+            # The chain is broken, older versions cannot be reached anymore
+            self.clear()
+
+        entry = {
+            'version': version,
+            'base_version': base_version,
+            'time': time.time(),
+            'title': title,
+            'traces': traces,
+            'meta': dict(meta or {}),
+            'nodes': nodes,
+            'edges': edges,
+            'forward': forward,
+            'inverse': inverse,
+            'size': estimate_size(forward) + estimate_size(inverse),
+        }
+        self._entries.append(entry)
+        self.size += entry['size']
+        self._evict()
+
+    def _evict(self):
+        """Drop the oldest versions until the history fits its limits."""
+        while len(self._entries) > max(self.max_versions, 1) or (
+                self.max_bytes is not None and self.size > self.max_bytes and len(self._entries) > 1):
+            self.size -= self._entries.popleft()['size']
+
+        newest = self._entries[-1] if self._entries else None
+        if newest is not None and self.max_bytes is not None and self.size > self.max_bytes:
+            # Too large on its own, keep the version but not the way back
+            self.size -= newest['size']
+            newest['forward'] = newest['inverse'] = None
+            newest['size'] = 0
+
+    def clear(self):
+        """Forget all versions."""
+        self._entries.clear()
+        self.size = 0
+
+    def versions(self):
+        """
+        Describe the versions in the history.
+
+        Returns:
+            list: One dict per version, oldest first, with 'version',
+                'time', 'title', 'nodes' and 'edges'.
+        """
+        return [
+            {key: entry[key] for key in ('version', 'time', 'title', 'nodes', 'edges')}
+            for entry in self._entries if self._reachable(entry)
+        ]
+
+    def _reachable(self, entry):
+        """Whether the way back from the newest version to entry is stored."""
+        for newer in reversed(self._entries):
+            if newer is entry:
+                return True
+            if newer['inverse'] is None:
+                return False
+        return False
+
+    def entry(self, version):
+        """
+        Look up the entry of a version.
+
+        Args:
+            version (int): Version number.
+
+        Returns:
+            dict: The entry, or None if the version is not in the history.
+        """
+        for entry in self._entries:
+            if entry['version'] == version:
+                return entry
+        return None
+
+    def path(self, from_version, to_version):
+        """
+        List the steps that lead from one version to another.
+
+        Args:
+            from_version (int): Version to start from.
+            to_version (int): Version to arrive at.
+
+        Returns:
+            list: ``(entry, direction)`` tuples in application order, where
+                direction is 'forward' or 'inverse'; empty if both versions
+                are equal. None if either version is not in the history or
+                a required delta was dropped.
+        """
+        versions = [entry['version'] for entry in self._entries]
+        if from_version not in versions or to_version not in versions:
+            return None
+
+        start = versions.index(from_version)
+        end = versions.index(to_version)
+        if end >= start:
+            steps = [(entry, 'forward') for entry in list(self._entries)[start + 1:end + 1]]
+        else:
+            steps = [(entry, 'inverse') for entry in reversed(list(self._entries)[end + 1:start + 1])]
+
+        if any(entry[direction] is None for entry, direction in steps):
+            return None
+        return steps
@@ -0,0 +1,232 @@
+"""
+End-to-end latency of graph updates.
+
+Every update is stamped on its way from the producer to the viewers'
+screens, all on the server's clock:
+
+- produced: send_graph() was called (clients convert their clock with
+  the offset measured during the HELLO handshake)
+- sent: the client started transmitting the message
+- received: the backend read the message from its socket
+- decoded: the message was decoded
+- emitted: the update was handed to the broadcaster, so 'delivery'
+  includes the time a viewer waited for its turn (see schnauzer.broadcast)
+- viewer received, rendered, laid out: reported back by each browser,
+  which measures its clock offset with 'clock_sync' requests
+
+The differences between consecutive stamps are the stages of the update.
+The producer side stages are recorded once per update and channel, the
+viewer side stages once per update and viewer. Percentiles are computed
+over a sliding window of the most recent samples.
+"""
+import threading
+from collections import OrderedDict, deque
+
+#: Stages measured once per update, before the broadcast.
+UPDATE_STAGES = ('client', 'transport', 'decode', 'process')
+
+#: Stages measured for every viewer; 'total' spans produced to laid out.
+VIEWER_STAGES = ('delivery', 'render', 'layout', 'total')
+
+STAGES = UPDATE_STAGES + VIEWER_STAGES
+
+# (stage, from stamp, to stamp) of the producer side
+_UPDATE_SPANS = (
+    ('client', 'produced', 'sent'),
+    ('transport', 'sent', 'received'),
+    ('decode', 'received', 'decoded'),
+    ('process', 'decoded', 'emitted'),
+)
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentiles(samples):
+    """
+    Summarize a list of durations.
+
+    Uses the nearest-rank method, so every reported value was observed.
+
+    Args:
+        samples (iterable): Durations in seconds.
+
+    Returns:
+        dict: 'count' and 'p50', 'p95' and 'p99' in seconds, or only
+            'count' if there are no samples.
+    """
+    ordered = sorted(samples)
+    summary = {'count': len(ordered)}
+    if ordered:
+        for percentile in PERCENTILES:
+            rank = max(1, -(-percentile * len(ordered) // 100))
+            summary[f'p{percentile}'] = ordered[rank - 1]
+    return summary
+
+
+class LatencyTracker:
+    """
+    Collects the stamps of recent updates and the durations of their stages.
+
+    Thread-safe: the backend thread stamps updates while Socket.IO handlers
+    report what the viewers saw.
+
+    Attributes:
+        max_versions (int): Updates per channel whose stamps are kept, so
+            late viewer reports can still be matched.
+        window (int): Samples per stage and channel or viewer that the
+            percentiles are computed over.
+    """
+
+    def __init__(self, max_versions=64, window=1000, histogram=None):
+        """
+        Initialize an empty tracker.
+
+        Args:
+            max_versions (int, optional): Updates kept per channel.
+                Defaults to 64.
+            window (int, optional): Samples per stage. Defaults to 1000.
+            histogram (Histogram, optional): Also observe every duration
+                in this schnauzer.metrics histogram with a 'stage' label.
+        """
+        self.max_versions = max_versions
+        self.window = window
+        self._histogram = histogram
+        self._lock = threading.Lock()
+        self._stamps = {}
+        self._updates = {}
+        self._viewers = {}
+
+    def stamp(self, channel, version, **stamps):
+        """
+        Record stamps of an update.
+
+        Stamps that are None are ignored. Once 'emitted' is stamped, the
+        producer side stages of the update are recorded.
+
+        Args:
+            channel (str): Channel of the update.
+            version (int): Graph version the update produced.
+            **stamps: Seconds since the epoch on the server's clock, named
+                'produced', 'sent', 'received', 'decoded' or 'emitted'.
+        """
+        with self._lock:
+            versions = self._stamps.setdefault(channel, OrderedDict())
+            entry = versions.get(version)
+            if entry is None:
+                entry = versions[version] = {}
+                while len(versions) > self.max_versions:
+                    versions.popitem(last=False)
+            entry.update((name, value) for name, value in stamps.items() if value is not None)
+
+            if 'emitted' in stamps and not entry.get('recorded'):
+                entry['recorded'] = True
+                series = self._updates.setdefault(channel, {})
+                for stage, start, end in _UPDATE_SPANS:
+                    if start in entry and end in entry:
+                        self._add(series, stage, entry[end] - entry[start])
+
+    def report(self, viewer, channel, version, received=None, rendered=None, laid_out=None):
+        """
+        Record what a viewer reported about an update.
+
+        Args:
+            viewer (str): Viewer id, e.g. the Socket.IO session id.
+            channel (str): Channel the viewer watches.
+            version (int): Version the viewer displayed.
+            received (float, optional): When the update arrived.
+            rendered (float, optional): When the elements were drawn.
+            laid_out (float, optional): When the layout finished.
+
+        Returns:
+            bool: False if the update is unknown, e.g. because it was
+                dropped from the stamps already.
+        """
+        with self._lock:
+            entry = self._stamps.get(channel, {}).get(version)
+            if entry is None:
+                return False
+
+            series = self._viewers.setdefault(viewer, {})
+            spans = (
+                ('delivery', entry.get('emitted'), received),
+                ('render', received, rendered),
+                ('layout', rendered, laid_out),
+                ('total', entry.get('produced', entry.get('sent', entry.get('received'))), laid_out or rendered),
+            )
+            for stage, start, end in spans:
+                if start is not None and end is not None:
+                    self._add(series, stage, end - start)
+            return True
+
+    def _add(self, series, stage, duration):
+        """Append a duration to a stage's window. Caller holds the lock."""
+        # Clocks are only synchronized to within the round trip time
+        duration = max(0.0, duration)
+        samples = series.get(stage)
+        if samples is None:
+            samples = series[stage] = deque(maxlen=self.window)
+        samples.append(duration)
+        if self._histogram is not None:
+            self._histogram.observe(duration, stage=stage)
+
+    def forget(self, viewer=None, channel=None):
+        """
+        Drop the samples of a viewer that disconnected or a channel that was evicted.
+
+        Args:
+            viewer (str, optional): Viewer id.
+            channel (str, optional): Channel name.
+        """
+        with self._lock:
+            if viewer is not None:
+                self._viewers.pop(viewer, None)
+            if channel is not None:
+                self._stamps.pop(channel, None)
+                self._updates.pop(channel, None)
+
+    def channels(self):
+        """
+        Channels with stamped updates.
+
+        Returns:
+            set: Channel names.
+        """
+        with self._lock:
+            return set(self._stamps) | set(self._updates)
+
+    def summary(self, channel, viewers=None):
+        """
+        Percentiles of every stage.
+
+        Args:
+            channel (str): Channel whose updates to summarize.
+            viewers (iterable, optional): Ids of the viewers to include,
+                usually those watching the channel. Defaults to all.
+
+        Returns:
+            dict: 'updates' maps the producer side stages to percentiles(),
+                'viewers' maps viewer id to its stages, and 'all_viewers'
+                summarizes the samples of all included viewers together.
+        """
+        with self._lock:
+            updates = {stage: list(samples) for stage, samples in self._updates.get(channel, {}).items()}
+            wanted = set(self._viewers) if viewers is None else set(viewers)
+            per_viewer = {
+                viewer: {stage: list(samples) for stage, samples in series.items()}
+                for viewer, series in self._viewers.items() if viewer in wanted
+            }
+
+        combined = {}
+        for series in per_viewer.values():
+            for stage, samples in series.items():
+                combined.setdefault(stage, []).extend(samples)
+
+        return {
+            'channel': channel,
+            'updates': {stage: percentiles(updates[stage]) for stage in UPDATE_STAGES if stage in updates},
+            'viewers': {
+                viewer: {stage: percentiles(series[stage]) for stage in VIEWER_STAGES if stage in series}
+                for viewer, series in per_viewer.items()
+            },
+            'all_viewers': {stage: percentiles(combined[stage]) for stage in VIEWER_STAGES if stage in combined},
+        }
@@ -0,0 +1,575 @@
+"""
+Server-side graph layout.
+
+Laying out a large graph with fcose in the browser blocks the tab for
+seconds and every viewer pays that cost again. When enabled, the server
+instead computes node positions once per graph version in a pool of worker
+processes and ships them with the graph, so viewers can use Cytoscape's
+'preset' layout.
+
+Two algorithms are available:
+
+- 'force': Fruchterman-Reingold with the grid variant for repulsion. Only
+  nodes in neighbouring grid cells repel each other, so an iteration costs
+  O(nodes + edges) instead of O(nodes^2) and pure Python lays out a graph
+  with a few thousand nodes in seconds.
+- 'hierarchical': layered layout for directed acyclic graphs. Nodes are
+  assigned to layers by longest path from the sources and ordered within
+  their layer with a few barycenter sweeps to reduce edge crossings.
+
+'auto' picks 'hierarchical' for directed acyclic graphs and 'force' for
+everything else. Results are cached by a hash of the graph structure, so
+updates that only change attributes get their positions instantly.
+
+Layouts of successive versions are warm-started from the previous
+positions: surviving nodes keep their place, new nodes start next to
+their neighbours and the force simulation only runs a short, cool
+refinement whose length is proportional to the amount of change. The
+picture stays stable while a graph grows, and small updates take a
+fraction of a full layout.
+"""
+import hashlib
+import logging
+import math
+import multiprocessing
+import random
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+ALGORITHMS = ('auto', 'force', 'hierarchical')
+
+#: Ideal distance between adjacent nodes, in Cytoscape model coordinates.
+DEFAULT_SPACING = 80.0
+
+#: Number of force-directed iterations for a layout from scratch.
+DEFAULT_ITERATIONS = 60
+
+# Fewest iterations of a warm-started refinement
+_MIN_ITERATIONS = 5
+
+_BARYCENTER_SWEEPS = 4
+
+# Half of the neighbouring grid cells, so every pair of cells is visited once
+_FORWARD_CELLS = ((1, -1), (1, 0), (1, 1), (0, 1))
+
+# Strength of the pull towards the centre, relative to the initial extent
+_GRAVITY = 80.0
+
+
+def _edge_pairs(index, edges):
+    """Map edges to unique index pairs, dropping self loops and unknown nodes."""
+    pairs = set()
+    for source, target in edges:
+        i = index.get(source)
+        j = index.get(target)
+        if i is not None and j is not None and i != j:
+            pairs.add((i, j) if i < j else (j, i))
+    return sorted(pairs)
+
+
+def incremental_iterations(changed, total):
+    """
+    Number of iterations for refining a warm-started layout.
+
+    Args:
+        changed (int): Number of nodes added or removed since the previous
+            layout.
+        total (int): Number of nodes in the graph.
+
+    Returns:
+        int: Between _MIN_ITERATIONS and DEFAULT_ITERATIONS, proportional
+            to the changed share of the graph. A quarter of the graph
+            changing already warrants a full layout.
+    """
+    if total <= 0:
+        return 0
+    return max(_MIN_ITERATIONS, min(DEFAULT_ITERATIONS, math.ceil(DEFAULT_ITERATIONS * 4 * changed / total)))
+
+
+def _seed_positions(node_ids, pairs, initial, spacing, rng):
+    """
+    Start positions for a warm-started layout.
+
+    Nodes with an initial position keep it. The others are placed breadth
+    first next to an already placed neighbour, so new parts of the graph
+    grow from where they attach. Components without any placed node start
+    around the centre of the placed ones.
+
+    Returns:
+        tuple: ``(xs, ys)`` lists aligned with node_ids, or None if no
+            node has an initial position.
+    """
+    n = len(node_ids)
+    xs = [None] * n
+    ys = [None] * n
+    queue = deque()
+    for i, nid in enumerate(node_ids):
+        position = initial.get(nid)
+        if position is not None:
+            xs[i] = position['x']
+            ys[i] = position['y']
+            queue.append(i)
+    if not queue:
+        return None
+
+    placed = len(queue)
+    mx = sum(xs[i] for i in queue) / placed
+    my = sum(ys[i] for i in queue) / placed
+
+    adjacency = [[] for _ in range(n)]
+    for i, j in pairs:
+        adjacency[i].append(j)
+        adjacency[j].append(i)
+
+    jitter = spacing / 2
+    while queue:
+        i = queue.popleft()
+        for j in adjacency[i]:
+            if xs[j] is None:
+                xs[j] = xs[i] + rng.uniform(-jitter, jitter)
+                ys[j] = ys[i] + rng.uniform(-jitter, jitter)
+                queue.append(j)
+
+    spread = spacing * math.sqrt(n) / 2
+    for i in range(n):
+        if xs[i] is None:
+            xs[i] = mx + rng.uniform(-spread, spread)
+            ys[i] = my + rng.uniform(-spread, spread)
+    return xs, ys
+
+
+def force_layout(node_ids, edges, iterations=DEFAULT_ITERATIONS, spacing=DEFAULT_SPACING, seed=0,
+                 initial=None, temperature=None):
+    """
+    Compute a force-directed layout.
+
+    Args:
+        node_ids (list): Node ids, in a deterministic order.
+        edges (list): ``(source, target)`` id pairs. Direction, duplicates
+            and self loops are ignored.
+        iterations (int, optional): Number of simulation steps.
+            Defaults to DEFAULT_ITERATIONS.
+        spacing (float, optional): Ideal edge length.
+            Defaults to DEFAULT_SPACING.
+        seed (int, optional): Seed for the initial placement. Defaults to 0.
+        initial (dict, optional): Previous positions to start from, mapping
+            node id to ``{'x': ..., 'y': ...}``. Nodes without one are
+            placed next to their neighbours. Defaults to None, which starts
+            from a random placement.
+        temperature (float, optional): Largest distance a node may move in
+            the first iteration. Defaults to a tenth of the layout's extent;
+            warm starts use a fraction of an edge length so surviving nodes
+            stay close to where they were.
+
+    Returns:
+        dict: Mapping of node id to ``{'x': ..., 'y': ...}``.
+    """
+    n = len(node_ids)
+    if n == 0:
+        return {}
+
+    index = {nid: i for i, nid in enumerate(node_ids)}
+    pairs = _edge_pairs(index, edges)
+    rng = random.Random(seed)
+
+    side = spacing * math.sqrt(n)
+    seeded = _seed_positions(node_ids, pairs, initial, spacing, rng) if initial else None
+    if seeded is not None:
+        xs, ys = seeded
+    else:
+        xs = [rng.uniform(0, side) for _ in range(n)]
+        ys = [rng.uniform(0, side) for _ in range(n)]
+
+    k = spacing
+    k2 = k * k
+    cell = 1.5 * k
+    cell2 = cell * cell
+    gravity = _GRAVITY / side
+    if temperature is None:
+        temperature = side / 10
+    cooling = temperature / (iterations + 1)
+
+    for _ in range(iterations):
+        dx = [0.0] * n
+        dy = [0.0] * n
+
+        # Repulsion between nodes closer than one grid cell. Each pair of
+        # neighbouring cells is visited once and both nodes are updated.
+        grid = {}
+        for i in range(n):
+            grid.setdefault((int(xs[i] // cell), int(ys[i] // cell)), []).append(i)
+
+        for (cx, cy), members in grid.items():
+            nearby = list(members)
+            for ox, oy in _FORWARD_CELLS:
+                nearby.extend(grid.get((cx + ox, cy + oy), ()))
+            for position, i in enumerate(members):
+                xi, yi = xs[i], ys[i]
+                fx = fy = 0.0
+                for j in nearby[position + 1:]:
+                    ddx = xi - xs[j]
+                    ddy = yi - ys[j]
+                    d2 = ddx * ddx + ddy * ddy
+                    if d2 >= cell2:
+                        continue
+                    if d2 < 1e-6:
+                        # Coincident nodes, push apart in a random direction
+                        ddx, ddy = rng.uniform(-1, 1), rng.uniform(-1, 1)
+                        d2 = ddx * ddx + ddy * ddy + 1e-6
+                    force = k2 / d2
+                    ddx *= force
+                    ddy *= force
+                    fx += ddx
+                    fy += ddy
+                    dx[j] -= ddx
+                    dy[j] -= ddy
+                dx[i] += fx
+                dy[i] += fy
+
+        # Attraction along edges
+        for i, j in pairs:
+            ddx = xs[i] - xs[j]
+            ddy = ys[i] - ys[j]
+            force = math.sqrt(ddx * ddx + ddy * ddy) / k
+            dx[i] -= ddx * force
+            dy[i] -= ddy * force
+            dx[j] += ddx * force
+            dy[j] += ddy * force
+
+        # Weak gravity keeps disconnected components together
+        mx = sum(xs) / n
+        my = sum(ys) / n
+        for i in range(n):
+            fx = dx[i] - (xs[i] - mx) * gravity
+            fy = dy[i] - (ys[i] - my) * gravity
+            length = math.sqrt(fx * fx + fy * fy)
+            if length > 0:
+                scale = min(length, temperature) / length
+                xs[i] += fx * scale
+                ys[i] += fy * scale
+
+        temperature -= cooling
+
+    return {nid: {'x': round(xs[i], 1), 'y': round(ys[i], 1)} for nid, i in index.items()}
+
+
+def topological_layers(node_ids, edges):
+    """
+    Assign every node of a DAG to a layer by longest path from a source.
+
+    Args:
+        node_ids (list): Node ids.
+        edges (list): Directed ``(source, target)`` id pairs.
+
+    Returns:
+        list: Layer number per node (aligned with node_ids), or None if the
+            graph contains a cycle.
+    """
+    index = {nid: i for i, nid in enumerate(node_ids)}
+    successors = [[] for _ in node_ids]
+    indegree = [0] * len(node_ids)
+    for source, target in set(edges):
+        i = index.get(source)
+        j = index.get(target)
+        if i is None or j is None:
+            continue
+        if i == j:
+            return None
+        successors[i].append(j)
+        indegree[j] += 1
+
+    layers = [0] * len(node_ids)
+    ready = [i for i, degree in enumerate(indegree) if degree == 0]
+    visited = 0
+    while ready:
+        i = ready.pop()
+        visited += 1
+        for j in successors[i]:
+            layers[j] = max(layers[j], layers[i] + 1)
+            indegree[j] -= 1
+            if indegree[j] == 0:
+                ready.append(j)
+
+    return layers if visited == len(node_ids) else None
+
+
+def hierarchical_layout(node_ids, edges, spacing=DEFAULT_SPACING, layers=None, initial=None):
+    """
+    Compute a top-down layered layout for a directed acyclic graph.
+
+    Args:
+        node_ids (list): Node ids, in a deterministic order.
+        edges (list): Directed ``(source, target)`` id pairs.
+        spacing (float, optional): Distance between neighbouring nodes of
+            a layer. Layers are 1.5 times as far apart.
+        layers (list, optional): Precomputed result of topological_layers().
+        initial (dict, optional): Previous positions. If given, nodes keep
+            their previous left-to-right order within a layer and new nodes
+            are inserted below their predecessors, instead of reordering
+            every layer from scratch.
+
+    Returns:
+        dict: Mapping of node id to ``{'x': ..., 'y': ...}``, or None if
+            the graph contains a cycle.
+    """
+    if layers is None:
+        layers = topological_layers(node_ids, edges)
+    if layers is None:
+        return None
+    if not node_ids:
+        return {}
+
+    index = {nid: i for i, nid in enumerate(node_ids)}
+    predecessors = [[] for _ in node_ids]
+    successors = [[] for _ in node_ids]
+    for source, target in set(edges):
+        i = index.get(source)
+        j = index.get(target)
+        if i is not None and j is not None:
+            successors[i].append(j)
+            predecessors[j].append(i)
+
+    rows = [[] for _ in range(max(layers) + 1)]
+    for i, layer in enumerate(layers):
+        rows[layer].append(i)
+
+    if initial:
+        # Keep the previous order, new nodes go below their predecessors
+        key = [math.inf] * len(node_ids)
+        for row in rows:
+            for i in row:
+                position = initial.get(node_ids[i])
+                if position is not None:
+                    key[i] = position['x']
+                else:
+                    linked = [key[j] for j in predecessors[i] if key[j] != math.inf]
+                    if linked:
+                        key[i] = sum(linked) / len(linked)
+            row.sort(key=key.__getitem__)
+
+    order = [0.0] * len(node_ids)
+    for row in rows:
+        for position, i in enumerate(row):
+            order[i] = position
+
+    # Alternate downward and upward sweeps, sorting each layer by the mean
+    # position of its neighbours in the previous layer
+    for sweep in range(0 if initial else _BARYCENTER_SWEEPS):
+        downward = sweep % 2 == 0
+        neighbours = predecessors if downward else successors
+        for row in (rows[1:] if downward else reversed(rows[:-1])):
+            def barycenter(i):
+                linked = neighbours[i]
+                return sum(order[j] for j in linked) / len(linked) if linked else order[i]
+            row.sort(key=barycenter)
+            for position, i in enumerate(row):
+                order[i] = position
+
+    positions = {}
+    for layer, row in enumerate(rows):
+        offset = (len(row) - 1) / 2
+        for position, i in enumerate(row):
+            positions[node_ids[i]] = {'x': round((position - offset) * spacing, 1),
+                                      'y': round(layer * spacing * 1.5, 1)}
+    return positions
+
+
+def compute_layout(algorithm, node_ids, edges, directed, previous=None):
+    """
+    Compute node positions with the given algorithm.
+
+    Runs in the worker processes, so it only takes plain data. Input order
+    does not matter; equal structures with equal previous positions always
+    get equal positions.
+
+    Args:
+        algorithm (str): 'auto', 'force' or 'hierarchical'.
+        node_ids (list): Node ids.
+        edges (list): ``(source, target)`` id pairs.
+        directed (bool): Whether edges are directed.
+        previous (dict, optional): Positions of an earlier version of the
+            graph to warm-start from. Defaults to None.
+
+    Returns:
+        dict: Mapping of node id to ``{'x': ..., 'y': ...}``.
+    """
+    node_ids = sorted(node_ids)
+    edges = sorted(edges)
+
+    if algorithm in ('auto', 'hierarchical') and directed:
+        positions = hierarchical_layout(node_ids, edges, initial=previous)
+        if positions is not None:
+            return positions
+        if algorithm == 'hierarchical':
+            log.info("Graph has cycles, using the force-directed layout instead")
+
+    if previous:
+        added = sum(1 for nid in node_ids if nid not in previous)
+        removed = len(previous) - (len(node_ids) - added)
+        iterations = incremental_iterations(added + removed, len(node_ids))
+        return force_layout(node_ids, edges, iterations=iterations, initial=previous,
+                            temperature=DEFAULT_SPACING / 4)
+
+    return force_layout(node_ids, edges)
+
+
+def structure_hash(algorithm, node_ids, edges, directed):
+    """
+    Hash everything a layout depends on.
+
+    Args:
+        algorithm (str): Layout algorithm.
+        node_ids (iterable): Node ids.
+        edges (iterable): ``(source, target)`` id pairs.
+        directed (bool): Whether edges are directed.
+
+    Returns:
+        str: Hex digest identifying the graph structure.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{algorithm}:{int(bool(directed))}\x02".encode('utf-8'))
+    digest.update('\x00'.join(sorted(node_ids)).encode('utf-8'))
+    digest.update(b'\x02')
+    digest.update('\x00'.join(f"{source}\x01{target}" for source, target in sorted(edges)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class LayoutEngine:
+    """
+    Computes layouts for graph states in the background.
+
+    Layouts run in a pool of worker processes, so they neither block the
+    backend thread nor compete with it for the GIL. Every key (channel)
+    has at most one layout in progress; requests arriving meanwhile are
+    coalesced and only the most recent one runs afterwards.
+
+    Attributes:
+        algorithm (str): 'auto', 'force' or 'hierarchical'.
+        max_nodes (int): Graphs with more nodes are not laid out.
+        cache_size (int): Number of layouts kept in the structure cache.
+        stats (dict): Counters of 'computed' and 'cached' layouts,
+            requests 'coalesced' into a later one and 'failed' layouts.
+    """
+
+    def __init__(self, algorithm='auto', workers=2, max_nodes=10000, cache_size=32):
+        """
+        Initialize the engine. Worker processes are started on first use.
+
+        Args:
+            algorithm (str, optional): Layout algorithm. Defaults to 'auto'.
+            workers (int, optional): Number of worker processes. 0 computes
+                layouts in a background thread of this process instead.
+                Defaults to 2.
+            max_nodes (int, optional): Largest graph to lay out.
+                Defaults to 10000.
+            cache_size (int, optional): Number of cached layouts.
+                Defaults to 32.
+
+        Raises:
+            ValueError: If algorithm is unknown.
+        """
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown layout algorithm {algorithm!r}, expected one of {', '.join(ALGORITHMS)}")
+
+        self.algorithm = algorithm
+        self.max_nodes = max_nodes
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._running = set()
+        self._queued = {}
+        self.stats = {'computed': 0, 'cached': 0, 'coalesced': 0, 'failed': 0}
+        # Spawn instead of fork, the server process runs several threads
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context('spawn')) if workers else None
+        self._threads = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix='schnauzer-layout')
+
+    def accepts(self, state):
+        """
+        Check whether a graph state is small enough to be laid out.
+
+        Args:
+            state (GraphState): Graph state.
+
+        Returns:
+            bool: True if the engine lays out this state.
+        """
+        return 0 < len(state.nodes) <= self.max_nodes
+
+    def submit(self, key, state, callback):
+        """
+        Request a layout of the current version of a graph state.
+
+        Args:
+            key (str): Identifies the graph, e.g. the channel name.
+            state (GraphState): State to lay out. Its structure is read
+                when the layout starts, not when it is requested.
+            callback (callable): Called with ``(version, positions)`` from
+                a background thread once the layout is ready.
+        """
+        with self._lock:
+            if key in self._running:
+                if key in self._queued:
+                    self.stats['coalesced'] += 1
+                self._queued[key] = (state, callback)
+                return
+            self._running.add(key)
+        self._threads.submit(self._run, key, state, callback)
+
+    def _run(self, key, state, callback):
+        """Lay out one state, then start the request queued meanwhile."""
+        try:
+            version, node_ids, edges, directed = state.structure()
+            digest = structure_hash(self.algorithm, node_ids, edges, directed)
+
+            positions = self._cached(digest)
+            if positions is None:
+                # Warm start from the positions of the previous version
+                args = (self.algorithm, node_ids, edges, directed, state.positions or None)
+                if self._pool is not None:
+                    positions = self._pool.submit(compute_layout, *args).result()
+                else:
+                    positions = compute_layout(*args)
+                self._store(digest, positions)
+                self._count('computed')
+            else:
+                log.debug(f"Layout cache hit for {key!r}")
+                self._count('cached')
+
+            callback(version, positions)
+        except Exception as e:
+            log.error(f"Error computing layout for {key!r}: {e}")
+            self._count('failed')
+        finally:
+            with self._lock:
+                queued = self._queued.pop(key, None)
+                if queued is None:
+                    self._running.discard(key)
+            if queued is not None:
+                self._threads.submit(self._run, key, *queued)
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _cached(self, digest):
+        with self._lock:
+            positions = self._cache.get(digest)
+            if positions is not None:
+                self._cache.move_to_end(digest)
+            return positions
+
+    def _store(self, digest, positions):
+        with self._lock:
+            self._cache[digest] = positions
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def shutdown(self):
+        """Stop the background threads and worker processes."""
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,329 @@
+"""
+Lightweight in-process metrics.
+
+The server counts what it receives and sends in a Registry of counters,
+gauges and histograms, which renders them in the Prometheus text
+exposition format for the /metrics endpoint and as plain dicts for
+in-process use. Recording a value is a dict lookup and an addition under a
+lock, cheap enough to leave on for every message. Values that the server
+already tracks elsewhere, such as graph sizes, are not recorded at all but
+read by callbacks when the metrics are collected.
+"""
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds, from sub-millisecond patches to huge graphs
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    """Escape a label value for the text format."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    """Format a sample value for the text format."""
+    if isinstance(value, float):
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        if value.is_integer():
+            return str(int(value))
+        return repr(value)
+    return str(value)
+
+
+def _format_labels(names, values, extra=()):
+    """Render a label set like ``{channel="default",type="full"}``."""
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class _Metric:
+    """Base class for metrics with a fixed set of label names."""
+
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labels=()):
+        """
+        Initialize a metric without samples.
+
+        Args:
+            name (str): Metric name, e.g. 'schnauzer_messages_total'.
+            documentation (str): Help text.
+            labels (tuple, optional): Label names. Defaults to none.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        """Label values in the order of the label names."""
+        if set(labels) != set(self.labels):
+            raise ValueError(f"Metric {self.name} takes labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def retain(self, label, values):
+        """
+        Drop the samples whose label is not one of values.
+
+        Args:
+            label (str): Label name, e.g. 'channel'.
+            values (set): Label values to keep, e.g. the existing channels.
+        """
+        index = self.labels.index(label)
+        with self._lock:
+            for key in [key for key in self._values if key[index] not in values]:
+                del self._values[key]
+
+    def samples(self):
+        """
+        Current samples of the metric.
+
+        Returns:
+            list: ``(suffix, label_values, extra_labels, value)`` tuples.
+        """
+        with self._lock:
+            return [('', key, (), value) for key, value in self._values.items()]
+
+    def snapshot(self):
+        """
+        Current values for in-process use.
+
+        Returns:
+            list: One ``{'labels': {...}, 'value': ...}`` dict per label set.
+        """
+        with self._lock:
+            items = list(self._values.items())
+        return [{'labels': dict(zip(self.labels, key)), 'value': self._plain(value)} for key, value in items]
+
+    @staticmethod
+    def _plain(value):
+        return value
+
+
+class Counter(_Metric):
+    """A value that only goes up, such as the number of received messages."""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        """
+        Increase the counter.
+
+        Args:
+            amount (float, optional): Increment. Defaults to 1.
+            **labels: Value of every label of the metric.
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, such as the number of viewers."""
+
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        """
+        Set the gauge.
+
+        Args:
+            value (float): New value.
+            **labels: Value of every label of the metric.
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        """Increase the gauge by amount."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        """Decrease the gauge by amount."""
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values, such as decode durations."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        """
+        Initialize a histogram without observations.
+
+        Args:
+            name (str): Metric name.
+            documentation (str): Help text.
+            labels (tuple, optional): Label names. Defaults to none.
+            buckets (tuple, optional): Sorted upper bounds of the buckets;
+                a +Inf bucket is always added. Defaults to DEFAULT_BUCKETS.
+        """
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        """
+        Record one observation.
+
+        Args:
+            value (float): Observed value.
+            **labels: Value of every label of the metric.
+        """
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # Per-bucket counts (the last one is +Inf), sum, count
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of a with block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        """Cumulative bucket, sum and count samples of every label set."""
+        with self._lock:
+            items = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+
+        samples = []
+        bounds = [_format_value(float(bound)) for bound in self.buckets] + ['+Inf']
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket in zip(bounds, counts):
+                cumulative += bucket
+                samples.append(('_bucket', key, (('le', bound),), cumulative))
+            samples.append(('_sum', key, (), total))
+            samples.append(('_count', key, (), count))
+        return samples
+
+    def _plain(self, value):
+        counts, total, count = value
+        return {'count': count, 'sum': total}
+
+
+class _Callback(_Metric):
+    """A metric whose samples are read from elsewhere when collected."""
+
+    def __init__(self, name, documentation, kind, labels, function):
+        super().__init__(name, documentation, labels)
+        self.kind = kind
+        self._function = function
+
+    def _read(self):
+        return {tuple(str(value) for value in key): value for key, value in self._function()}
+
+    def samples(self):
+        return [('', key, (), value) for key, value in self._read().items()]
+
+    def snapshot(self):
+        return [{'labels': dict(zip(self.labels, key)), 'value': value} for key, value in self._read().items()]
+
+
+class Registry:
+    """
+    Collection of metrics, rendered together.
+
+    Examples:
+        >>> metrics = Registry()
+        >>> received = metrics.counter('messages_total', 'Received messages', ('channel',))
+        >>> received.inc(channel='default')
+        >>> print(metrics.render())
+        # HELP messages_total Received messages
+        # TYPE messages_total counter
+        messages_total{channel="default"} 1
+        <BLANKLINE>
+    """
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        """Create and register a Counter."""
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=()):
+        """Create and register a Gauge."""
+        return self._register(Gauge(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        """Create and register a Histogram."""
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def callback(self, name, documentation, function, labels=(), kind='gauge'):
+        """
+        Register a metric that is read when the metrics are collected.
+
+        Args:
+            name (str): Metric name.
+            documentation (str): Help text.
+            function (callable): Returns an iterable of
+                ``(label_values, value)`` pairs, label_values being a tuple
+                in the order of labels.
+            labels (tuple, optional): Label names. Defaults to none.
+            kind (str, optional): 'gauge' or 'counter'. Defaults to 'gauge'.
+        """
+        self._register(_Callback(name, documentation, kind, labels, function))
+
+    def render(self):
+        """
+        Render all metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The exposition, served with CONTENT_TYPE.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for suffix, key, extra, value in metric.samples():
+                labels = _format_labels(metric.labels, key, extra)
+                lines.append(f'{metric.name}{suffix}{labels} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        """
+        Current values of all metrics as plain data.
+
+        Returns:
+            dict: Mapping of metric name to a list of
+                ``{'labels': {...}, 'value': ...}`` dicts. Histogram values
+                are ``{'count': ..., 'sum': ...}``.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
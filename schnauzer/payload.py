@@ -0,0 +1,165 @@
+"""
+Serialized graph snapshots for HTTP and Socket.IO delivery.
+
+Serializing a large graph takes far longer than sending it, so the server
+serializes each graph version once and hands the same bytes to every
+/graph-data request and every Socket.IO 'graph_update' emit. Compressed
+variants are built on first request and kept alongside the plain JSON.
+
+Brotli compression is used if the optional ``brotli`` package is
+installed, gzip otherwise.
+"""
+import gzip
+import hashlib
+import json
+import threading
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+#: Responses smaller than this are not worth compressing.
+MIN_COMPRESS_SIZE = 1024
+
+# Fast settings, a large graph is compressed on the request path
+_GZIP_LEVEL = 5
+_BROTLI_QUALITY = 5
+
+
+def available_encodings():
+    """
+    List the content encodings this server can produce.
+
+    Returns:
+        list: Encodings in order of preference, e.g. ``['br', 'gzip']``.
+    """
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+class Payload:
+    """
+    One serialized graph snapshot with its compressed variants.
+
+    Attributes:
+        body (bytes): UTF-8 encoded JSON of the graph.
+        size (int): Length of body in bytes.
+        etag (str): Strong entity tag of the JSON body, without quotes.
+    """
+
+    def __init__(self, body):
+        """
+        Wrap serialized JSON.
+
+        Args:
+            body (bytes): UTF-8 encoded JSON document.
+        """
+        self._body = body
+        self.size = len(body)
+        self.etag = hashlib.blake2b(body, digest_size=12).hexdigest()
+        self._encoded = {}
+        self._lock = threading.Lock()
+        self._body_lock = threading.Lock()
+
+    @classmethod
+    def from_gzip(cls, data, size, etag):
+        """
+        Wrap a body that is only at hand gzip compressed, e.g. read from disk.
+
+        The plain JSON is decompressed when it is first needed, so gzip
+        requests are answered without touching it.
+
+        Args:
+            data (bytes): The gzip compressed body.
+            size (int): Length of the uncompressed body.
+            etag (str): Entity tag of the uncompressed body.
+
+        Returns:
+            Payload: The serialized graph.
+        """
+        payload = cls.__new__(cls)
+        payload._body = None
+        payload.size = size
+        payload.etag = etag
+        payload._encoded = {'gzip': data}
+        payload._lock = threading.Lock()
+        payload._body_lock = threading.Lock()
+        return payload
+
+    @property
+    def body(self):
+        """bytes: UTF-8 encoded JSON of the graph."""
+        if self._body is None:
+            with self._body_lock:
+                if self._body is None:
+                    self._body = gzip.decompress(self._encoded['gzip'])
+        return self._body
+
+    @classmethod
+    def from_graph(cls, graph):
+        """
+        Serialize a graph dict.
+
+        Args:
+            graph (dict): Graph in Cytoscape.js format.
+
+        Returns:
+            Payload: The serialized graph.
+        """
+        return cls(json.dumps(graph, separators=(',', ':')).encode('utf-8'))
+
+    def encoded(self, encoding):
+        """
+        Return the body in a content encoding, compressing it on first use.
+
+        Args:
+            encoding (str): 'br', 'gzip' or 'identity'.
+
+        Returns:
+            bytes: The encoded body.
+
+        Raises:
+            ValueError: If the encoding is not available.
+        """
+        if encoding == 'identity':
+            return self.body
+
+        with self._lock:
+            data = self._encoded.get(encoding)
+            if data is None:
+                if encoding == 'gzip':
+                    data = gzip.compress(self.body, compresslevel=_GZIP_LEVEL, mtime=0)
+                elif encoding == 'br' and brotli is not None:
+                    data = brotli.compress(self.body, quality=_BROTLI_QUALITY)
+                else:
+                    raise ValueError(f"Unsupported content encoding {encoding!r}")
+                self._encoded[encoding] = data
+            return data
+
+    def negotiate(self, accept_encodings):
+        """
+        Pick the content encoding for a request.
+
+        Args:
+            accept_encodings: The request's parsed Accept-Encoding header,
+                e.g. ``flask.request.accept_encodings``.
+
+        Returns:
+            str: 'br', 'gzip' or 'identity'.
+        """
+        if self.size < MIN_COMPRESS_SIZE:
+            return 'identity'
+        return accept_encodings.best_match(available_encodings()) or 'identity'
+
+    def entity_tag(self, encoding):
+        """
+        Entity tag of one encoded variant.
+
+        Args:
+            encoding (str): Content encoding of the response.
+
+        Returns:
+            str: The tag without quotes; variants get a suffix so caches
+                never mix them up.
+        """
+        return self.etag if encoding == 'identity' else f"{self.etag}-{encoding}"
@@ -0,0 +1,89 @@
+"""
+Shared constants and helpers for the client/server backend protocol.
+
+Clients open a session with a HELLO handshake. Servers that understand the
+versioned protocol answer with a JSON description of their capabilities;
+older servers answer with a plain string, in which case the client falls
+back to sending complete graphs only. The reply carries the server's clock,
+so clients can stamp updates in server time for latency tracing, and, if
+the server offers shared-memory transfer, the 'local' transport description
+clients on the same host use (see schnauzer.shm).
+"""
+import json
+import time
+
+PROTOCOL_VERSION = 2
+
+HELLO = "HELLO"
+
+#: How long clients wait for the server to acknowledge a message.
+REQUEST_TIMEOUT_MS = 5000
+
+#: Optional protocol features this package implements.
+FEATURES = ['delta', 'columnar', 'latency', 'events']
+
+
+def hello_reply(version, local=None):
+    """
+    Build the server's answer to a HELLO handshake.
+
+    Args:
+        version (str): Package version of the server.
+        local (dict, optional): Shared-memory transport description from
+            schnauzer.shm.LocalTransport.describe(). Defaults to None.
+
+    Returns:
+        str: JSON encoded capability description, including the server's
+            current 'time' in seconds since the epoch.
+    """
+    capabilities = {
+        'server': 'schnauzer',
+        'version': version,
+        'protocol': PROTOCOL_VERSION,
+        'features': FEATURES,
+        'time': time.time(),
+    }
+    if local is not None:
+        capabilities['local'] = local
+    return json.dumps(capabilities)
+
+
+def parse_hello(reply):
+    """
+    Parse the server's answer to a HELLO handshake.
+
+    Args:
+        reply (str): Raw reply received from the server.
+
+    Returns:
+        dict: Capability description. Legacy servers yield protocol 1
+            and no features.
+    """
+    try:
+        capabilities = json.loads(reply)
+        if isinstance(capabilities, dict):
+            return capabilities
+    except ValueError:
+        pass
+    return {'protocol': 1, 'features': []}
+
+
+def parse_ack(reply):
+    """
+    Parse the server's acknowledgement of an update.
+
+    Args:
+        reply (str): Raw reply received from the server.
+
+    Returns:
+        dict: Acknowledgement with at least a 'status' key. Plain string
+            replies from legacy servers are mapped to 'ok' or 'error'.
+    """
+    try:
+        ack = json.loads(reply)
+        if isinstance(ack, dict):
+            return ack
+    except ValueError:
+        pass
+    status = 'error' if reply.startswith('Error') else 'ok'
+    return {'status': status, 'message': reply}
@@ -0,0 +1,547 @@
+"""
+Horizontal fan-out over several web worker processes.
+
+A single Server receives graphs, decodes them and serves every viewer in
+one process. For more viewers than one process can serve, ingest and
+serving are split:
+
+- one IngestServer accepts clients on the usual backend port, applies
+  their updates and publishes every accepted update on a ZeroMQ PUB
+  socket, numbered with a sequence number
+- any number of WebWorker processes, on the same or other machines,
+  subscribe to those updates, apply them to a local replica of every
+  channel and serve their own viewers from it, behind a load balancer
+
+Updates are published in the form the ingest applied them: complete
+graphs as exported by GraphState.export(), and patches, including those
+computed from event batches, as deltas. Replicas keep the ingest's version
+numbers, so viewers can switch workers and clients can query versions on
+any of them.
+
+Workers that start late, or miss an update because their subscription
+fell behind, request a snapshot of all channels from the ingest's snapshot
+socket. It answers with the current state of every channel and the
+sequence number it corresponds to; the worker replays the updates it
+buffered meanwhile that are newer than that (the "clone" pattern of the
+ZeroMQ guide).
+
+Layouts are computed once, by the ingest, and published to the workers.
+Channels are only evicted by the ingest, which publishes their removal;
+replicas never evict on their own, as a channel evicted on a worker alone
+would make the next patch for it fail and force a snapshot of everything.
+"""
+import json
+import logging
+import threading
+import time
+import weakref
+
+import zmq
+
+from schnauzer.server import Server
+from schnauzer.store import CapacityExceeded, VersionMismatch, DEFAULT_CHANNEL
+
+log = logging.getLogger(__name__)
+
+#: Default port the ingest publishes updates on.
+PUBLISH_PORT = 8087
+
+#: Default port the ingest answers snapshot requests on.
+SNAPSHOT_PORT = 8088
+
+#: Seconds a worker waits for a snapshot before requesting it again.
+SNAPSHOT_TIMEOUT = 10.0
+
+#: Updates a worker buffers while it waits for a snapshot. When more
+#: arrive, the buffer is dropped and a fresh snapshot requested.
+MAX_BUFFERED = 10000
+
+# Snapshot request and the marker that ends a snapshot
+_SNAPSHOT = b'SNAPSHOT'
+_END = 'end'
+
+
+class IngestServer(Server):
+    """
+    Server that publishes every accepted update to web workers.
+
+    Clients connect to it as to any Server. It serves viewers as well, but
+    skips broadcasting and summarizing channels nobody views on it, so it
+    can dedicate itself to ingest.
+
+    Attributes:
+        publish_port (int): Port of the PUB socket workers subscribe to.
+        snapshot_port (int): Port workers request snapshots from.
+        sequence (int): Sequence number of the last published update.
+
+    Examples:
+        >>> from schnauzer.replication import IngestServer
+        >>>
+        >>> ingest = IngestServer(backend_port=8086, publish_port=8087, snapshot_port=8088)
+        >>> ingest.start()
+    """
+
+    def __init__(self, *args, publish_port=PUBLISH_PORT, snapshot_port=SNAPSHOT_PORT, **kwargs):
+        """
+        Initialize the ingest server; see Server for the other arguments.
+
+        Args:
+            *args: Positional arguments of Server.
+            publish_port (int, optional): Port to publish updates on.
+                Defaults to PUBLISH_PORT.
+            snapshot_port (int, optional): Port to answer snapshot
+                requests on. Defaults to SNAPSHOT_PORT.
+            **kwargs: Keyword arguments of Server.
+        """
+        super().__init__(*args, **kwargs)
+        self.publish_port = publish_port
+        self.snapshot_port = snapshot_port
+        self.sequence = 0
+        self._publisher = None
+        self._snapshots = None
+        # Layouts finish in other threads, updates in the backend thread
+        self._publish_lock = threading.Lock()
+        self.channels.on_evict = self._on_channel_evicted
+
+    def _open_backend_sockets(self):
+        """Bind the publish and snapshot sockets."""
+        self._publisher = self.context.socket(zmq.PUB)
+        self._publisher.setsockopt(zmq.LINGER, 0)
+        self._publisher.bind(f"tcp://*:{self.publish_port}")
+        self._snapshots = self.context.socket(zmq.ROUTER)
+        self._snapshots.setsockopt(zmq.LINGER, 0)
+        self._snapshots.bind(f"tcp://*:{self.snapshot_port}")
+        return {self._snapshots: self._send_snapshot}
+
+    def _run_backend_server(self):
+        """Run the backend and close the publisher once it stops."""
+        try:
+            super()._run_backend_server()
+        finally:
+            with self._publish_lock:
+                self._publisher.close()
+                self._publisher = None
+            self._snapshots = None
+
+    def _publish(self, channel, header, body=b''):
+        """
+        Publish one update to the workers.
+
+        Args:
+            channel (str): Channel of the update, also the message topic.
+            header (dict): 'kind' of update and its 'version'; the channel
+                and sequence number are added.
+            body (bytes, optional): JSON of the update.
+        """
+        with self._publish_lock:
+            if self._publisher is None:
+                return
+            self.sequence += 1
+            header = dict(header, channel=channel, sequence=self.sequence)
+            self._publisher.send_multipart([channel.encode('utf-8'), json.dumps(header).encode('utf-8'), body])
+
+    def _send_snapshot(self):
+        """
+        Answer a snapshot request with the current state of every channel.
+
+        Runs in the backend thread, so no update is applied meanwhile; the
+        publish lock keeps layouts from being published meanwhile.
+        """
+        frames = self._snapshots.recv_multipart()
+        envelope, payload = self._split_envelope(frames)
+        if payload[:1] != [_SNAPSHOT]:
+            log.warning("Ignoring invalid snapshot request")
+            return
+
+        request_id = payload[1].decode('utf-8') if len(payload) > 1 else None
+        with self._publish_lock:
+            for name in self.channels.names():
+                state = self.channels.get(name)
+                if state is None:
+                    continue
+                header = {'channel': name, 'request': request_id}
+                self._snapshots.send_multipart(
+                    envelope + [json.dumps(header).encode('utf-8'), json.dumps(state.export()).encode('utf-8')])
+            end = {_END: True, 'request': request_id, 'sequence': self.sequence}
+            self._snapshots.send_multipart(envelope + [json.dumps(end).encode('utf-8'), b''])
+        log.info(f"Sent snapshot at sequence {self.sequence}")
+
+    def _on_graph_update(self, channel=DEFAULT_CHANNEL):
+        """Publish a complete graph, then broadcast it to local viewers."""
+        state = self.channels.get(channel)
+        if state is None:
+            return
+        graph = state.export()
+        self._publish(channel, {'kind': 'full', 'version': graph['version'], 'layout': self._layout_pending(state)},
+                      json.dumps(graph).encode('utf-8'))
+        if self._viewed(channel, state):
+            super()._on_graph_update(channel)
+
+    def _on_graph_patch(self, patch, version, channel=DEFAULT_CHANNEL):
+        """Publish an applied patch, then broadcast it to local viewers."""
+        state = self.channels.get(channel)
+        if state is None:
+            return
+        body = {
+            'base_version': patch['base_version'],
+            'delta': patch.get('delta') or {},
+            'title': state.title,
+            **state.meta,
+        }
+        if 'traces' in patch:
+            body['traces'] = patch['traces']
+        self._publish(channel, {'kind': 'patch', 'version': version, 'layout': self._layout_pending(state)},
+                      json.dumps(body).encode('utf-8'))
+        if self._viewed(channel, state):
+            super()._on_graph_patch(patch, version, channel)
+
+    def _on_channel_evicted(self, channel):
+        """Publish the removal of an evicted channel, so workers drop their replica."""
+        self._publish(channel, {'kind': 'remove', 'version': None})
+
+    def _viewed(self, channel, state):
+        """
+        Whether anybody views a channel on the ingest itself.
+
+        Unviewed channels are neither broadcast nor summarized; their
+        updates count as emitted once they are published.
+        """
+        if self.channels.viewers.get(channel):
+            return True
+        self.latency.stamp(channel, state.version, emitted=time.time())
+        return False
+
+    def _on_graph_layout(self, channel, version, positions):
+        """Publish finished positions, then send them to local viewers."""
+        self._publish(channel, {'kind': 'layout', 'version': version},
+                      json.dumps(positions).encode('utf-8'))
+        super()._on_graph_layout(channel, version, positions)
+
+
+class WebWorker(Server):
+    """
+    Server that serves viewers from a replica of an IngestServer's channels.
+
+    Workers do not accept clients on a backend port; all updates come from
+    the ingest. Everything viewers use - graphs, patches, history, search,
+    chunks, summaries, latency reports and metrics - is served from the
+    local replica. Layouts are computed by the ingest.
+
+    Run several workers behind a load balancer. Socket.IO long polling
+    needs sticky sessions; WebSocket-only setups do not.
+
+    The channel limits of the ingest apply: a worker neither evicts idle
+    channels nor limits their number, it removes channels when the ingest
+    publishes that it evicted them.
+
+    Attributes:
+        ingest_host (str): Host of the ingest server.
+        publish_port (int): Port the ingest publishes updates on.
+        snapshot_port (int): Port the ingest answers snapshot requests on.
+        sequence (int): Sequence number of the last applied update, or
+            None while the worker waits for a snapshot.
+        stats_replication (dict): Counters of 'updates' applied,
+            'snapshots' loaded, 'gaps' that required a snapshot and
+            'overflows' of the buffer while waiting for one.
+
+    Examples:
+        >>> from schnauzer.replication import WebWorker
+        >>>
+        >>> worker = WebWorker(web_port=8081, ingest_host='ingest.internal')
+        >>> worker.start()
+    """
+
+    def __init__(self, *args, ingest_host='localhost', publish_port=PUBLISH_PORT, snapshot_port=SNAPSHOT_PORT,
+                 **kwargs):
+        """
+        Initialize the worker; see Server for the other arguments.
+
+        Args:
+            *args: Positional arguments of Server; backend_port is not used.
+            ingest_host (str, optional): Host of the ingest server.
+                Defaults to 'localhost'.
+            publish_port (int, optional): Port the ingest publishes updates
+                on. Defaults to PUBLISH_PORT.
+            snapshot_port (int, optional): Port the ingest answers snapshot
+                requests on. Defaults to SNAPSHOT_PORT.
+            **kwargs: Keyword arguments of Server.
+
+        Raises:
+            ValueError: If a layout or persist_dir is configured; layouts
+                are computed and graphs persisted by the ingest server.
+        """
+        if kwargs.get('layout'):
+            raise ValueError("Layouts of replicated channels are computed by the ingest server")
+        if kwargs.get('persist_dir'):
+            raise ValueError("Replicated channels are persisted by the ingest server")
+        super().__init__(*args, **kwargs)
+        # The replica follows the ingest's evictions instead
+        self.channels.idle_timeout = None
+        self.channels.max_channels = None
+        self.ingest_host = ingest_host
+        self.publish_port = publish_port
+        self.snapshot_port = snapshot_port
+        self.sequence = None
+        self.stats_replication = {'updates': 0, 'snapshots': 0, 'gaps': 0, 'overflows': 0}
+        self._subscriber = None
+        self._snapshots = None
+        self._buffer = []
+        self._snapshot_request = None
+        self._snapshot_channels = []
+        self._snapshot_deadline = None
+        # States whose version the ingest is laying out
+        self._layouts_expected = weakref.WeakKeyDictionary()
+        self.metrics.callback('schnauzer_replication_total', 'Updates and snapshots applied by a web worker',
+                              lambda: [((kind,), count) for kind, count in dict(self.stats_replication).items()],
+                              ('kind',), kind='counter')
+
+    def publish(self, *args, **kwargs):
+        """
+        Not supported: a worker only shows what the ingest server publishes.
+
+        Raises:
+            RuntimeError: Always; publish to the IngestServer instead.
+        """
+        raise RuntimeError("Web workers replicate the ingest server, publish graphs there")
+
+    def client(self, **kwargs):
+        """
+        Not supported: a worker has no backend socket.
+
+        Raises:
+            RuntimeError: Always; connect clients to the IngestServer instead.
+        """
+        raise RuntimeError("Web workers replicate the ingest server, connect clients there")
+
+    def _start_backend(self):
+        """
+        Subscribe to the ingest server and request a snapshot.
+
+        Note:
+            Called by start(). Does nothing if the worker is already running.
+        """
+        if self.running:
+            return
+
+        self.running = True
+        self.context = zmq.Context()
+        self._control_address = f"inproc://schnauzer-control-{id(self)}"
+        self._control = self.context.socket(zmq.PAIR)
+        self._control.bind(self._control_address)
+
+        # Subscribe before requesting the snapshot, so no update falls in between
+        self._subscriber = self.context.socket(zmq.SUB)
+        self._subscriber.setsockopt(zmq.LINGER, 0)
+        self._subscriber.setsockopt(zmq.SUBSCRIBE, b'')
+        self._subscriber.connect(f"tcp://{self.ingest_host}:{self.publish_port}")
+        self._snapshots = self.context.socket(zmq.DEALER)
+        self._snapshots.setsockopt(zmq.LINGER, 0)
+        self._snapshots.connect(f"tcp://{self.ingest_host}:{self.snapshot_port}")
+
+        self.server_thread = threading.Thread(target=self._run_backend_server)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+        self.broadcaster.start()
+
+    def _run_backend_server(self):
+        """
+        Apply published updates to the replica until stopped.
+
+        Like Server._run_backend_server(), but reads the ingest's updates
+        and snapshots instead of client messages.
+        """
+        poller = zmq.Poller()
+        poller.register(self._subscriber, zmq.POLLIN)
+        poller.register(self._snapshots, zmq.POLLIN)
+        poller.register(self._control, zmq.POLLIN)
+
+        self._request_snapshot()
+
+        while self.running:
+            try:
+                timeout = None
+                if self._snapshot_deadline is not None:
+                    timeout = max(0, int((self._snapshot_deadline - time.monotonic()) * 1000))
+
+                events = dict(poller.poll(timeout))
+
+                if self._snapshot_deadline is not None and time.monotonic() >= self._snapshot_deadline:
+                    log.warning("No snapshot from the ingest server, requesting it again")
+                    self._request_snapshot()
+
+                if self._control in events:
+                    self._control.recv()
+                    break
+
+                if self._snapshots in events:
+                    while self._snapshots.poll(0):
+                        self._receive_snapshot(self._snapshots.recv_multipart())
+
+                if self._subscriber in events:
+                    while self._subscriber.poll(0):
+                        self._receive_update(self._subscriber.recv_multipart())
+
+            except zmq.error.ContextTerminated:
+                break
+
+            except Exception as e:
+                log.error(f"Error in replication loop: {e}")
+
+        self._subscriber.close()
+        self._snapshots.close()
+        self._control.close()
+        self._subscriber = None
+        self._snapshots = None
+        self._control = None
+        print("Replication stopped")
+
+    def _request_snapshot(self):
+        """
+        Ask the ingest for the state of all channels, buffering updates meanwhile.
+
+        Updates buffered so far were published before the ingest takes the
+        snapshot, which therefore contains them, so they are dropped.
+        """
+        self.sequence = None
+        self._buffer = []
+        self._snapshot_request = f"{id(self)}-{time.monotonic()}"
+        self._snapshot_channels = []
+        self._snapshot_deadline = time.monotonic() + SNAPSHOT_TIMEOUT
+        self._snapshots.send_multipart([b'', _SNAPSHOT, self._snapshot_request.encode('utf-8')])
+
+    def _receive_snapshot(self, frames):
+        """
+        Collect one message of a snapshot, and load it once it is complete.
+
+        Args:
+            frames (list): Empty delimiter, header and exported graph.
+        """
+        payload = frames[1:]  # After the empty delimiter
+        header = json.loads(payload[0])
+        if header.get('request') != self._snapshot_request:
+            return  # Answer to an earlier request
+        if not header.get(_END):
+            self._snapshot_channels.append((header['channel'], payload[1]))
+            return
+
+        # Channels the ingest evicted while their removal was missed
+        current = {channel for channel, _ in self._snapshot_channels}
+        for channel in self.channels.names():
+            if channel not in current and self.channels.remove(channel):
+                log.info(f"Channel {channel!r} no longer exists on the ingest server, removed it")
+        self._forget_evicted()
+
+        for channel, body in self._snapshot_channels:
+            graph = json.loads(body)
+            try:
+                state = self.channels.get(channel, create=True)
+            except CapacityExceeded as e:
+                log.error(f"Cannot replicate channel {channel!r}: {e}")
+                continue
+            if state.version != graph['version']:
+                state.replace(graph, version=graph['version'])
+                self._layouts_expected.pop(state, None)
+                self._on_graph_update(channel)
+            if graph.get('positions') and state.set_positions(graph['layout_version'], graph['positions']):
+                self._on_graph_layout(channel, graph['layout_version'], graph['positions'])
+
+        self.sequence = header['sequence']
+        self._snapshot_request = None
+        self._snapshot_channels = []
+        self._snapshot_deadline = None
+        self.stats_replication['snapshots'] += 1
+        log.info(f"Loaded snapshot at sequence {self.sequence}")
+
+        buffered, self._buffer = self._buffer, []
+        for update in buffered:
+            self._receive_update(update)
+
+    def _receive_update(self, frames):
+        """
+        Apply one published update, or buffer it while a snapshot is loading.
+
+        Args:
+            frames (list): Topic, header and body of the update.
+        """
+        if self.sequence is None:
+            if len(self._buffer) >= MAX_BUFFERED:
+                log.warning(f"More than {MAX_BUFFERED} updates while waiting for a snapshot, requesting a fresh one")
+                self.stats_replication['overflows'] += 1
+                self._request_snapshot()
+            self._buffer.append(frames)
+            return
+
+        header = json.loads(frames[1])
+        sequence = header['sequence']
+        if sequence <= self.sequence:
+            return  # Already contained in the snapshot
+        if sequence != self.sequence + 1:
+            log.warning(f"Missed updates {self.sequence + 1} to {sequence - 1}, requesting a snapshot")
+            self.stats_replication['gaps'] += 1
+            self._request_snapshot()
+            return
+
+        self.sequence = sequence
+        try:
+            self._apply_update(header, frames[2])
+            self.stats_replication['updates'] += 1
+        except (VersionMismatch, CapacityExceeded) as e:
+            log.warning(f"Replica of channel {header['channel']!r} diverged ({e}), requesting a snapshot")
+            self.stats_replication['gaps'] += 1
+            self._request_snapshot()
+
+    def _apply_update(self, header, body):
+        """
+        Apply a published update to the replica and notify the viewers.
+
+        Args:
+            header (dict): 'kind', 'channel' and 'version' of the update.
+            body (bytes): JSON of the exported graph, the patch or the
+                positions.
+        """
+        channel = header['channel']
+        version = header['version']
+        kind = header['kind']
+
+        if kind == 'remove':
+            state = self.channels.get(channel)
+            if state is not None and self.channels.remove(channel):
+                self._layouts_expected.pop(state, None)
+                self._forget_evicted()
+            return
+
+        if kind == 'layout':
+            state = self.channels.get(channel)
+            positions = json.loads(body)
+            if state is not None and state.set_positions(version, positions):
+                self._on_graph_layout(channel, version, positions)
+            return
+
+        state = self.channels.get(channel, create=True)
+        if kind == 'full':
+            graph = json.loads(body)
+            state.replace(graph, version=version)
+            self._layouts_expected[state] = header.get('layout', False)
+            self._on_graph_update(channel)
+        elif kind == 'patch':
+            patch = json.loads(body)
+            state.apply_patch(patch, version=version)
+            self._layouts_expected[state] = header.get('layout', False)
+            self._on_graph_patch(patch, version, channel)
+        else:
+            log.warning(f"Ignoring update of unknown kind {kind!r}")
+
+    def _layout_pending(self, state):
+        """Whether the ingest is still laying out the state's version."""
+        return self._layouts_expected.get(state, False) and state.layout_version != state.version
+
+    def stop(self):
+        """
+        Stop replicating and the web server.
+
+        Note:
+            Safe to call multiple times.
+        """
+        super().stop()
+        self.sequence = None
+        self._buffer = []
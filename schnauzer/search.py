@@ -0,0 +1,318 @@
+"""
+Inverted attribute index for searching graph elements.
+
+Scanning every element on each keystroke does not scale to large graphs,
+so the server indexes the attributes of a graph and answers search queries
+from the index. Queries use the syntax of the viewer's search box:
+
+- ``key:value`` matches elements whose ``key`` attribute contains
+  ``value`` (case-insensitive)
+- any other word matches elements with an attribute value containing a
+  word that starts with it
+
+All parts of a query must match. The index is updated in place when a
+patch changes the graph, so keeping it current costs O(delta).
+"""
+import bisect
+import json
+import re
+
+from schnauzer.convert import _gc_paused
+
+_TOKEN = re.compile(r'\w+')
+
+#: Length of the substrings indexed for attribute filters.
+_GRAM = 3
+
+
+def _grams(text):
+    """Distinct substrings of length _GRAM of a text."""
+    return {text[i:i + _GRAM] for i in range(len(text) - _GRAM + 1)}
+
+
+def _text(value):
+    """Lower-case text of an attribute value, as the viewer displays it."""
+    if isinstance(value, str):
+        return value.lower()
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, (list, tuple)):
+        return ','.join(_text(item) for item in value)
+    if isinstance(value, dict):
+        return json.dumps(value).lower()
+    return str(value).lower()
+
+
+def parse_query(query):
+    """
+    Split a search query into attribute filters and general terms.
+
+    Args:
+        query (str): Search query, e.g. ``'type:database srv'``.
+
+    Returns:
+        tuple: ``(filters, terms)`` where filters is a list of lower-case
+            ``(key, value)`` pairs and terms a list of lower-case words.
+    """
+    filters = []
+    terms = []
+    for part in query.lower().split():
+        if part.count(':') == 1:
+            key, value = part.split(':')
+            if key and value:
+                filters.append((key, value))
+        else:
+            terms.extend(_TOKEN.findall(part))
+    return filters, terms
+
+
+class SearchIndex:
+    """
+    Inverted index over the attributes of one kind of element.
+
+    Maps attribute key to value to element ids for attribute filters and
+    every word of every attribute value to element ids for general terms.
+    The words are also kept in a sorted list, so prefix lookups are a
+    binary search. Keys that have been filtered on also get a trigram
+    index of their distinct values, so substring filters only check the
+    values sharing all trigrams of the filter.
+    """
+
+    def __init__(self):
+        """Initialize an empty index."""
+        self._values = {}
+        self._tokens = {}
+        self._sorted = []
+        self._stale = 0
+        self._terms = {}
+        self._trigrams = {}
+
+    def __len__(self):
+        return len(self._terms)
+
+    @classmethod
+    def build(cls, elements):
+        """
+        Index a group of elements.
+
+        Args:
+            elements (dict): Mapping of element id to Cytoscape element.
+
+        Returns:
+            SearchIndex: The populated index.
+        """
+        index = cls()
+        # Building allocates many small sets, pause the collector meanwhile
+        with _gc_paused():
+            for eid, element in elements.items():
+                index._index(eid, element)
+        # One sort instead of an insertion per word
+        index._sorted = sorted(index._tokens)
+        return index
+
+    def add(self, eid, element):
+        """
+        Index an element, replacing an earlier version of it.
+
+        Args:
+            eid (str): Element id.
+            element (dict): Cytoscape element with a 'data' dict.
+        """
+        if eid in self._terms:
+            self.remove(eid)
+        for token in self._index(eid, element):
+            position = bisect.bisect_left(self._sorted, token)
+            if position < len(self._sorted) and self._sorted[position] == token:
+                self._stale -= 1
+            else:
+                self._sorted.insert(position, token)
+
+    def _index(self, eid, element):
+        """Add an element to the maps, returning the words that are new."""
+        all_values = self._values
+        all_tokens = self._tokens
+        all_trigrams = self._trigrams
+        findall = _TOKEN.findall
+        pairs = []
+        tokens = set()
+        for key, value in (element.get('data') or {}).items():
+            if value is None:
+                continue
+            text = value.lower() if type(value) is str else _text(value)
+            key = key.lower()
+            pairs.append((key, text))
+            tokens.update(findall(text))
+
+            values = all_values.get(key)
+            if values is None:
+                values = all_values[key] = {}
+            ids = values.get(text)
+            if ids is None:
+                values[text] = {eid}
+                trigrams = all_trigrams.get(key)
+                if trigrams is not None:
+                    for gram in _grams(text):
+                        trigrams.setdefault(gram, set()).add(text)
+            else:
+                ids.add(eid)
+
+        new = []
+        for token in tokens:
+            ids = all_tokens.get(token)
+            if ids is None:
+                all_tokens[token] = {eid}
+                new.append(token)
+            else:
+                ids.add(eid)
+        self._terms[eid] = (pairs, tokens)
+        return new
+
+    def remove(self, eid):
+        """
+        Drop an element from the index.
+
+        Args:
+            eid (str): Element id; unknown ids are ignored.
+        """
+        terms = self._terms.pop(eid, None)
+        if terms is None:
+            return
+        pairs, tokens = terms
+
+        for key, text in pairs:
+            values = self._values[key]
+            values[text].discard(eid)
+            if not values[text]:
+                del values[text]
+                if not values:
+                    del self._values[key]
+                    self._trigrams.pop(key, None)
+                else:
+                    self._forget(key, text)
+        for token in tokens:
+            self._tokens[token].discard(eid)
+            if not self._tokens[token]:
+                # Left in the sorted list until enough words are gone
+                del self._tokens[token]
+                self._stale += 1
+
+        if self._stale > len(self._sorted) // 2:
+            self._sorted = sorted(self._tokens)
+            self._stale = 0
+
+    def _forget(self, key, text):
+        """Drop a value that no element has any more from the trigram index."""
+        trigrams = self._trigrams.get(key)
+        if trigrams is None:
+            return
+        for gram in _grams(text):
+            texts = trigrams[gram]
+            texts.discard(text)
+            if not texts:
+                del trigrams[gram]
+
+    def _trigram_index(self, key):
+        """Trigram to distinct values map of a key, built on first use."""
+        trigrams = self._trigrams.get(key)
+        if trigrams is None:
+            trigrams = self._trigrams[key] = {}
+            with _gc_paused():
+                for text in self._values[key]:
+                    for gram in _grams(text):
+                        texts = trigrams.get(gram)
+                        if texts is None:
+                            trigrams[gram] = {text}
+                        else:
+                            texts.add(text)
+        return trigrams
+
+    def apply(self, group, elements):
+        """
+        Update the index for one 'nodes' or 'edges' section of a delta.
+
+        Args:
+            group (dict): Delta section with 'added', 'changed' and
+                'removed' lists.
+            elements (dict): Mapping of element id to element after the
+                delta was applied.
+        """
+        for eid in group.get('removed') or []:
+            self.remove(eid)
+        for element in (group.get('added') or []) + (group.get('changed') or []):
+            eid = element['data']['id']
+            if eid in elements:
+                self.add(eid, elements[eid])
+
+    def match_attribute(self, key, value):
+        """
+        Find elements whose attribute contains a value.
+
+        Values of at least three characters are looked up in the trigram
+        index of the key, which narrows the candidates to the distinct
+        values containing all trigrams of the filter. Shorter values scan
+        all distinct values of the key, which for keys such as 'id' or
+        'name' means one value per element.
+
+        Args:
+            key (str): Lower-case attribute key.
+            value (str): Lower-case text the attribute value must contain.
+
+        Returns:
+            set: Ids of the matching elements.
+        """
+        values = self._values.get(key)
+        if not values:
+            return set()
+        matches = set(values.get(value, ()))
+        if len(value) < _GRAM:
+            candidates = values
+        else:
+            trigrams = self._trigram_index(key)
+            sets = sorted((trigrams.get(gram, set()) for gram in _grams(value)), key=len)
+            candidates = sets[0].intersection(*sets[1:])
+        for text in candidates:
+            if value in text and text != value:
+                matches |= values[text]
+        return matches
+
+    def match_prefix(self, prefix):
+        """
+        Find elements with an attribute word starting with a prefix.
+
+        Args:
+            prefix (str): Lower-case word prefix.
+
+        Returns:
+            set: Ids of the matching elements.
+        """
+        matches = set()
+        position = bisect.bisect_left(self._sorted, prefix)
+        while position < len(self._sorted) and self._sorted[position].startswith(prefix):
+            ids = self._tokens.get(self._sorted[position])
+            if ids:
+                matches |= ids
+            position += 1
+        return matches
+
+    def search(self, filters, terms):
+        """
+        Find the elements matching all parts of a parsed query.
+
+        Args:
+            filters (list): ``(key, value)`` pairs from parse_query().
+            terms (list): Words from parse_query().
+
+        Returns:
+            set: Ids of the matching elements; empty for an empty query.
+        """
+        result = None
+        lookups = [(self.match_attribute, part) for part in filters]
+        lookups += [(self.match_prefix, (term,)) for term in terms]
+        for lookup, args in lookups:
+            matches = lookup(*args)
+            result = matches if result is None else result & matches
+            if not result:
+                return set()
+        return result or set()
@@ -6,42 +6,127 @@ and a web frontend for interactive visualization. The server renders network gra
 using Cytoscape.js and provides interactive features like zooming, panning, and node details.
 """
 
-from flask import Flask, render_template, jsonify, session
-from flask_socketio import SocketIO, emit
+from flask import Flask, Response, render_template, jsonify, session, request, abort
+from flask_socketio import SocketIO, emit, join_room
+from werkzeug.serving import make_server
 import argparse
+from collections import deque
 import os
 import uuid
 import sys
 import threading
+import weakref
 import zmq
 import json
 import time
 import importlib.resources as pkg_resources
 import logging
 
+from schnauzer.aggregate import DEFAULT_GROUP_BY
+from schnauzer.archive import MAX_VERSIONS, ArchiveError, GraphArchive
+from schnauzer.assets import StaticAssets
+from schnauzer.broadcast import Broadcaster
+from schnauzer.client import VisualizationClient
+from schnauzer.convert import node_data, edge_data
+from schnauzer.events import EventError
+from schnauzer.latency import LatencyTracker
+from schnauzer.layout import LayoutEngine
+from schnauzer.metrics import Registry, CONTENT_TYPE
+from schnauzer.payload import Payload
+from schnauzer.protocol import HELLO, hello_reply
+from schnauzer.shm import LocalTransport, SegmentError, is_shared, read_frames
+from schnauzer.store import ChannelStore, CapacityExceeded, VersionMismatch, DEFAULT_CHANNEL
+from schnauzer.traces import TraceError
+from schnauzer.wire import is_columnar, decode_message, WireFormatError
+
 log = logging.getLogger(__name__)
 
+#: Most elements a viewer may request with one 'graph_chunk' request.
+MAX_CHUNK_SIZE = 50000
+
 class Server:
     """
     Combined web and visualization server for NetworkX graphs.
 
     This class handles both the ZeroMQ backend for receiving graph data
     and the web frontend for visualization. It creates two servers:
-    1. A ZeroMQ REP server to receive graph data from clients
+    1. A ZeroMQ ROUTER server to receive graph data from clients
     2. A Flask/SocketIO web server to serve the interactive visualization
 
-    The server maintains the current graph state and broadcasts updates
-    to all connected web clients when new graph data is received.
+    The server keeps one graph per named channel and broadcasts updates to
+    the web clients viewing that channel when new graph data is received.
+    Complete graphs are broadcast as 'graph_update' events, incremental
+    patches as 'graph_patch' events carrying only the changed elements.
+    Batches of fine-grained mutations from client streams (see
+    schnauzer.events) are applied atomically and broadcast as one patch.
+    Viewers open /g/<channel> to subscribe to a channel; the root page
+    shows the default channel.
+
+    Optionally the server lays out graphs itself (see schnauzer.layout) and
+    ships node positions with the graph, followed by 'graph_layout' events
+    whenever a new layout is ready, so browsers skip the expensive fcose run.
+
+    Each channel keeps a bounded history of its recent versions. Viewers
+    can load any of them and step between neighbouring versions, which
+    only transfers the delta in between.
+
+    Graphs with more than chunk_threshold elements are announced to viewers
+    by a manifest, and the viewers fetch the elements in chunks sized to
+    their own rendering speed with 'graph_chunk' requests.
+
+    With lod_threshold set, graphs with more nodes are sent as a summary of
+    clusters (see schnauzer.aggregate); viewers expand one cluster at a time
+    with 'lod_expand' requests.
+
+    Message counts and sizes, decode and broadcast durations, graph sizes
+    and viewer counts are recorded as metrics (see schnauzer.metrics), which
+    /metrics serves in the Prometheus text format and stats() returns.
+
+    Every update is stamped from the producer to the viewers' screens (see
+    schnauzer.latency): clients stamp when a graph was produced and sent,
+    the backend when it was received, decoded and broadcast, and viewers
+    report back when they rendered and laid it out. /latency/<channel>
+    serves the percentiles of every stage per viewer.
+
+    Graph updates and patches are handed to a Broadcaster (see
+    schnauzer.broadcast), which sends them to every viewer at its own pace:
+    at most max_fps updates per second, and none while the viewer has not
+    acknowledged the previous ones. Viewers that fall behind skip the
+    versions in between and receive one composed patch or the latest graph,
+    so slow browsers never hold up ingest or other viewers.
+
+    Clients on the same host can hand over large messages through shared
+    memory and an ipc:// endpoint instead of TCP (see schnauzer.shm).
+
+    With persist_dir, every channel's versions are also written to disk in
+    the background (see schnauzer.archive). A restarted server serves the
+    archived graphs at once and restores its state from them meanwhile.
 
     Attributes:
         web_port (int): Port number for the Flask web server.
         backend_port (int): Port number for the ZeroMQ backend listener.
-        current_graph (dict): Current graph data in Cytoscape.js format.
+        channels (ChannelStore): Versioned graph states of all channels.
+        layout_engine (LayoutEngine): Server-side layout, or None if disabled.
+        chunk_threshold (int): Graphs with more nodes plus edges are
+            delivered in chunks, None or 0 to always send them at once.
+        lod_threshold (int): Graphs with more nodes are sent as clusters,
+            None or 0 to always send the whole graph.
+        lod_group_by (str): Top-level grouping of summarized graphs.
+        broadcaster (Broadcaster): Per-viewer delivery of updates.
+        archive (GraphArchive): Versions persisted on disk, or None.
+        shared_memory (bool): Whether local clients are offered the
+            shared-memory transfer.
+        metrics (Registry): The server's metrics.
+        latency (LatencyTracker): Stage durations of recent updates.
+        graph_state (GraphState): State of the default channel.
+        current_graph (dict): Default channel's graph in Cytoscape.js format.
         running (bool): Flag indicating if the backend server is running.
         context (zmq.Context): ZeroMQ context for socket creation.
-        socket (zmq.Socket): ZeroMQ REP socket for receiving data.
+        socket (zmq.Socket): ZeroMQ ROUTER socket for receiving data.
         server_thread (threading.Thread): Thread running the backend server.
         app (Flask): Flask application instance.
+        assets (StaticAssets): Bundled viewer assets served from /assets,
+            or None to serve the sources from /static.
         socketio (SocketIO): SocketIO instance for real-time updates.
 
     Examples:
@@ -56,7 +141,12 @@ class Server:
         >>> server.start()
     """
 
-    def __init__(self, web_port=8080, backend_port=8086, log_level = logging.WARN):
+    def __init__(self, web_port=8080, backend_port=8086, log_level = logging.WARN,
+                 max_channels=64, channel_max_elements=None, channel_idle_timeout=3600,
+                 layout=None, layout_workers=2, layout_max_nodes=10000,
+                 history_size=50, history_max_bytes=32 * 2**20,
+                 lod_threshold=None, lod_group_by=DEFAULT_GROUP_BY, chunk_threshold=5000, max_fps=20,
+                 shared_memory=True, persist_dir=None, persist_versions=MAX_VERSIONS, persist_max_bytes=None):
         """
         Initialize the visualization server.
 
@@ -71,6 +161,54 @@ class Server:
                 Defaults to 8086. Clients send graph data to this port.
             log_level (int, optional): Logging level for the server.
                 Defaults to logging.WARN.
+            max_channels (int, optional): Maximum number of graph channels,
+                including the default channel. When a new channel would
+                exceed it, the least recently updated channel without
+                viewers is evicted. Defaults to 64.
+            channel_max_elements (int, optional): Maximum number of nodes
+                plus edges per channel; larger updates are rejected.
+                Defaults to None (unlimited).
+            channel_idle_timeout (float, optional): Seconds after which a
+                channel without updates and viewers is evicted. Defaults to
+                3600. None keeps channels until the server stops.
+            layout (str, optional): Server-side layout algorithm, 'auto',
+                'force' or 'hierarchical'. Defaults to None, which leaves
+                the layout to the browser.
+            layout_workers (int, optional): Number of layout worker
+                processes. Defaults to 2.
+            layout_max_nodes (int, optional): Graphs with more nodes are
+                left to the browser. Defaults to 10000.
+            history_size (int, optional): Number of versions each channel
+                keeps for time travel. Defaults to 50, 0 disables history.
+            history_max_bytes (int, optional): Estimated memory budget of
+                each channel's history; the oldest versions are evicted
+                first. Defaults to 32 MiB.
+            lod_threshold (int, optional): Graphs with more nodes are sent
+                to viewers as expandable clusters. Defaults to None, which
+                always sends the whole graph.
+            lod_group_by (str, optional): How summarized graphs are grouped:
+                'community', 'component' or the name of a node attribute.
+                Defaults to 'community'.
+            chunk_threshold (int, optional): Graphs with more nodes plus
+                edges are delivered to viewers in chunks, so they can render
+                them progressively. Defaults to 5000, None or 0 always sends
+                the whole graph at once.
+            max_fps (float, optional): Most graph updates per second sent to
+                one viewer; updates in between are merged. Defaults to 20,
+                0 sends every update as soon as the viewer acknowledged the
+                previous ones.
+            shared_memory (bool, optional): Offer clients on the same host
+                an ipc:// endpoint and shared-memory transfer of large
+                messages. Defaults to True.
+            persist_dir (str, optional): Directory to write every channel's
+                versions to in the background. On startup the latest ones
+                are shown right away and restored. Defaults to None, which
+                keeps graphs in memory only.
+            persist_versions (int, optional): Versions kept on disk per
+                channel. Defaults to 10.
+            persist_max_bytes (int, optional): Disk budget per channel; the
+                oldest versions are deleted first. Defaults to None, no
+                budget.
 
         Note:
             Both ports must be available or the server will fail to start.
@@ -80,20 +218,74 @@ class Server:
         log.setLevel(log_level)
         self.web_port = web_port
         self.backend_port = backend_port
-        self.current_graph = {
-            'elements': {'nodes': [], 'edges': []},
-            'title': 'NetworkX DiGraph Visualization'
-        }
+        self.channels = ChannelStore(
+            max_channels=max_channels,
+            max_elements=channel_max_elements,
+            idle_timeout=channel_idle_timeout,
+            default_title='NetworkX DiGraph Visualization',
+            history_size=history_size,
+            history_max_bytes=history_max_bytes
+        )
+        self._viewer_channels = {}
+        self.lod_threshold = lod_threshold
+        self.lod_group_by = lod_group_by
+        self.chunk_threshold = chunk_threshold
+        self._summaries_pending = set()
+        self._summaries_lock = threading.Lock()
+        self.layout_engine = LayoutEngine(layout, workers=layout_workers, max_nodes=layout_max_nodes) \
+            if layout else None
+        self._backend_queue = 0
+        self.broadcaster = Broadcaster(self._send_to_viewer, self._full_state, max_fps=max_fps)
+        self.shared_memory = shared_memory
+        self._local = None
+        self._ingest_lock = threading.Lock()
+        self._clients = weakref.WeakSet()
+
+        # Versions on disk; channels still being restored serve their archived payload
+        self.archive = GraphArchive(persist_dir, max_versions=persist_versions, max_bytes=persist_max_bytes) \
+            if persist_dir else None
+        self._restoring = self.archive.latest() if self.archive is not None else {}
+        self._restored_payloads = {}
+        for archived in self._restoring.values():
+            self.channels.reserve_versions(archived.version)
+        self.metrics = Registry()
+        self._setup_metrics()
+        self.latency = LatencyTracker(histogram=self.metrics.histogram(
+            'schnauzer_update_latency_seconds', 'Time graph updates spend in each stage', ('stage',)))
 
         # Backend server attributes
         self.running = False
         self.context = None
         self.socket = None
+        self._control = None
+        self._control_address = None
+        self._backend_handlers = {}
         self.server_thread = None
+        self.inproc_endpoint = f"inproc://schnauzer-backend-{id(self)}"
+
+        # Background mode
+        self._web_server = None
+        self._web_thread = None
 
         # Web server attributes
         self.app = self._create_app()
-        self.socketio = SocketIO(
+        self.assets = StaticAssets.load(self.app.static_folder)
+        self.socketio = self._create_socketio()
+
+        # Set up routes and socket handlers
+        self._setup_routes()
+        self._setup_socketio_handlers()
+
+
+    def _create_socketio(self):
+        """
+        Create the Socket.IO server viewers connect to.
+
+        Returns:
+            SocketIO: Flask-SocketIO instance serving the Flask app with one
+                thread per connection.
+        """
+        return SocketIO(
             self.app,
             cors_allowed_origins="*",
             ping_timeout=60,         # Longer ping timeout for stability
@@ -101,10 +293,152 @@ class Server:
             async_mode='threading'   # Thread mode for better stability
         )
 
-        # Set up routes and socket handlers
-        self._setup_routes()
-        self._setup_socketio_handlers()
+    def _emit(self, event, data, to, label=None):
+        """
+        Send a Socket.IO event to a room or a single viewer.
+
+        Safe to call from any thread.
+
+        Args:
+            event (str): Event name.
+            data: Event data.
+            to (str): Channel room or session id of a viewer.
+            label (str, optional): Event label of the broadcast duration
+                metric. Defaults to the event name.
+        """
+        with self._broadcast_seconds.time(event=label or event):
+            self.socketio.emit(event, data, to=to)
+
+    def _background(self, function):
+        """
+        Run a function in the background, e.g. to summarize a large graph.
+
+        Args:
+            function (callable): Called without arguments.
+        """
+        self.socketio.start_background_task(function)
+
+    @property
+    def graph_state(self):
+        """
+        State of the default channel.
+
+        Returns:
+            GraphState: Versioned graph state of the default channel.
+        """
+        return self.channels.get(DEFAULT_CHANNEL)
+
+    @property
+    def current_graph(self):
+        """
+        Current graph data of the default channel in Cytoscape.js format.
+
+        Returns:
+            dict: Snapshot of the graph state including its version.
+        """
+        return self.graph_state.to_dict()
 
+    @current_graph.setter
+    def current_graph(self, graph):
+        self.graph_state.replace(graph)
+
+    def stats(self):
+        """
+        Current values of the server's metrics.
+
+        Returns:
+            dict: Mapping of metric name to a list of
+                ``{'labels': {...}, 'value': ...}`` dicts, see
+                schnauzer.metrics.Registry.snapshot().
+        """
+        self._forget_evicted()
+        return self.metrics.snapshot()
+
+    def _setup_metrics(self):
+        """
+        Register the server's metrics.
+
+        Counters and histograms are updated where messages are handled and
+        events broadcast. Graph sizes, viewer counts and layout statistics
+        are already tracked elsewhere and only read when collected.
+        """
+        metrics = self.metrics
+        self._messages = metrics.counter(
+            'schnauzer_messages_total', 'Graph messages received from clients', ('channel', 'type'))
+        self._message_bytes = metrics.counter(
+            'schnauzer_message_bytes_total', 'Bytes of graph messages received from clients', ('channel',))
+        self._rejected = metrics.counter(
+            'schnauzer_messages_rejected_total', 'Messages answered with an error or a resync request',
+            ('reason',))
+        self._decode_seconds = metrics.histogram(
+            'schnauzer_decode_seconds', 'Time to decode a graph message', ('encoding',))
+        self._broadcast_seconds = metrics.histogram(
+            'schnauzer_broadcast_seconds', 'Time to send an event to the viewers of a channel', ('event',))
+        self._coalesced = metrics.counter(
+            'schnauzer_updates_coalesced_total', 'Viewer updates skipped in favour of a newer version',
+            ('kind',))
+
+        def per_channel(measure):
+            def read():
+                with self.channels.lock:
+                    return [((name,), measure(state)) for name, state in self.channels.channels.items()]
+            return read
+
+        metrics.callback('schnauzer_graph_nodes', 'Nodes of the current graph of a channel',
+                         per_channel(lambda state: len(state.nodes)), ('channel',))
+        metrics.callback('schnauzer_graph_edges', 'Edges of the current graph of a channel',
+                         per_channel(lambda state: len(state.edges)), ('channel',))
+        metrics.callback('schnauzer_channels', 'Number of graph channels',
+                         lambda: [((), len(self.channels.names()))])
+        metrics.callback('schnauzer_viewers', 'Socket.IO clients viewing a channel',
+                         lambda: [((name,), count) for name, count in dict(self.channels.viewers).items()],
+                         ('channel',))
+        metrics.callback('schnauzer_viewers_connected', 'Connected Socket.IO clients',
+                         lambda: [((), len(self._viewer_channels))])
+        metrics.callback('schnauzer_viewer_updates_total', 'Updates sent to or skipped by single viewers',
+                         lambda: [((outcome,), count) for outcome, count in dict(self.broadcaster.stats).items()],
+                         ('outcome',), kind='counter')
+        metrics.callback('schnauzer_viewers_lagging', 'Viewers skipped until they acknowledge earlier updates',
+                         lambda: [((), self.broadcaster.lagging())])
+        metrics.callback('schnauzer_backend_queue_depth', 'Messages read from the backend socket but not handled yet',
+                         lambda: [((), self._backend_queue)])
+        if self.archive is not None:
+            metrics.callback('schnauzer_archive_versions_total', 'Graph versions written to disk or skipped',
+                             lambda: [((outcome,), count) for outcome, count in dict(self.archive.stats).items()
+                                      if outcome != 'bytes'],
+                             ('outcome',), kind='counter')
+            metrics.callback('schnauzer_archive_bytes_total', 'Bytes of graph versions written to disk',
+                             lambda: [((), self.archive.stats['bytes'])], kind='counter')
+        if self.layout_engine is not None:
+            metrics.callback('schnauzer_layouts_total', 'Server-side layout requests by outcome',
+                             lambda: [((outcome,), count) for outcome, count in self.layout_engine.stats.items()],
+                             ('outcome',), kind='counter')
+
+    def _forget_evicted(self):
+        """Drop the counters and latency samples of channels that were evicted."""
+        names = set(self.channels.names())
+        self._messages.retain('channel', names)
+        self._message_bytes.retain('channel', names)
+        for channel in self.latency.channels() - names:
+            self.latency.forget(channel=channel)
+        for channel in self.broadcaster.channels() - names:
+            self.broadcaster.forget(channel)
+
+    def latency_summary(self, channel=DEFAULT_CHANNEL):
+        """
+        Latency percentiles of a channel's updates.
+
+        Args:
+            channel (str, optional): Channel name. Defaults to the default
+                channel.
+
+        Returns:
+            dict: Percentiles per stage for the updates and for every viewer
+                currently watching the channel, see
+                schnauzer.latency.LatencyTracker.summary().
+        """
+        viewers = [sid for sid, viewed in list(self._viewer_channels.items()) if viewed == channel]
+        return self.latency.summary(channel, viewers)
 
     @staticmethod
     def _create_app():
@@ -165,8 +499,15 @@ class Server:
         Set up Flask routes for the web interface.
 
         Configures the following HTTP endpoints:
-        - / : Main visualization page
-        - /graph-data : JSON endpoint for current graph data
+        - / : Main visualization page for the default channel
+        - /g/<channel> : Visualization page for a named channel
+        - /graph-data : JSON endpoint for the default channel's graph
+        - /graph-data/<channel> : JSON endpoint for a named channel's graph
+        - /history/<channel> : JSON list of the versions in a channel's history
+        - /history/<channel>/<version> : JSON endpoint for an earlier version
+        - /latency/<channel> : JSON latency percentiles of a channel
+        - /metrics : Metrics in the Prometheus text format
+        - /assets/<filename> : Bundled, content-hashed viewer assets
         - /favicon.ico : Favicon for browser tabs
 
         Each client connection gets a unique session ID for tracking.
@@ -177,21 +518,167 @@ class Server:
         """
 
         @self.app.route('/')
-        def index():
+        @self.app.route('/g/<channel>')
+        def index(channel=DEFAULT_CHANNEL):
+            channel = self._channel_or_404(channel)
             # Generate a unique session ID for each client
             if 'client_id' not in session:
                 session['client_id'] = str(uuid.uuid4())
-            return render_template('index.html', title=self.current_graph.get('title', 'Schnauzer Graph Visualization'))
+            state = self.channels.get(channel)
+            title = state.title if state else None
+            return render_template('index.html', title=title or 'Schnauzer Graph Visualization',
+                                   channel=channel, assets=self.assets)
 
         @self.app.route('/graph-data')
-        def get_graph_data():
+        @self.app.route('/graph-data/<channel>')
+        def get_graph_data(channel=DEFAULT_CHANNEL):
             """
-            Endpoint to get current graph data.
+            Endpoint to get the current graph data of a channel.
+
+            The JSON is serialized once per graph version and compressed
+            with brotli or gzip if the browser accepts it. Responses carry
+            an ETag, so reloading an unchanged graph returns 304. With
+            ``?chunked=1`` graphs above chunk_threshold elements are
+            described by a manifest and loaded with 'graph_chunk' requests.
 
             Returns:
                 JSON: Current graph in Cytoscape.js format
             """
-            return jsonify(self.current_graph)
+            payload = self._channel_payload(self._channel_or_404(channel),
+                                            chunked=bool(request.args.get('chunked')))
+            encoding = payload.negotiate(request.accept_encodings)
+            etag = payload.entity_tag(encoding)
+
+            if etag in request.if_none_match:
+                response = Response(status=304)
+            else:
+                response = Response(payload.encoded(encoding), mimetype='application/json')
+                if encoding != 'identity':
+                    response.content_encoding = encoding
+
+            response.set_etag(etag)
+            response.cache_control.no_cache = True
+            response.vary.add('Accept-Encoding')
+            return response
+
+        @self.app.route('/history/<channel>')
+        def get_history(channel):
+            """
+            Endpoint listing the versions available for time travel.
+
+            Returns:
+                JSON: 'versions' (oldest first, each with 'version', 'time',
+                    'title', 'nodes' and 'edges') and the 'current' version
+            """
+            state = self.channels.get(self._channel_or_404(channel))
+            if state is None:
+                return jsonify({'versions': [], 'current': 0})
+            with state.lock:
+                versions = state.history.versions() if state.history is not None else []
+                return jsonify({'versions': versions, 'current': state.version})
+
+        @self.app.route('/history/<channel>/<int:version>')
+        def get_history_version(channel, version):
+            """
+            Endpoint to get an earlier version of a channel's graph.
+
+            Returns:
+                JSON: The graph at that version in Cytoscape.js format, or
+                    404 if the version is no longer in the history
+            """
+            state = self.channels.get(self._channel_or_404(channel))
+            graph = state.snapshot(version) if state is not None else None
+            if graph is None:
+                abort(404)
+            return jsonify(graph)
+
+        @self.app.route('/search')
+        @self.app.route('/search/<channel>')
+        def search(channel=DEFAULT_CHANNEL):
+            """
+            Endpoint to search the elements of a channel's graph.
+
+            Takes the query from the 'q' parameter, e.g.
+            ``/search?q=type:database srv``.
+
+            Returns:
+                JSON: Ids of the matching 'nodes' and 'edges' and the
+                    'version' of the graph that was searched
+            """
+            state = self.channels.get(self._channel_or_404(channel))
+            if state is None:
+                return jsonify({'nodes': [], 'edges': [], 'version': 0})
+            return jsonify(state.search(request.args.get('q', '')))
+
+        @self.app.route('/traces/<channel>/<msg_id>')
+        def get_traces(channel, msg_id):
+            """
+            Endpoint to get the origin paths of a message.
+
+            Takes the version the viewer shows from the optional 'version'
+            parameter, so paths can be traced while browsing the history.
+
+            Returns:
+                JSON: 'paths' as lists of edge ids and the 'version' they
+                    belong to, or 404 if the version is no longer known
+            """
+            state = self.channels.get(self._channel_or_404(channel))
+            version = request.args.get('version', type=int)
+            paths = state.trace_paths(msg_id, version) if state is not None else None
+            if paths is None:
+                abort(404)
+            return jsonify({'paths': paths, 'version': version if version is not None else state.version})
+
+        @self.app.route('/metrics')
+        def metrics():
+            """
+            Endpoint for Prometheus to scrape the server's metrics.
+
+            Returns:
+                Response: Metrics in the Prometheus text exposition format
+            """
+            self._forget_evicted()
+            return Response(self.metrics.render(), content_type=CONTENT_TYPE)
+
+        @self.app.route('/latency')
+        @self.app.route('/latency/<channel>')
+        def get_latency(channel=DEFAULT_CHANNEL):
+            """
+            Endpoint to get the latency of a channel's updates.
+
+            Returns:
+                JSON: p50, p95 and p99 of every stage for the updates, each
+                    viewer of the channel and all of them together
+            """
+            return jsonify(self.latency_summary(self._channel_or_404(channel)))
+
+        @self.app.route('/assets/<filename>')
+        def asset(filename):
+            """
+            Endpoint for the bundled viewer assets.
+
+            File names contain a hash of their content, so responses may
+            be cached forever. Gzip and brotli variants are compressed when
+            the assets are built, not per request.
+
+            Returns:
+                Response: The file in the best encoding the browser accepts
+            """
+            if self.assets is None:
+                abort(404)
+            try:
+                data, encoding, mimetype = self.assets.get(filename, request.accept_encodings)
+            except KeyError:
+                abort(404)
+
+            response = Response(data, mimetype=mimetype)
+            if encoding != 'identity':
+                response.content_encoding = encoding
+            response.cache_control.public = True
+            response.cache_control.max_age = 365 * 24 * 3600
+            response.cache_control.immutable = True
+            response.vary.add('Accept-Encoding')
+            return response
 
         @self.app.route('/favicon.ico')
         def favicon():
@@ -204,13 +691,172 @@ class Server:
             return self.app.send_static_file('favicon/favicon.ico')
 
 
+    @staticmethod
+    def _channel_or_404(channel):
+        """Validate a channel name taken from a URL, aborting with 404."""
+        try:
+            return ChannelStore.validate_name(channel)
+        except ValueError:
+            abort(404)
+
+    def _channel_graph(self, channel):
+        """
+        Current graph of a channel in Cytoscape.js format.
+
+        Channels that do not exist (yet) are reported as an empty graph
+        without creating them, so viewers cannot fill up the store.
+
+        Args:
+            channel (str): Channel name.
+
+        Returns:
+            dict: Snapshot of the channel's graph state.
+        """
+        state = self.channels.get(channel)
+        if state is None:
+            return {'elements': {'nodes': [], 'edges': []},
+                    'title': self.channels.default_title, 'version': 0}
+        graph = state.to_dict()
+        graph['layout_pending'] = self._layout_pending(state)
+        return graph
+
+    def _channel_payload(self, channel, chunked=False):
+        """
+        Serialized current graph of a channel, shared by all viewers.
+
+        Args:
+            channel (str): Channel name.
+            chunked (bool, optional): Send a manifest instead of the
+                elements if the graph has more than chunk_threshold nodes
+                plus edges. Defaults to False.
+
+        Returns:
+            Payload: JSON of the channel's graph, as _channel_graph() builds
+                it, cached until the next update or layout.
+        """
+        state = self.channels.get(channel)
+        restored = self._restored_payload(channel, state)
+        if restored is not None:
+            return restored
+        if state is None:
+            return Payload.from_graph(self._channel_graph(channel))
+        if self._summarized(state):
+            return state.aggregation(self.lod_group_by).payload()
+        manifest = chunked and bool(self.chunk_threshold) and state.size > self.chunk_threshold
+        return state.payload(manifest=manifest, layout_pending=self._layout_pending(state))
+
+    def _restored_payload(self, channel, state):
+        """
+        Archived payload of a channel that is still being restored.
+
+        Args:
+            channel (str): Channel name.
+            state (GraphState): The channel's state, or None.
+
+        Returns:
+            Payload: The payload read from disk, or None if the channel is
+                not waiting for its archived version.
+        """
+        archived = self._restoring.get(channel)
+        if archived is None or (state is not None and state.version):
+            return None
+        payload = self._restored_payloads.get(channel)
+        if payload is None:
+            try:
+                payload = self._restored_payloads[channel] = archived.payload()
+            except ArchiveError as e:
+                log.error(f"Cannot serve archived version of channel {channel!r}: {e}")
+                return None
+        return payload
+
+    def _versioned_payload(self, channel):
+        """
+        Viewer payload of a channel together with the version it shows.
+
+        Args:
+            channel (str): Channel name.
+
+        Returns:
+            tuple: ``(payload, version)`` as _channel_payload(channel,
+                chunked=True) returns it; version is 0 for channels that do
+                not exist.
+        """
+        while True:
+            state = self.channels.get(channel)
+            if state is None:
+                return self._channel_payload(channel, chunked=True), 0
+            version = state.version
+            payload = self._channel_payload(channel, chunked=True)
+            # Retry if an update arrived while the payload was built
+            if state.version == version:
+                return payload, version
+
+    def _full_state(self, channel):
+        """
+        Complete graph of a channel for viewers that cannot be patched.
+
+        Args:
+            channel (str): Channel name.
+
+        Returns:
+            tuple: ``(data, version)`` for a 'graph_update' event, or None if
+                the channel is gone or its viewers get summaries instead.
+        """
+        state = self.channels.get(channel)
+        if state is None or self._summarized(state):
+            return None
+        payload, version = self._versioned_payload(channel)
+        return payload.body, version
+
+    def _send_to_viewer(self, event, data, viewer):
+        """
+        Emit an update to a single viewer, see schnauzer.broadcast.
+
+        Args:
+            event (str): 'graph_update' or 'graph_patch'.
+            data: Event data.
+            viewer (str): Socket.IO session id.
+        """
+        self._emit(event, data, to=viewer)
+
+    def _summarized(self, state):
+        """Whether viewers get the state's graph as clusters."""
+        return bool(self.lod_threshold) and len(state.nodes) > self.lod_threshold
+
+    def _layout_pending(self, state):
+        """Whether server-side positions for the state's version are still coming."""
+        return (self.layout_engine is not None and self.layout_engine.accepts(state)
+                and state.layout_version != state.version)
+
+    def _schedule_layout(self, channel, state):
+        """
+        Request a server-side layout of a channel's current graph.
+
+        Args:
+            channel (str): Channel name.
+            state (GraphState): The channel's state.
+        """
+        if self.layout_engine is None or not self.layout_engine.accepts(state):
+            return
+
+        def done(version, positions):
+            # The channel may have been evicted while the layout ran
+            if self.channels.get(channel) is state and state.set_positions(version, positions):
+                self._on_graph_layout(channel, version, positions)
+                self._archive(channel)
+
+        self.layout_engine.submit(channel, state, done)
+
     def _setup_socketio_handlers(self):
         """
         Set up SocketIO event handlers for real-time updates.
 
         Configures WebSocket event handlers for:
-        - connect: Send current graph to newly connected clients
-        - disconnect: Log client disconnection
+        - connect: Join the room of the requested channel (query parameter
+          'channel') and send its current graph
+        - disconnect: Leave the channel
+        - the requests in _viewer_requests(), whose return value is
+          delivered to the viewer's acknowledgement callback
 
         These handlers enable real-time graph updates without page refresh.
 
@@ -221,30 +867,277 @@ class Server:
 
         @self.socketio.on('connect')
         def handle_connect():
-            # Send current graph data to new client
-            log.info('Web client connected')
-            emit('graph_update', self.current_graph)
+            try:
+                channel = ChannelStore.validate_name(request.args.get('channel'))
+            except ValueError:
+                log.warning('Rejected web client with invalid channel name')
+                return False
+
+            # Updates are only sent to the room of the viewed channel
+            join_room(channel)
+            payload, version = self._viewer_connected(request.sid, channel)
+            # Pre-serialized JSON, so connect storms cost no serialization
+            emit('graph_update', payload.body)
+            self.broadcaster.add_viewer(request.sid, channel, version)
 
         @self.socketio.on('disconnect')
-        def handle_disconnect():
-            log.info('Web client disconnected')
+        def handle_disconnect(*args):
+            self._viewer_disconnected(request.sid)
 
+        for event, handler in self._viewer_requests().items():
+            self.socketio.on_event(event, self._bind_request(handler))
 
-    def _on_graph_update(self):
+    @staticmethod
+    def _bind_request(handler):
+        """Adapt a viewer request handler to Flask-SocketIO, which passes the sid in the request context."""
+        def handle(request_data=None, *args):
+            return handler(request.sid, request_data)
+        return handle
+
+    def _viewer_requests(self):
+        """
+        Requests viewers send over Socket.IO.
+
+        Each handler is called with the viewer's session id and the request
+        data, and returns the reply for the viewer's acknowledgement
+        callback:
+
+        - history_seek: Return an earlier version of the viewer's channel
+        - history_step: Return the patches between two versions
+        - lod_expand: Return the contents of a cluster of a summarized graph
+        - graph_chunk: Return a slice of the nodes or edges of a large graph
+        - clock_sync: Return the server time, so viewers can convert theirs
+        - latency_report: Record when a viewer received, rendered and laid
+          out an update
+        - graph_ack: Record that a viewer has drawn a version, so it is
+          sent the next one
+
+        Returns:
+            dict: Mapping of event name to handler.
+        """
+        return {
+            'history_seek': self._history_seek,
+            'history_step': self._history_step,
+            'lod_expand': self._lod_expand,
+            'graph_chunk': self._graph_chunk,
+            'clock_sync': self._clock_sync,
+            'latency_report': self._latency_report,
+            'graph_ack': self._graph_ack,
+        }
+
+    def _viewer_connected(self, sid, channel):
+        """
+        Register a viewer that joined the room of a channel.
+
+        Args:
+            sid (str): Socket.IO session id of the viewer.
+            channel (str): Validated channel name.
+
+        Returns:
+            tuple: ``(payload, version)`` of the graph to send the viewer
+                first, see _versioned_payload(). Register the viewer with
+                the broadcaster once it is sent.
+        """
+        self.channels.subscribe(channel)
+        self._viewer_channels[sid] = channel
+        log.info(f'Web client connected to channel {channel!r}')
+        return self._versioned_payload(channel)
+
+    def _viewer_disconnected(self, sid):
+        """
+        Forget a viewer that disconnected.
+
+        Args:
+            sid (str): Socket.IO session id of the viewer.
+        """
+        channel = self._viewer_channels.pop(sid, None)
+        if channel is not None:
+            self.channels.unsubscribe(channel)
+        self.latency.forget(viewer=sid)
+        self.broadcaster.remove_viewer(sid)
+        log.info('Web client disconnected')
+
+    def _history_seek(self, sid, request_data):
+        """Snapshot of an earlier version of the viewer's channel."""
+        state = self._viewer_state(sid)
+        graph = state.snapshot((request_data or {}).get('version')) if state is not None else None
+        return graph if graph is not None else {'error': 'Version not available'}
+
+    def _history_step(self, sid, request_data):
+        """Patches between two versions of the viewer's channel."""
+        request_data = request_data or {}
+        state = self._viewer_state(sid)
+        patches = state.history_patches(request_data.get('from'), request_data.get('to')) \
+            if state is not None else None
+        return {'patches': patches} if patches is not None else {'error': 'Version not available'}
+
+    def _lod_expand(self, sid, request_data):
+        """Contents of a cluster of a summarized graph."""
+        request_data = request_data or {}
+        state = self._viewer_state(sid)
+        if state is None or not self._summarized(state):
+            return {'error': 'Graph is not summarized'}
+        aggregation = state.aggregation(self.lod_group_by)
+        if aggregation.version != request_data.get('version'):
+            return {'error': 'Graph changed'}
+        contents = aggregation.expand(request_data.get('cluster'), request_data.get('expanded') or [])
+        return contents if contents is not None else {'error': 'Unknown cluster'}
+
+    def _graph_chunk(self, sid, request_data):
+        """Slice of the nodes or edges of a large graph."""
+        request_data = request_data or {}
+        state = self._viewer_state(sid)
+        try:
+            offset = max(int(request_data.get('offset', 0)), 0)
+            count = min(max(int(request_data.get('count', MAX_CHUNK_SIZE)), 1), MAX_CHUNK_SIZE)
+        except (TypeError, ValueError):
+            return {'error': 'Invalid chunk request'}
+        elements = state.chunk(request_data.get('version'), request_data.get('group'), offset, count) \
+            if state is not None else None
+        return {'elements': elements} if elements is not None else {'error': 'Graph changed'}
+
+    @staticmethod
+    def _clock_sync(sid, request_data):
+        """Server time, for viewers to measure their clock offset."""
+        return {'time': time.time()}
+
+    def _latency_report(self, sid, request_data):
+        """Record the viewer side stamps of an update."""
+        request_data = request_data or {}
+        channel = self._viewer_channels.get(sid)
+        stamps = {}
+        for name in ('received', 'rendered', 'laid_out'):
+            value = request_data.get(name)
+            if value is not None:
+                if not isinstance(value, (int, float)) or isinstance(value, bool):
+                    return {'error': 'Invalid latency report'}
+                stamps[name] = float(value)
+        version = request_data.get('version')
+        if channel is None or not isinstance(version, int):
+            return {'error': 'Invalid latency report'}
+        self.latency.report(sid, channel, version, **stamps)
+
+    def _graph_ack(self, sid, request_data):
+        """Record that a viewer has drawn a version."""
+        version = (request_data or {}).get('version')
+        if isinstance(version, int) and not isinstance(version, bool):
+            self.broadcaster.acknowledge(sid, version)
+
+    def _viewer_state(self, sid):
+        """State of the channel a Socket.IO client is viewing, or None."""
+        channel = self._viewer_channels.get(sid)
+        return self.channels.get(channel) if channel is not None else None
+
+    def _on_graph_update(self, channel=DEFAULT_CHANNEL):
         """
         Callback for when the graph is updated from a backend client.
 
-        Broadcasts the new graph data to all connected web clients using
-        SocketIO. This ensures all viewers see updates in real-time.
+        Hands the new version to the broadcaster, which sends the graph to
+        the web clients viewing the channel as soon as each of them is
+        ready for it.
+
+        Args:
+            channel (str, optional): Channel that was updated.
 
         Note:
             This method is called internally when new graph data is
             received on the ZeroMQ socket.
         """
-        self.socketio.emit('graph_update', self.current_graph)
-        log.info('Sent graph update to web clients')
+        state = self.channels.get(channel)
+        if state is not None and self._summarized(state):
+            self._emit_summary(channel)
+            return
+        if state is None:
+            return
+        version = state.version
+        self.broadcaster.notify(channel, version)
+        self.latency.stamp(channel, version, emitted=time.time())
+        log.info(f'Scheduled graph update to version {version} for web clients of channel {channel!r}')
+
+    def _emit_summary(self, channel):
+        """
+        Send the cluster summary of a channel's graph to its viewers.
+
+        Finding the clusters of a large graph takes a while, so it runs in
+        a background task instead of delaying the client's acknowledgement.
+        One task per channel at a time; it repeats until it has sent the
+        latest version.
+
+        Args:
+            channel (str): Channel that was updated.
+        """
+        with self._summaries_lock:
+            if channel in self._summaries_pending:
+                # The running task picks up the new version
+                self._coalesced.inc(kind='summary')
+                return
+            self._summaries_pending.add(channel)
+
+        def send():
+            try:
+                while True:
+                    state = self.channels.get(channel)
+                    if state is None or not self._summarized(state):
+                        return
+                    aggregation = state.aggregation(self.lod_group_by)
+                    payload = aggregation.payload()
+                    self._emit('graph_update', payload.body, to=channel, label='graph_summary')
+                    self.latency.stamp(channel, aggregation.version, emitted=time.time())
+                    log.info(f'Sent graph summary of version {aggregation.version} '
+                             f'to web clients of channel {channel!r}')
+                    with self._summaries_lock:
+                        if state.version == aggregation.version:
+                            self._summaries_pending.discard(channel)
+                            return
+            except Exception as e:
+                log.error(f"Error summarizing channel {channel!r}: {e}")
+                with self._summaries_lock:
+                    self._summaries_pending.discard(channel)
+
+        self._background(send)
+
+    def _on_graph_patch(self, patch, version, channel=DEFAULT_CHANNEL):
+        """
+        Callback for when a patch was applied to the graph.
+
+        Hands only the changed elements to the broadcaster. Viewers that
+        missed earlier patches get them composed into one, or the full
+        graph if those are no longer known.
+
+        Args:
+            patch (dict): The applied patch message.
+            version (int): The graph version after applying the patch.
+            channel (str, optional): Channel the patch was applied to.
+        """
+        state = self.channels.get(channel)
+        if state is not None and self._summarized(state):
+            # Viewers of a summary cannot apply element patches
+            self._emit_summary(channel)
+            return
+        self.broadcaster.notify(channel, version, {
+            'base_version': patch['base_version'],
+            'version': version,
+            'title': state.title if state else patch.get('title'),
+            'delta': patch.get('delta') or {},
+            'layout_pending': state is not None and self._layout_pending(state),
+            **({'trace_count': len(patch['traces'] or {})} if 'traces' in patch else {})
+        })
+        self.latency.stamp(channel, version, emitted=time.time())
+        log.info(f'Scheduled graph patch for version {version} for web clients of channel {channel!r}')
+
+    def _on_graph_layout(self, channel, version, positions):
+        """
+        Callback for when the server-side layout of a graph is ready.
+
+        Args:
+            channel (str): Channel that was laid out.
+            version (int): Graph version the positions were computed for.
+            positions (dict): Mapping of node id to ``{'x': ..., 'y': ...}``.
+        """
+        self._emit('graph_layout', {'version': version, 'positions': positions}, to=channel)
+        log.info(f'Sent layout for version {version} to web clients of channel {channel!r}')
 
-    def start(self):
+    def start(self, background=False):
         """
         Start both the backend and web servers.
 
@@ -252,30 +1145,49 @@ class Server:
         and then starts the Flask web server in the main thread. The method
         blocks until the web server is stopped.
 
+        With background=True the web server runs in a thread as well and
+        start() returns as soon as both ports accept connections, e.g. to
+        embed the server in a notebook or test and feed it with publish()
+        or client(). A web_port or backend_port of 0 picks a free port,
+        which is stored in the attribute once the server started.
+
         The web interface becomes accessible at http://localhost:{web_port}/
         and clients can send data to the backend port.
 
+        Args:
+            background (bool, optional): Return instead of serving in the
+                calling thread. Defaults to False.
+
         Note:
-            This method blocks the calling thread. To stop the server,
-            use Ctrl+C or call stop() from another thread.
+            Without background, this method blocks the calling thread. To
+            stop the server, use Ctrl+C or call stop() from another thread.
+            Calling start() on a running server does nothing.
 
         Examples:
             >>> server = Server()
             >>> server.start()  # Blocks here
             Starting visualization server at http://localhost:8080/
             Backend listener running on port 8086
+
+            >>> server = Server(web_port=0, backend_port=0)
+            >>> server.start(background=True)
+            >>> server.publish(nx.path_graph(3))
         """
         if self.running:
             return
 
-        # Start the backend server
-        self.running = True
-        self.context = zmq.Context()
-
-        # Start the server thread
-        self.server_thread = threading.Thread(target=self._run_backend_server)
-        self.server_thread.daemon = True
-        self.server_thread.start()
+        # Start the backend server thread
+        self._start_backend()
+
+        if background:
+            self._web_server = make_server('0.0.0.0', self.web_port, self.app, threaded=True)
+            self.web_port = self._web_server.port
+            self._web_thread = threading.Thread(target=self._web_server.serve_forever, name='schnauzer-web',
+                                                daemon=True)
+            self._web_thread.start()
+            log.info(f"Serving http://localhost:{self.web_port}/ and backend port {self.backend_port} "
+                     f"in the background")
+            return
 
         # Start the web server in the main thread
         print("="*50)
@@ -294,6 +1206,76 @@ class Server:
         )
 
 
+    def _start_backend(self):
+        """
+        Start the ZeroMQ backend listener in a background thread.
+
+        Note:
+            Called by start(). Does nothing if the backend is already running.
+        """
+        if self.running:
+            return
+
+        self.running = True
+        self._start_archive()
+        self.context = zmq.Context()
+        self._control_address = f"inproc://schnauzer-control-{id(self)}"
+
+        # Bind the backend sockets before returning, so clients and stop()
+        # can connect immediately
+        self.socket = self.context.socket(zmq.ROUTER)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        if self.backend_port == 0:
+            self.backend_port = self.socket.bind_to_random_port('tcp://*')
+        else:
+            self.socket.bind(f"tcp://*:{self.backend_port}")
+        self.socket.bind(self.inproc_endpoint)
+        self._open_local_transport()
+        self._control = self.context.socket(zmq.PAIR)
+        self._control.bind(self._control_address)
+        self._backend_handlers = self._open_backend_sockets()
+
+        self.server_thread = threading.Thread(target=self._run_backend_server)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+        self.broadcaster.start()
+
+    def _open_local_transport(self):
+        """
+        Offer local clients the shared-memory transfer, if enabled.
+
+        Creates the probe segment announced in the HELLO reply and binds
+        the backend socket to an ipc:// endpoint as well.
+        """
+        if not self.shared_memory:
+            return
+        try:
+            self._local = LocalTransport()
+        except OSError as e:
+            log.warning(f"Shared memory is not available, local clients will use TCP: {e}")
+            return
+        self._local.bind(self.socket)
+
+    def _close_local_transport(self):
+        """Unlink the probe segment once the backend socket is closed."""
+        if self._local is not None:
+            self._local.close()
+            self._local = None
+
+    def _open_backend_sockets(self):
+        """
+        Open additional sockets served by the backend thread.
+
+        Called by _start_backend() once the ZeroMQ context exists. The
+        sockets are only used by the backend thread, which closes them
+        when it stops.
+
+        Returns:
+            dict: Mapping of socket to a function without arguments that
+                the backend thread calls whenever the socket is readable.
+        """
+        return {}
+
     def _run_backend_server(self):
         """
         Run the backend ZeroMQ server in a background thread.
@@ -301,76 +1283,444 @@ class Server:
         This method listens for incoming graph data on the ZeroMQ socket
         and updates the graph when new data is received. It handles:
         - Connection handshakes ("HELLO" messages)
-        - Graph data updates (JSON formatted Cytoscape.js data)
+        - Graph data updates (JSON or columnar Cytoscape.js data)
+        - Incremental patches against the current graph version
         - Error recovery for malformed messages
 
-        The server uses a REQ-REP pattern, so it always sends a response
-        for each received message to maintain socket synchronization.
+        The server uses a ROUTER socket, so any number of REQ or DEALER
+        clients can talk to it at the same time. Every reply is routed back
+        to the client that sent the request. The loop blocks in
+        zmq.Poller until either a client message or a stop command on the
+        control socket arrives, so it neither sleeps nor spins while idle.
+        If channels have an idle timeout, the poll wakes up periodically to
+        evict idle channels.
 
         Note:
             This method runs in a separate thread and continues until
-            self.running is set to False. It includes error handling to
-            prevent the thread from crashing on bad input.
+            stop() is called. It includes error handling to prevent the
+            thread from crashing on bad input.
         """
-        # Create a ZeroMQ REP socket
-        self.socket = self.context.socket(zmq.REP)
-        self.socket.bind(f"tcp://*:{self.backend_port}")
+        poller = zmq.Poller()
+        poller.register(self.socket, zmq.POLLIN)
+        poller.register(self._control, zmq.POLLIN)
+        for extra in self._backend_handlers:
+            poller.register(extra, zmq.POLLIN)
+
+        idle_timeout = self.channels.idle_timeout
+        eviction_interval = None if idle_timeout is None else min(idle_timeout / 4, 60)
+        next_eviction = None if idle_timeout is None else time.monotonic() + eviction_interval
 
         while self.running:
             try:
-                # Wait for next request from client (non-blocking when running)
-                message = self.socket.recv_string(flags=zmq.NOBLOCK if self.running else 0)
+                timeout = None
+                if next_eviction is not None:
+                    timeout = max(0, int((next_eviction - time.monotonic()) * 1000))
+
+                events = dict(poller.poll(timeout))
+
+                if next_eviction is not None and time.monotonic() >= next_eviction:
+                    self.channels.evict_idle()
+                    next_eviction = time.monotonic() + eviction_interval
+
+                if self._control in events:
+                    self._control.recv()
+                    break
+
+                for extra, handler in self._backend_handlers.items():
+                    if extra in events:
+                        handler()
+
+                # Drain everything that arrived while we were busy
+                pending = deque()
+                while True:
+                    try:
+                        frames = self.socket.recv_multipart(flags=zmq.NOBLOCK)
+                    except zmq.error.Again:
+                        break
+                    pending.append((time.time(), frames))
+
+                while pending:
+                    self._backend_queue = len(pending)
+                    received, frames = pending.popleft()
+                    envelope, payload = self._split_envelope(frames)
+                    reply = self._handle_message(payload, received)
+                    self.socket.send_multipart(envelope + [reply.encode('utf-8')])
+                self._backend_queue = 0
+
+            except zmq.error.ContextTerminated:
+                break
 
-                # Simple handshake for connection testing
-                if message == "HELLO":
-                    self.socket.send_string("Connected to visualization server")
-                    continue
+            except Exception as e:
+                log.error(f"Error in server loop: {e}")
+
+        # Cleanup when stopping
+        for extra in self._backend_handlers:
+            extra.close()
+        self._backend_handlers = {}
+        self.socket.close()
+        self._control.close()
+        self.socket = None
+        self._control = None
+        print("Backend listener stopped")
+
+    @staticmethod
+    def _split_envelope(frames):
+        """
+        Split a ROUTER message into its routing envelope and payload.
+
+        Args:
+            frames (list): Frames as received on the ROUTER socket. REQ
+                and DEALER clients of this package separate the routing
+                identity from the payload with an empty delimiter frame.
+
+        Returns:
+            tuple: ``(envelope, payload)`` - the frames to prepend to the
+                reply (including the delimiter) and the message frames.
+        """
+        for index, frame in enumerate(frames[1:], start=1):
+            if not frame:
+                return frames[:index + 1], frames[index + 1:]
 
-                try:
+        # Raw DEALER client without a delimiter
+        return frames[:1], frames[1:]
+
+    def _handle_message(self, frames, received=None):
+        """
+        Process one message received on the backend socket.
+
+        Args:
+            frames (list): Payload frames of the received message. Single
+                frame messages are either a HELLO handshake, a JSON
+                encoded graph or a descriptor of a columnar message in
+                shared memory, multipart messages use the columnar format
+                from schnauzer.wire. The optional 'channel' key selects
+                the graph to update; the channel is created on first use.
+                Messages of type 'events' carry a batch of mutations
+                from a schnauzer.stream.GraphStream. JSON messages of type
+                'latency' request the latency summary of a channel instead.
+            received (float, optional): When the message was read from the
+                socket. Defaults to now.
+
+        Returns:
+            str: The reply to send back to the client.
+        """
+        received = received if received is not None else time.time()
+        try:
+            if is_shared(frames):
+                # The segment is closed again before the client gets the reply
+                with read_frames(frames[0]) as shared:
+                    return self._handle_message(shared, received)
+
+            if is_columnar(frames):
+                with self._decode_seconds.time(encoding='columnar'):
+                    message_data = decode_message(frames)
+            else:
+                message = frames[0].decode('utf-8')
+
+                # Handshake announcing the supported protocol features
+                if message == HELLO:
+                    from schnauzer import __version__
+                    return hello_reply(__version__, local=self._local.describe() if self._local else None)
+
+                with self._decode_seconds.time(encoding='json'):
                     message_data = json.loads(message)
 
-                    # Handle the new format - cytoscape data is sent directly
-                    self.current_graph = message_data
+            decoded = time.time()
+            if message_data.get('type') == 'latency':
+                channel = ChannelStore.validate_name(message_data.get('channel'))
+                return json.dumps({'status': 'ok', 'latency': self.latency_summary(channel)})
+
+            version = self._ingest(message_data, sum(len(frame) for frame in frames), received, decoded)
+            if version is None:
+                # Patch for an evicted channel, the client has to start over
+                log.info(f"Requesting resync for unknown channel {message_data.get('channel')!r}")
+                self._rejected.inc(reason='resync')
+                return json.dumps({'status': 'resync', 'version': 0})
+
+            # Acknowledge with the new version
+            return json.dumps({'status': 'ok', 'version': version})
+
+        except VersionMismatch as e:
+            log.info(f"Requesting resync: {e}")
+            self._rejected.inc(reason='resync')
+            return json.dumps({'status': 'resync', 'version': e.actual})
+
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            log.error(f"Invalid JSON received: {e}")
+            self._rejected.inc(reason='invalid')
+            return json.dumps({'status': 'error', 'error': 'Invalid JSON'})
+
+        except WireFormatError as e:
+            log.error(f"Invalid columnar message received: {e}")
+            self._rejected.inc(reason='invalid')
+            return json.dumps({'status': 'error', 'error': f'Invalid message: {e}'})
+
+        except SegmentError as e:
+            log.error(f"Invalid shared-memory message received: {e}")
+            self._rejected.inc(reason='invalid')
+            return json.dumps({'status': 'error', 'error': str(e)})
+
+        except CapacityExceeded as e:
+            log.warning(f"Rejected update: {e}")
+            self._rejected.inc(reason='capacity')
+            return json.dumps({'status': 'error', 'error': str(e)})
+
+        except EventError as e:
+            log.error(f"Invalid events received: {e}")
+            self._rejected.inc(reason='invalid')
+            return json.dumps({'status': 'error', 'error': f'Invalid events: {e}'})
+
+        except TraceError as e:
+            log.error(f"Invalid traces received: {e}")
+            self._rejected.inc(reason='invalid')
+            return json.dumps({'status': 'error', 'error': f'Invalid traces: {e}'})
+
+        except KeyError as e:
+            log.error(f"Missing expected key in message: {e}")
+            self._rejected.inc(reason='invalid')
+            return json.dumps({'status': 'error', 'error': f'Missing key {e}'})
+
+        except Exception as e:
+            log.error(f"Error processing message: {e}")
+            self._rejected.inc(reason='error')
+            return json.dumps({'status': 'error', 'error': str(e)})
+
+    def _ingest(self, message_data, size, received, decoded):
+        """
+        Apply a decoded update to its channel and hand it to the viewers.
+
+        Updates are applied one at a time, whether they come from the
+        backend socket or from publish().
+
+        Args:
+            message_data (dict): A 'full', 'patch' or 'events' message.
+            size (int): Encoded size of the message in bytes, 0 for graphs
+                handed over in this process.
+            received (float): When the message arrived.
+            decoded (float): When the message was decoded.
+
+        Returns:
+            int: The channel's new version, or None for a patch to a channel
+                that does not exist (anymore).
+
+        Raises:
+            ValueError: If the channel name is invalid.
+            VersionMismatch: If a patch does not apply to the current version.
+            CapacityExceeded: If the channel or graph limits are exceeded.
+            EventError: If an events message is malformed.
+            TraceError: If the message carries malformed traces.
+        """
+        channel = ChannelStore.validate_name(message_data.get('channel'))
+        kind = message_data.get('type') if message_data.get('type') in ('patch', 'events') else 'full'
+        self._messages.inc(channel=channel, type=kind)
+        if size:
+            self._message_bytes.inc(size, channel=channel)
+
+        with self._ingest_lock:
+            state = self.channels.get(channel, create=kind != 'patch')
+            if state is None:
+                return None
+
+            if kind == 'patch':
+                version = state.apply_patch(message_data)
+                self._stamp_update(channel, version, message_data, received, decoded)
+                self._on_graph_patch(message_data, version, channel)
+            elif kind == 'events':
+                version, patch = state.apply_events(message_data)
+                if patch is None:
+                    # Nothing changed, so there is nothing to broadcast or lay out
+                    return version
+                self._stamp_update(channel, version, message_data, received, decoded)
+                self._on_graph_patch(patch, version, channel)
+            else:
+                # Full graph, cytoscape data is sent directly
+                version = state.replace(message_data)
+                self._stamp_update(channel, version, message_data, received, decoded)
+                self._on_graph_update(channel)
+
+            # After broadcasting, so viewers never get positions ahead of the graph
+            self._schedule_layout(channel, state)
+        self._archive(channel)
+        return version
+
+    def _archive(self, channel):
+        """Have the archive write the channel's current version, if persisting."""
+        if self.archive is not None:
+            self.archive.save(channel, lambda: self._archive_snapshot(channel))
+
+    def _archive_snapshot(self, channel):
+        """
+        Everything the archive writes for the current version of a channel.
+
+        Called by the archive's writer thread.
 
-                    # Ensure we have a title
-                    if 'title' not in self.current_graph:
-                        self.current_graph['title'] = 'NetworkX Graph Visualization'
+        Args:
+            channel (str): Channel name.
 
-                    # Broadcast the update to web clients
-                    self._on_graph_update()
+        Returns:
+            tuple: ``(graph, payload)`` - GraphState.export() and the
+                /graph-data payload of the same version, or None if the
+                channel is gone or empty.
+        """
+        while True:
+            state = self.channels.get(channel)
+            if state is None or not state.version:
+                return None
+            version, layout_version = state.version, state.layout_version
+            payload = self._channel_payload(channel)
+            graph = state.export()
+            # Retry if an update or layout arrived meanwhile
+            if graph['version'] == version and graph['layout_version'] == layout_version:
+                return graph, payload
+
+    def _restore_archived(self):
+        """
+        Restore the channels found in the archive, in a background thread.
 
-                    # Send acknowledgement
-                    self.socket.send_string("Update received")
+        Channels a producer updated in the meantime keep the newer graph.
+        """
+        for channel, archived in list(self._restoring.items()):
+            if not self.running:
+                return
+            try:
+                started = time.monotonic()
+                graph = archived.graph()
+                positions = graph.pop('positions', None)
+                layout_version = graph.pop('layout_version', 0)
+                with self._ingest_lock:
+                    state = self.channels.get(channel)
+                    if state is None or not state.version:
+                        state = self.channels.get(channel, create=True)
+                        state.replace(graph, version=archived.version)
+                        if positions:
+                            state.set_positions(layout_version, positions)
+                        self._restoring.pop(channel, None)
+                        self._on_graph_update(channel)
+                        if not positions:
+                            self._schedule_layout(channel, state)
+                        log.info(f"Restored version {archived.version} of channel {channel!r} "
+                                 f"in {time.monotonic() - started:.3f} s")
+            except (ArchiveError, CapacityExceeded, TraceError) as e:
+                log.error(f"Cannot restore channel {channel!r} from the archive: {e}")
+            finally:
+                self._restoring.pop(channel, None)
+                self._restored_payloads.pop(channel, None)
+
+    def _start_archive(self):
+        """Start writing versions to disk and restoring the archived ones."""
+        if self.archive is None:
+            return
+        self.archive.start()
+        if self._restoring:
+            threading.Thread(target=self._restore_archived, name='schnauzer-restore', daemon=True).start()
 
-                except json.JSONDecodeError as e:
-                    log.error(f"Invalid JSON received: {e}")
-                    # Send error response to keep socket in sync
-                    self.socket.send_string("Error: Invalid JSON")
+    def publish(self, graph, title=None, traces=None, node_attrs=None, edge_attrs=None, channel=None):
+        """
+        Show a graph without a client, for servers embedded in the producer.
 
-                except KeyError as e:
-                    log.error(f"Missing expected key in message: {e}")
-                    # Send error response to keep socket in sync
-                    self.socket.send_string(f"Error: Missing key {e}")
+        The graph is converted into elements and handed straight to the
+        channel's state: nothing is serialized and no socket is involved.
+        Viewers are updated exactly as for a graph sent by a client. Works
+        whether or not the server was started.
 
-                except Exception as e:
-                    log.error(f"Error processing message: {e}")
-                    # Send error response to keep socket in sync
-                    self.socket.send_string(f"Error: {e}")
+        Args:
+            graph (networkx.Graph or dict): Graph to show, or elements that
+                were already converted, in the format of
+                ``nx.cytoscape_data`` (with or without the 'elements' level).
+            title (str, optional): Title to display above the graph.
+            traces (dict, optional): Trace data for edge origin tracking.
+            node_attrs (iterable, optional): Node attribute keys to show.
+                Defaults to None, which shows all attributes.
+            edge_attrs (iterable, optional): Edge attribute keys to show.
+                Defaults to None, which shows all attributes.
+            channel (str, optional): Channel to update. Defaults to None,
+                the default channel.
 
-            except zmq.error.Again:
-                # No message available, sleep briefly to prevent CPU hogging
-                time.sleep(0.1)
-                continue
+        Returns:
+            int: The channel's new version.
 
-            except Exception as e:
-                log.error(f"Error in server loop: {e}")
-                time.sleep(0.1)  # Wait a bit before continuing
+        Raises:
+            ValueError: If channel is not a valid channel name.
+            CapacityExceeded: If the channel or graph limits are exceeded.
+            TraceError: If traces are malformed.
 
-        # Cleanup when stopping
-        if self.socket:
-            self.socket.close()
-        print("Backend listener stopped")
+        Note:
+            Attribute values are not copied. Values must be JSON
+            serializable, as with VisualizationClient.send_graph(), and
+            should not be modified in place after publishing. Edge data of
+            converted elements get their derived 'id' written into them.
 
+        Examples:
+            >>> server = Server(web_port=0)
+            >>> server.start(background=True)
+            >>> server.publish(nx.karate_club_graph(), title="Club")
+        """
+        received = time.time()
+        message_data = {'type': 'full', 'title': title or 'NetworkX Graph Visualization with Cytoscape',
+                        'produced_at': received}
+        if isinstance(graph, dict):
+            message_data['elements'] = graph.get('elements', graph)
+            message_data.update({key: bool(graph[key]) for key in ('directed', 'multigraph') if key in graph})
+        else:
+            message_data['elements'] = {
+                'nodes': [{'data': data} for data in node_data(graph, node_attrs)],
+                'edges': [{'data': data} for data in edge_data(graph, edge_attrs)],
+            }
+            message_data.update(directed=graph.is_directed(), multigraph=graph.is_multigraph())
+        if traces:
+            message_data['traces'] = traces
+        if channel is not None:
+            message_data['channel'] = channel
+        return self._ingest(message_data, 0, received, time.time())
+
+    def client(self, **kwargs):
+        """
+        Create a client connected to this server over inproc://.
+
+        The client talks the regular backend protocol, so code written for
+        a remote server runs unchanged, but its messages never leave the
+        process. The server must have been started; clients created here
+        are disconnected by stop().
+
+        Args:
+            **kwargs: Keyword arguments of VisualizationClient, e.g.
+                delta or blocking.
+
+        Returns:
+            VisualizationClient: Client sharing this server's ZeroMQ context.
+
+        Raises:
+            RuntimeError: If the server is not running.
+        """
+        if not self.running or self.context is None:
+            raise RuntimeError("Start the server before creating an in-process client")
+        kwargs.setdefault('shared_memory', False)
+        client = VisualizationClient(endpoint=self.inproc_endpoint, context=zmq.Context.shadow(self.context.underlying),
+                                     **kwargs)
+        self._clients.add(client)
+        return client
+
+    def _stamp_update(self, channel, version, message_data, received, decoded):
+        """
+        Record the stamps of an update up to its broadcast.
+
+        The broadcast itself is stamped where it happens, which for
+        summarized graphs is a background task.
+
+        Args:
+            channel (str): Channel of the update.
+            version (int): Version the update produced.
+            message_data (dict): The message, with the client's optional
+                'produced_at' and 'sent_at' stamps.
+            received (float): When the backend read the message.
+            decoded (float): When the message was decoded.
+        """
+        stamps = {}
+        for name in ('produced', 'sent'):
+            value = message_data.get(f'{name}_at')
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                stamps[name] = float(value)
+        self.latency.stamp(channel, version, received=received, decoded=decoded, **stamps)
 
     def stop(self):
         """
@@ -378,24 +1728,54 @@ class Server:
 
         This method safely stops the ZeroMQ server thread and cleans up
         resources. It:
-        1. Sets the running flag to False to stop the backend thread
-        2. Closes the ZeroMQ socket
-        3. Terminates the ZeroMQ context
+        1. Stops the web server if it runs in the background and
+           disconnects the clients created with client()
+        2. Sends a stop command over the control socket, which wakes the
+           backend thread immediately
+        3. Waits for the backend thread to close its sockets
+        4. Terminates the ZeroMQ context
+        5. Stops the broadcaster
+        6. Writes the versions still pending to disk, if persisting
 
         Note:
-            Safe to call multiple times. The web server typically needs
-            to be stopped with Ctrl+C as it runs in the main thread.
+            Safe to call multiple times. A web server started without
+            background typically needs to be stopped with Ctrl+C as it runs
+            in the main thread.
         """
+        if not self.running:
+            return
         self.running = False
-        time.sleep(0.2)  # Give the thread time to exit gracefully
 
-        if self.socket:
-            self.socket.close()
-            self.socket = None
+        if self._web_server is not None:
+            self._web_server.shutdown()
+            self._web_thread.join()
+            self._web_server.server_close()
+            self._web_server = None
+            self._web_thread = None
+
+        # Their sockets would keep the context from terminating
+        for client in list(self._clients):
+            client.disconnect()
+
+        if self.server_thread and self.server_thread.is_alive():
+            control = self.context.socket(zmq.PAIR)
+            control.setsockopt(zmq.LINGER, 0)
+            control.connect(self._control_address)
+            control.send(b'STOP')
+            control.close()
+            self.server_thread.join()
+        self.server_thread = None
+        self._close_local_transport()
 
         if self.context:
             self.context.term()
             self.context = None
+        self.broadcaster.stop()
+        if self.archive is not None:
+            self.archive.stop()
+
+        if self.layout_engine is not None:
+            self.layout_engine.shutdown()
 
 
 def main():
@@ -409,6 +1789,24 @@ def main():
     Command-line arguments:
         --port: Web server port (default: 8080)
         --backend-port: Backend listener port (default: 8086)
+        --max-channels: Maximum number of graph channels (default: 64)
+        --channel-max-elements: Per-channel node plus edge limit
+        --channel-idle-timeout: Idle channel eviction in seconds (default: 3600)
+        --layout: Server-side layout algorithm (default: none)
+        --layout-workers: Number of layout worker processes (default: 2)
+        --layout-max-nodes: Largest graph laid out on the server (default: 10000)
+        --history-size: Versions kept per channel for time travel (default: 50)
+        --history-max-bytes: Estimated history memory per channel (default: 32 MiB)
+        --lod-threshold: Summarize graphs with more nodes as clusters (default: off)
+        --lod-group-by: Grouping of summarized graphs (default: community)
+        --chunk-threshold: Deliver larger graphs in chunks (default: 5000 elements)
+        --max-fps: Most updates per second per viewer (default: 20)
+        --asyncio: Serve everything from one asyncio event loop
+        --role: 'standalone', or 'ingest' / 'worker' to split ingest and
+            serving across processes (see schnauzer.replication)
+        --ingest-host: Host of the ingest server, for workers (default: localhost)
+        --publish-port: Port the ingest publishes updates on (default: 8087)
+        --snapshot-port: Port the ingest answers snapshot requests on (default: 8088)
 
     Returns:
         Server: The created server instance (though it blocks on start()).
@@ -424,11 +1822,99 @@ def main():
                       help='Port to run the web server on (default: 8080)')
     parser.add_argument('--backend-port', type=int, default=8086,
                       help='Port to listen for backend connections (default: 8086)')
+    parser.add_argument('--max-channels', type=int, default=64,
+                      help='Maximum number of graph channels (default: 64)')
+    parser.add_argument('--channel-max-elements', type=int, default=None,
+                      help='Maximum number of nodes plus edges per channel (default: unlimited)')
+    parser.add_argument('--channel-idle-timeout', type=float, default=3600,
+                      help='Evict channels without updates or viewers after this many seconds (default: 3600)')
+
+    parser.add_argument('--layout', choices=['auto', 'force', 'hierarchical'], default=None,
+                      help='Compute layouts on the server with this algorithm (default: in the browser)')
+    parser.add_argument('--layout-workers', type=int, default=2,
+                      help='Number of layout worker processes (default: 2)')
+    parser.add_argument('--layout-max-nodes', type=int, default=10000,
+                      help='Largest graph to lay out on the server (default: 10000)')
+
+    parser.add_argument('--history-size', type=int, default=50,
+                      help='Versions kept per channel for time travel, 0 disables (default: 50)')
+    parser.add_argument('--history-max-bytes', type=int, default=32 * 2**20,
+                      help='Estimated history memory per channel in bytes (default: 32 MiB)')
+
+    parser.add_argument('--lod-threshold', type=int, default=None,
+                      help='Send graphs with more nodes as expandable clusters (default: off)')
+    parser.add_argument('--lod-group-by', default=DEFAULT_GROUP_BY,
+                      help="Group summarized graphs by 'community', 'component' or a node attribute "
+                           "(default: community)")
+    parser.add_argument('--chunk-threshold', type=int, default=5000,
+                      help='Deliver graphs with more nodes plus edges in chunks, 0 disables (default: 5000)')
+    parser.add_argument('--max-fps', type=float, default=20,
+                      help='Most graph updates per second sent to each viewer, 0 for no limit (default: 20)')
+    parser.add_argument('--no-shared-memory', action='store_true',
+                      help='Do not offer clients on this host shared-memory transfer over an ipc:// endpoint')
+    parser.add_argument('--persist-dir',
+                      help='Write graph versions to this directory and restore them on startup (default: off)')
+    parser.add_argument('--persist-versions', type=int, default=MAX_VERSIONS,
+                      help=f'Versions kept on disk per channel (default: {MAX_VERSIONS})')
+    parser.add_argument('--persist-max-bytes', type=int, default=None,
+                      help='Disk budget per channel in bytes; the oldest versions are deleted first '
+                           '(default: unlimited)')
+    parser.add_argument('--asyncio', action='store_true',
+                      help='Serve viewers and clients from one asyncio event loop, for many concurrent viewers '
+                           '(needs: pip install schnauzer[asyncio])')
+
+    parser.add_argument('--role', choices=['standalone', 'ingest', 'worker'], default='standalone',
+                      help="Run everything in this process, or only the 'ingest' of client updates or a web "
+                           "'worker' serving viewers from the ingest's updates (default: standalone)")
+    parser.add_argument('--ingest-host', default='localhost',
+                      help='Host of the ingest server, for workers (default: localhost)')
+    parser.add_argument('--publish-port', type=int, default=8087,
+                      help='Port the ingest publishes updates on (default: 8087)')
+    parser.add_argument('--snapshot-port', type=int, default=8088,
+                      help='Port the ingest answers snapshot requests on (default: 8088)')
 
     args = parser.parse_args()
 
+    server_class = Server
+    options = {}
+    if args.asyncio:
+        if args.role != 'standalone':
+            parser.error('--asyncio only supports --role standalone')
+        from schnauzer.aio import AsyncServer
+        server_class = AsyncServer
+    elif args.role == 'ingest':
+        from schnauzer.replication import IngestServer
+        server_class = IngestServer
+        options = {'publish_port': args.publish_port, 'snapshot_port': args.snapshot_port}
+    elif args.role == 'worker':
+        if args.layout:
+            parser.error('Layouts are computed by the ingest, start it with --layout instead')
+        if args.persist_dir:
+            parser.error('Graphs are persisted by the ingest, start it with --persist-dir instead')
+        from schnauzer.replication import WebWorker
+        server_class = WebWorker
+        options = {'ingest_host': args.ingest_host, 'publish_port': args.publish_port,
+                   'snapshot_port': args.snapshot_port}
+
     # Create and start the server
-    server = Server(web_port=args.port, backend_port=args.backend_port)
+    server = server_class(web_port=args.port, backend_port=args.backend_port,
+                    max_channels=args.max_channels,
+                    channel_max_elements=args.channel_max_elements,
+                    channel_idle_timeout=args.channel_idle_timeout,
+                    layout=args.layout,
+                    layout_workers=args.layout_workers,
+                    layout_max_nodes=args.layout_max_nodes,
+                    history_size=args.history_size,
+                    history_max_bytes=args.history_max_bytes,
+                    lod_threshold=args.lod_threshold,
+                    lod_group_by=args.lod_group_by,
+                    chunk_threshold=args.chunk_threshold,
+                    max_fps=args.max_fps,
+                    shared_memory=not args.no_shared_memory,
+                    persist_dir=args.persist_dir,
+                    persist_versions=args.persist_versions,
+                    persist_max_bytes=args.persist_max_bytes,
+                    **options)
     server.start()
 
     return server
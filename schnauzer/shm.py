@@ -0,0 +1,314 @@
+"""
+Shared-memory transfer for producers on the same host as the server.
+
+Large graph messages normally travel through the TCP stack: ZeroMQ copies
+the frames into its own buffers, the kernel copies them through the
+loopback interface and the server receives yet another copy. A client
+that runs on the server's host can instead write the encoded frames into
+a shared-memory segment and send only a small descriptor::
+
+    SHM_MAGIC + {"name": <segment>, "frames": [[offset, length], ...]}
+
+The server decodes the columnar message straight from views of the
+segment. Such clients also talk to the server over an ipc:// endpoint
+instead of TCP when the platform supports it.
+
+Clients detect a local server from the HELLO reply, which names a small
+probe segment and the random token the server wrote into it. Only a client
+that can attach to that segment and reads the same token shares memory
+with the server; any other client keeps sending its frames inline.
+
+Segment lifetime:
+
+- The client creates its segment and is its only owner. One segment is
+  reused for every message that fits and replaced by a larger one when
+  needed. The client unlinks it when it disconnects, when a request fails
+  or times out, and when it is replaced.
+- The server attaches to a segment only while it decodes the message and
+  closes it before it replies. A client that has the reply may overwrite
+  or unlink the segment right away.
+- After a failed request the server may still be reading, so the segment
+  is never reused: it is unlinked, which leaves mappings the server still
+  holds intact, and the next message gets a new segment.
+- The probe segment and the ipc:// socket file exist while the server
+  runs and are removed in stop().
+- Segments of a process that dies without cleaning up are unlinked by the
+  multiprocessing resource tracker.
+"""
+import json
+import logging
+import os
+import secrets
+import tempfile
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+
+import zmq
+
+log = logging.getLogger(__name__)
+
+SHM_MAGIC = b'SCHM\x01'
+
+#: Messages smaller than this many bytes are sent inline, where a segment
+#: would save less than the system calls it costs.
+SHM_MIN_BYTES = 256 * 1024
+
+#: Smallest segment a client creates.
+MIN_SEGMENT_BYTES = 2**20
+
+# Frames start at multiples of this, so columns can be read in place
+_ALIGNMENT = 8
+
+_TOKEN_BYTES = 16
+
+# Segments created by this process, which stay registered with its resource tracker
+_created = set()
+
+
+class SegmentError(ValueError):
+    """Raised when a shared-memory descriptor cannot be read."""
+
+
+def _create(size):
+    """Create a segment with a random name, short enough for macOS."""
+    segment = shared_memory.SharedMemory(name=f"schnz_{secrets.token_hex(8)}", create=True, size=size)
+    _created.add(segment.name)
+    return segment
+
+
+def _unlink(segment):
+    """Close and unlink a segment this process created."""
+    _created.discard(segment.name)
+    segment.close()
+    segment.unlink()
+
+
+def _attach(name):
+    """
+    Attach to an existing segment without taking ownership of it.
+
+    Args:
+        name (str): Segment name.
+
+    Returns:
+        multiprocessing.shared_memory.SharedMemory: The attached segment.
+
+    Raises:
+        OSError: If the segment does not exist.
+    """
+    segment = shared_memory.SharedMemory(name=name)
+    if os.name == 'posix' and segment.name not in _created:
+        # Before Python 3.13 attaching registers the segment with the
+        # resource tracker, which would unlink it when this process exits
+        resource_tracker.unregister(segment._name, 'shared_memory')
+    return segment
+
+
+def is_shared(frames):
+    """
+    Check whether a message is a shared-memory descriptor.
+
+    Args:
+        frames (list): Frames of a received ZeroMQ message.
+
+    Returns:
+        bool: True if the message is a single frame starting with SHM_MAGIC.
+    """
+    return len(frames) == 1 and bytes(frames[0][:len(SHM_MAGIC)]) == SHM_MAGIC
+
+
+@contextmanager
+def read_frames(frame):
+    """
+    Attach to the segment a descriptor points to and view its frames.
+
+    The views are only valid inside the with block; they are released and
+    the segment is closed on exit.
+
+    Args:
+        frame (bytes): Descriptor frame as received from the client.
+
+    Yields:
+        list: One memoryview per frame of the original message.
+
+    Raises:
+        SegmentError: If the descriptor is malformed or the segment does
+            not exist.
+    """
+    try:
+        descriptor = json.loads(bytes(frame[len(SHM_MAGIC):]))
+        name = descriptor['name']
+        layout = [(int(offset), int(length)) for offset, length in descriptor['frames']]
+    except (ValueError, TypeError, KeyError) as e:
+        raise SegmentError(f"Malformed shared-memory descriptor: {e}") from e
+
+    try:
+        segment = _attach(name)
+    except (OSError, ValueError) as e:
+        raise SegmentError(f"Cannot attach to shared-memory segment {name!r}: {e}") from e
+
+    views = []
+    try:
+        for offset, length in layout:
+            if offset < 0 or length < 0 or offset + length > segment.size:
+                raise SegmentError(f"Frame outside of shared-memory segment {name!r}")
+            views.append(segment.buf[offset:offset + length])
+        yield views
+    finally:
+        for view in views:
+            view.release()
+        try:
+            segment.close()
+        except BufferError:
+            # A decoder kept a view; the mapping goes away with it
+            log.warning(f"Shared-memory segment {name!r} is still referenced after decoding")
+
+
+class SegmentWriter:
+    """
+    Client side of the transfer: writes messages into a reusable segment.
+
+    Not thread-safe; each client writes from one thread at a time.
+
+    Attributes:
+        segment (multiprocessing.shared_memory.SharedMemory): Current
+            segment, or None before the first message.
+    """
+
+    def __init__(self):
+        self.segment = None
+
+    def write(self, frames):
+        """
+        Copy a message into the segment.
+
+        The segment must not be written again before the server replied to
+        the returned descriptor; call discard() if no reply arrives.
+
+        Args:
+            frames (list): Frames of the message.
+
+        Returns:
+            list: The single descriptor frame to send instead.
+        """
+        layout = []
+        size = 0
+        for frame in frames:
+            layout.append((size, len(frame)))
+            size += -(-len(frame) // _ALIGNMENT) * _ALIGNMENT
+
+        if self.segment is None or self.segment.size < size:
+            self.discard()
+            # Headroom, so a slowly growing graph does not need a new segment every time
+            self.segment = _create(max(MIN_SEGMENT_BYTES, size + size // 2))
+            log.debug(f"Created shared-memory segment {self.segment.name} of {self.segment.size} bytes")
+
+        buffer = self.segment.buf
+        for frame, (offset, length) in zip(frames, layout):
+            buffer[offset:offset + length] = frame
+
+        descriptor = {'name': self.segment.name, 'frames': layout}
+        return [SHM_MAGIC + json.dumps(descriptor).encode('utf-8')]
+
+    def discard(self):
+        """
+        Unlink the segment, e.g. after a request failed or on disconnect.
+
+        Note:
+            Safe to call multiple times.
+        """
+        if self.segment is None:
+            return
+        segment, self.segment = self.segment, None
+        try:
+            _unlink(segment)
+        except (OSError, BufferError) as e:
+            log.debug(f"Error releasing shared-memory segment {segment.name}: {e}")
+
+
+class LocalTransport:
+    """
+    Server side of the transfer: the probe segment and the ipc:// endpoint.
+
+    Attributes:
+        endpoint (str): ipc:// endpoint the backend socket is bound to, or
+            None if the platform has no ipc transport or binding failed.
+    """
+
+    def __init__(self):
+        self.endpoint = None
+        self._token = secrets.token_bytes(_TOKEN_BYTES)
+        self._probe = _create(_TOKEN_BYTES)
+        self._probe.buf[:_TOKEN_BYTES] = self._token
+
+    def bind(self, socket):
+        """
+        Bind a backend socket to a fresh ipc:// endpoint as well.
+
+        Args:
+            socket (zmq.Socket): The backend ROUTER socket.
+        """
+        if not zmq.has('ipc'):
+            return
+        endpoint = f"ipc://{os.path.join(tempfile.gettempdir(), f'schnauzer-{secrets.token_hex(8)}.ipc')}"
+        try:
+            socket.bind(endpoint)
+        except zmq.error.ZMQError as e:
+            log.warning(f"Could not bind {endpoint}, local clients will use TCP: {e}")
+            return
+        self.endpoint = endpoint
+
+    def describe(self):
+        """
+        Describe the transport for the HELLO reply.
+
+        Returns:
+            dict: The 'probe' segment name, its hex 'token' and the 'ipc'
+                endpoint (None without one).
+        """
+        return {'probe': self._probe.name, 'token': self._token.hex(), 'ipc': self.endpoint}
+
+    def close(self):
+        """
+        Unlink the probe segment and the ipc:// socket file.
+
+        Call after the backend socket was closed.
+
+        Note:
+            Safe to call multiple times.
+        """
+        if self._probe is None:
+            return
+        probe, self._probe = self._probe, None
+        try:
+            _unlink(probe)
+        except OSError as e:
+            log.debug(f"Error releasing probe segment {probe.name}: {e}")
+        if self.endpoint is not None:
+            # ZeroMQ leaves the socket file behind
+            try:
+                os.remove(self.endpoint[len('ipc://'):])
+            except OSError:
+                pass
+
+
+def same_host(description):
+    """
+    Check whether the server that sent a transport description shares memory with us.
+
+    Args:
+        description (dict): The 'local' entry of the HELLO reply, see
+            LocalTransport.describe().
+
+    Returns:
+        bool: True if the probe segment exists here and holds the token.
+    """
+    try:
+        token = bytes.fromhex(description['token'])
+        segment = _attach(description['probe'])
+    except (OSError, ValueError, TypeError, KeyError):
+        return False
+    try:
+        return bytes(segment.buf[:len(token)]) == token
+    finally:
+        segment.close()
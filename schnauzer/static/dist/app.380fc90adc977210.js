@@ -0,0 +1,294 @@
+const __schnauzer_state=(()=>{class State{constructor(){this.data={graphData:null,graphVersion:null,liveVersion:null,browsingHistory:false,lod:null,streaming:false,cy:null,traceCount:0,selectedNode:null,selectedEdge:null,layout:'fcose',searchTerm:'',searchResults:[],traceAttribute:null,showOrigins:false,currentPathIndex:0,currentPaths:[],socket:null,connected:false};this.listeners={};}
+get(key){return this.data[key];}
+set(key,value){const oldValue=this.data[key];this.data[key]=value;this.notify(key,value,oldValue);}
+setGraphData(data){this.data.graphData=data;this.data.graphVersion=data.version??null;this.data.traceCount=data.trace_count||0;this.notify('graphData',data);}
+applyPatch(patch){this.data.graphVersion=patch.version;if(patch.title&&this.data.graphData){this.data.graphData.title=patch.title;}
+if('trace_count'in patch){this.data.traceCount=patch.trace_count||0;}
+this.notify('graphPatch',patch);}
+setCy(cy){this.data.cy=cy;}
+setSelectedNode(nodeId){this.data.selectedNode=nodeId;this.data.selectedEdge=null;this.notify('selection',{node:nodeId,edge:null});}
+setSelectedEdge(edgeId){this.data.selectedEdge=edgeId;this.data.selectedNode=null;this.notify('selection',{node:null,edge:edgeId});}
+clearSelection(){this.data.selectedNode=null;this.data.selectedEdge=null;this.notify('selection',{node:null,edge:null});}
+on(event,callback){if(!this.listeners[event]){this.listeners[event]=[];}
+this.listeners[event].push(callback);}
+notify(event,value,oldValue){if(this.listeners[event]){this.listeners[event].forEach(callback=>{callback(value,oldValue);});}}}
+return{State};})();const __schnauzer_graph=(()=>{class Graph{constructor(state,ui){this.state=state;this.ui=ui;this.cy=null;this.layoutVersion=null;this.previous=null;this.streamPositioned=true;}
+init(){const container=this.ui.elements.graphContainer;if(!container){console.error('Graph container not found');if(this.ui){this.ui.showStatus('Error: Graph container not found','error');}
+return;}
+try{this.cy=cytoscape({container:container,style:this.getStyles(),minZoom:0.1,maxZoom:4,wheelSensitivity:0.2});this.state.setCy(this.cy);let resizeTimeout;window.addEventListener('resize',()=>{clearTimeout(resizeTimeout);resizeTimeout=setTimeout(()=>{if(this.cy&&this.cy.nodes().length>0){this.ensureGraphVisible();}},250);});return this.cy;}catch(error){console.error('Failed to initialize Cytoscape:',error);if(this.ui){this.ui.showStatus('Error: Failed to initialize graph','error');}
+return null;}}
+getStyles(){return[{selector:'node',style:{'background-color':'data(color)','label':(ele)=>this.formatLabel(ele.data('name')),'text-valign':'center','text-halign':'center','text-wrap':'wrap','text-max-width':'100px','width':'label','height':(ele)=>{const name=ele.data('name')||'';return name.length>12?40:25;},'padding':10,'shape':'roundrectangle','border-width':1,'border-color':'#fff','font-size':14,'color':(ele)=>this.ui.getTextColor(ele.data('color')||'#999')}},{selector:'edge',style:{'width':2,'line-color':'data(color)','target-arrow-color':'data(color)','target-arrow-shape':'triangle','curve-style':'bezier','control-point-step-size':20,'label':(ele)=>this.formatLabel(ele.data('name')),'font-size':10,'text-rotation':'autorotate','text-margin-y':-10}},{selector:'node[?meta]',style:{'label':(ele)=>`${this.formatLabel(ele.data('name'))}\n(${ele.data('count')})`,'shape':'ellipse','width':(ele)=>40+12*Math.log2(ele.data('count')+1),'height':(ele)=>40+12*Math.log2(ele.data('count')+1),'border-width':2,'border-style':'double'}},{selector:'edge[?meta]',style:{'width':(ele)=>Math.min(12,1+Math.log2(ele.data('count')))}},{selector:':selected',style:{'border-width':2,'border-color':'#007bff'}},{selector:'.dimmed',style:{'opacity':0.2}},{selector:'.highlighted',style:{'opacity':1,'z-index':999}},{selector:'.trace-highlight',style:{'border-width':3,'border-color':'#e74c3c','z-index':1000}},{selector:'edge.trace-highlight',style:{'line-color':'#e74c3c','target-arrow-color':'#e74c3c','width':5}},{selector:'edge.trace-highlight-secondary',style:{'line-color':'#e74c3c','target-arrow-color':'#e74c3c','width':3,'opacity':0.4,'z-index':999}},{selector:'.hidden',style:{'display':'none'}}];}
+getAdjustedViewport(){const rightPanelWidth=300;const topOffset=80;const bottomOffset=80;const leftOffset=20;return{x1:leftOffset,y1:topOffset,x2:window.innerWidth-rightPanelWidth-20,y2:window.innerHeight-bottomOffset};}
+getSmartLayoutOptions(layoutName){const viewport=this.getAdjustedViewport();const nodeCount=this.cy?.nodes().length||0;const edgeCount=this.cy?.edges().length||0;const baseOptions={name:layoutName,animate:true,animationDuration:1000,fit:false,boundingBox:viewport};const avgDegree=nodeCount>0?(2*edgeCount)/nodeCount:0;const isSimpleGraph=avgDegree<3;let estimatedDepth=Math.ceil(Math.sqrt(nodeCount));if(this.cy&&(layoutName==='dagre'||layoutName==='breadthfirst')){const roots=this.cy.nodes().filter(n=>n.indegree()===0);if(roots.length>0){estimatedDepth=Math.ceil(Math.log2(nodeCount/roots.length+1));}}
+switch(layoutName){case'dagre':let rankSep,nodeSep;if(nodeCount<=10){rankSep=20;nodeSep=8;}else if(nodeCount<=30){rankSep=30;nodeSep=12;}else{rankSep=40;nodeSep=15;}
+return{...baseOptions,rankDir:'TB',rankSep:rankSep,nodeSep:nodeSep,edgeSep:3,ranker:'tight-tree',align:'UL'};case'breadthfirst':return{...baseOptions,directed:true,spacingFactor:isSimpleGraph?0.6:1.0,avoidOverlap:true,grid:false,maximal:false};case'fcose':return{...baseOptions,idealEdgeLength:isSimpleGraph?100:200,nodeOverlap:1,nodeRepulsion:isSimpleGraph?1000:2000,numIter:2500,tile:true,tilingPaddingVertical:10,tilingPaddingHorizontal:10,randomize:true,quality:'default'};case'circle':const viewportWidth=viewport.x2-viewport.x1;const viewportHeight=viewport.y2-viewport.y1;const minDimension=Math.min(viewportWidth,viewportHeight);const nodeSpacing=80;const circumference=nodeCount*nodeSpacing;const calculatedRadius=circumference/(2*Math.PI);const radius=Math.min(minDimension*0.4,Math.max(calculatedRadius,50));return{...baseOptions,name:'circle',radius:radius,avoidOverlap:true,avoidOverlapPadding:20,clockwise:true};case'concentric':return{...baseOptions,minNodeSpacing:50,levelWidth:()=>2,concentric:(node)=>node.degree(),startAngle:0,sweep:2*Math.PI,clockwise:true,avoidOverlap:true,avoidOverlapPadding:10};case'grid':return{...baseOptions,avoidOverlap:true,avoidOverlapPadding:10,condense:true,rows:undefined,cols:undefined};default:return baseOptions;}}
+ensureGraphVisible(){if(!this.cy||this.cy.nodes().length===0)return;const bb=this.cy.elements().boundingBox();const viewport=this.getAdjustedViewport();const viewportWidth=viewport.x2-viewport.x1;const viewportHeight=viewport.y2-viewport.y1;const padding=0.9;const zoomX=(viewportWidth/bb.w)*padding;const zoomY=(viewportHeight/bb.h)*padding;let targetZoom=Math.min(zoomX,zoomY,2.0);targetZoom=Math.max(targetZoom,0.1);const bbCenterX=(bb.x1+bb.x2)/2;const bbCenterY=(bb.y1+bb.y2)/2;const viewportCenterX=(viewport.x1+viewport.x2)/2;const viewportCenterY=(viewport.y1+viewport.y2)/2;const targetPan={x:viewportCenterX-bbCenterX*targetZoom,y:viewportCenterY-bbCenterY*targetZoom};this.cy.animate({zoom:targetZoom,pan:targetPan,duration:500,easing:'ease-in-out'});}
+render(data){if(!this.cy){console.error('Cannot render: Cytoscape not initialized');if(this.ui){this.ui.showStatus('Error: Graph not initialized','error');}
+return;}
+if(!data||!data.elements){console.error('Cannot render: invalid data structure');if(this.ui){this.ui.showStatus('Error: Invalid graph data received','error');}
+return;}
+const previous=new Map();this.cy.nodes().forEach(node=>previous.set(node.id(),{...node.position()}));this.cy.elements().remove();if(data.chunked){this.previous=previous;this.streamPositioned=true;this.layoutVersion=data.layout_version??null;return;}
+this.previous=null;const hasNodes=data.elements.nodes&&data.elements.nodes.length>0;const hasEdges=data.elements.edges&&data.elements.edges.length>0;if(!hasNodes&&!hasEdges){console.log('Rendering empty graph');return;}
+try{const added=this.cy.add(data.elements);this.layoutVersion=data.layout_version??null;const positioned=hasNodes&&data.elements.nodes.every(node=>node.position);this.layoutNodes(added.nodes(),previous,positioned,data);}catch(error){console.error('Error rendering graph:',error);if(this.ui){this.ui.showStatus('Error: Failed to render graph data','error');}}}
+layoutNodes(nodes,previous,positioned,data){if(positioned){this.runLayoutWithFit('preset',{animate:false});return;}
+const fresh=nodes.filter(node=>!previous.has(node.id()));nodes.forEach(node=>{if(previous.has(node.id())){node.position(previous.get(node.id()));}});const survivors=nodes.length-fresh.length;if(survivors>0){this.seedPositions(fresh);}
+if(data.layout_pending){if(survivors===0){this.runLayoutWithFit('grid',{animate:false});}}else if(survivors>0){const removed=previous.size-survivors;this.runLayoutWithFit('fcose',{randomize:false,numIter:this.incrementalIterations(fresh.length+removed,nodes.length)});}else{this.runLayoutWithFit('fcose');}}
+addChunk(group,elements){if(!this.cy||elements.length===0)return;const previous=this.previous||new Map();this.cy.batch(()=>{const added=this.cy.add(group==='nodes'?{nodes:elements}:{edges:elements});if(group==='nodes'){const spread=Math.sqrt(this.cy.nodes().length)*60;elements.forEach((element,i)=>{if(element.position)return;this.streamPositioned=false;const node=added[i];node.position(previous.get(node.id())??{x:Math.random()*spread,y:Math.random()*spread});});}});if(group==='nodes'&&this.cy.nodes().length===elements.length){this.cy.fit(undefined,50);}}
+finishChunks(data){if(!this.cy)return;const previous=this.previous||new Map();this.previous=null;this.layoutNodes(this.cy.nodes(),previous,this.streamPositioned,data);}
+applyPatch(patch){if(!this.cy){console.error('Cannot apply patch: Cytoscape not initialized');return;}
+const nodes=patch.delta.nodes||{};const edges=patch.delta.edges||{};let added=null;try{this.cy.batch(()=>{this.removeElements(edges.removed);this.removeElements(nodes.removed);this.updateElements(nodes.changed);this.updateElements(edges.changed);added=this.cy.add({nodes:nodes.added||[],edges:edges.added||[]});});const addedNodes=added.nodes();if(addedNodes.length>0){this.seedPositions(addedNodes);if(!patch.layout_pending){const changed=addedNodes.length+(nodes.removed||[]).length;this.runLayoutWithFit('fcose',{randomize:false,numIter:this.incrementalIterations(changed,this.cy.nodes().length)});}}}catch(error){console.error('Error applying graph patch:',error);if(this.ui){this.ui.showStatus('Error: Failed to apply graph update','error');}}}
+seedPositions(unplaced){const pending=new Set(unplaced.map(node=>node.id()));const jitter=40;let frontier=unplaced.toArray();while(frontier.length>0){const next=[];frontier.forEach(node=>{if(!pending.has(node.id()))return;const anchors=node.neighborhood('node').filter(n=>!pending.has(n.id()));if(anchors.empty())return;let x=0;let y=0;anchors.forEach(anchor=>{x+=anchor.position('x');y+=anchor.position('y');});node.position({x:x/anchors.length+(Math.random()-0.5)*jitter,y:y/anchors.length+(Math.random()-0.5)*jitter});pending.delete(node.id());node.neighborhood('node').forEach(n=>{if(pending.has(n.id()))next.push(n);});});frontier=next;}
+if(pending.size>0){const placed=this.cy.nodes().filter(n=>!pending.has(n.id()));const bb=placed.nonempty()?placed.boundingBox():{x1:0,y1:0,w:0,h:0};const spread=Math.max(100,Math.sqrt(pending.size)*jitter);unplaced.forEach(node=>{if(!pending.has(node.id()))return;node.position({x:bb.x1+bb.w/2+(Math.random()-0.5)*spread,y:bb.y1+bb.h/2+(Math.random()-0.5)*spread});});}}
+incrementalIterations(changed,total){const full=2500;if(total===0)return full;return Math.max(50,Math.min(full,Math.ceil(full*4*changed/total)));}
+applyPositions(layout){if(!this.cy||!layout||!layout.positions)return;if(this.layoutVersion!=null&&layout.version<this.layoutVersion)return;this.layoutVersion=layout.version;this.runLayoutWithFit('preset',{positions:(node)=>layout.positions[node.id()]??null,animate:this.cy.nodes().length<=1000});}
+removeElements(ids){if(!ids||ids.length===0)return;ids.forEach(id=>{const element=this.cy.getElementById(String(id));if(element.nonempty()){element.remove();}});}
+updateElements(elements){if(!elements||elements.length===0)return;elements.forEach(({data})=>{const element=this.cy.getElementById(String(data.id));if(element.empty()){this.cy.add({group:'source'in data?'edges':'nodes',data:data});return;}
+const stale=Object.keys(element.data()).filter(key=>!(key in data)&&key!=='id'&&key!=='source'&&key!=='target');if(stale.length>0){element.removeData(stale.join(' '));}
+if(element.isEdge()&&(String(element.data('source'))!==String(data.source)||String(element.data('target'))!==String(data.target))){element.move({source:String(data.source),target:String(data.target)});}
+const{id,source,target,...attributes}=data;element.data(attributes);});}
+runLayoutWithFit(layoutName,options={}){if(!this.cy)return;const smartOptions=this.getSmartLayoutOptions(layoutName);const layoutOptions={...smartOptions,...options};const layout=this.cy.layout(layoutOptions);layout.on('layoutstop',()=>{window.dispatchEvent(new CustomEvent('layoutComplete',{detail:{layout:layoutName}}));setTimeout(()=>{this.ensureGraphVisible();},100);});window.dispatchEvent(new CustomEvent('layoutStart',{detail:{layout:layoutName}}));layout.run();return layout;}
+formatLabel(name){if(!name||name.length<=16)return name||'';let processedName=name.length>32?name.substring(0,32):name;const midPoint=Math.floor(processedName.length/2);for(let i=midPoint;i>=Math.max(0,midPoint-8);i--){if(processedName[i]===' '||processedName[i]==='-'||processedName[i]==='_'){return processedName.substring(0,i)+'\n'+processedName.substring(i+1);}}
+return processedName.substring(0,midPoint)+'\n'+processedName.substring(midPoint);}
+resetZoom(){this.ensureGraphVisible();}
+exportAsPNG(){if(!this.cy)return;const blob=this.cy.png({output:'blob',bg:'#f9f9f9',scale:2});const url=URL.createObjectURL(blob);const a=document.createElement('a');a.download=`graph-${Date.now()}.png`;a.href=url;document.body.appendChild(a);a.click();document.body.removeChild(a);URL.revokeObjectURL(url);}}
+return{Graph};})();const __schnauzer_layouts=(()=>{class LayoutManager{constructor(state,graph){this.state=state;this.graph=graph;this.currentLayout=null;this.currentLayoutName='fcose';this.setupListeners();}
+setupListeners(){document.querySelectorAll('.layout-option').forEach(option=>{option.addEventListener('click',(e)=>{e.preventDefault();const layoutName=option.getAttribute('data-layout');this.setLayout(layoutName);});});const resetBtn=document.getElementById('reset-zoom');if(resetBtn){resetBtn.addEventListener('click',()=>this.graph.resetZoom());}
+const exportBtn=document.getElementById('export-graph');if(exportBtn){exportBtn.addEventListener('click',()=>this.graph.exportAsPNG());}
+const slider=document.getElementById('spring-length-slider');const value=document.getElementById('spring-length-value');if(slider&&value){slider.addEventListener('input',()=>{value.textContent=slider.value;if(this.currentLayoutName==='fcose'){this.updateSpringLength(parseInt(slider.value));}});}}
+setLayout(layoutName){this.currentLayoutName=layoutName;this.state.set('layout',layoutName);if(this.currentLayout){this.currentLayout.stop();}
+const options=this.getLayoutOptions(layoutName);this.currentLayout=this.graph.runLayoutWithFit(layoutName,options);this.updateUI(layoutName);this.updateControlVisibility(layoutName);}
+getLayoutOptions(layoutName){const smartOptions=this.graph.getSmartLayoutOptions(layoutName);const overrides={};switch(layoutName){case'fcose':break;case'dagre':break;case'breadthfirst':break;case'circle':break;case'concentric':break;case'grid':break;}
+return{...smartOptions,...overrides};}
+updateSpringLength(value){const cy=this.state.get('cy');if(!cy)return;const positions={};cy.nodes().forEach(node=>{positions[node.id()]={x:node.position('x'),y:node.position('y')};});const options=this.getLayoutOptions('fcose');options.idealEdgeLength=value;options.randomize=false;options.positions=node=>positions[node.id()];options.animationDuration=300;options.numIter=250;this.currentLayout=this.graph.runLayoutWithFit('fcose',options);}
+updateUI(layoutName){document.querySelectorAll('.layout-option').forEach(opt=>{opt.classList.remove('active');});const activeOption=document.querySelector(`.layout-option[data-layout="${layoutName}"]`);if(activeOption){activeOption.classList.add('active');}
+const display=document.getElementById('current-layout');if(display){const names={'fcose':'fCoSE','breadthfirst':'Tree','dagre':'Dagre','circle':'Circle','concentric':'Concentric','grid':'Grid'};display.textContent=names[layoutName]||layoutName;}}
+updateControlVisibility(layoutName){const springControl=document.getElementById('spring-length-control');if(!springControl)return;if(layoutName==='fcose'){springControl.classList.remove('d-none');}else{springControl.classList.add('d-none');}}}
+return{LayoutManager};})();const __schnauzer_interactions=(()=>{class InteractionHandler{constructor(state,ui,graph){this.state=state;this.ui=ui;this.graph=graph;this.tooltipTimeout=null;this.hoveredElement=null;}
+init(){const cy=this.state.get('cy');if(!cy)return;this.setupNodeEvents(cy);this.setupEdgeEvents(cy);this.setupGeneralEvents(cy);}
+setupNodeEvents(cy){cy.on('tap','node',(evt)=>{const node=evt.target;const data=node.data();this.state.setSelectedNode(data.id);this.ui.showNodeDetails(data);window.dispatchEvent(new CustomEvent('elementClicked',{detail:{type:'node',element:node}}));});cy.on('mouseover','node',(evt)=>{const node=evt.target;const data=node.data();this.hoveredElement=node;const tooltip=this.buildTooltip(data);const position=this.getTooltipPosition(evt);this.showTooltip(tooltip,position.x,position.y);});cy.on('mouseout','node',()=>{this.hideTooltip();});}
+setupEdgeEvents(cy){cy.on('tap','edge',(evt)=>{const edge=evt.target;const data=edge.data();this.state.setSelectedEdge(data.id);this.ui.showEdgeDetails(data);window.dispatchEvent(new CustomEvent('elementClicked',{detail:{type:'edge',element:edge}}));});cy.on('mouseover','edge',(evt)=>{const edge=evt.target;const data=edge.data();this.hoveredElement=edge;const tooltip=this.buildTooltip(data);const position=this.getTooltipPosition(evt);this.showTooltip(tooltip,position.x,position.y);});cy.on('mouseout','edge',()=>{this.hideTooltip();});}
+setupGeneralEvents(cy){cy.on('tap',(evt)=>{if(evt.target===cy){this.state.clearSelection();this.ui.hideDetails();}});cy.on('mousedown',()=>{this.state.set('isMouseDown',true);if(this.hoveredElement){this.hideTooltip();}});cy.on('mouseup',()=>{this.state.set('isMouseDown',false);});cy.on('mousemove',(evt)=>{if(this.hoveredElement&&!this.state.get('isMouseDown')){const tooltip=this.ui.elements.tooltip;if(tooltip&&tooltip.style.opacity!=='0'){const position=this.getTooltipPosition(evt);tooltip.style.left=position.x+'px';tooltip.style.top=position.y+'px';}}});}
+buildTooltip(data){let html='';const name=this.formatTooltipName(data.name||'Element');html+=`<h4>${name}</h4>`;if(data.description&&data.description.trim()!==''){const desc=data.description.length>150?data.description.substring(0,147)+'...':data.description;html+=`<div class="node-description">${this.escapeHTML(desc)}</div>`;}
+return html;}
+formatTooltipName(name){if(name.length<=16)return name;let processedName=name.length>32?name.substring(0,32):name;const midPoint=Math.floor(processedName.length/2);for(let i=midPoint;i>=Math.max(0,midPoint-8);i--){if(processedName[i]===' '||processedName[i]==='-'||processedName[i]==='_'){return processedName.substring(0,i)+'<br>'+
+processedName.substring(i+1);}}
+return processedName.substring(0,midPoint)+'<br>'+
+processedName.substring(midPoint);}
+getTooltipPosition(evt){const container=this.state.get('cy').container();const rect=container.getBoundingClientRect();return{x:evt.renderedPosition.x+rect.left+15,y:evt.renderedPosition.y+rect.top-30};}
+showTooltip(html,x,y){clearTimeout(this.tooltipTimeout);const tooltip=this.ui.elements.tooltip;if(!tooltip)return;tooltip.innerHTML=html;tooltip.style.left=x+'px';tooltip.style.top=y+'px';tooltip.style.opacity='0.95';}
+hideTooltip(){this.hoveredElement=null;this.tooltipTimeout=setTimeout(()=>{const tooltip=this.ui.elements.tooltip;if(tooltip){tooltip.style.opacity='0';}},100);}
+escapeHTML(str=''){if(str===null||str===undefined)return'';return String(str).replace(/&/g,'&amp;').replace(/</g,'&lt;').replace(/>/g,'&gt;').replace(/"/g,'&quot;').replace(/'/g,'&#39;');}}
+return{InteractionHandler};})();const __schnauzer_search=(()=>{const WORD=/[\p{L}\p{N}_]+/gu;function searchText(value){if(typeof value==='string')return value.toLowerCase();if(value===null)return'none';if(Array.isArray(value))return value.map(searchText).join(',');if(typeof value==='object')return pythonJson(value).toLowerCase();return String(value).toLowerCase();}
+function pythonJson(value){if(Array.isArray(value))return`[${value.map(pythonJson).join(', ')}]`;if(value!==null&&typeof value==='object'){return`{${Object.entries(value).map(([k, v]) => `${JSON.stringify(k)}:${pythonJson(v)}`).join(', ')}}`;}
+return JSON.stringify(value);}
+class Search{constructor(state,graph){this.state=state;this.graph=graph;this.searchBox=null;this.debounceTimeout=null;this.channel=document.body.dataset.channel||'default';this.init();}
+init(){this.searchBox=document.getElementById('search-nodes');if(!this.searchBox)return;this.searchBox.addEventListener('input',(e)=>{this.debounceSearch(e.target.value);});}
+debounceSearch(value){clearTimeout(this.debounceTimeout);this.debounceTimeout=setTimeout(()=>{this.performSearch(value);},200);}
+async performSearch(searchTerm){const cy=this.state.get('cy');if(!cy)return;this.state.set('searchTerm',searchTerm);cy.elements().removeClass('dimmed highlighted');const term=searchTerm.toLowerCase().trim();if(!term){return;}
+const matches=await this.fetchMatches(term);if(this.state.get('searchTerm')!==searchTerm)return;let matchingNodes,matchingEdges;if(matches){matchingNodes=this.collect(cy,matches.nodes);matchingEdges=this.collect(cy,matches.edges);}else{const{filters,terms}=this.parseSearchTerm(term);matchingNodes=cy.nodes().filter(node=>this.elementMatches(node.data(),filters,terms));matchingEdges=cy.edges().filter(edge=>this.elementMatches(edge.data(),filters,terms));}
+this.applySearchHighlight(cy,matchingNodes,matchingEdges);this.state.set('searchResults',{nodes:matchingNodes.map(n=>n.id()),edges:matchingEdges.map(e=>e.id())});console.log(`Search found ${matchingNodes.length} nodes, ${matchingEdges.length} edges`);}
+async fetchMatches(term){if(this.state.get('browsingHistory'))return null;try{const response=await fetch(`/search/${encodeURIComponent(this.channel)}?q=${encodeURIComponent(term)}`);if(!response.ok)return null;const matches=await response.json();if(matches.version!==this.state.get('graphVersion'))return null;return matches;}catch(error){console.error('Search request failed, searching locally:',error);return null;}}
+collect(cy,ids){return cy.collection(ids.map(id=>cy.getElementById(id)).filter(el=>el.nonempty()));}
+parseSearchTerm(term){const filters=[];const terms=[];term.toLowerCase().split(/\s+/).forEach(part=>{if(part.split(':').length===2){const[attribute,value]=part.split(':');if(attribute&&value){filters.push({attribute,value});}}else{terms.push(...(part.match(WORD)||[]));}});return{filters,terms};}
+elementMatches(data,filters,terms){if(filters.length===0&&terms.length===0){return false;}
+const texts={};for(const[key,value]of Object.entries(data)){if(value===null||value===undefined)continue;(texts[key.toLowerCase()]||=[]).push(searchText(value));}
+for(const filter of filters){if(!(texts[filter.attribute]||[]).some(text=>text.includes(filter.value))){return false;}}
+if(terms.length>0){const words=Object.values(texts).flat().flatMap(text=>text.match(WORD)||[]);return terms.every(term=>words.some(word=>word.startsWith(term)));}
+return true;}
+applySearchHighlight(cy,matchingNodes,matchingEdges){cy.elements().addClass('dimmed');matchingNodes.removeClass('dimmed').addClass('highlighted');matchingEdges.removeClass('dimmed').addClass('highlighted');matchingNodes.connectedEdges().removeClass('dimmed').addClass('highlighted');matchingEdges.connectedNodes().removeClass('dimmed').addClass('highlighted');}
+reset(){const cy=this.state.get('cy');if(!cy)return;if(this.searchBox){this.searchBox.value='';}
+cy.elements().removeClass('dimmed highlighted');this.state.set('searchTerm','');this.state.set('searchResults',{nodes:[],edges:[]});}
+clear(){if(this.searchBox){this.searchBox.value='';this.performSearch('');}}}
+return{Search};})();const __schnauzer_trace=(()=>{class Trace{constructor(state,graph,ui){this.state=state;this.graph=graph;this.ui=ui;this.channel=document.body.dataset.channel||'default';this.traceSelect=null;this.originsCheckbox=null;this.originsContainer=null;this.init();}
+init(){this.cacheElements();this.populateAttributes();this.setupListeners();this.updateOriginsVisibility();}
+cacheElements(){this.traceSelect=document.getElementById('trace-attribute');this.originsCheckbox=document.getElementById('show-origins');this.originsContainer=document.getElementById('show-origins-container');}
+populateAttributes(){const cy=this.state.get('cy');if(!cy||!this.traceSelect)return;const attributes=new Set();cy.nodes().forEach(node=>{Object.keys(node.data()).forEach(key=>{if(key!=='id'&&key!=='name'){attributes.add(key);}});});cy.edges().forEach(edge=>{Object.keys(edge.data()).forEach(key=>{if(key!=='id'&&key!=='source'&&key!=='target'){attributes.add(key);}});});this.traceSelect.innerHTML='<option value="">No trace</option>';Array.from(attributes).sort().forEach(attr=>{const option=document.createElement('option');option.value=attr;option.textContent=attr;this.traceSelect.appendChild(option);});const selected=this.state.get('traceAttribute');if(selected&&attributes.has(selected)){this.traceSelect.value=selected;}}
+setupListeners(){if(this.traceSelect){this.traceSelect.addEventListener('change',()=>{const attribute=this.traceSelect.value||null;this.state.set('traceAttribute',attribute);this.clearHighlights();});}
+if(this.originsCheckbox){this.originsCheckbox.addEventListener('change',()=>{const showOrigins=this.originsCheckbox.checked;this.state.set('showOrigins',showOrigins);this.state.set('currentPathIndex',0);this.state.set('currentPaths',[]);this.clearHighlights();});}
+window.addEventListener('elementClicked',(e)=>{this.handleElementClick(e.detail);});}
+updateOriginsVisibility(){if(!this.originsContainer)return;if(this.state.get('traceCount')){this.originsContainer.classList.remove('d-none');}else{this.originsContainer.classList.add('d-none');this.state.set('showOrigins',false);if(this.originsCheckbox){this.originsCheckbox.checked=false;}}}
+handleElementClick(detail){const{type,element}=detail;if(this.state.get('showOrigins')&&type==='edge'){this.traceOrigins(element);}else if(this.state.get('traceAttribute')){this.traceAttribute(element);}}
+traceAttribute(element){const cy=this.state.get('cy');if(!cy)return;const attribute=this.state.get('traceAttribute');const data=element.data();const value=data[attribute];if(value===undefined||value===null||value===''){console.log(`No value for attribute "${attribute}"`);return;}
+this.clearHighlights();const valueStr=String(value).toLowerCase().trim();const matches=cy.elements().filter(el=>{const elValue=el.data()[attribute];if(elValue===undefined||elValue===null)return false;const elValueStr=String(elValue).toLowerCase().trim();return elValueStr.includes(valueStr);});matches.addClass('trace-highlight');console.log(`Traced ${attribute}="${value}": found ${matches.length} matches`);}
+async traceOrigins(edge){const msgId=edge.data('msg_id');if(msgId===undefined||msgId===null){console.log('Edge has no msg_id');return;}
+if(!this.state.get('traceCount')){console.log('No traces available');return;}
+const paths=await this.fetchPaths(msgId);if(!paths||paths.length===0){console.log(`No paths found for msg_id ${msgId}`);return;}
+this.state.set('currentPaths',paths);this.state.set('currentPathIndex',0);this.highlightPaths(paths,edge);if(this.state.get('selectedEdge')===edge.data('id')){this.addPathNavigation();}}
+async fetchPaths(msgId){const version=this.state.get('graphVersion');const query=version!==null?`?version=${version}`:'';try{const response=await fetch(`/traces/${encodeURIComponent(this.channel)}/${encodeURIComponent(msgId)}${query}`);if(!response.ok)return null;const result=await response.json();if(version!==null&&result.version!==version)return null;return result.paths;}catch(error){console.error('Failed to load traces:',error);return null;}}
+highlightPaths(paths,clickedEdge){const cy=this.state.get('cy');if(!cy)return;cy.edges().removeClass('trace-highlight trace-highlight-secondary');const currentIndex=this.state.get('currentPathIndex');paths.forEach(path=>{this.pathEdges(path,clickedEdge,cy).addClass('trace-highlight-secondary');});if(paths[currentIndex]){this.pathEdges(paths[currentIndex],clickedEdge,cy).removeClass('trace-highlight-secondary').addClass('trace-highlight');}}
+pathEdges(path,startEdge,cy){const edges=path.map(id=>cy.getElementById(id)).filter(el=>el.nonempty());return cy.collection([startEdge,...edges.map(el=>el[0])]);}
+addPathNavigation(){const paths=this.state.get('currentPaths');const currentIndex=this.state.get('currentPathIndex');if(!paths||paths.length===0)return;const navHTML=`
+            <div class="path-navigation mb-3 p-2 bg-light rounded">
+                <div class="d-flex justify-content-between align-items-center">
+                    <span>Path ${currentIndex + 1} of ${paths.length}</span>
+                    <div class="btn-group btn-group-sm">
+                        <button class="btn btn-outline-secondary" id="path-prev">
+                            <i class="bi bi-chevron-left"></i>
+                        </button>
+                        <button class="btn btn-outline-secondary" id="path-next">
+                            <i class="bi bi-chevron-right"></i>
+                        </button>
+                    </div>
+                </div>
+            </div>
+        `;const detailsContent=this.ui.elements.nodeDetailsContent;if(detailsContent){const existingNav=detailsContent.querySelector('.path-navigation');if(existingNav){existingNav.remove();}
+detailsContent.insertAdjacentHTML('afterbegin',navHTML);const prevBtn=document.getElementById('path-prev');const nextBtn=document.getElementById('path-next');if(prevBtn){prevBtn.disabled=currentIndex===0;prevBtn.addEventListener('click',()=>this.navigatePath(-1));}
+if(nextBtn){nextBtn.disabled=currentIndex===paths.length-1;nextBtn.addEventListener('click',()=>this.navigatePath(1));}}}
+navigatePath(direction){const paths=this.state.get('currentPaths');const currentIndex=this.state.get('currentPathIndex');const newIndex=Math.max(0,Math.min(currentIndex+direction,paths.length-1));this.state.set('currentPathIndex',newIndex);const cy=this.state.get('cy');const selectedEdgeId=this.state.get('selectedEdge');if(cy&&selectedEdgeId){const edge=cy.getElementById(selectedEdgeId);if(edge.nonempty()){this.highlightPaths(paths,edge);this.addPathNavigation();}}}
+clearHighlights(){const cy=this.state.get('cy');if(!cy)return;cy.elements().removeClass('trace-highlight trace-highlight-secondary');}
+reset(){this.clearHighlights();this.populateAttributes();this.updateOriginsVisibility();if(this.traceSelect){this.traceSelect.value='';}
+this.state.set('traceAttribute',null);this.state.set('currentPaths',[]);this.state.set('currentPathIndex',0);}}
+return{Trace};})();const __schnauzer_filter=(()=>{class Filter{constructor(state,graph){this.state=state;this.graph=graph;this.filterSelect=null;this.hiddenAttribute=null;this.init();}
+init(){this.filterSelect=document.getElementById('filter-attribute');if(!this.filterSelect)return;this.populateAttributes();this.setupListener();}
+populateAttributes(){const cy=this.state.get('cy');if(!cy||!this.filterSelect)return;const attributes=new Set();cy.nodes().forEach(node=>{Object.keys(node.data()).forEach(key=>{if(key!=='id'&&key!=='name'){attributes.add(key);}});});cy.edges().forEach(edge=>{Object.keys(edge.data()).forEach(key=>{if(key!=='id'&&key!=='source'&&key!=='target'){attributes.add(key);}});});this.filterSelect.innerHTML='<option value="">Show all</option>';Array.from(attributes).sort().forEach(attr=>{const option=document.createElement('option');option.value=attr;option.textContent=`Hide: ${attr}`;this.filterSelect.appendChild(option);});if(this.hiddenAttribute&&attributes.has(this.hiddenAttribute)){this.filterSelect.value=this.hiddenAttribute;}
+console.log(`Found ${attributes.size} filterable attributes`);}
+setupListener(){if(!this.filterSelect)return;this.filterSelect.addEventListener('change',()=>{this.hiddenAttribute=this.filterSelect.value||null;this.applyFilter();});}
+applyFilter(){const cy=this.state.get('cy');if(!cy)return;cy.elements().style('display','element');if(!this.hiddenAttribute){console.log('Filter cleared - showing all elements');return;}
+let hiddenCount=0;cy.elements().forEach(el=>{if(el.data(this.hiddenAttribute)!==undefined){el.style('display','none');hiddenCount++;}});console.log(`Hiding ${hiddenCount} elements with attribute "${this.hiddenAttribute}"`);}
+reset(){this.hiddenAttribute=null;if(this.filterSelect){this.filterSelect.value='';}
+this.populateAttributes();if(this.hiddenAttribute){this.applyFilter();}}
+clear(){this.hiddenAttribute=null;if(this.filterSelect){this.filterSelect.value='';}
+this.applyFilter();}}
+return{Filter};})();const __schnauzer_socket=(()=>{class Socket{constructor(state,onGraphUpdate,ui,onGraphPatch,onGraphLayout){this.state=state;this.onGraphUpdate=onGraphUpdate;this.onGraphPatch=onGraphPatch;this.onGraphLayout=onGraphLayout;this.ui=ui;this.socket=null;this.resyncPending=false;this.channel=document.body.dataset.channel||'default';}
+connect(){return new Promise((resolve)=>{this.socket=io({reconnection:true,reconnectionAttempts:5,reconnectionDelay:1000,reconnectionDelayMax:5000,forceNew:true,timeout:20000,query:{channel:this.channel}});this.state.set('socket',this.socket);this.socket.on('connect',()=>{this.state.set('connected',true);console.log('Connected to server');if(this.ui){this.ui.showStatus('Connected to server','success',2000);}
+resolve();});this.socket.on('disconnect',()=>{this.state.set('connected',false);console.log('Disconnected from server');if(this.ui){this.ui.showStatus('Disconnected from server. Trying to reconnect...','warning');}});this.socket.on('graph_update',(payload)=>{console.log('Received graph update');const arrival=Date.now();let data=payload;if(payload instanceof ArrayBuffer||ArrayBuffer.isView(payload)){try{data=JSON.parse(new TextDecoder().decode(payload));}catch(error){data=null;}}
+if(!data||!data.elements){console.error('Received invalid graph data');if(this.ui){this.ui.showStatus('Error: Received invalid graph data','error',5000);}
+return;}
+this.acknowledge(data.version);if(this.state.get('browsingHistory')){this.state.set('liveVersion',data.version);return;}
+this.state.set('liveVersion',data.version);const isEmpty=this.isEmptyGraph(data);this.onGraphUpdate(data,arrival);if(this.ui){if(isEmpty){this.ui.showStatus('Graph cleared','info',3000);}else{const nodeCount=data.elements.nodes?.length||0;const edgeCount=data.elements.edges?.length||0;this.ui.showStatus(`Graph updated: ${nodeCount} nodes, ${edgeCount} edges`,'success',3000);}}});this.socket.on('graph_layout',(layout)=>{if(layout&&layout.positions&&this.onGraphLayout&&!this.state.get('browsingHistory')){this.onGraphLayout(layout);}});this.socket.on('graph_patch',(patch)=>{const arrival=Date.now();if(!patch||!patch.delta){console.error('Received invalid graph patch');return;}
+this.acknowledge(patch.version);if(this.state.get('browsingHistory')){this.state.set('liveVersion',patch.version);return;}
+this.state.set('liveVersion',patch.version);if(this.state.get('graphVersion')!==patch.base_version||this.state.get('lod')||this.state.get('streaming')){console.log(`Graph version ${this.state.get('graphVersion')} does not match patch base ${patch.base_version}, resyncing`);this.resync();return;}
+this.onGraphPatch(patch,arrival);});this.socket.on('connect_error',(error)=>{console.error('Connection error:',error);if(this.ui){this.ui.showStatus('Connection error: '+error.message,'error',3000);}});setTimeout(resolve,500);});}
+acknowledge(version){requestAnimationFrame(()=>{if(this.socket&&this.state.get('connected')){this.socket.emit('graph_ack',{version:version});}});}
+async loadInitialData(){if(this.ui){this.ui.showStatus('Checking for graph data...','info');}
+try{const response=await fetch(`/graph-data/${encodeURIComponent(this.channel)}?chunked=1`);if(!response.ok){throw new Error(`HTTP error! Status: ${response.status}`);}
+const data=await response.json();if(this.isEmptyGraph(data)){if(this.ui){this.ui.showStatus('Waiting for graph data...','info',5000);}
+this.onGraphUpdate(data);}else{this.onGraphUpdate(data);if(this.ui){this.ui.showStatus('Graph loaded successfully','success',3000);}}
+return data;}catch(error){console.error('Error loading initial data:',error);if(this.ui){this.ui.showStatus('Failed to connect to server. Retrying...','error',5000);}
+setTimeout(()=>this.loadInitialData(),5000);throw error;}}
+resync(){if(this.resyncPending)return;this.resyncPending=true;this.loadInitialData().catch(()=>{}).finally(()=>{this.resyncPending=false;});}
+isEmptyGraph(data){if(!data||!data.elements)return true;if(data.chunked)return data.chunked.nodes+data.chunked.edges===0;const hasNodes=data.elements.nodes&&data.elements.nodes.length>0;const hasEdges=data.elements.edges&&data.elements.edges.length>0;return!hasNodes&&!hasEdges;}
+disconnect(){if(this.socket){this.socket.disconnect();this.socket=null;this.state.set('socket',null);this.state.set('connected',false);}}}
+return{Socket};})();const __schnauzer_ui=(()=>{class UI{constructor(state){this.state=state;this.elements={};this.statusTimeout=null;}
+init(){this.cacheElements();this.setupBasicListeners();}
+cacheElements(){this.elements={graphContainer:document.getElementById('graph-container'),statusMessage:document.getElementById('status-message'),nodeDetails:document.getElementById('node-details'),nodeDetailsTitle:document.getElementById('node-details-title'),nodeDetailsContent:document.getElementById('node-details-content'),resetZoomBtn:document.getElementById('reset-zoom'),exportBtn:document.getElementById('export-graph'),layoutDropdown:document.querySelectorAll('.layout-option'),currentLayout:document.getElementById('current-layout'),nodeCount:document.getElementById('node-count'),edgeCount:document.getElementById('edge-count'),searchBox:document.getElementById('search-nodes'),clearSearchBtn:document.getElementById('clear-search'),traceSelect:document.getElementById('trace-attribute'),originsCheckbox:document.getElementById('show-origins'),originsContainer:document.getElementById('show-origins-container'),filterSelect:document.getElementById('filter-attribute'),springSlider:document.getElementById('spring-length-slider'),springValue:document.getElementById('spring-length-value'),springControl:document.getElementById('spring-length-control'),tooltip:document.querySelector('.graph-tooltip')||this.createTooltip()};}
+createTooltip(){const tooltip=document.createElement('div');tooltip.className='graph-tooltip';tooltip.style.opacity='0';document.body.appendChild(tooltip);return tooltip;}
+setupBasicListeners(){if(this.elements.clearSearchBtn){this.elements.clearSearchBtn.addEventListener('click',()=>{if(this.elements.searchBox){this.elements.searchBox.value='';this.elements.searchBox.dispatchEvent(new Event('input'));}});}
+const fcoseOption=document.querySelector('.layout-option[data-layout="fcose"]');if(fcoseOption){fcoseOption.classList.add('active');}
+if(this.elements.nodeDetailsContent){this.elements.nodeDetailsContent.addEventListener('click',(e)=>{if(e.target.classList.contains('expand-toggle')){e.preventDefault();const action=e.target.dataset.action;const targetId=e.target.dataset.target;if(action==='expand'){document.getElementById(targetId+'-short').style.display='none';document.getElementById(targetId+'-full').style.display='inline';}else{document.getElementById(targetId+'-short').style.display='inline';document.getElementById(targetId+'-full').style.display='none';}}});}}
+showStatus(message,type='info',duration=0){const el=this.elements.statusMessage;if(!el)return;clearTimeout(this.statusTimeout);el.textContent=message;el.className=`floating-panel status-panel alert alert-${type}`;el.classList.remove('d-none');if(duration>0){this.statusTimeout=setTimeout(()=>{el.classList.add('d-none');},duration);}}
+updateStats(data){if(!data||!data.elements){if(this.elements.nodeCount){this.elements.nodeCount.textContent='0';}
+if(this.elements.edgeCount){this.elements.edgeCount.textContent='0';}
+return;}
+const nodeCount=data.lod?data.lod.nodes:data.elements.nodes?.length||0;const edgeCount=data.lod?data.lod.edges:data.elements.edges?.length||0;this.updateCounts(nodeCount,edgeCount);}
+updateCounts(nodeCount,edgeCount){if(this.elements.nodeCount){this.elements.nodeCount.textContent=nodeCount;}
+if(this.elements.edgeCount){this.elements.edgeCount.textContent=edgeCount;}
+if(nodeCount===0&&edgeCount===0){if(!document.getElementById('empty-graph-message')){const container=this.elements.graphContainer;if(container){const emptyMsg=document.createElement('div');emptyMsg.id='empty-graph-message';emptyMsg.style.cssText=`
+                        position: absolute;
+                        top: 90%;
+                        left: 50%;
+                        transform: translate(-50%, -50%);
+                        color: #999;
+                        font-size: 18px;
+                        text-align: center;
+                        pointer-events: none;
+                        user-select: none;
+                        z-index: 1;
+                    `;emptyMsg.innerHTML=`
+                        <div>No graph data available</div>
+                        <div style="font-size: 14px; color: #aaa; margin-top: 8px;">Waiting for data...</div>
+                    `;container.appendChild(emptyMsg);}}}else{const emptyMsg=document.getElementById('empty-graph-message');if(emptyMsg){emptyMsg.remove();}}}
+updateTitle(title){const displayTitle=title||'Schnauzer Graph Visualization';document.title=displayTitle;const header=document.querySelector('h1.graph-title');if(header){header.textContent=displayTitle;}}
+showNodeDetails(node){const panel=this.elements.nodeDetails;if(!panel)return;panel.classList.remove('d-none');this.elements.nodeDetailsTitle.textContent=node.name||'Node Details';const header=panel.querySelector('.panel-header');if(header){header.style.backgroundColor=node.color||'#999';header.style.color=this.getTextColor(node.color||'#999');}
+this.elements.nodeDetailsContent.innerHTML=this.formatDetails(node,'node');}
+showEdgeDetails(edge){const panel=this.elements.nodeDetails;if(!panel)return;panel.classList.remove('d-none');this.elements.nodeDetailsTitle.textContent=edge.name||'Edge Details';const header=panel.querySelector('.panel-header');if(header){header.style.backgroundColor=edge.color||'#999';header.style.color=this.getTextColor(edge.color||'#999');}
+this.elements.nodeDetailsContent.innerHTML=this.formatDetails(edge,'edge');}
+hideDetails(){if(this.elements.nodeDetails){this.elements.nodeDetails.classList.add('d-none');}}
+formatDetails(data,elementType='node'){let html='';if(data.description&&data.description.trim()!==''){html+=`<div class="mb-3 pb-2 border-bottom text-muted fst-italic">${this.escapeHTML(data.description)}</div>`;}
+if(elementType==='edge'){if(data.source){html+=`<p class="mb-1"><strong>Source:</strong> ${this.escapeHTML(data.source)}</p>`;}
+if(data.target){html+=`<p class="mb-1"><strong>Target:</strong> ${this.escapeHTML(data.target)}</p>`;}}
+if(data.type){html+=`<p class="mb-1"><strong>Type:</strong> ${this.escapeHTML(data.type)}</p>`;}
+if(data.labels){if(typeof data.labels==='object'&&!Array.isArray(data.labels)){for(const[key,value]of Object.entries(data.labels)){html+=`<p class="mb-2"><strong>${this.escapeHTML(key)}:</strong> ${this.formatValue(value)}</p>`;}}else{html+=`<p class="mb-1"><strong>Labels:</strong> ${this.formatValue(data.labels)}</p>`;}}
+const skipKeys=['id','name','color','description','source','target','type','labels','x','y'];for(const[key,value]of Object.entries(data)){if(!skipKeys.includes(key)&&value!==undefined&&value!==null){html+=`<p class="mb-1"><strong>${this.escapeHTML(key)}:</strong> ${this.formatValue(value)}</p>`;}}
+return html||'<p>No details available</p>';}
+formatValue(value){if(value===null||value===undefined){return'';}
+let fullText='';if(Array.isArray(value)){if(value.length===0)return'[]';const formatted=value.map(v=>{if(typeof v==='object'&&v!==null){return JSON.stringify(v);}
+return String(v);});fullText=formatted.join(', ');}else if(typeof value==='object'){fullText=JSON.stringify(value);}else{fullText=String(value);}
+const maxLength=150;if(fullText.length<=maxLength){return this.escapeHTML(fullText);}
+const truncated=fullText.substring(0,maxLength)+'...';const uniqueId='expand-'+Math.random().toString(36).slice(2,11);return`
+            <span class="expandable-value">
+                <span id="${uniqueId}-short">
+                    ${this.escapeHTML(truncated)}
+                    <a href="#" class="expand-toggle text-primary text-decoration-none ms-1" 
+                       data-action="expand" data-target="${uniqueId}">[+]</a>
+                </span>
+                <span id="${uniqueId}-full" style="display: none; word-break: break-word;">
+                    ${this.escapeHTML(fullText)}
+                    <a href="#" class="expand-toggle text-primary text-decoration-none ms-1" 
+                       data-action="collapse" data-target="${uniqueId}">[-]</a>
+                </span>
+            </span>
+        `;}
+escapeHTML(str){if(str===null||str===undefined)return'';return String(str).replace(/&/g,'&amp;').replace(/</g,'&lt;').replace(/>/g,'&gt;').replace(/"/g,'&quot;').replace(/'/g,'&#39;').replace(/\n/g,'<br>');}
+getTextColor(bgColor){const color=bgColor.startsWith('#')?bgColor.substring(1):bgColor;const r=parseInt(color.substring(0,2),16);const g=parseInt(color.substring(2,4),16);const b=parseInt(color.substring(4,6),16);const luminance=(0.299*r+0.587*g+0.114*b)/255;return luminance>0.5?'#000000':'#ffffff';}}
+return{UI};})();const __schnauzer_history=(()=>{const MAX_PATCH_STEPS=10;class History{constructor(state,ui,socket,onGraph,onPatch){this.state=state;this.ui=ui;this.socket=socket;this.onGraph=onGraph;this.onPatch=onPatch;this.versions=[];this.refreshTimeout=null;this.seekTimeout=null;this.busy=false;this.init();}
+init(){this.panel=document.getElementById('history-control');this.slider=document.getElementById('history-slider');this.label=document.getElementById('history-label');if(!this.panel||!this.slider)return;this.slider.addEventListener('input',()=>{this.updateLabel(parseInt(this.slider.value));this.debounceSeek(parseInt(this.slider.value));});document.getElementById('history-prev')?.addEventListener('click',()=>this.step(-1));document.getElementById('history-next')?.addEventListener('click',()=>this.step(1));document.getElementById('history-live')?.addEventListener('click',()=>this.goLive());this.state.on('liveVersion',()=>this.debounceRefresh());}
+debounceRefresh(){clearTimeout(this.refreshTimeout);this.refreshTimeout=setTimeout(()=>this.refresh(),500);}
+debounceSeek(index){clearTimeout(this.seekTimeout);this.seekTimeout=setTimeout(()=>this.seek(index),150);}
+async refresh(){try{const response=await fetch(`/history/${encodeURIComponent(this.socket.channel)}`);if(!response.ok)return;const data=await response.json();this.versions=data.versions||[];}catch(error){console.error('Error loading graph history:',error);return;}
+this.panel.classList.toggle('d-none',this.versions.length<2||Boolean(this.state.get('lod')));this.slider.max=Math.max(this.versions.length-1,0);if(!this.state.get('browsingHistory')){this.slider.value=this.slider.max;}
+this.updateLabel(parseInt(this.slider.value));}
+currentIndex(){const version=this.state.get('graphVersion');return this.versions.findIndex(entry=>entry.version===version);}
+step(offset){const index=this.currentIndex();if(index<0)return;const target=Math.min(Math.max(index+offset,0),this.versions.length-1);this.slider.value=target;this.updateLabel(target);this.seek(target);}
+seek(index){const target=this.versions[index];const socket=this.state.get('socket');if(!target||!socket||this.busy)return;if(index===this.versions.length-1&&!this.state.get('browsingHistory'))return;this.state.set('browsingHistory',true);this.panel.classList.add('browsing');const current=this.currentIndex();this.busy=true;if(current>=0&&Math.abs(index-current)<=MAX_PATCH_STEPS){socket.emit('history_step',{from:this.versions[current].version,to:target.version},(response)=>{this.busy=false;if(!response||!response.patches){this.handleUnavailable();return;}
+response.patches.forEach(patch=>this.onPatch(patch));});}else{socket.emit('history_seek',{version:target.version},(graph)=>{this.busy=false;if(!graph||!graph.elements){this.handleUnavailable();return;}
+this.onGraph(graph);});}}
+goLive(){this.state.set('browsingHistory',false);this.panel.classList.remove('browsing');this.slider.value=this.slider.max;this.updateLabel(parseInt(this.slider.value));this.socket.resync();}
+handleUnavailable(){if(this.ui){this.ui.showStatus('This version is no longer available','warning',3000);}
+this.refresh();}
+updateLabel(index){if(!this.label)return;const entry=this.versions[index];if(!entry){this.label.textContent='';return;}
+const time=new Date(entry.time*1000).toLocaleTimeString();const live=index===this.versions.length-1?' (latest)':'';this.label.textContent=`${index + 1}/${this.versions.length} · ${time}${live}`;}}
+return{History};})();const __schnauzer_lod=(()=>{class LevelOfDetail{constructor(state,graph,ui){this.state=state;this.graph=graph;this.ui=ui;this.expanded=[];this.pending=false;}
+init(){const cy=this.state.get('cy');if(!cy)return;cy.on('dbltap','node[?meta]',(evt)=>{this.expand(evt.target.id());});}
+async reset(data){const previous=this.expanded;this.expanded=[];this.state.set('lod',data.lod||null);if(!data.lod)return;if(this.ui){this.ui.showStatus(`Large graph: showing ${data.elements.nodes.length} clusters, double click one to expand it`,'info',4000);}
+const cy=this.state.get('cy');for(const cluster of previous){const node=cy.getElementById(cluster.id);if(node.empty()||node.data('name')!==cluster.name)continue;if(!await this.expand(cluster.id))break;}}
+expand(clusterId){const socket=this.state.get('socket');const cy=this.state.get('cy');const node=cy?cy.getElementById(clusterId):null;if(!socket||!node||node.empty()||this.pending)return Promise.resolve(false);this.pending=true;const request={cluster:clusterId,expanded:this.expanded.map(cluster=>cluster.id),version:this.state.get('graphVersion')};return new Promise((resolve)=>{socket.emit('lod_expand',request,(contents)=>{this.pending=false;if(!contents||contents.error){console.log(`Cannot expand ${clusterId}: ${contents ? contents.error : 'no response'}`);resolve(false);return;}
+this.replace(node,contents);resolve(true);});});}
+replace(node,contents){const cy=this.state.get('cy');const center={...node.position()};this.expanded.push({id:node.id(),name:node.data('name')});let added=null;cy.batch(()=>{node.remove();added=cy.add({nodes:contents.nodes,edges:contents.edges});});const nodes=added.nodes();const radius=Math.max(50,Math.sqrt(nodes.length)*40);nodes.forEach((child,i)=>{const angle=2*Math.PI*i/nodes.length;child.position({x:center.x+radius*Math.cos(angle),y:center.y+radius*Math.sin(angle)});});this.graph.runLayoutWithFit('fcose',{randomize:false,numIter:this.graph.incrementalIterations(nodes.length,cy.nodes().length)});if(this.ui){this.ui.updateCounts(cy.nodes().length,cy.edges().length);}}}
+return{LevelOfDetail};})();const __schnauzer_stream=(()=>{const TARGET_CHUNK_MS=50;const MIN_CHUNK=200;const MAX_CHUNK=20000;class GraphStream{constructor(state,graph,ui){this.state=state;this.graph=graph;this.ui=ui;this.chunkSize=2000;this.generation=0;}
+async load(manifest){const generation=++this.generation;const total=manifest.chunked.nodes+manifest.chunked.edges;let loaded=0;this.state.set('streaming',true);try{for(const group of['nodes','edges']){let offset=0;while(offset<manifest.chunked[group]){const elements=await this.request(manifest.version,group,offset);if(generation!==this.generation)return false;if(!elements)return false;const start=performance.now();this.graph.addChunk(group,elements);await this.nextFrame();this.adapt(elements.length,performance.now()-start);offset+=elements.length;loaded+=elements.length;if(this.ui){this.ui.showStatus(`Loading graph... ${Math.floor(100 * loaded / total)}%`,'info');}
+if(elements.length===0)break;}}
+this.graph.finishChunks(manifest);if(this.ui){this.ui.showStatus('Graph loaded successfully','success',2000);}
+return true;}finally{if(generation===this.generation){this.state.set('streaming',false);}}}
+request(version,group,offset){const socket=this.state.get('socket');if(!socket)return Promise.resolve(null);return new Promise((resolve)=>{socket.emit('graph_chunk',{version,group,offset,count:this.chunkSize},(response)=>{if(!response||response.error){console.log(`Graph chunk unavailable: ${response ? response.error : 'no response'}`);resolve(null);return;}
+resolve(response.elements);});});}
+adapt(count,elapsed){if(count<this.chunkSize)return;const factor=Math.min(2,Math.max(0.5,TARGET_CHUNK_MS/Math.max(elapsed,1)));this.chunkSize=Math.round(Math.min(MAX_CHUNK,Math.max(MIN_CHUNK,this.chunkSize*factor)));}
+nextFrame(){return new Promise(resolve=>requestAnimationFrame(()=>resolve()));}}
+return{GraphStream};})();const __schnauzer_latency=(()=>{const SYNC_SAMPLES=3;const REFRESH_INTERVAL=2000;const STAGE_LABELS={client:'Client',transport:'Transport',decode:'Decode',process:'Process',delivery:'Delivery',render:'Render',layout:'Layout',total:'Total'};class Latency{constructor(state,socket){this.state=state;this.socket=socket;this.offset=0;this.pending=null;this.layoutsRunning=0;this.refreshInterval=null;}
+init(){this.panel=document.getElementById('latency-panel');this.table=document.getElementById('latency-table');document.getElementById('toggle-latency')?.addEventListener('click',()=>this.toggle());this.state.on('connected',(connected)=>{if(connected)this.syncClock();});window.addEventListener('layoutStart',()=>this.layoutsRunning++);window.addEventListener('layoutComplete',(event)=>{this.layoutsRunning=Math.max(0,this.layoutsRunning-1);this.laidOut(event.detail.layout);});}
+async syncClock(){const socket=this.state.get('socket');if(!socket)return;let best=Infinity;for(let i=0;i<SYNC_SAMPLES;i++){const sent=Date.now();const reply=await new Promise(resolve=>socket.emit('clock_sync',resolve));const now=Date.now();if(!reply||typeof reply.time!=='number')return;if(now-sent<best){best=now-sent;this.offset=reply.time*1000-(sent+now)/2;}}}
+serverTime(local=Date.now()){return(local+this.offset)/1000;}
+received(version,arrival,layoutPending){if(this.pending&&this.pending.rendered!==undefined){this.report(this.pending);}
+this.pending={version:version,received:this.serverTime(arrival),layoutPending:Boolean(layoutPending)};}
+rendered(version){const pending=this.pending;if(!pending||pending.version!==version)return;requestAnimationFrame(()=>{if(this.pending!==pending)return;pending.rendered=this.serverTime();if(pending.laidOut===undefined&&!pending.layoutPending&&this.layoutsRunning===0){pending.laidOut=pending.rendered;}
+if(pending.laidOut!==undefined){pending.laidOut=Math.max(pending.laidOut,pending.rendered);this.report(pending);}});}
+laidOut(layout){const pending=this.pending;if(!pending||this.layoutsRunning>0)return;if(pending.layoutPending&&layout!=='preset')return;pending.laidOut=this.serverTime();if(pending.rendered!==undefined){this.report(pending);}}
+report(pending){if(this.pending===pending){this.pending=null;}
+const socket=this.state.get('socket');if(!socket||!this.state.get('connected'))return;socket.emit('latency_report',{version:pending.version,received:pending.received,rendered:pending.rendered,laid_out:pending.laidOut});}
+toggle(){if(!this.panel)return;const show=this.panel.classList.contains('d-none');this.panel.classList.toggle('d-none',!show);clearInterval(this.refreshInterval);this.refreshInterval=null;if(show){this.refresh();this.refreshInterval=setInterval(()=>this.refresh(),REFRESH_INTERVAL);}}
+async refresh(){try{const response=await fetch(`/latency/${encodeURIComponent(this.socket.channel)}`);if(!response.ok)return;this.renderTable(await response.json());}catch(error){console.error('Error loading latency:',error);}}
+renderTable(summary){if(!this.table)return;const own=this.state.get('socket')?.id;const viewerCount=Object.keys(summary.viewers||{}).length;const sections=[['Update',summary.updates],[`All viewers (${viewerCount})`,summary.all_viewers],['This viewer',own?(summary.viewers||{})[own]:null]];const rows=[];sections.forEach(([title,stages])=>{const entries=Object.entries(stages||{});if(entries.length===0)return;rows.push(`<tr class="latency-section"><th colspan="4">${title}</th></tr>`);entries.forEach(([stage,percentiles])=>{rows.push(`<tr><td>${STAGE_LABELS[stage] || stage}</td>`+
+['p50','p95','p99'].map(key=>`<td>${this.formatSeconds(percentiles[key])}</td>`).join('')+'</tr>');});});this.table.innerHTML=rows.length>0?rows.join(''):'<tr><td colspan="4" class="text-muted">No updates measured yet</td></tr>';}
+formatSeconds(seconds){if(seconds===undefined)return'-';return seconds<1?`${(seconds * 1000).toFixed(1)} ms`:`${seconds.toFixed(2)} s`;}}
+return{Latency};})();const __schnauzer_app=(()=>{const{State}=__schnauzer_state;const{Graph}=__schnauzer_graph;const{LayoutManager}=__schnauzer_layouts;const{InteractionHandler}=__schnauzer_interactions;const{Search}=__schnauzer_search;const{Trace}=__schnauzer_trace;const{Filter}=__schnauzer_filter;const{Socket}=__schnauzer_socket;const{UI}=__schnauzer_ui;const{History}=__schnauzer_history;const{LevelOfDetail}=__schnauzer_lod;const{GraphStream}=__schnauzer_stream;const{Latency}=__schnauzer_latency;class App{constructor(){this.state=new State();this.ui=new UI(this.state);this.graph=new Graph(this.state,this.ui);this.layouts=new LayoutManager(this.state,this.graph);this.interactions=new InteractionHandler(this.state,this.ui,this.graph);this.search=new Search(this.state,this.graph);this.trace=new Trace(this.state,this.graph,this.ui);this.filter=new Filter(this.state,this.graph);this.socket=new Socket(this.state,this.handleGraphUpdate.bind(this),this.ui,this.handleGraphPatch.bind(this),this.handleGraphLayout.bind(this));this.lod=new LevelOfDetail(this.state,this.graph,this.ui);this.stream=new GraphStream(this.state,this.graph,this.ui);this.latency=new Latency(this.state,this.socket);this.history=new History(this.state,this.ui,this.socket,this.handleGraphUpdate.bind(this),this.handleGraphPatch.bind(this));}
+async init(){console.log('Initializing Schnauzer...');this.ui.init();this.graph.init();this.interactions.init();this.lod.init();this.latency.init();await this.socket.connect();await this.socket.loadInitialData();}
+async handleGraphUpdate(data,arrival=null){if(arrival!==null){this.latency.received(data.version,arrival,data.layout_pending);}
+this.state.setGraphData(data);this.graph.render(data);if(data.chunked){if(!await this.stream.load(data)){if(!this.state.get('streaming')){this.socket.resync();}
+return;}
+const cy=this.state.get('cy');this.ui.updateCounts(cy.nodes().length,cy.edges().length);}else{this.ui.updateStats(data);}
+this.latency.rendered(data.version);this.ui.updateTitle(data.title);this.search.reset();this.trace.reset();this.filter.reset();this.lod.reset(data);setTimeout(()=>{this.graph.ensureGraphVisible();},250);}
+handleGraphPatch(patch,arrival=null){if(arrival!==null){this.latency.received(patch.version,arrival,patch.layout_pending);}
+this.state.applyPatch(patch);this.graph.applyPatch(patch);this.latency.rendered(patch.version);const cy=this.state.get('cy');this.ui.updateCounts(cy.nodes().length,cy.edges().length);if(patch.title){this.ui.updateTitle(patch.title);}
+this.trace.populateAttributes();this.trace.updateOriginsVisibility();this.filter.populateAttributes();if(this.filter.hiddenAttribute){this.filter.applyFilter();}}
+handleGraphLayout(layout){this.graph.applyPositions(layout);}}
+const app=new App();document.addEventListener('DOMContentLoaded',()=>app.init());return{app};})();
\ No newline at end of file
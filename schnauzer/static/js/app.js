@@ -12,6 +12,10 @@ import { Trace } from './trace.js';
 import { Filter } from './filter.js';
 import { Socket } from './socket.js';
 import { UI } from './ui.js';
+import { History } from './history.js';
+import { LevelOfDetail } from './lod.js';
+import { GraphStream } from './stream.js';
+import { Latency } from './latency.js';
 
 class App {
     constructor() {
@@ -24,7 +28,13 @@ class App {
         this.search = new Search(this.state, this.graph);
         this.trace = new Trace(this.state, this.graph, this.ui);
         this.filter = new Filter(this.state, this.graph);
-        this.socket = new Socket(this.state, this.handleGraphUpdate.bind(this), this.ui);
+        this.socket = new Socket(this.state, this.handleGraphUpdate.bind(this), this.ui,
+            this.handleGraphPatch.bind(this), this.handleGraphLayout.bind(this));
+        this.lod = new LevelOfDetail(this.state, this.graph, this.ui);
+        this.stream = new GraphStream(this.state, this.graph, this.ui);
+        this.latency = new Latency(this.state, this.socket);
+        this.history = new History(this.state, this.ui, this.socket,
+            this.handleGraphUpdate.bind(this), this.handleGraphPatch.bind(this));
     }
 
     async init() {
@@ -38,20 +48,42 @@ class App {
 
         // Set up interactions
         this.interactions.init();
+        this.lod.init();
+        this.latency.init();
 
         // Connect socket and load data
         await this.socket.connect();
         await this.socket.loadInitialData();
     }
 
-    handleGraphUpdate(data) {
+    async handleGraphUpdate(data, arrival = null) {
+        // Live updates are timed until they are on screen
+        if (arrival !== null) {
+            this.latency.received(data.version, arrival, data.layout_pending);
+        }
         this.state.setGraphData(data);
         this.graph.render(data);  // This now includes auto-fit via runLayoutWithFit
-        this.ui.updateStats(data);
+
+        if (data.chunked) {
+            // Large graph: the elements follow in chunks
+            if (!await this.stream.load(data)) {
+                // Superseded by a newer graph, or the graph changed while loading
+                if (!this.state.get('streaming')) {
+                    this.socket.resync();
+                }
+                return;
+            }
+            const cy = this.state.get('cy');
+            this.ui.updateCounts(cy.nodes().length, cy.edges().length);
+        } else {
+            this.ui.updateStats(data);
+        }
+        this.latency.rendered(data.version);
         this.ui.updateTitle(data.title);
         this.search.reset();
         this.trace.reset();
         this.filter.reset();
+        this.lod.reset(data);
 
         // Additional fit after all updates complete
         // Small delay to ensure all animations have started
@@ -59,6 +91,32 @@ class App {
             this.graph.ensureGraphVisible();
         }, 250);
     }
+
+    handleGraphPatch(patch, arrival = null) {
+        if (arrival !== null) {
+            this.latency.received(patch.version, arrival, patch.layout_pending);
+        }
+        this.state.applyPatch(patch);
+        this.graph.applyPatch(patch);
+        this.latency.rendered(patch.version);
+        const cy = this.state.get('cy');
+        this.ui.updateCounts(cy.nodes().length, cy.edges().length);
+        if (patch.title) {
+            this.ui.updateTitle(patch.title);
+        }
+
+        // Keep search, trace and filter selections, only refresh attribute lists
+        this.trace.populateAttributes();
+        this.trace.updateOriginsVisibility();
+        this.filter.populateAttributes();
+        if (this.filter.hiddenAttribute) {
+            this.filter.applyFilter();
+        }
+    }
+
+    handleGraphLayout(layout) {
+        this.graph.applyPositions(layout);
+    }
 }
 
 // Start the app
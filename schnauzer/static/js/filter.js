@@ -55,6 +55,11 @@ export class Filter {
             this.filterSelect.appendChild(option);
         });
 
+        // Keep the current selection when the attribute list is refreshed
+        if (this.hiddenAttribute && attributes.has(this.hiddenAttribute)) {
+            this.filterSelect.value = this.hiddenAttribute;
+        }
+
         console.log(`Found ${attributes.size} filterable attributes`);
     }
 
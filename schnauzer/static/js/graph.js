@@ -8,6 +8,9 @@ export class Graph {
         this.state = state;
         this.ui = ui;
         this.cy = null;
+        this.layoutVersion = null;  // Graph version of the server-side positions
+        this.previous = null;  // Positions of the previous graph while a new one streams in
+        this.streamPositioned = true;  // Every streamed node came with a server position
     }
 
     init() {
@@ -91,6 +94,23 @@ export class Graph {
                     'text-margin-y': -10
                 }
             },
+            {
+                selector: 'node[?meta]',
+                style: {
+                    'label': (ele) => `${this.formatLabel(ele.data('name'))}\n(${ele.data('count')})`,
+                    'shape': 'ellipse',
+                    'width': (ele) => 40 + 12 * Math.log2(ele.data('count') + 1),
+                    'height': (ele) => 40 + 12 * Math.log2(ele.data('count') + 1),
+                    'border-width': 2,
+                    'border-style': 'double'
+                }
+            },
+            {
+                selector: 'edge[?meta]',
+                style: {
+                    'width': (ele) => Math.min(12, 1 + Math.log2(ele.data('count')))
+                }
+            },
             {
                 selector: ':selected',
                 style: {
@@ -348,9 +368,22 @@ export class Graph {
             return;
         }
 
+        // Remember where nodes were, so surviving nodes keep their place
+        const previous = new Map();
+        this.cy.nodes().forEach(node => previous.set(node.id(), { ...node.position() }));
+
         // Clear existing elements
         this.cy.elements().remove();
 
+        if (data.chunked) {
+            // Elements follow in chunks, see addChunk() and finishChunks()
+            this.previous = previous;
+            this.streamPositioned = true;
+            this.layoutVersion = data.layout_version ?? null;
+            return;
+        }
+        this.previous = null;
+
         // Check if we have any elements to add
         const hasNodes = data.elements.nodes && data.elements.nodes.length > 0;
         const hasEdges = data.elements.edges && data.elements.edges.length > 0;
@@ -362,18 +395,248 @@ export class Graph {
 
         // Add new elements
         try {
-            this.cy.add(data.elements);
+            const added = this.cy.add(data.elements);
+            this.layoutVersion = data.layout_version ?? null;
+            const positioned = hasNodes && data.elements.nodes.every(node => node.position);
+            this.layoutNodes(added.nodes(), previous, positioned, data);
+        } catch (error) {
+            console.error('Error rendering graph:', error);
+            if (this.ui) {
+                this.ui.showStatus('Error: Failed to render graph data', 'error');
+            }
+        }
+    }
+
+    layoutNodes(nodes, previous, positioned, data) {
+        if (positioned) {
+            // Positions computed by the server
+            this.runLayoutWithFit('preset', { animate: false });
+            return;
+        }
+
+        // Warm start: survivors stay put, new nodes start next to their neighbours
+        const fresh = nodes.filter(node => !previous.has(node.id()));
+        nodes.forEach(node => {
+            if (previous.has(node.id())) {
+                node.position(previous.get(node.id()));
+            }
+        });
+        const survivors = nodes.length - fresh.length;
+        if (survivors > 0) {
+            this.seedPositions(fresh);
+        }
 
+        if (data.layout_pending) {
+            // Placeholder until the server's positions arrive
+            if (survivors === 0) {
+                this.runLayoutWithFit('grid', { animate: false });
+            }
+        } else if (survivors > 0) {
+            // Short refinement proportional to the change
+            const removed = previous.size - survivors;
+            this.runLayoutWithFit('fcose', {
+                randomize: false,
+                numIter: this.incrementalIterations(fresh.length + removed, nodes.length)
+            });
+        } else {
             // Run default layout with auto-fit
             this.runLayoutWithFit('fcose');
+        }
+    }
+
+    addChunk(group, elements) {
+        if (!this.cy || elements.length === 0) return;
+
+        const previous = this.previous || new Map();
+        this.cy.batch(() => {
+            const added = this.cy.add(group === 'nodes' ? { nodes: elements } : { edges: elements });
+
+            // Show streamed nodes right away: at the server's position, where they
+            // were before, or spread over an area that grows with the graph
+            if (group === 'nodes') {
+                const spread = Math.sqrt(this.cy.nodes().length) * 60;
+                elements.forEach((element, i) => {
+                    if (element.position) return;
+                    this.streamPositioned = false;
+                    const node = added[i];
+                    node.position(previous.get(node.id()) ??
+                        { x: Math.random() * spread, y: Math.random() * spread });
+                });
+            }
+        });
+
+        if (group === 'nodes' && this.cy.nodes().length === elements.length) {
+            this.cy.fit(undefined, 50);
+        }
+    }
+
+    finishChunks(data) {
+        if (!this.cy) return;
+
+        const previous = this.previous || new Map();
+        this.previous = null;
+        this.layoutNodes(this.cy.nodes(), previous, this.streamPositioned, data);
+    }
+
+    applyPatch(patch) {
+        if (!this.cy) {
+            console.error('Cannot apply patch: Cytoscape not initialized');
+            return;
+        }
+
+        const nodes = patch.delta.nodes || {};
+        const edges = patch.delta.edges || {};
+        let added = null;
+
+        try {
+            this.cy.batch(() => {
+                // Edges first, so removing a node does not cascade twice
+                this.removeElements(edges.removed);
+                this.removeElements(nodes.removed);
+
+                this.updateElements(nodes.changed);
+                this.updateElements(edges.changed);
+
+                added = this.cy.add({
+                    nodes: nodes.added || [],
+                    edges: edges.added || []
+                });
+            });
+
+            // Only re-layout if the structure grew; attribute changes keep positions.
+            // New nodes start next to their neighbours, so a short refinement suffices.
+            // With a pending server-side layout the positions arrive separately.
+            const addedNodes = added.nodes();
+            if (addedNodes.length > 0) {
+                this.seedPositions(addedNodes);
+                if (!patch.layout_pending) {
+                    const changed = addedNodes.length + (nodes.removed || []).length;
+                    this.runLayoutWithFit('fcose', {
+                        randomize: false,
+                        numIter: this.incrementalIterations(changed, this.cy.nodes().length)
+                    });
+                }
+            }
         } catch (error) {
-            console.error('Error rendering graph:', error);
+            console.error('Error applying graph patch:', error);
             if (this.ui) {
-                this.ui.showStatus('Error: Failed to render graph data', 'error');
+                this.ui.showStatus('Error: Failed to apply graph update', 'error');
             }
         }
     }
 
+    seedPositions(unplaced) {
+        // Breadth-first from the placed nodes: every new node starts next to
+        // an already placed neighbour, so new parts grow where they attach
+        const pending = new Set(unplaced.map(node => node.id()));
+        const jitter = 40;
+        let frontier = unplaced.toArray();
+
+        while (frontier.length > 0) {
+            const next = [];
+            frontier.forEach(node => {
+                if (!pending.has(node.id())) return;
+
+                const anchors = node.neighborhood('node').filter(n => !pending.has(n.id()));
+                if (anchors.empty()) return;
+
+                let x = 0;
+                let y = 0;
+                anchors.forEach(anchor => {
+                    x += anchor.position('x');
+                    y += anchor.position('y');
+                });
+                node.position({
+                    x: x / anchors.length + (Math.random() - 0.5) * jitter,
+                    y: y / anchors.length + (Math.random() - 0.5) * jitter
+                });
+                pending.delete(node.id());
+
+                node.neighborhood('node').forEach(n => {
+                    if (pending.has(n.id())) next.push(n);
+                });
+            });
+            frontier = next;
+        }
+
+        // Components without any placed node start around the graph's center
+        if (pending.size > 0) {
+            const placed = this.cy.nodes().filter(n => !pending.has(n.id()));
+            const bb = placed.nonempty() ? placed.boundingBox() : { x1: 0, y1: 0, w: 0, h: 0 };
+            const spread = Math.max(100, Math.sqrt(pending.size) * jitter);
+            unplaced.forEach(node => {
+                if (!pending.has(node.id())) return;
+                node.position({
+                    x: bb.x1 + bb.w / 2 + (Math.random() - 0.5) * spread,
+                    y: bb.y1 + bb.h / 2 + (Math.random() - 0.5) * spread
+                });
+            });
+        }
+    }
+
+    incrementalIterations(changed, total) {
+        // Iterations proportional to the changed share of the graph; a quarter
+        // of the graph changing warrants the full budget
+        const full = 2500;
+        if (total === 0) return full;
+        return Math.max(50, Math.min(full, Math.ceil(full * 4 * changed / total)));
+    }
+
+    applyPositions(layout) {
+        if (!this.cy || !layout || !layout.positions) return;
+
+        // Layouts of older versions may arrive late
+        if (this.layoutVersion != null && layout.version < this.layoutVersion) return;
+        this.layoutVersion = layout.version;
+
+        // Nodes without a position (added since) keep their current one
+        this.runLayoutWithFit('preset', {
+            positions: (node) => layout.positions[node.id()] ?? null,
+            animate: this.cy.nodes().length <= 1000
+        });
+    }
+
+    removeElements(ids) {
+        if (!ids || ids.length === 0) return;
+
+        ids.forEach(id => {
+            const element = this.cy.getElementById(String(id));
+            if (element.nonempty()) {
+                element.remove();
+            }
+        });
+    }
+
+    updateElements(elements) {
+        if (!elements || elements.length === 0) return;
+
+        elements.forEach(({ data }) => {
+            const element = this.cy.getElementById(String(data.id));
+            if (element.empty()) {
+                // Unknown element, treat the change as an addition
+                this.cy.add({ group: 'source' in data ? 'edges' : 'nodes', data: data });
+                return;
+            }
+
+            // Cytoscape merges data, so drop attributes that no longer exist
+            const stale = Object.keys(element.data()).filter(key =>
+                !(key in data) && key !== 'id' && key !== 'source' && key !== 'target'
+            );
+            if (stale.length > 0) {
+                element.removeData(stale.join(' '));
+            }
+
+            // Endpoints are immutable in Cytoscape, move() handles rewiring
+            if (element.isEdge() && (String(element.data('source')) !== String(data.source) ||
+                String(element.data('target')) !== String(data.target))) {
+                element.move({ source: String(data.source), target: String(data.target) });
+            }
+
+            const { id, source, target, ...attributes } = data;
+            element.data(attributes);
+        });
+    }
+
     runLayoutWithFit(layoutName, options = {}) {
         if (!this.cy) return;
 
@@ -390,11 +653,13 @@ export class Graph {
 
         // Fit after layout completes
         layout.on('layoutstop', () => {
+            window.dispatchEvent(new CustomEvent('layoutComplete', { detail: { layout: layoutName } }));
             setTimeout(() => {
                 this.ensureGraphVisible();
             }, 100);
         });
 
+        window.dispatchEvent(new CustomEvent('layoutStart', { detail: { layout: layoutName } }));
         layout.run();
         return layout;
     }
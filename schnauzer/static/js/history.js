@@ -0,0 +1,148 @@
+/**
+ * history.js - Time travel through earlier graph versions
+ * Handles the timeline slider and stepping between versions
+ */
+
+// Step through patches for nearby versions, load a full snapshot otherwise
+const MAX_PATCH_STEPS = 10;
+
+export class History {
+    constructor(state, ui, socket, onGraph, onPatch) {
+        this.state = state;
+        this.ui = ui;
+        this.socket = socket;
+        this.onGraph = onGraph;
+        this.onPatch = onPatch;
+        this.versions = [];
+        this.refreshTimeout = null;
+        this.seekTimeout = null;
+        this.busy = false;
+
+        this.init();
+    }
+
+    init() {
+        this.panel = document.getElementById('history-control');
+        this.slider = document.getElementById('history-slider');
+        this.label = document.getElementById('history-label');
+        if (!this.panel || !this.slider) return;
+
+        this.slider.addEventListener('input', () => {
+            this.updateLabel(parseInt(this.slider.value));
+            this.debounceSeek(parseInt(this.slider.value));
+        });
+
+        document.getElementById('history-prev')?.addEventListener('click', () => this.step(-1));
+        document.getElementById('history-next')?.addEventListener('click', () => this.step(1));
+        document.getElementById('history-live')?.addEventListener('click', () => this.goLive());
+
+        // Every live update extends the timeline
+        this.state.on('liveVersion', () => this.debounceRefresh());
+    }
+
+    debounceRefresh() {
+        clearTimeout(this.refreshTimeout);
+        this.refreshTimeout = setTimeout(() => this.refresh(), 500);
+    }
+
+    debounceSeek(index) {
+        clearTimeout(this.seekTimeout);
+        this.seekTimeout = setTimeout(() => this.seek(index), 150);
+    }
+
+    async refresh() {
+        try {
+            const response = await fetch(`/history/${encodeURIComponent(this.socket.channel)}`);
+            if (!response.ok) return;
+            const data = await response.json();
+            this.versions = data.versions || [];
+        } catch (error) {
+            console.error('Error loading graph history:', error);
+            return;
+        }
+
+        // Summarized graphs cannot be patched between versions
+        this.panel.classList.toggle('d-none', this.versions.length < 2 || Boolean(this.state.get('lod')));
+        this.slider.max = Math.max(this.versions.length - 1, 0);
+        if (!this.state.get('browsingHistory')) {
+            this.slider.value = this.slider.max;
+        }
+        this.updateLabel(parseInt(this.slider.value));
+    }
+
+    currentIndex() {
+        const version = this.state.get('graphVersion');
+        return this.versions.findIndex(entry => entry.version === version);
+    }
+
+    step(offset) {
+        const index = this.currentIndex();
+        if (index < 0) return;
+        const target = Math.min(Math.max(index + offset, 0), this.versions.length - 1);
+        this.slider.value = target;
+        this.updateLabel(target);
+        this.seek(target);
+    }
+
+    seek(index) {
+        const target = this.versions[index];
+        const socket = this.state.get('socket');
+        if (!target || !socket || this.busy) return;
+
+        if (index === this.versions.length - 1 && !this.state.get('browsingHistory')) return;
+        this.state.set('browsingHistory', true);
+        this.panel.classList.add('browsing');
+
+        const current = this.currentIndex();
+        this.busy = true;
+
+        if (current >= 0 && Math.abs(index - current) <= MAX_PATCH_STEPS) {
+            // Nearby version: only transfer the deltas in between
+            socket.emit('history_step', { from: this.versions[current].version, to: target.version }, (response) => {
+                this.busy = false;
+                if (!response || !response.patches) {
+                    this.handleUnavailable();
+                    return;
+                }
+                response.patches.forEach(patch => this.onPatch(patch));
+            });
+        } else {
+            socket.emit('history_seek', { version: target.version }, (graph) => {
+                this.busy = false;
+                if (!graph || !graph.elements) {
+                    this.handleUnavailable();
+                    return;
+                }
+                this.onGraph(graph);
+            });
+        }
+    }
+
+    goLive() {
+        this.state.set('browsingHistory', false);
+        this.panel.classList.remove('browsing');
+        this.slider.value = this.slider.max;
+        this.updateLabel(parseInt(this.slider.value));
+        this.socket.resync();
+    }
+
+    handleUnavailable() {
+        // The version was evicted meanwhile
+        if (this.ui) {
+            this.ui.showStatus('This version is no longer available', 'warning', 3000);
+        }
+        this.refresh();
+    }
+
+    updateLabel(index) {
+        if (!this.label) return;
+        const entry = this.versions[index];
+        if (!entry) {
+            this.label.textContent = '';
+            return;
+        }
+        const time = new Date(entry.time * 1000).toLocaleTimeString();
+        const live = index === this.versions.length - 1 ? ' (latest)' : '';
+        this.label.textContent = `${index + 1}/${this.versions.length} · ${time}${live}`;
+    }
+}
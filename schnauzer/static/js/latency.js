@@ -0,0 +1,181 @@
+/**
+ * latency.js - End-to-end update latency
+ * Reports when live updates were received, rendered and laid out, and shows
+ * the per-stage percentiles the server aggregates
+ */
+
+// Clock sync round trips; the fastest one gives the best offset estimate
+const SYNC_SAMPLES = 3;
+const REFRESH_INTERVAL = 2000;
+
+const STAGE_LABELS = {
+    client: 'Client',
+    transport: 'Transport',
+    decode: 'Decode',
+    process: 'Process',
+    delivery: 'Delivery',
+    render: 'Render',
+    layout: 'Layout',
+    total: 'Total'
+};
+
+export class Latency {
+    constructor(state, socket) {
+        this.state = state;
+        this.socket = socket;
+        this.offset = 0;  // Milliseconds to add to the local clock to get the server's
+        this.pending = null;  // The live update being displayed, until it is reported
+        this.layoutsRunning = 0;
+        this.refreshInterval = null;
+    }
+
+    init() {
+        this.panel = document.getElementById('latency-panel');
+        this.table = document.getElementById('latency-table');
+        document.getElementById('toggle-latency')?.addEventListener('click', () => this.toggle());
+
+        this.state.on('connected', (connected) => {
+            if (connected) this.syncClock();
+        });
+        window.addEventListener('layoutStart', () => this.layoutsRunning++);
+        window.addEventListener('layoutComplete', (event) => {
+            this.layoutsRunning = Math.max(0, this.layoutsRunning - 1);
+            this.laidOut(event.detail.layout);
+        });
+    }
+
+    async syncClock() {
+        const socket = this.state.get('socket');
+        if (!socket) return;
+
+        let best = Infinity;
+        for (let i = 0; i < SYNC_SAMPLES; i++) {
+            const sent = Date.now();
+            const reply = await new Promise(resolve => socket.emit('clock_sync', resolve));
+            const now = Date.now();
+            if (!reply || typeof reply.time !== 'number') return;
+            if (now - sent < best) {
+                // The server read its clock about halfway through the round trip
+                best = now - sent;
+                this.offset = reply.time * 1000 - (sent + now) / 2;
+            }
+        }
+    }
+
+    serverTime(local = Date.now()) {
+        return (local + this.offset) / 1000;
+    }
+
+    received(version, arrival, layoutPending) {
+        // An update that never finished its layout is reported as far as it got
+        if (this.pending && this.pending.rendered !== undefined) {
+            this.report(this.pending);
+        }
+        this.pending = {
+            version: version,
+            received: this.serverTime(arrival),
+            layoutPending: Boolean(layoutPending)
+        };
+    }
+
+    rendered(version) {
+        const pending = this.pending;
+        if (!pending || pending.version !== version) return;
+
+        // Elements are on screen once the browser painted the next frame
+        requestAnimationFrame(() => {
+            if (this.pending !== pending) return;
+            pending.rendered = this.serverTime();
+            if (pending.laidOut === undefined && !pending.layoutPending && this.layoutsRunning === 0) {
+                // Nothing left to lay out
+                pending.laidOut = pending.rendered;
+            }
+            if (pending.laidOut !== undefined) {
+                pending.laidOut = Math.max(pending.laidOut, pending.rendered);
+                this.report(pending);
+            }
+        });
+    }
+
+    laidOut(layout) {
+        const pending = this.pending;
+        if (!pending || this.layoutsRunning > 0) return;
+        // With a pending server-side layout, only its positions complete the update
+        if (pending.layoutPending && layout !== 'preset') return;
+
+        pending.laidOut = this.serverTime();
+        if (pending.rendered !== undefined) {
+            this.report(pending);
+        }
+    }
+
+    report(pending) {
+        if (this.pending === pending) {
+            this.pending = null;
+        }
+        const socket = this.state.get('socket');
+        if (!socket || !this.state.get('connected')) return;
+
+        socket.emit('latency_report', {
+            version: pending.version,
+            received: pending.received,
+            rendered: pending.rendered,
+            laid_out: pending.laidOut
+        });
+    }
+
+    toggle() {
+        if (!this.panel) return;
+        const show = this.panel.classList.contains('d-none');
+        this.panel.classList.toggle('d-none', !show);
+        clearInterval(this.refreshInterval);
+        this.refreshInterval = null;
+        if (show) {
+            this.refresh();
+            this.refreshInterval = setInterval(() => this.refresh(), REFRESH_INTERVAL);
+        }
+    }
+
+    async refresh() {
+        try {
+            const response = await fetch(`/latency/${encodeURIComponent(this.socket.channel)}`);
+            if (!response.ok) return;
+            this.renderTable(await response.json());
+        } catch (error) {
+            console.error('Error loading latency:', error);
+        }
+    }
+
+    renderTable(summary) {
+        if (!this.table) return;
+
+        const own = this.state.get('socket')?.id;
+        const viewerCount = Object.keys(summary.viewers || {}).length;
+        const sections = [
+            ['Update', summary.updates],
+            [`All viewers (${viewerCount})`, summary.all_viewers],
+            ['This viewer', own ? (summary.viewers || {})[own] : null]
+        ];
+
+        const rows = [];
+        sections.forEach(([title, stages]) => {
+            const entries = Object.entries(stages || {});
+            if (entries.length === 0) return;
+            rows.push(`<tr class="latency-section"><th colspan="4">${title}</th></tr>`);
+            entries.forEach(([stage, percentiles]) => {
+                rows.push(`<tr><td>${STAGE_LABELS[stage] || stage}</td>` +
+                    ['p50', 'p95', 'p99'].map(key => `<td>${this.formatSeconds(percentiles[key])}</td>`).join('') +
+                    '</tr>');
+            });
+        });
+
+        this.table.innerHTML = rows.length > 0
+            ? rows.join('')
+            : '<tr><td colspan="4" class="text-muted">No updates measured yet</td></tr>';
+    }
+
+    formatSeconds(seconds) {
+        if (seconds === undefined) return '-';
+        return seconds < 1 ? `${(seconds * 1000).toFixed(1)} ms` : `${seconds.toFixed(2)} s`;
+    }
+}
@@ -0,0 +1,100 @@
+/**
+ * lod.js - Level of detail for large graphs
+ * Expands the clusters of a summarized graph on demand
+ */
+
+export class LevelOfDetail {
+    constructor(state, graph, ui) {
+        this.state = state;
+        this.graph = graph;
+        this.ui = ui;
+        this.expanded = [];  // Expanded clusters in expansion order, as { id, name }
+        this.pending = false;
+    }
+
+    init() {
+        const cy = this.state.get('cy');
+        if (!cy) return;
+
+        // Double click on a cluster shows its contents
+        cy.on('dbltap', 'node[?meta]', (evt) => {
+            this.expand(evt.target.id());
+        });
+    }
+
+    async reset(data) {
+        const previous = this.expanded;
+        this.expanded = [];
+        this.state.set('lod', data.lod || null);
+        if (!data.lod) return;
+
+        if (this.ui) {
+            this.ui.showStatus(`Large graph: showing ${data.elements.nodes.length} clusters, double click one to expand it`, 'info', 4000);
+        }
+
+        // Restore the viewer's expansions where the same clusters still exist
+        const cy = this.state.get('cy');
+        for (const cluster of previous) {
+            const node = cy.getElementById(cluster.id);
+            if (node.empty() || node.data('name') !== cluster.name) continue;
+            if (!await this.expand(cluster.id)) break;
+        }
+    }
+
+    expand(clusterId) {
+        const socket = this.state.get('socket');
+        const cy = this.state.get('cy');
+        const node = cy ? cy.getElementById(clusterId) : null;
+        if (!socket || !node || node.empty() || this.pending) return Promise.resolve(false);
+
+        this.pending = true;
+        const request = {
+            cluster: clusterId,
+            expanded: this.expanded.map(cluster => cluster.id),
+            version: this.state.get('graphVersion')
+        };
+
+        return new Promise((resolve) => {
+            socket.emit('lod_expand', request, (contents) => {
+                this.pending = false;
+                if (!contents || contents.error) {
+                    // A newer summary is on its way if the graph changed
+                    console.log(`Cannot expand ${clusterId}: ${contents ? contents.error : 'no response'}`);
+                    resolve(false);
+                    return;
+                }
+                this.replace(node, contents);
+                resolve(true);
+            });
+        });
+    }
+
+    replace(node, contents) {
+        const cy = this.state.get('cy');
+        const center = { ...node.position() };
+        this.expanded.push({ id: node.id(), name: node.data('name') });
+
+        let added = null;
+        cy.batch(() => {
+            node.remove();  // Also removes its merged edges
+            added = cy.add({ nodes: contents.nodes, edges: contents.edges });
+        });
+
+        // Contents start on a circle where the cluster was
+        const nodes = added.nodes();
+        const radius = Math.max(50, Math.sqrt(nodes.length) * 40);
+        nodes.forEach((child, i) => {
+            const angle = 2 * Math.PI * i / nodes.length;
+            child.position({ x: center.x + radius * Math.cos(angle), y: center.y + radius * Math.sin(angle) });
+        });
+
+        this.graph.runLayoutWithFit('fcose', {
+            randomize: false,
+            numIter: this.graph.incrementalIterations(nodes.length, cy.nodes().length)
+        });
+
+        if (this.ui) {
+            this.ui.updateCounts(cy.nodes().length, cy.edges().length);
+        }
+    }
+}
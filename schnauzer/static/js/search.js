@@ -1,14 +1,37 @@
 /**
  * search.js - Search functionality
  * Handles node and edge searching with filters
+ * Queries the server's search index, scanning locally only as a fallback
  */
 
+// Words as Python's \w+ finds them
+const WORD = /[\p{L}\p{N}_]+/gu;
+
+// Lower-case text of an attribute value, as schnauzer.search._text() builds it
+function searchText(value) {
+    if (typeof value === 'string') return value.toLowerCase();
+    if (value === null) return 'none';
+    if (Array.isArray(value)) return value.map(searchText).join(',');
+    if (typeof value === 'object') return pythonJson(value).toLowerCase();
+    return String(value).toLowerCase();
+}
+
+// JSON with the separators of Python's json.dumps()
+function pythonJson(value) {
+    if (Array.isArray(value)) return `[${value.map(pythonJson).join(', ')}]`;
+    if (value !== null && typeof value === 'object') {
+        return `{${Object.entries(value).map(([k, v]) => `${JSON.stringify(k)}: ${pythonJson(v)}`).join(', ')}}`;
+    }
+    return JSON.stringify(value);
+}
+
 export class Search {
     constructor(state, graph) {
         this.state = state;
         this.graph = graph;
         this.searchBox = null;
         this.debounceTimeout = null;
+        this.channel = document.body.dataset.channel || 'default';
 
         this.init();
     }
@@ -29,7 +52,7 @@ export class Search {
         }, 200);
     }
 
-    performSearch(searchTerm) {
+    async performSearch(searchTerm) {
         const cy = this.state.get('cy');
         if (!cy) return;
 
@@ -45,17 +68,23 @@ export class Search {
             return;
         }
 
-        // Parse search term for filters
-        const { filters, generalSearch } = this.parseSearchTerm(term);
-
         // Find matching elements
-        const matchingNodes = cy.nodes().filter(node =>
-            this.elementMatches(node.data(), filters, generalSearch)
-        );
-
-        const matchingEdges = cy.edges().filter(edge =>
-            this.elementMatches(edge.data(), filters, generalSearch)
-        );
+        const matches = await this.fetchMatches(term);
+        if (this.state.get('searchTerm') !== searchTerm) return;  // A newer search started meanwhile
+
+        let matchingNodes, matchingEdges;
+        if (matches) {
+            matchingNodes = this.collect(cy, matches.nodes);
+            matchingEdges = this.collect(cy, matches.edges);
+        } else {
+            const { filters, terms } = this.parseSearchTerm(term);
+            matchingNodes = cy.nodes().filter(node =>
+                this.elementMatches(node.data(), filters, terms)
+            );
+            matchingEdges = cy.edges().filter(edge =>
+                this.elementMatches(edge.data(), filters, terms)
+            );
+        }
 
         // Apply visual states
         this.applySearchHighlight(cy, matchingNodes, matchingEdges);
@@ -69,66 +98,69 @@ export class Search {
         console.log(`Search found ${matchingNodes.length} nodes, ${matchingEdges.length} edges`);
     }
 
+    async fetchMatches(term) {
+        // The server only indexes the live graph
+        if (this.state.get('browsingHistory')) return null;
+
+        try {
+            const response = await fetch(`/search/${encodeURIComponent(this.channel)}?q=${encodeURIComponent(term)}`);
+            if (!response.ok) return null;
+            const matches = await response.json();
+            if (matches.version !== this.state.get('graphVersion')) return null;
+            return matches;
+        } catch (error) {
+            console.error('Search request failed, searching locally:', error);
+            return null;
+        }
+    }
+
+    collect(cy, ids) {
+        return cy.collection(ids.map(id => cy.getElementById(id)).filter(el => el.nonempty()));
+    }
+
+    // Same rules as schnauzer/search.py, so results do not depend on where the query runs
     parseSearchTerm(term) {
         const filters = [];
-        let generalSearchTerms = [];
-
-        // Split search into potential filters and general terms
-        term.split(/\s+/).forEach(part => {
-            if (part.includes(':') && part.split(':').length === 2) {
-                const [attr, value] = part.split(':');
-                if (attr && value) {
-                    filters.push({
-                        attribute: attr.toLowerCase(),
-                        value: value.toLowerCase()
-                    });
+        const terms = [];
+
+        term.toLowerCase().split(/\s+/).forEach(part => {
+            if (part.split(':').length === 2) {
+                const [attribute, value] = part.split(':');
+                if (attribute && value) {
+                    filters.push({ attribute, value });
                 }
-            } else if (part) {
-                generalSearchTerms.push(part);
+            } else {
+                terms.push(...(part.match(WORD) || []));
             }
         });
 
-        return {
-            filters,
-            generalSearch: generalSearchTerms.join(' ')
-        };
+        return { filters, terms };
     }
 
-    elementMatches(data, filters, generalSearch) {
-        // Check filters first
-        for (const filter of filters) {
-            const attrValue = String(data[filter.attribute] || '').toLowerCase();
-            if (!attrValue.includes(filter.value)) {
-                return false;
-            }
+    elementMatches(data, filters, terms) {
+        if (filters.length === 0 && terms.length === 0) {
+            return false;
         }
 
-        // If only filters and they passed, match
-        if (filters.length > 0 && !generalSearch) {
-            return true;
+        const texts = {};
+        for (const [key, value] of Object.entries(data)) {
+            if (value === null || value === undefined) continue;
+            (texts[key.toLowerCase()] ||= []).push(searchText(value));
         }
 
-        // For general search, check all attributes
-        if (generalSearch) {
-            const searchableText = this.getSearchableText(data);
-            return searchableText.includes(generalSearch);
+        // key:value - the attribute contains the value
+        for (const filter of filters) {
+            if (!(texts[filter.attribute] || []).some(text => text.includes(filter.value))) {
+                return false;
+            }
         }
 
-        return false;
-    }
-
-    getSearchableText(data) {
-        return Object.entries(data)
-            .map(([key, value]) => {
-                if (Array.isArray(value)) {
-                    return value.join(' ');
-                } else if (typeof value === 'object' && value !== null) {
-                    return JSON.stringify(value);
-                }
-                return String(value || '');
-            })
-            .join(' ')
-            .toLowerCase();
+        // Other words - an attribute value has a word starting with them
+        if (terms.length > 0) {
+            const words = Object.values(texts).flat().flatMap(text => text.match(WORD) || []);
+            return terms.every(term => words.some(word => word.startsWith(term)));
+        }
+        return true;
     }
 
     applySearchHighlight(cy, matchingNodes, matchingEdges) {
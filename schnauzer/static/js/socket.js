@@ -4,11 +4,16 @@
  */
 
 export class Socket {
-    constructor(state, onGraphUpdate, ui) {
+    constructor(state, onGraphUpdate, ui, onGraphPatch, onGraphLayout) {
         this.state = state;
         this.onGraphUpdate = onGraphUpdate;
+        this.onGraphPatch = onGraphPatch;
+        this.onGraphLayout = onGraphLayout;
         this.ui = ui;
         this.socket = null;
+        this.resyncPending = false;
+        // Channel of the page, e.g. 'pipeline-a' for /g/pipeline-a
+        this.channel = document.body.dataset.channel || 'default';
     }
 
     connect() {
@@ -19,7 +24,8 @@ export class Socket {
                 reconnectionDelay: 1000,
                 reconnectionDelayMax: 5000,
                 forceNew: true,
-                timeout: 20000
+                timeout: 20000,
+                query: { channel: this.channel }
             });
 
             this.state.set('socket', this.socket);
@@ -42,8 +48,19 @@ export class Socket {
                 }
             });
 
-            this.socket.on('graph_update', (data) => {
+            this.socket.on('graph_update', (payload) => {
                 console.log('Received graph update');
+                const arrival = Date.now();
+
+                // The server sends its cached, pre-serialized JSON as binary
+                let data = payload;
+                if (payload instanceof ArrayBuffer || ArrayBuffer.isView(payload)) {
+                    try {
+                        data = JSON.parse(new TextDecoder().decode(payload));
+                    } catch (error) {
+                        data = null;
+                    }
+                }
 
                 // Check what kind of update we received
                 if (!data || !data.elements) {
@@ -55,9 +72,18 @@ export class Socket {
                     return;
                 }
 
+                this.acknowledge(data.version);
+
+                // While browsing the history, only remember that the live graph moved on
+                if (this.state.get('browsingHistory')) {
+                    this.state.set('liveVersion', data.version);
+                    return;
+                }
+                this.state.set('liveVersion', data.version);
+
                 const isEmpty = this.isEmptyGraph(data);
 
-                this.onGraphUpdate(data);
+                this.onGraphUpdate(data, arrival);
 
                 if (this.ui) {
                     if (isEmpty) {
@@ -70,6 +96,39 @@ export class Socket {
                 }
             });
 
+            this.socket.on('graph_layout', (layout) => {
+                // Node positions computed by the server
+                if (layout && layout.positions && this.onGraphLayout && !this.state.get('browsingHistory')) {
+                    this.onGraphLayout(layout);
+                }
+            });
+
+            this.socket.on('graph_patch', (patch) => {
+                const arrival = Date.now();
+                if (!patch || !patch.delta) {
+                    console.error('Received invalid graph patch');
+                    return;
+                }
+                this.acknowledge(patch.version);
+
+                if (this.state.get('browsingHistory')) {
+                    this.state.set('liveVersion', patch.version);
+                    return;
+                }
+                this.state.set('liveVersion', patch.version);
+
+                // Patches only apply on top of the version they were made for,
+                // and never to a summary of clusters or a partially loaded graph
+                if (this.state.get('graphVersion') !== patch.base_version || this.state.get('lod') ||
+                    this.state.get('streaming')) {
+                    console.log(`Graph version ${this.state.get('graphVersion')} does not match patch base ${patch.base_version}, resyncing`);
+                    this.resync();
+                    return;
+                }
+
+                this.onGraphPatch(patch, arrival);
+            });
+
             this.socket.on('connect_error', (error) => {
                 console.error('Connection error:', error);
                 if (this.ui) {
@@ -82,13 +141,24 @@ export class Socket {
         });
     }
 
+    acknowledge(version) {
+        // The server sends the next update once the browser has drawn this
+        // one, so a busy tab gets fewer, merged updates instead of a backlog
+        requestAnimationFrame(() => {
+            if (this.socket && this.state.get('connected')) {
+                this.socket.emit('graph_ack', { version: version });
+            }
+        });
+    }
+
     async loadInitialData() {
         if (this.ui) {
             this.ui.showStatus('Checking for graph data...', 'info');
         }
 
         try {
-            const response = await fetch('/graph-data');
+            // Large graphs arrive as a manifest, their elements are streamed
+            const response = await fetch(`/graph-data/${encodeURIComponent(this.channel)}?chunked=1`);
             if (!response.ok) {
                 throw new Error(`HTTP error! Status: ${response.status}`);
             }
@@ -123,9 +193,22 @@ export class Socket {
         }
     }
 
+    resync() {
+        // Fetch the full graph once, even if several patches arrive meanwhile
+        if (this.resyncPending) return;
+        this.resyncPending = true;
+
+        this.loadInitialData()
+            .catch(() => {})
+            .finally(() => {
+                this.resyncPending = false;
+            });
+    }
+
     isEmptyGraph(data) {
         // Check if this is the default empty graph
         if (!data || !data.elements) return true;
+        if (data.chunked) return data.chunked.nodes + data.chunked.edges === 0;
 
         const hasNodes = data.elements.nodes && data.elements.nodes.length > 0;
         const hasEdges = data.elements.edges && data.elements.edges.length > 0;
@@ -8,8 +8,13 @@ export class State {
         this.data = {
             // Graph data
             graphData: null,
+            graphVersion: null,  // Server version of the rendered graph
+            liveVersion: null,  // Latest version known to the server
+            browsingHistory: false,  // Showing an earlier version instead of the live graph
+            lod: null,  // Summary info if the graph is shown as clusters
+            streaming: false,  // A large graph is being loaded in chunks
             cy: null,  // Cytoscape instance reference
-            traces: null,
+            traceCount: 0,  // Number of traced messages, paths are fetched on demand
 
             // UI state
             selectedNode: null,
@@ -50,10 +55,23 @@ export class State {
     // Specific setters for complex state
     setGraphData(data) {
         this.data.graphData = data;
-        this.data.traces = data.traces || null;
+        this.data.graphVersion = data.version ?? null;
+        this.data.traceCount = data.trace_count || 0;
         this.notify('graphData', data);
     }
 
+    applyPatch(patch) {
+        // graphData keeps the last full snapshot; the live elements are in cy
+        this.data.graphVersion = patch.version;
+        if (patch.title && this.data.graphData) {
+            this.data.graphData.title = patch.title;
+        }
+        if ('trace_count' in patch) {
+            this.data.traceCount = patch.trace_count || 0;
+        }
+        this.notify('graphPatch', patch);
+    }
+
     setCy(cy) {
         this.data.cy = cy;
     }
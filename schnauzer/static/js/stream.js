@@ -0,0 +1,88 @@
+/**
+ * stream.js - Progressive loading of large graphs
+ * Fetches nodes and edges in chunks sized to the measured render time
+ */
+
+// Render time per chunk that keeps the page responsive
+const TARGET_CHUNK_MS = 50;
+const MIN_CHUNK = 200;
+const MAX_CHUNK = 20000;
+
+export class GraphStream {
+    constructor(state, graph, ui) {
+        this.state = state;
+        this.graph = graph;
+        this.ui = ui;
+        this.chunkSize = 2000;  // Adapted to this browser while loading
+        this.generation = 0;
+    }
+
+    async load(manifest) {
+        // A newer graph supersedes a load in progress
+        const generation = ++this.generation;
+        const total = manifest.chunked.nodes + manifest.chunked.edges;
+        let loaded = 0;
+        this.state.set('streaming', true);
+
+        try {
+            // Nodes first, so every edge finds its endpoints
+            for (const group of ['nodes', 'edges']) {
+                let offset = 0;
+                while (offset < manifest.chunked[group]) {
+                    const elements = await this.request(manifest.version, group, offset);
+                    if (generation !== this.generation) return false;
+                    if (!elements) return false;
+
+                    const start = performance.now();
+                    this.graph.addChunk(group, elements);
+                    await this.nextFrame();  // Let the browser paint and handle input
+                    this.adapt(elements.length, performance.now() - start);
+
+                    offset += elements.length;
+                    loaded += elements.length;
+                    if (this.ui) {
+                        this.ui.showStatus(`Loading graph... ${Math.floor(100 * loaded / total)}%`, 'info');
+                    }
+                    if (elements.length === 0) break;
+                }
+            }
+
+            this.graph.finishChunks(manifest);
+            if (this.ui) {
+                this.ui.showStatus('Graph loaded successfully', 'success', 2000);
+            }
+            return true;
+        } finally {
+            if (generation === this.generation) {
+                this.state.set('streaming', false);
+            }
+        }
+    }
+
+    request(version, group, offset) {
+        const socket = this.state.get('socket');
+        if (!socket) return Promise.resolve(null);
+
+        return new Promise((resolve) => {
+            socket.emit('graph_chunk', { version, group, offset, count: this.chunkSize }, (response) => {
+                if (!response || response.error) {
+                    console.log(`Graph chunk unavailable: ${response ? response.error : 'no response'}`);
+                    resolve(null);
+                    return;
+                }
+                resolve(response.elements);
+            });
+        });
+    }
+
+    adapt(count, elapsed) {
+        // Scale towards the target time, at most doubling or halving per chunk
+        if (count < this.chunkSize) return;
+        const factor = Math.min(2, Math.max(0.5, TARGET_CHUNK_MS / Math.max(elapsed, 1)));
+        this.chunkSize = Math.round(Math.min(MAX_CHUNK, Math.max(MIN_CHUNK, this.chunkSize * factor)));
+    }
+
+    nextFrame() {
+        return new Promise(resolve => requestAnimationFrame(() => resolve()));
+    }
+}
@@ -8,6 +8,7 @@ export class Trace {
         this.state = state;
         this.graph = graph;
         this.ui = ui;
+        this.channel = document.body.dataset.channel || 'default';
 
         this.traceSelect = null;
         this.originsCheckbox = null;
@@ -61,6 +62,12 @@ export class Trace {
             option.textContent = attr;
             this.traceSelect.appendChild(option);
         });
+
+        // Keep the current selection when the attribute list is refreshed
+        const selected = this.state.get('traceAttribute');
+        if (selected && attributes.has(selected)) {
+            this.traceSelect.value = selected;
+        }
     }
 
     setupListeners() {
@@ -93,8 +100,7 @@ export class Trace {
     updateOriginsVisibility() {
         if (!this.originsContainer) return;
 
-        const traces = this.state.get('traces');
-        if (traces) {
+        if (this.state.get('traceCount')) {
             this.originsContainer.classList.remove('d-none');
         } else {
             this.originsContainer.classList.add('d-none');
@@ -147,20 +153,19 @@ export class Trace {
         console.log(`Traced ${attribute}="${value}": found ${matches.length} matches`);
     }
 
-    traceOrigins(edge) {
+    async traceOrigins(edge) {
         const msgId = edge.data('msg_id');
         if (msgId === undefined || msgId === null) {
             console.log('Edge has no msg_id');
             return;
         }
 
-        const traces = this.state.get('traces');
-        if (!traces) {
+        if (!this.state.get('traceCount')) {
             console.log('No traces available');
             return;
         }
 
-        const paths = traces[String(msgId)];
+        const paths = await this.fetchPaths(msgId);
         if (!paths || paths.length === 0) {
             console.log(`No paths found for msg_id ${msgId}`);
             return;
@@ -179,6 +184,23 @@ export class Trace {
         }
     }
 
+    async fetchPaths(msgId) {
+        // The server resolves paths to edge ids, for the version on screen
+        const version = this.state.get('graphVersion');
+        const query = version !== null ? `?version=${version}` : '';
+        try {
+            const response = await fetch(
+                `/traces/${encodeURIComponent(this.channel)}/${encodeURIComponent(msgId)}${query}`);
+            if (!response.ok) return null;
+            const result = await response.json();
+            if (version !== null && result.version !== version) return null;
+            return result.paths;
+        } catch (error) {
+            console.error('Failed to load traces:', error);
+            return null;
+        }
+    }
+
     highlightPaths(paths, clickedEdge) {
         const cy = this.state.get('cy');
         if (!cy) return;
@@ -190,59 +212,21 @@ export class Trace {
 
         // Mark all paths as secondary
         paths.forEach(path => {
-            const pathEdges = this.tracePathBackwards(path, clickedEdge, cy);
-            pathEdges.forEach(edge => {
-                edge.addClass('trace-highlight-secondary');
-            });
+            this.pathEdges(path, clickedEdge, cy).addClass('trace-highlight-secondary');
         });
 
         // Mark current path as primary
         if (paths[currentIndex]) {
-            const currentPathEdges = this.tracePathBackwards(paths[currentIndex], clickedEdge, cy);
-            currentPathEdges.forEach(edge => {
-                edge.removeClass('trace-highlight-secondary');
-                edge.addClass('trace-highlight');
-            });
+            this.pathEdges(paths[currentIndex], clickedEdge, cy)
+                .removeClass('trace-highlight-secondary')
+                .addClass('trace-highlight');
         }
     }
 
-    tracePathBackwards(path, startEdge, cy) {
-        const pathEdges = [startEdge];
-
-        // Build production map
-        const productionMap = new Map();
-        path.forEach(([msgId, componentName, consumedIds]) => {
-            if (componentName && consumedIds) {
-                const key = `${componentName}|${msgId}`;
-                productionMap.set(key, new Set(consumedIds.map(id => Number(id))));
-            }
-        });
-
-        // Find edges in path
-        cy.edges().forEach(edge => {
-            if (edge === startEdge) return;
-
-            const edgeMsgId = Number(edge.data('msg_id'));
-            const edgeTarget = edge.target().data('name');
-            const edgeSource = edge.source().data('name');
-
-            // Check if this edge is part of the path
-            for (const [key, consumedIds] of productionMap) {
-                const [component] = key.split('|');
-
-                if (component === edgeTarget && consumedIds.has(edgeMsgId)) {
-                    // Verify source
-                    for (const [pathMsgId, pathComponent] of path) {
-                        if (Number(pathMsgId) === edgeMsgId && pathComponent === edgeSource) {
-                            pathEdges.push(edge);
-                            return;
-                        }
-                    }
-                }
-            }
-        });
-
-        return pathEdges;
+    pathEdges(path, startEdge, cy) {
+        // Paths arrive as edge ids, so this is a lookup per edge
+        const edges = path.map(id => cy.getElementById(id)).filter(el => el.nonempty());
+        return cy.collection([startEdge, ...edges.map(el => el[0])]);
     }
 
     addPathNavigation() {
@@ -305,8 +289,8 @@ export class Trace {
         const selectedEdgeId = this.state.get('selectedEdge');
 
         if (cy && selectedEdgeId) {
-            const edge = cy.edges().filter(e => e.data('id') === selectedEdgeId)[0];
-            if (edge) {
+            const edge = cy.getElementById(selectedEdgeId);
+            if (edge.nonempty()) {
                 this.highlightPaths(paths, edge);
                 this.addPathNavigation();
             }
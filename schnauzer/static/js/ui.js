@@ -134,9 +134,13 @@ export class UI {
             return;
         }
 
-        const nodeCount = data.elements.nodes?.length || 0;
-        const edgeCount = data.elements.edges?.length || 0;
+        // Summaries count the whole graph, not the clusters
+        const nodeCount = data.lod ? data.lod.nodes : data.elements.nodes?.length || 0;
+        const edgeCount = data.lod ? data.lod.edges : data.elements.edges?.length || 0;
+        this.updateCounts(nodeCount, edgeCount);
+    }
 
+    updateCounts(nodeCount, edgeCount) {
         if (this.elements.nodeCount) {
             this.elements.nodeCount.textContent = nodeCount;
         }
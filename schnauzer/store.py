@@ -0,0 +1,886 @@
+"""
+Server-side graph state.
+
+This module holds the versioned graph state that the server keeps for its
+viewers. Full graphs replace the state wholesale, while patches produced by
+schnauzer.delta are applied in place so that an update costs O(delta)
+instead of O(graph).
+
+A server can host several independent graphs, one per named channel. The
+ChannelStore keeps one GraphState per channel and enforces the channel
+count, per-channel size and idle eviction limits. Each state may keep a
+bounded schnauzer.history.History of its recent versions, and builds a
+schnauzer.search.SearchIndex of its elements on the first search. Message
+traces are validated on arrival and compiled into edge-id paths by
+schnauzer.traces on the first lookup of a version; viewers only receive
+the number of traced messages and fetch the paths they click on. Batches of
+fine-grained mutation events are turned into deltas by schnauzer.events
+and applied like patches.
+"""
+import itertools
+import logging
+import random
+import re
+import threading
+import time
+
+from schnauzer.aggregate import Aggregation, DEFAULT_GROUP_BY
+from schnauzer.delta import index_elements, node_id, edge_id, diff, delta_size, invert
+from schnauzer.events import events_to_delta, validate_events
+from schnauzer.history import History
+from schnauzer.payload import Payload
+from schnauzer.search import SearchIndex, parse_query
+from schnauzer.traces import compile_traces, message_key, validate_traces
+
+log = logging.getLogger(__name__)
+
+DEFAULT_TITLE = 'NetworkX Graph Visualization'
+
+DEFAULT_CHANNEL = 'default'
+
+_CHANNEL_NAME = re.compile(r'^[A-Za-z0-9_.-]{1,64}$')
+
+
+class VersionMismatch(Exception):
+    """Raised when a patch does not apply to the current graph version."""
+
+    def __init__(self, expected, actual):
+        super().__init__(f"Patch expects version {expected}, current version is {actual}")
+        self.expected = expected
+        self.actual = actual
+
+
+class CapacityExceeded(Exception):
+    """Raised when an update would exceed a channel's limits."""
+
+
+class _VersionSequence:
+    """Thread-safe sequence of version numbers that can skip ahead."""
+
+    def __init__(self, start):
+        self._next = start
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with self._lock:
+            version = self._next
+            self._next += 1
+            return version
+
+    def skip_past(self, version):
+        """Make sure all following versions are greater than version."""
+        with self._lock:
+            self._next = max(self._next, version + 1)
+
+
+class GraphState:
+    """
+    Versioned graph state in Cytoscape.js format.
+
+    Nodes and edges are kept in id-indexed dicts so patches can be applied
+    without rebuilding the whole graph. Every accepted update moves
+    ``version`` to the next number of the version sequence; clients use it
+    as the base for their next patch.
+
+    Attributes:
+        version (int): Version of the current state, 0 for the empty graph.
+        title (str): Title displayed above the graph.
+        traces (dict): Optional trace data sent by the client, see
+            schnauzer.traces.
+        meta (dict): Graph-level keys such as 'directed' and 'multigraph'.
+        nodes (dict): Mapping of node id to Cytoscape node element.
+        edges (dict): Mapping of edge id to Cytoscape edge element.
+        max_elements (int): Maximum number of nodes plus edges, or None.
+        last_update (float): time.monotonic() of the last accepted update.
+        positions (dict): Node positions computed by the server-side
+            layout, mapping node id to ``{'x': ..., 'y': ...}``.
+        layout_version (int): Version the positions were computed for,
+            0 if there are none.
+        history (History): Recent versions of the graph, or None.
+    """
+
+    def __init__(self, title=DEFAULT_TITLE, max_elements=None, versions=None, history=None):
+        """
+        Initialize an empty graph state.
+
+        Args:
+            title (str, optional): Title of the empty graph.
+            max_elements (int, optional): Reject updates that would grow the
+                graph beyond this many nodes plus edges. Defaults to None,
+                which means unlimited.
+            versions (iterator, optional): Source of version numbers, which
+                may be shared between states. Defaults to 1, 2, 3, ...
+            history (History, optional): Records every accepted update.
+                Defaults to None, which keeps no history.
+        """
+        self.max_elements = max_elements
+        self.history = history
+        self._versions = versions if versions is not None else itertools.count(1)
+        self.last_update = time.monotonic()
+        self.lock = threading.RLock()
+        self.version = 0
+        self.title = title
+        self.traces = None
+        self.meta = {}
+        self.nodes = {}
+        self.edges = {}
+        self.positions = {}
+        self.layout_version = 0
+        self._graph = None
+        self._graph_key = None
+        self._payloads = {}
+        self._payload_lock = threading.Lock()
+        self._search = None
+        self._aggregation = None
+        self._aggregation_key = None
+        self._aggregation_lock = threading.Lock()
+        self._compiled_traces = None
+        self._compiled_version = None
+
+    def replace(self, graph, version=None):
+        """
+        Replace the state with a complete graph.
+
+        Args:
+            graph (dict): Graph in Cytoscape.js format with an 'elements'
+                key, as produced by nx.cytoscape_data.
+            version (int, optional): Version of the new state, for replicas
+                of another server's state. Defaults to None, the next
+                number of the version sequence.
+
+        Returns:
+            int: The new version number.
+
+        Raises:
+            CapacityExceeded: If the graph has more than max_elements
+                nodes plus edges.
+            TraceError: If the graph carries malformed traces.
+        """
+        nodes, edges = index_elements(graph.get('elements') or {})
+        self._check_capacity(len(nodes) + len(edges))
+        if graph.get('traces'):
+            validate_traces(graph['traces'])
+        with self.lock:
+            if self.history is not None or self._search is not None:
+                forward = diff(self.nodes, self.edges, nodes, edges)
+            if self.history is not None:
+                inverse = invert(forward, self.nodes, self.edges)
+            base_version = self.version
+
+            self.nodes = nodes
+            self.edges = edges
+            self.title = graph.get('title') or DEFAULT_TITLE
+            self.traces = graph.get('traces')
+            self.meta = {key: graph[key] for key in ('directed', 'multigraph') if key in graph}
+            self.version = version if version is not None else next(self._versions)
+            self.last_update = time.monotonic()
+
+            if self._search is not None:
+                self._update_search(forward)
+            if self.history is not None:
+                self._record(base_version, forward, inverse)
+            return self.version
+
+    def apply_patch(self, patch, version=None):
+        """
+        Apply a delta patch to the state.
+
+        Args:
+            patch (dict): Patch message with 'base_version', 'delta' and
+                optionally 'title', 'traces', 'directed' and 'multigraph'.
+            version (int, optional): Version after the patch, for replicas
+                of another server's state. Defaults to None, the next
+                number of the version sequence.
+
+        Returns:
+            int: The new version number.
+
+        Raises:
+            VersionMismatch: If the patch was computed against a different
+                version than the current one.
+            CapacityExceeded: If the patch would grow the graph beyond
+                max_elements nodes plus edges.
+            TraceError: If the patch carries malformed traces.
+        """
+        delta = patch.get('delta') or {}
+        if patch.get('traces'):
+            validate_traces(patch['traces'])
+        with self.lock:
+            if patch.get('base_version') != self.version:
+                raise VersionMismatch(patch.get('base_version'), self.version)
+            return self._apply_delta(delta, patch, version)
+
+    def apply_events(self, message):
+        """
+        Apply a batch of fine-grained mutation events to the state.
+
+        The batch is applied atomically: it is turned into a delta against
+        the current graph, which is applied as one patch.
+
+        Args:
+            message (dict): Events message with 'events' and optionally
+                'title', 'directed' and 'multigraph', see schnauzer.events.
+                The graph's own 'directed' and 'multigraph' flags are used
+                if the message does not carry them.
+
+        Returns:
+            tuple: ``(version, patch)`` - the version after the batch and
+                the equivalent patch with 'base_version', 'title' and
+                'delta'. patch is None if the batch changed nothing, in
+                which case no new version is created.
+
+        Raises:
+            EventError: If an event is malformed.
+            CapacityExceeded: If the batch would grow the graph beyond
+                max_elements nodes plus edges.
+        """
+        events = message.get('events')
+        validate_events(events)
+        with self.lock:
+            for key in ('directed', 'multigraph'):
+                if key in message:
+                    self.meta[key] = bool(message[key])
+            delta = events_to_delta(self.nodes, self.edges, events,
+                                    directed=self.meta.get('directed', True),
+                                    multigraph=self.meta.get('multigraph', False))
+            title = message.get('title')
+            if delta_size(delta) == 0 and (not title or title == self.title):
+                return self.version, None
+
+            base_version = self.version
+            version = self._apply_delta(delta, {'title': title})
+            return version, {'base_version': base_version, 'title': self.title, 'delta': delta}
+
+    def _apply_delta(self, delta, patch, version=None):
+        """
+        Apply a delta and move to the next version. Caller holds the lock.
+
+        Args:
+            delta (dict): Delta to apply, see schnauzer.delta.
+            patch (dict): Message the delta came with, for its optional
+                'title', 'traces', 'directed' and 'multigraph'.
+            version (int, optional): Version to move to. Defaults to the
+                next number of the version sequence.
+
+        Returns:
+            int: The new version number.
+        """
+        if self.max_elements is not None:
+            growth = sum(
+                len(group.get('added') or []) - len(group.get('removed') or [])
+                for group in (delta.get('nodes') or {}, delta.get('edges') or {})
+            )
+            self._check_capacity(self.size + growth)
+
+        if self.history is not None:
+            inverse = invert(delta, self.nodes, self.edges)
+        base_version = self.version
+
+        self._apply_group(self.nodes, delta.get('nodes') or {}, node_id)
+        self._apply_group(self.edges, delta.get('edges') or {}, edge_id)
+
+        if patch.get('title'):
+            self.title = patch['title']
+        if 'traces' in patch:
+            self.traces = patch['traces']
+        for key in ('directed', 'multigraph'):
+            if key in patch:
+                self.meta[key] = bool(patch[key])
+
+        self.version = version if version is not None else next(self._versions)
+        self.last_update = time.monotonic()
+
+        if self._search is not None:
+            self._update_search(delta)
+        if self.history is not None:
+            self._record(base_version, delta, inverse)
+        return self.version
+
+    def _record(self, base_version, forward, inverse):
+        """Add the current version to the history. Caller holds the lock."""
+        self.history.record(self.version, base_version, forward, inverse, title=self.title,
+                            traces=self.traces, meta=self.meta,
+                            nodes=len(self.nodes), edges=len(self.edges))
+
+    def _update_search(self, delta):
+        """Bring the search index up to date with a delta. Caller holds the lock."""
+        node_index, edge_index = self._search
+        node_index.apply(delta.get('nodes') or {}, self.nodes)
+        edge_index.apply(delta.get('edges') or {}, self.edges)
+
+    def search(self, query):
+        """
+        Find the elements matching a search query.
+
+        The index is built on the first search and kept up to date by
+        every later update, so graphs nobody searches cost nothing extra.
+
+        Args:
+            query (str): Query in the syntax of schnauzer.search, e.g.
+                ``'type:database srv'``.
+
+        Returns:
+            dict: 'nodes' and 'edges' with the ids of the matching
+                elements, and the 'version' they were found in.
+        """
+        filters, terms = parse_query(query)
+        with self.lock:
+            if not filters and not terms:
+                return {'nodes': [], 'edges': [], 'version': self.version}
+            if self._search is None:
+                self._search = (SearchIndex.build(self.nodes), SearchIndex.build(self.edges))
+            node_index, edge_index = self._search
+            return {
+                'nodes': list(node_index.search(filters, terms)),
+                'edges': list(edge_index.search(filters, terms)),
+                'version': self.version,
+            }
+
+    def trace_paths(self, msg_id, version=None):
+        """
+        Origin paths of a message as lists of edge ids.
+
+        The traces of the current version are compiled once, on the first
+        lookup, so every later lookup is a dict access. Earlier versions
+        are reconstructed from the history and only the requested message
+        is compiled.
+
+        Args:
+            msg_id: Message id as found in the 'msg_id' of an edge.
+            version (int, optional): Version the caller shows. Defaults to
+                the current one.
+
+        Returns:
+            list: One list of edge ids per path, empty if the message has
+                no traces. None if the version is not in the history.
+        """
+        key = message_key(msg_id)
+        with self.lock:
+            if version is None or version == self.version:
+                if self._compiled_version != self.version:
+                    self._compiled_traces = compile_traces(self.traces or {}, self.nodes, self.edges)
+                    self._compiled_version = self.version
+                return self._compiled_traces.get(key, [])
+
+            state = self._reconstruct(version)
+            if state is None:
+                return None
+            nodes, edges, target = state
+            traces = {k: paths for k, paths in (target['traces'] or {}).items() if message_key(k) == key}
+            return compile_traces(traces, nodes, edges).get(key, [])
+
+    def snapshot(self, version):
+        """
+        Reconstruct an earlier version of the graph from the history.
+
+        Starts from a copy of the current graph and applies the inverse
+        deltas of all newer versions, so the cost is one copy plus the
+        size of the deltas in between. Nodes keep their current
+        server-side positions, so the picture stays comparable.
+
+        Args:
+            version (int): Version to reconstruct.
+
+        Returns:
+            dict: The graph at that version in the format of to_dict(),
+                or None if the version is not in the history.
+        """
+        with self.lock:
+            if version == self.version:
+                return self.to_dict()
+            state = self._reconstruct(version)
+            if state is None:
+                return None
+            nodes, edges, target = state
+            return self._graph_dict(nodes, edges, version, target['title'], target['traces'], target['meta'])
+
+    def _reconstruct(self, version):
+        """Nodes, edges and history entry of an earlier version, or None. Caller holds the lock."""
+        steps = self.history.path(self.version, version) if self.history is not None else None
+        if steps is None:
+            return None
+
+        nodes = dict(self.nodes)
+        edges = dict(self.edges)
+        for entry, direction in steps:
+            delta = entry[direction]
+            self._apply_group(nodes, delta.get('nodes') or {}, node_id)
+            self._apply_group(edges, delta.get('edges') or {}, edge_id)
+        return nodes, edges, self.history.entry(version)
+
+    def history_patches(self, from_version, to_version):
+        """
+        Build the patches that move a viewer between two versions.
+
+        Args:
+            from_version (int): Version the viewer shows.
+            to_version (int): Version the viewer wants to see.
+
+        Returns:
+            list: Patch dicts with 'base_version', 'version', 'delta',
+                'title' and 'trace_count', in application order. None if either
+                version is not in the history.
+        """
+        with self.lock:
+            steps = self.history.path(from_version, to_version) if self.history is not None else None
+            if steps is None:
+                return None
+
+            patches = []
+            for entry, direction in steps:
+                if direction == 'forward':
+                    base, target = entry['base_version'], entry
+                else:
+                    base, target = entry['version'], self.history.entry(entry['base_version'])
+                patches.append({
+                    'base_version': base,
+                    'version': target['version'],
+                    'delta': entry[direction],
+                    'title': target['title'],
+                    'trace_count': len(target['traces'] or {}),
+                })
+            return patches
+
+    def structure(self):
+        """
+        Snapshot of everything the layout of the graph depends on.
+
+        Returns:
+            tuple: ``(version, node_ids, edges, directed)`` where edges is a
+                list of ``(source, target)`` id pairs.
+        """
+        with self.lock:
+            edges = [(str(element['data']['source']), str(element['data']['target']))
+                     for element in self.edges.values()]
+            return self.version, list(self.nodes), edges, bool(self.meta.get('directed'))
+
+    def set_positions(self, version, positions):
+        """
+        Store node positions computed for a version of this graph.
+
+        Positions computed for an older version are still accepted as long
+        as they are newer than the stored ones; nodes added since then stay
+        without a position until the next layout.
+
+        Args:
+            version (int): Version the positions were computed for.
+            positions (dict): Mapping of node id to ``{'x': ..., 'y': ...}``.
+
+        Returns:
+            bool: True if the positions were stored.
+        """
+        with self.lock:
+            if version < self.layout_version:
+                return False
+            self.positions = positions
+            self.layout_version = version
+            return True
+
+    def payload(self, manifest=False, **extra):
+        """
+        Serialized form of the current state, built once per version.
+
+        Concurrent callers wait for a single serialization instead of each
+        building their own, and the state lock is only held while taking
+        the snapshot, so updates are not blocked by serialization.
+
+        Args:
+            manifest (bool, optional): Leave out the elements and describe
+                them in a 'chunked' key with the number of 'nodes' and
+                'edges' instead; viewers then fetch them with chunk().
+                Defaults to False.
+            **extra: Additional top-level keys for the graph dict. They are
+                part of the cache key.
+
+        Returns:
+            Payload: JSON of to_dict() plus extra.
+        """
+        with self._payload_lock:
+            with self.lock:
+                graph = self._snapshot()
+                key = (manifest, tuple(sorted(extra.items())))
+                payload = self._payloads.get(key)
+                if payload is not None:
+                    return payload
+
+            snapshot = graph
+            graph = dict(snapshot, **extra)
+            if manifest:
+                elements = graph['elements']
+                graph['chunked'] = {'nodes': len(elements['nodes']), 'edges': len(elements['edges'])}
+                graph['elements'] = {'nodes': [], 'edges': []}
+            payload = Payload.from_graph(graph)
+            with self.lock:
+                # Only cache it if no update arrived meanwhile
+                if self._graph is snapshot:
+                    self._payloads[key] = payload
+            return payload
+
+    def chunk(self, version, group, offset, count):
+        """
+        Slice of the elements of the current version.
+
+        Args:
+            version (int): Version the caller is loading.
+            group (str): 'nodes' or 'edges'.
+            offset (int): Index of the first element.
+            count (int): Maximum number of elements.
+
+        Returns:
+            list: Elements in the order of to_dict(), or None if the state
+                has moved on from version or group is unknown.
+        """
+        with self.lock:
+            if version != self.version or group not in ('nodes', 'edges'):
+                return None
+            return self._snapshot()['elements'][group][offset:offset + count]
+
+    def _snapshot(self):
+        """to_dict() of the current version and layout, built once. Caller holds the lock."""
+        key = (self.version, self.layout_version)
+        if self._graph_key != key:
+            self._graph = self.to_dict()
+            self._graph_key = key
+            self._payloads = {}
+        return self._graph
+
+    def aggregation(self, group_by=DEFAULT_GROUP_BY, **options):
+        """
+        Cluster hierarchy of the current state, built once per version.
+
+        Like payload(), the state lock is only held while taking the
+        snapshot, so updates are not blocked while the clusters are found.
+
+        Args:
+            group_by (str, optional): 'component', 'community' or a node
+                attribute. Defaults to 'community'.
+            **options: max_clusters and max_size for the Aggregation.
+
+        Returns:
+            Aggregation: Clusters of the current version.
+        """
+        with self._aggregation_lock:
+            with self.lock:
+                key = (self.version, group_by, tuple(sorted(options.items())))
+                if self._aggregation_key == key:
+                    return self._aggregation
+                nodes = dict(self.nodes)
+                edges = dict(self.edges)
+                header = {'title': self.title, 'version': self.version, **self.meta}
+                if self.traces:
+                    header['trace_count'] = len(self.traces)
+
+            self._aggregation = Aggregation(nodes, edges, group_by, directed=bool(header.get('directed')),
+                                            header=header, **options)
+            self._aggregation_key = key
+            return self._aggregation
+
+    @property
+    def size(self):
+        """int: Number of nodes plus edges in the current graph."""
+        return len(self.nodes) + len(self.edges)
+
+    def _check_capacity(self, size):
+        """Raise CapacityExceeded if size is above max_elements."""
+        if self.max_elements is not None and size > self.max_elements:
+            raise CapacityExceeded(
+                f"Graph with {size} elements exceeds the limit of {self.max_elements}")
+
+    @staticmethod
+    def _apply_group(index, group, id_of):
+        """Apply one 'nodes' or 'edges' section of a delta to an index."""
+        for eid in group.get('removed') or []:
+            index.pop(eid, None)
+        for element in group.get('added') or []:
+            data = element['data']
+            data['id'] = id_of(data)
+            index[data['id']] = element
+        for element in group.get('changed') or []:
+            data = element['data']
+            data['id'] = id_of(data)
+            index[data['id']] = element
+
+    def export(self):
+        """
+        Everything a replica needs to reproduce the current state.
+
+        Returns:
+            dict: Graph for replace() with the 'traces' themselves instead
+                of their count, the 'version', and the server-side layout's
+                'positions' and 'layout_version' kept apart from the nodes.
+        """
+        with self.lock:
+            graph = {
+                'elements': {
+                    'nodes': list(self.nodes.values()),
+                    'edges': list(self.edges.values()),
+                },
+                'title': self.title,
+                'version': self.version,
+                'positions': self.positions,
+                'layout_version': self.layout_version,
+            }
+            graph.update(self.meta)
+            if self.traces:
+                graph['traces'] = self.traces
+            return graph
+
+    def to_dict(self):
+        """
+        Build the Cytoscape.js representation of the current state.
+
+        Returns:
+            dict: Graph with 'elements', 'title', 'version' and, if present,
+                'trace_count' and the graph-level metadata. The traces
+                themselves are served by trace_paths(). If the server-side
+                layout has run, nodes carry a 'position' and the graph a
+                'layout_version'.
+        """
+        with self.lock:
+            return self._graph_dict(self.nodes, self.edges, self.version, self.title, self.traces, self.meta)
+
+    def _graph_dict(self, nodes, edges, version, title, traces, meta):
+        """Assemble a graph dict from node and edge indices. Caller holds the lock."""
+        positions = self.positions
+        if positions:
+            node_list = [
+                {**element, 'position': positions[nid]} if nid in positions else element
+                for nid, element in nodes.items()
+            ]
+        else:
+            node_list = list(nodes.values())
+
+        graph = {
+            'elements': {
+                'nodes': node_list,
+                'edges': list(edges.values()),
+            },
+            'title': title,
+            'version': version,
+        }
+        graph.update(meta)
+        if traces:
+            graph['trace_count'] = len(traces)
+        if positions:
+            graph['layout_version'] = self.layout_version
+        return graph
+
+
+class ChannelStore:
+    """
+    Graph states of all named channels hosted by one server.
+
+    Channels are created on their first update. The default channel always
+    exists; other channels are evicted when they had neither updates nor
+    viewers for idle_timeout seconds, or - least recently updated first -
+    when a new channel would exceed max_channels.
+
+    All channels draw their versions from one sequence with a random start,
+    so a client's version from an evicted channel or a previous server run
+    never matches a different graph by accident.
+
+    Attributes:
+        max_channels (int): Maximum number of channels, including default,
+            or None for no limit.
+        max_elements (int): Per-channel limit of nodes plus edges, or None.
+        idle_timeout (float): Seconds after which an unused channel is
+            evicted, or None to keep channels forever.
+        history_size (int): Versions kept per channel, 0 for no history.
+        history_max_bytes (int): Estimated history memory per channel.
+        on_evict (callable): Called with the name of every evicted channel,
+            after the store's lock was released, or None.
+    """
+
+    def __init__(self, max_channels=64, max_elements=None, idle_timeout=None,
+                 default_title=DEFAULT_TITLE, history_size=0, history_max_bytes=None):
+        """
+        Initialize the store with an empty default channel.
+
+        Args:
+            max_channels (int, optional): Maximum number of channels.
+                Defaults to 64.
+            max_elements (int, optional): Per-channel element limit.
+                Defaults to None (unlimited).
+            idle_timeout (float, optional): Idle eviction timeout in
+                seconds. Defaults to None (never evict).
+            default_title (str, optional): Title of empty graphs.
+            history_size (int, optional): Number of versions each channel
+                keeps in its history. Defaults to 0 (no history).
+            history_max_bytes (int, optional): Estimated memory budget of
+                each channel's history. Defaults to None (no budget).
+        """
+        self.max_channels = max_channels
+        self.max_elements = max_elements
+        self.idle_timeout = idle_timeout
+        self.default_title = default_title
+        self.history_size = history_size
+        self.history_max_bytes = history_max_bytes
+        self.on_evict = None
+        self.lock = threading.RLock()
+        self.channels = {}
+        self.viewers = {}
+        # Stay well below 2**53 so versions survive the trip through JavaScript
+        self._versions = _VersionSequence(random.randrange(1, 2 ** 40))
+        self.get(DEFAULT_CHANNEL, create=True)
+
+    @staticmethod
+    def validate_name(name):
+        """
+        Check that a channel name is safe to use in URLs and room names.
+
+        Args:
+            name (str): Channel name.
+
+        Returns:
+            str: The name, or DEFAULT_CHANNEL if name is empty.
+
+        Raises:
+            ValueError: If the name contains characters other than letters,
+                digits, '_', '.' and '-', or is longer than 64 characters.
+        """
+        if not name:
+            return DEFAULT_CHANNEL
+        if not isinstance(name, str) or not _CHANNEL_NAME.match(name):
+            raise ValueError(f"Invalid channel name {name!r}")
+        return name
+
+    def get(self, name, create=False):
+        """
+        Look up the state of a channel.
+
+        Args:
+            name (str): Channel name.
+            create (bool, optional): Create the channel if it does not
+                exist yet. Defaults to False.
+
+        Returns:
+            GraphState: The channel's state, or None if it does not exist
+                and create is False.
+
+        Raises:
+            CapacityExceeded: If a new channel is needed but max_channels
+                is reached and no channel can be evicted.
+        """
+        evicted = None
+        with self.lock:
+            state = self.channels.get(name)
+            if state is None and create:
+                if self.max_channels is not None and len(self.channels) >= self.max_channels:
+                    evicted = self._evict_least_recent()
+                history = History(self.history_size, self.history_max_bytes) if self.history_size else None
+                state = GraphState(title=self.default_title, max_elements=self.max_elements,
+                                   versions=self._versions, history=history)
+                self.channels[name] = state
+        if evicted is not None:
+            self._evicted([evicted])
+        return state
+
+    def reserve_versions(self, version):
+        """
+        Make sure new versions of all channels are greater than version.
+
+        Called for graphs restored from an earlier run, so viewers and
+        clients never see a version go backwards.
+
+        Args:
+            version (int): Highest version in use.
+        """
+        self._versions.skip_past(version)
+
+    def names(self):
+        """
+        List all channels.
+
+        Returns:
+            list: Channel names in creation order.
+        """
+        with self.lock:
+            return list(self.channels)
+
+    def subscribe(self, name):
+        """Register a viewer of a channel, keeping it from being evicted."""
+        with self.lock:
+            self.viewers[name] = self.viewers.get(name, 0) + 1
+
+    def unsubscribe(self, name):
+        """Unregister a viewer of a channel."""
+        with self.lock:
+            count = self.viewers.get(name, 0) - 1
+            if count > 0:
+                self.viewers[name] = count
+            else:
+                self.viewers.pop(name, None)
+
+    def _evictable(self):
+        """Names of channels that may be evicted, least recently updated first."""
+        candidates = [
+            name for name in self.channels
+            if name != DEFAULT_CHANNEL and not self.viewers.get(name)
+        ]
+        return sorted(candidates, key=lambda name: self.channels[name].last_update)
+
+    def _evict_least_recent(self):
+        """Evict the least recently updated channel, returning its name. Caller holds the lock."""
+        candidates = self._evictable()
+        if not candidates:
+            raise CapacityExceeded(f"Channel limit of {self.max_channels} reached")
+        log.info(f"Evicting channel {candidates[0]!r} to make room")
+        del self.channels[candidates[0]]
+        return candidates[0]
+
+    def _evicted(self, names):
+        """Report evicted channels to on_evict. Caller does not hold the lock."""
+        if self.on_evict is None:
+            return
+        for name in names:
+            try:
+                self.on_evict(name)
+            except Exception as e:
+                log.error(f"Error reporting the eviction of channel {name!r}: {e}")
+
+    def remove(self, name):
+        """
+        Remove a channel, e.g. one its origin evicted.
+
+        Viewers keep watching the name and see the channel again once it
+        is recreated. The default channel is never removed.
+
+        Args:
+            name (str): Channel name.
+
+        Returns:
+            bool: True if the channel existed and was removed.
+        """
+        if name == DEFAULT_CHANNEL:
+            return False
+        with self.lock:
+            return self.channels.pop(name, None) is not None
+
+    def evict_idle(self, now=None):
+        """
+        Remove channels without updates or viewers for idle_timeout seconds.
+
+        Args:
+            now (float, optional): Current time.monotonic() value.
+
+        Returns:
+            list: Names of the evicted channels.
+        """
+        if self.idle_timeout is None:
+            return []
+
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            evicted = [
+                name for name in self._evictable()
+                if now - self.channels[name].last_update > self.idle_timeout
+            ]
+            for name in evicted:
+                del self.channels[name]
+        if evicted:
+            log.info(f"Evicted idle channels: {', '.join(evicted)}")
+            self._evicted(evicted)
+        return evicted
@@ -0,0 +1,398 @@
+"""
+Streaming graph mutations.
+
+A GraphStream updates a graph on the server with fine-grained changes
+instead of complete snapshots: producers call add_node(), add_edge(),
+update_attrs(), remove_node() and remove_edge() as things happen, without
+keeping a graph of their own. The changes are buffered and a background
+thread sends them as one batched message once the oldest buffered change
+is interval_ms old or max_events changes are waiting. The server applies
+every batch atomically and forwards it to the viewers as a single patch
+(see schnauzer.events), so high event rates turn into few messages and few
+render passes.
+
+Attribute updates of an element that is already waiting for the next
+batch are merged into the waiting update instead of being queued again,
+unless an event in between added or removed that element or one of its
+nodes: merging must never move an update across such an event.
+"""
+import json
+import logging
+import threading
+import time
+
+import zmq
+
+from schnauzer.convert import _plain
+from schnauzer.protocol import HELLO, REQUEST_TIMEOUT_MS, parse_hello, parse_ack
+
+log = logging.getLogger(__name__)
+
+
+class GraphStream:
+    """
+    Buffered stream of node and edge changes to one channel.
+
+    Create streams with VisualizationClient.stream(). Streams are thread
+    safe; only their background sender thread touches their socket. Use a
+    stream as a context manager, or call close(), so the last batch is
+    sent.
+
+    Attributes:
+        channel (str): Channel the changes are applied to, or None for the
+            default channel.
+        title (str): Title of the graph, or None to keep the current one.
+        interval_ms (float): Maximum age of a buffered change in
+            milliseconds before its batch is sent.
+        max_events (int): Number of buffered changes that triggers sending
+            right away.
+        version (int): Graph version after the last acknowledged batch, or
+            None if no batch was acknowledged yet.
+        stats (dict): Counters of 'events' buffered, updates 'coalesced'
+            into a waiting one, 'batches' sent and batches that 'failed'.
+
+    Examples:
+        >>> with client.stream(channel="simulation", interval_ms=100) as stream:
+        ...     stream.add_node("sensor", type="input")
+        ...     stream.add_edge("sensor", "filter", rate=10)
+        ...     stream.update_attrs("sensor", load=0.7)
+        ...     stream.update_attrs("sensor", "filter", rate=12)
+        ...     stream.remove_node("filter")
+    """
+
+    def __init__(self, client, channel=None, title=None, interval_ms=50, max_events=1000,
+                 directed=None, multigraph=None):
+        """
+        Initialize a stream; the connection is opened with the first batch.
+
+        Args:
+            client (VisualizationClient): Client whose server and ZeroMQ
+                context the stream uses.
+            channel (str, optional): Validated channel name. Defaults to
+                None, the default channel.
+            title (str, optional): Title to set with every batch.
+            interval_ms (float, optional): Send buffered changes at the
+                latest this many milliseconds after the first of them.
+                Defaults to 50.
+            max_events (int, optional): Send as soon as this many changes
+                are buffered. Defaults to 1000.
+            directed (bool, optional): Whether the graph is directed. For
+                undirected graphs the server finds edges with their
+                endpoints in either order. Defaults to None, which keeps
+                the setting of the graph on the server.
+            multigraph (bool, optional): Whether edges without a key get
+                a new key like in networkx multigraphs. Defaults to None,
+                which keeps the setting of the graph on the server.
+
+        Raises:
+            ValueError: If interval_ms is negative or max_events is
+                smaller than 1.
+        """
+        if interval_ms < 0:
+            raise ValueError("interval_ms must not be negative")
+        if max_events < 1:
+            raise ValueError("max_events must be at least 1")
+
+        self.client = client
+        self.channel = channel
+        self.title = title
+        self.interval_ms = interval_ms
+        self.max_events = max_events
+        self.directed = directed
+        self.multigraph = multigraph
+        self.version = None
+        self.stats = {'events': 0, 'coalesced': 0, 'batches': 0, 'failed': 0}
+
+        self._socket = None
+        self._clock_offset = 0.0
+        self._buffer = []
+        self._updates = {}  # element -> its buffered update event, for merging
+        self._first = None  # time.monotonic() of the oldest buffered change
+        self._produced = None  # time.time() of the oldest buffered change
+        self._flushing = False
+        self._in_flight = False
+        self._closed = False
+        self._condition = threading.Condition()
+        self._sender = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add_node(self, node, **attrs):
+        """
+        Add a node, or update the attributes of an existing one.
+
+        Args:
+            node (hashable): The node; its Cytoscape id is str(node).
+            **attrs: Node attributes.
+        """
+        nid = str(node)
+        self._push(['add_node', nid, _plain(node), attrs], touched=[('node', nid)])
+
+    def add_edge(self, u, v, key=None, **attrs):
+        """
+        Add an edge, or update the attributes of an existing one.
+
+        Endpoints that do not exist yet are added as well.
+
+        Args:
+            u (hashable): Source node.
+            v (hashable): Target node.
+            key (str or int, optional): Multigraph edge key. Defaults to
+                None, which in multigraphs picks the lowest unused key.
+            **attrs: Edge attributes.
+        """
+        source, target = str(u), str(v)
+        self._push(['add_edge', source, target, key, attrs], touched=self._edge_keys(source, target, key))
+
+    def update_attrs(self, *element, key=None, **attrs):
+        """
+        Update attributes of an existing node or edge.
+
+        Updates of elements that do not exist are ignored by the server.
+
+        Args:
+            *element: The node, or the source and target node of an edge.
+            key (str or int, optional): Multigraph key of the edge.
+            **attrs: Attributes to set; other attributes are kept.
+
+        Raises:
+            TypeError: If element is not one node or two endpoints.
+        """
+        if len(element) == 1:
+            nid = str(element[0])
+            self._push(['update_node', nid, attrs], update=('node', nid))
+        elif len(element) == 2:
+            source, target = str(element[0]), str(element[1])
+            self._push(['update_edge', source, target, key, attrs], update=('edge', source, target, key))
+        else:
+            raise TypeError("update_attrs() takes a node or the two endpoints of an edge")
+
+    def remove_node(self, node):
+        """
+        Remove a node and all of its edges.
+
+        Args:
+            node (hashable): The node.
+        """
+        nid = str(node)
+        self._push(['remove_node', nid], touched=[('node', nid)], incident=nid)
+
+    def remove_edge(self, u, v, key=None):
+        """
+        Remove an edge.
+
+        Args:
+            u (hashable): Source node.
+            v (hashable): Target node.
+            key (str or int, optional): Multigraph key of the edge.
+        """
+        source, target = str(u), str(v)
+        self._push(['remove_edge', source, target, key], touched=self._edge_keys(source, target, key))
+
+    @staticmethod
+    def _edge_keys(source, target, key):
+        """
+        Merge keys an edge event touches.
+
+        These are the edge in both directions, as undirected edges match
+        either, and both endpoints, which adding an edge creates.
+        """
+        return [('edge', source, target, key), ('edge', target, source, key),
+                ('node', source), ('node', target)]
+
+    def _push(self, event, update=None, touched=(), incident=None):
+        """
+        Buffer an event and wake the sender if a batch is due.
+
+        Args:
+            event (list): Event as described in schnauzer.events.
+            update (tuple, optional): Element an attribute update applies
+                to; merged into a buffered update of the same element.
+            touched (list, optional): Elements an addition or removal
+                applies to; later updates must not be merged across it.
+            incident (str, optional): Node whose edges the event removes;
+                updates of those edges must not be merged across it either.
+
+        Raises:
+            RuntimeError: If the stream was closed.
+        """
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Stream is closed")
+
+            self.stats['events'] += 1
+            if update is not None:
+                waiting = self._updates.get(update)
+                if waiting is not None:
+                    waiting[-1].update(event[-1])
+                    self.stats['coalesced'] += 1
+                    return
+                self._updates[update] = event
+            for element in touched:
+                self._updates.pop(element, None)
+            if incident is not None:
+                for element in [element for element in self._updates
+                                if element[0] == 'edge' and incident in element[1:3]]:
+                    del self._updates[element]
+
+            if not self._buffer:
+                self._first = time.monotonic()
+                self._produced = time.time()
+            self._buffer.append(event)
+
+            if self._sender is None:
+                self._sender = threading.Thread(target=self._run_sender, daemon=True)
+                self._sender.start()
+            if len(self._buffer) == 1 or len(self._buffer) >= self.max_events:
+                self._condition.notify_all()
+
+    def _run_sender(self):
+        """Send batches until the stream is closed and drained."""
+        while True:
+            with self._condition:
+                while True:
+                    if self._buffer:
+                        if self._closed or self._flushing or len(self._buffer) >= self.max_events:
+                            break
+                        remaining = self._first + self.interval_ms / 1000 - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._condition.wait(remaining)
+                    elif self._closed:
+                        self._disconnect()
+                        return
+                    else:
+                        self._condition.wait()
+
+                events, self._buffer = self._buffer, []
+                self._updates = {}
+                produced = self._produced
+                self._in_flight = True
+
+            success = self._send(events, produced)
+
+            with self._condition:
+                self._in_flight = False
+                self.stats['batches' if success else 'failed'] += 1
+                if not self._buffer:
+                    self._flushing = False
+                self._condition.notify_all()
+
+    def _send(self, events, produced):
+        """
+        Send one batch and wait for the acknowledgement.
+
+        Args:
+            events (list): The batched events.
+            produced (float): time.time() of the oldest event.
+
+        Returns:
+            bool: True if the server applied the batch.
+        """
+        try:
+            if self._socket is None and not self._connect():
+                return False
+
+            message = {
+                'type': 'events',
+                'events': events,
+                'produced_at': produced + self._clock_offset,
+            }
+            for key in ('channel', 'title', 'directed', 'multigraph'):
+                if getattr(self, key) is not None:
+                    message[key] = getattr(self, key)
+            message['sent_at'] = time.time() + self._clock_offset
+            self._socket.send_string(json.dumps(message))
+            ack = parse_ack(self._socket.recv_string())
+        except zmq.error.ZMQError as e:
+            log.error(f"Error sending {len(events)} graph events: {e}")
+            self._disconnect()
+            return False
+        except (TypeError, ValueError) as e:
+            log.error(f"Could not encode graph events: {e}")
+            return False
+
+        if ack.get('status') != 'ok':
+            log.error(f"Server rejected graph events: {ack.get('error') or ack.get('message')}")
+            return False
+        self.version = ack.get('version')
+        return True
+
+    def _connect(self):
+        """
+        Open the stream's socket and check that the server accepts events.
+
+        Returns:
+            bool: True if the server supports event batches.
+        """
+        self._socket = self.client.context.socket(zmq.REQ)
+        self._socket.setsockopt(zmq.LINGER, 0)
+        self._socket.setsockopt(zmq.RCVTIMEO, REQUEST_TIMEOUT_MS)
+        self._socket.connect(self.client.endpoint)
+
+        start = time.time()
+        self._socket.send_string(HELLO)
+        capabilities = parse_hello(self._socket.recv_string())
+        if 'events' not in capabilities.get('features', []):
+            log.error("Server does not support graph event streams, upgrade it to use stream()")
+            self._disconnect()
+            return False
+        if 'time' in capabilities:
+            self._clock_offset = capabilities['time'] - (start + time.time()) / 2
+        return True
+
+    def _disconnect(self):
+        """Close the socket, e.g. after a timeout left it unusable."""
+        if self._socket is not None:
+            try:
+                self._socket.close()
+            except zmq.error.ZMQError:
+                pass
+            self._socket = None
+
+    def flush(self, timeout=None):
+        """
+        Send buffered changes now and wait until they were acknowledged.
+
+        Args:
+            timeout (float, optional): Maximum number of seconds to wait.
+                Defaults to None, which waits indefinitely.
+
+        Returns:
+            bool: True if nothing is buffered or in flight anymore.
+        """
+        with self._condition:
+            if self._buffer:
+                self._flushing = True
+                self._condition.notify_all()
+            return self._condition.wait_for(
+                lambda: not self._buffer and not self._in_flight, timeout=timeout)
+
+    def close(self, timeout=None):
+        """
+        Send the remaining changes and stop the stream.
+
+        Args:
+            timeout (float, optional): Seconds to wait for the last batch.
+                Defaults to None, two request timeouts: one for a batch
+                in flight and one for the rest.
+
+        Note:
+            Safe to call multiple times.
+        """
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+
+        if self._sender is not None:
+            # The sender closes the socket once everything was sent
+            self._sender.join(2 * REQUEST_TIMEOUT_MS / 1000 if timeout is None else timeout)
+            if self._sender.is_alive():
+                log.warning("Graph event stream did not finish sending in time")
+        self.client._streams.discard(self)
@@ -0,0 +1,120 @@
+"""
+Message-origin traces.
+
+Clients may attach traces to a graph that describe how each message was
+produced: for a message id, a list of paths, each path a list of
+``[msg_id, component, consumed_ids]`` steps meaning that ``component``
+produced ``msg_id`` from the messages ``consumed_ids``. Edges carry the id
+of the message they transport in their ``msg_id`` attribute.
+
+Resolving a path against the graph means finding, for every consumed
+message, the edge that carried it from its producer to its consumer. The
+server validates traces when they arrive and compiles them once per graph
+version into lists of edge ids, so tracing a path in the viewer is a
+direct lookup instead of a scan over all edges.
+"""
+from collections import defaultdict
+
+
+class TraceError(ValueError):
+    """Raised when trace data does not have the expected structure."""
+
+
+def message_key(msg_id):
+    """
+    Normalize a message id, so ``3``, ``3.0`` and ``'3'`` are the same message.
+
+    Args:
+        msg_id: Message id as found in traces or edge attributes.
+
+    Returns:
+        str: The normalized id.
+    """
+    if isinstance(msg_id, float) and msg_id.is_integer():
+        msg_id = int(msg_id)
+    elif isinstance(msg_id, str):
+        try:
+            msg_id = int(msg_id)
+        except ValueError:
+            return msg_id
+    return str(msg_id)
+
+
+def validate_traces(traces):
+    """
+    Check the structure of trace data.
+
+    Args:
+        traces (dict): Mapping of message id to a list of paths, each a list
+            of ``[msg_id, component, consumed_ids]`` steps. component and
+            consumed_ids may be None.
+
+    Raises:
+        TraceError: If traces is not structured like that.
+    """
+    if not isinstance(traces, dict):
+        raise TraceError(f"Traces must be a dict, got {type(traces).__name__}")
+
+    for key, paths in traces.items():
+        if not isinstance(paths, list):
+            raise TraceError(f"Paths of message {key!r} must be a list")
+        for path in paths:
+            if not isinstance(path, list):
+                raise TraceError(f"Path of message {key!r} must be a list of steps")
+            for step in path:
+                if not isinstance(step, (list, tuple)) or len(step) != 3:
+                    raise TraceError(f"Step {step!r} of message {key!r} must be [msg_id, component, consumed_ids]")
+                if step[2] is not None and not isinstance(step[2], (list, tuple)):
+                    raise TraceError(f"Consumed ids of step {step!r} of message {key!r} must be a list")
+
+
+def compile_traces(traces, nodes, edges):
+    """
+    Resolve every trace path into the ids of the edges it consists of.
+
+    An edge belongs to a path if it carries a consumed message from the
+    component that produced it (its source node's name) to the component
+    that consumed it (its target node's name).
+
+    Args:
+        traces (dict): Validated trace data.
+        nodes (dict): Mapping of node id to Cytoscape node element.
+        edges (dict): Mapping of edge id to Cytoscape edge element.
+
+    Returns:
+        dict: Mapping of normalized message id to a list of paths, each a
+            list of edge ids.
+    """
+    def name(nid):
+        node = nodes.get(str(nid))
+        return node['data'].get('name') if node is not None else None
+
+    # (message, producer, consumer) -> ids of the edges carrying it
+    carriers = defaultdict(list)
+    for eid, element in edges.items():
+        data = element['data']
+        if data.get('msg_id') is not None:
+            carriers[(message_key(data['msg_id']), name(data['source']), name(data['target']))].append(eid)
+
+    compiled = {}
+    for key, paths in traces.items():
+        compiled[message_key(key)] = [_path_edges(path, carriers) for path in paths]
+    return compiled
+
+
+def _path_edges(path, carriers):
+    """Edge ids of one path, in order of the steps and without duplicates."""
+    producers = defaultdict(list)
+    for msg_id, component, _ in path:
+        producers[message_key(msg_id)].append(component)
+
+    found = {}
+    for _, consumer, consumed in path:
+        if not consumer or not consumed:
+            continue
+        for msg_id in consumed:
+            msg_id = message_key(msg_id)
+            for producer in producers.get(msg_id, ()):
+                for eid in carriers.get((msg_id, producer, consumer), ()):
+                    found.setdefault(eid, None)
+    return list(found)
@@ -0,0 +1,369 @@
+"""
+Compact columnar wire format for the ZeroMQ backend channel.
+
+Instead of one JSON document, a graph message is sent as a multipart
+ZeroMQ message::
+
+    [header, strings, values, column, column, ...]
+
+- ``header`` starts with MAGIC followed by a small JSON object holding the
+  message metadata (type, title, versions, removed ids, ...) and the layout
+  of the element sections that follow.
+- ``strings`` is the UTF-8 encoded, NUL separated dictionary of all string
+  attribute values (ids, names, types, colors, ...). Every distinct string
+  is stored once, no matter how many elements use it.
+- ``values`` is a JSON array with the dictionary of all non-string values
+  (numbers, booleans, lists, ...).
+- Each ``column`` is a little-endian int32 array with one entry per element
+  of a section, referencing the value of one attribute key. Non-negative
+  references point into the string dictionary, negative ones into the value
+  dictionary and -1 marks an element without that attribute.
+
+Large graphs may be written as several sections with the same name, each
+covering a chunk of elements; they are concatenated when decoding.
+
+Decoding turns every column into a list of values with a single
+``map(table.__getitem__, refs)`` call and builds each element's data dict
+directly from those columns, without an intermediate JSON parse tree.
+"""
+import json
+import sys
+from array import array
+
+MAGIC = b'SCHZ\x01'
+
+MISSING_REF = -1
+
+# Element sections carried in columnar form, per message type
+_SECTIONS = {
+    'full': [('nodes', ('elements', 'nodes')), ('edges', ('elements', 'edges'))],
+    'patch': [
+        ('nodes.added', ('delta', 'nodes', 'added')),
+        ('nodes.changed', ('delta', 'nodes', 'changed')),
+        ('edges.added', ('delta', 'edges', 'added')),
+        ('edges.changed', ('delta', 'edges', 'changed')),
+    ],
+}
+
+_MISSING = object()
+
+
+class WireFormatError(ValueError):
+    """Raised when a columnar message cannot be decoded."""
+
+
+def is_columnar(frames):
+    """
+    Check whether a multipart message uses the columnar format.
+
+    Args:
+        frames (list): Frames of a received ZeroMQ message.
+
+    Returns:
+        bool: True if the first frame starts with MAGIC.
+    """
+    return len(frames) > 1 and bytes(frames[0][:len(MAGIC)]) == MAGIC
+
+
+class _Dictionary:
+    """Dictionary encoder assigning each distinct value a reference."""
+
+    def __init__(self):
+        self.strings = []
+        self.values = []
+        self.string_refs = {}
+        self._refs = {}
+
+    def ref(self, value):
+        if type(value) is str:
+            ref = self.string_refs.get(value)
+            if ref is None:
+                if '\x00' in value:
+                    ref = -2 - len(self.values)
+                    self.values.append(value)
+                else:
+                    ref = len(self.strings)
+                    self.strings.append(value)
+                self.string_refs[value] = ref
+            return ref
+
+        if isinstance(value, (list, dict)):
+            key = ('json', json.dumps(value))
+        else:
+            # Keep True, 1 and 1.0 apart, they compare equal
+            key = (type(value), value)
+
+        ref = self._refs.get(key)
+        if ref is None:
+            ref = -2 - len(self.values)
+            self.values.append(value)
+            self._refs[key] = ref
+        return ref
+
+
+def _get(message, path):
+    """Follow a key path into a message, returning [] if it is absent."""
+    for key in path:
+        message = message.get(key) or {}
+    return message or []
+
+
+def _to_bytes(refs):
+    if sys.byteorder == 'big':
+        refs.byteswap()
+    return refs.tobytes()
+
+
+def _from_bytes(frame):
+    if sys.byteorder == 'big':
+        refs = array('i')
+        refs.frombytes(frame)
+        refs.byteswap()
+        return refs
+    # Read the references in place, e.g. straight from a shared-memory segment
+    try:
+        return memoryview(frame).cast('B').cast('i')
+    except TypeError as e:
+        raise WireFormatError(f"Malformed column frame: {e}") from e
+
+
+class ColumnarWriter:
+    """
+    Incremental builder for columnar messages.
+
+    Element sections are added one after another; each one is turned into
+    reference columns straight away, so callers can stream elements from
+    any source without materializing Cytoscape.js element dicts. A section
+    name may be used several times, e.g. to write a large graph in chunks;
+    the decoder concatenates them in order.
+
+    Examples:
+        >>> writer = ColumnarWriter()
+        >>> writer.add_section('nodes', 2, [[('id', 'a')], [('id', 'b'), ('type', 'x')]])
+        >>> frames = writer.frames({'type': 'full'})
+    """
+
+    def __init__(self):
+        self.dictionary = _Dictionary()
+        self.sections = []
+        self.columns = []
+
+    def add_section(self, name, count, rows):
+        """
+        Encode one section of elements.
+
+        Args:
+            name (str): Section name, e.g. 'nodes' or 'edges.added'.
+            count (int): Number of rows that will be yielded.
+            rows (iterable): One iterable of ``(key, value)`` pairs per
+                element, e.g. ``data.items()``.
+
+        Raises:
+            WireFormatError: If rows yields more than count elements.
+        """
+        ref = self.dictionary.ref
+        known = self.dictionary.string_refs
+        columns = {}
+        for index, row in enumerate(rows):
+            if index >= count:
+                raise WireFormatError(f"Section {name} has more than {count} rows")
+            for key, value in row:
+                column = columns.get(key)
+                if column is None:
+                    column = columns[key] = array('i', [MISSING_REF]) * count
+                # Inline lookup for the common case of an already seen string
+                value_ref = known.get(value) if type(value) is str else None
+                column[index] = ref(value) if value_ref is None else value_ref
+
+        self.sections.append({'name': name, 'count': count, 'keys': list(columns)})
+        self.columns.extend(_to_bytes(column) for column in columns.values())
+
+    def frames(self, header):
+        """
+        Finish the message.
+
+        Args:
+            header (dict): Message metadata; the section layout is added.
+
+        Returns:
+            list: Frames (bytes) ready for ``socket.send_multipart``.
+        """
+        header = dict(header, sections=self.sections)
+        return [
+            MAGIC + json.dumps(header).encode('utf-8'),
+            '\x00'.join(self.dictionary.strings).encode('utf-8'),
+            json.dumps(self.dictionary.values).encode('utf-8'),
+            *self.columns,
+        ]
+
+
+def encode_message(message):
+    """
+    Encode a graph message into columnar multipart frames.
+
+    Args:
+        message (dict): A 'full' or 'patch' message as built by the client,
+            with elements in Cytoscape.js format.
+
+    Returns:
+        list: Frames (bytes) ready for ``socket.send_multipart``.
+    """
+    kind = 'patch' if message.get('type') == 'patch' else 'full'
+    writer = ColumnarWriter()
+
+    for name, path in _SECTIONS[kind]:
+        elements = _get(message, path)
+        writer.add_section(name, len(elements), (element['data'].items() for element in elements))
+
+    header = {key: value for key, value in message.items() if key not in ('elements', 'delta')}
+    header['type'] = kind
+    if kind == 'patch':
+        delta = message.get('delta') or {}
+        header['removed'] = {
+            group: (delta.get(group) or {}).get('removed') or []
+            for group in ('nodes', 'edges')
+        }
+
+    return writer.frames(header)
+
+
+class ColumnarSection:
+    """
+    One decoded element section, stored column by column.
+
+    Attributes:
+        name (str): Section name, e.g. 'nodes' or 'edges.added'.
+        keys (list): Attribute keys, one per column.
+        columns (list): Decoded value lists, aligned with keys.
+        count (int): Number of elements in the section.
+    """
+
+    def __init__(self, name, keys, columns, count):
+        self.name = name
+        self.keys = keys
+        self.columns = columns
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def column(self, key):
+        """
+        Return all values of one attribute, None where it is absent.
+
+        Args:
+            key (str): Attribute key.
+
+        Returns:
+            list: One value per element.
+        """
+        if key not in self.keys:
+            return [None] * len(self)
+        return [None if value is _MISSING else value
+                for value in self.columns[self.keys.index(key)]]
+
+    def elements(self):
+        """
+        Build the Cytoscape.js elements of this section.
+
+        Returns:
+            list: Elements of the form ``{'data': {...}}``.
+        """
+        keys = self.keys
+        if not keys:
+            return [{'data': {}} for _ in range(self.count)]
+        return [
+            {'data': {key: value for key, value in zip(keys, row) if value is not _MISSING}}
+            for row in zip(*self.columns)
+        ]
+
+
+def decode_sections(frames):
+    """
+    Decode the header and element sections of a columnar message.
+
+    Args:
+        frames (list): Frames as returned by ``socket.recv_multipart``,
+            or memoryviews such as those of schnauzer.shm.read_frames().
+
+    Returns:
+        tuple: ``(header, sections)`` where sections maps section names
+            to lists of ColumnarSection instances, in message order.
+
+    Raises:
+        WireFormatError: If the frames are not a valid columnar message.
+    """
+    if not is_columnar(frames) or len(frames) < 3:
+        raise WireFormatError("Not a columnar message")
+
+    try:
+        header = json.loads(bytes(frames[0][len(MAGIC):]))
+        strings = str(frames[1], 'utf-8').split('\x00') if len(frames[1]) else []
+        values = json.loads(bytes(frames[2]))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise WireFormatError(f"Malformed dictionary frames: {e}") from e
+
+    # Negative references index the reversed value dictionary from the end,
+    # with the trailing sentinel taking the place of MISSING_REF
+    table = strings + values[::-1] + [_MISSING]
+    lookup = table.__getitem__
+
+    sections = {}
+    position = 3
+    for section in header.get('sections', []):
+        keys = section['keys']
+        if position + len(keys) > len(frames):
+            raise WireFormatError(f"Missing column frames for section {section['name']}")
+
+        columns = []
+        for frame in frames[position:position + len(keys)]:
+            refs = _from_bytes(frame)
+            if len(refs) != section['count']:
+                raise WireFormatError(f"Column length mismatch in section {section['name']}")
+            try:
+                columns.append(list(map(lookup, refs)))
+            except IndexError as e:
+                raise WireFormatError(f"Invalid value reference in section {section['name']}") from e
+        position += len(keys)
+        sections.setdefault(section['name'], []).append(ColumnarSection(section['name'], keys, columns, section['count']))
+
+    return header, sections
+
+
+def decode_message(frames):
+    """
+    Decode a columnar message into the message dict the server consumes.
+
+    The result has the same shape as the JSON messages sent by clients
+    that do not use the columnar format.
+
+    Args:
+        frames (list): Frames as returned by ``socket.recv_multipart``,
+            or memoryviews such as those of schnauzer.shm.read_frames().
+
+    Returns:
+        dict: The decoded 'full' or 'patch' message.
+
+    Raises:
+        WireFormatError: If the frames are not a valid columnar message.
+    """
+    header, sections = decode_sections(frames)
+    message = {key: value for key, value in header.items() if key not in ('sections', 'removed')}
+
+    def elements(name):
+        return [element for section in sections.get(name, []) for element in section.elements()]
+
+    if header.get('type') == 'patch':
+        removed = header.get('removed') or {}
+        message['delta'] = {
+            group: {
+                'added': elements(f'{group}.added'),
+                'changed': elements(f'{group}.changed'),
+                'removed': removed.get(group) or [],
+            }
+            for group in ('nodes', 'edges')
+        }
+    else:
+        message['elements'] = {'nodes': elements('nodes'), 'edges': elements('edges')}
+
+    return message
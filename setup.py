@@ -9,7 +9,7 @@ setup(
     description="Visualize networkx graphs interactively in a web browser.",
     author="Nico Bachmann",
     author_email="python@deschnauz.ch",
-    packages=find_packages(),
+    packages=find_packages(exclude=['benchmarks', 'benchmarks.*']),
     include_package_data=True,
     package_data={
         "schnauzer": ["static/**/*", "templates/**/*"],
@@ -21,6 +21,12 @@ setup(
         "networkx",
         "pyyaml",
     ],
+    extras_require={
+        "brotli": ["brotli"],
+        "assets": ["rjsmin", "brotli"],
+        "test": ["pytest"],
+        "asyncio": ["uvicorn", "asgiref"],
+    },
     entry_points={
         "console_scripts": [
             "schnauzer-server=schnauzer.server:main",
@@ -0,0 +1,53 @@
+"""Tests of schnauzer.aggregate."""
+from schnauzer.aggregate import Aggregation
+
+
+def _graph(node_ids, pairs):
+    nodes = {nid: {'data': {'id': nid, 'name': nid}} for nid in node_ids}
+    edges = {f'{source}-{target}': {'data': {'id': f'{source}-{target}', 'source': source, 'target': target}}
+             for source, target in pairs}
+    return nodes, edges
+
+
+def test_components_are_summarized_with_merged_edges():
+    nodes, edges = _graph('abcdef', [('a', 'b'), ('b', 'c'), ('d', 'e'), ('e', 'f')])
+    aggregation = Aggregation(nodes, edges, 'component')
+
+    summary = aggregation.summary()
+    assert sorted(node['data']['count'] for node in summary['elements']['nodes']) == [3, 3]
+    assert summary['elements']['edges'] == []
+    assert summary['lod'] == {'group_by': 'component', 'nodes': 6, 'edges': 4, 'dangling': 0}
+
+
+def test_expand_returns_the_nodes_and_edges_of_a_cluster():
+    nodes, edges = _graph('abcd', [('a', 'b'), ('c', 'd'), ('b', 'c')])
+    aggregation = Aggregation(nodes, edges, 'name', max_clusters=2)
+
+    cid = aggregation.roots[0]
+    contents = aggregation.expand(cid)
+    members = {node['data']['id'] for node in contents['nodes']}
+    assert contents['cluster'] == cid
+    for edge in contents['edges']:
+        data = edge['data']
+        assert data['source'] in members or data['target'] in members
+    assert aggregation.expand('missing') is None
+
+
+def test_dangling_edges_are_skipped_and_counted():
+    nodes, edges = _graph('abc', [('a', 'b'), ('b', 'c'), ('c', 'x'), ('y', 'z')])
+    aggregation = Aggregation(nodes, edges, 'component')
+
+    assert aggregation.dangling == 2
+    summary = aggregation.summary()
+    assert summary['lod']['dangling'] == 2
+    assert aggregation.expand(aggregation.roots[0])['edges'] == [edges['a-b'], edges['b-c']]
+
+
+def test_cluster_ids_do_not_collide_with_node_ids():
+    nodes, edges = _graph(['cluster:1', 'cluster:2', 'other'], [('cluster:1', 'cluster:2')])
+    aggregation = Aggregation(nodes, edges, 'component')
+
+    assert len(aggregation.roots) == 2
+    assert not set(aggregation.roots) & set(nodes)
+    contents = aggregation.expand(aggregation.roots[0])
+    assert {node['data']['id'] for node in contents['nodes']} == {'cluster:1', 'cluster:2'}
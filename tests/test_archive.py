@@ -0,0 +1,137 @@
+"""Tests of schnauzer.archive."""
+import os
+import time
+
+import networkx as nx
+import pytest
+
+from schnauzer.archive import ArchiveError, ArchivedGraph, GraphArchive
+from schnauzer.payload import Payload
+from schnauzer.server import Server
+from schnauzer.store import GraphState
+
+
+def _state(*node_ids, version=None, title='Graph'):
+    state = GraphState()
+    state.replace({
+        'title': title,
+        'elements': {
+            'nodes': [{'data': {'id': nid, 'name': f'Node {nid}', 'load': 0.5}} for nid in node_ids],
+            'edges': [{'data': {'source': source, 'target': target}} for source, target in zip(node_ids, node_ids[1:])],
+        },
+        'traces': {'1': [[[1, 'a', []]]]},
+    }, version=version)
+    return state
+
+
+def _snapshot(state):
+    taken = (state.export(), Payload.from_graph(state.to_dict()))
+    return lambda: taken
+
+
+def _archive(directory, *states, channel='c', **kwargs):
+    archive = GraphArchive(str(directory), **kwargs)
+    archive.start()
+    for state in states:
+        archive.save(channel, _snapshot(state))
+        # Give the writer each version instead of only the latest
+        deadline = time.monotonic() + 5
+        while archive._pending and time.monotonic() < deadline:
+            time.sleep(0.01)
+    archive.stop()
+    return archive
+
+
+def test_round_trip(tmp_path):
+    state = _state('a', 'b', 'c')
+    archive = _archive(tmp_path, state)
+
+    archived = archive.latest()['c']
+    assert (archived.channel, archived.version, archived.title) == ('c', state.version, 'Graph')
+    assert (archived.nodes, archived.edges) == (3, 2)
+    assert archive.stats['written'] == 1
+
+    assert archived.graph() == state.export()
+    payload = Payload.from_graph(state.to_dict())
+    restored = archived.payload()
+    assert restored.etag == payload.etag
+    assert restored.body == payload.body
+
+    # The restored graph reproduces the state
+    copy = GraphState()
+    copy.replace(archived.graph(), version=archived.version)
+    assert copy.to_dict() == state.to_dict()
+
+
+def test_only_latest_pending_version_is_written(tmp_path):
+    archive = GraphArchive(str(tmp_path))
+    first, second = _state('a', version=1), _state('a', 'b', version=2)
+    archive.save('c', _snapshot(first))
+    archive.save('c', _snapshot(second))
+    archive.start()
+    archive.stop()
+
+    assert archive.stats['skipped'] == 1 and archive.stats['written'] == 1
+    assert archive.latest()['c'].nodes == 2
+
+
+def _versions(directory, channel='c'):
+    return sorted(os.listdir(os.path.join(directory, f'{channel}.versions')))
+
+
+def test_retention(tmp_path):
+    states = [_state('a', 'b', version=version) for version in range(1, 5)]
+
+    _archive(tmp_path / 'count', *states, max_versions=2)
+    assert _versions(tmp_path / 'count') == [f'{state.version:016d}.schz' for state in states[-2:]]
+
+    # A budget smaller than one version keeps only the latest
+    _archive(tmp_path / 'bytes', *states, max_bytes=1)
+    assert _versions(tmp_path / 'bytes') == [f'{states[-1].version:016d}.schz']
+
+    with pytest.raises(ValueError):
+        GraphArchive(str(tmp_path), max_versions=0)
+
+
+def test_unreadable_versions_are_skipped(tmp_path):
+    first, second = _state('a', version=1), _state('a', 'b', version=2)
+    archive = _archive(tmp_path, first, second)
+
+    latest = os.path.join(tmp_path, 'c.versions', _versions(tmp_path)[-1])
+    with open(latest, 'wb') as file:
+        file.write(b'garbage')
+    with pytest.raises(ArchiveError):
+        ArchivedGraph.open('c', latest)
+    assert archive.latest()['c'].version == first.version
+
+    # Stray files in the directory are ignored
+    open(os.path.join(tmp_path, 'c.versions', 'notes.txt'), 'w').close()
+    open(os.path.join(tmp_path, 'other'), 'w').close()
+    assert set(archive.latest()) == {'c'}
+
+
+def test_restart_restores_channels(tmp_path):
+    server = Server(web_port=0, backend_port=0, persist_dir=str(tmp_path))
+    server.start(background=True)
+    client = server.client()
+    assert client.send_graph(nx.path_graph(5), title='Path', channel='team') is True
+    client.disconnect()
+    version = server.channels.get('team').version
+    server.stop()
+
+    server = Server(web_port=0, backend_port=0, persist_dir=str(tmp_path))
+    try:
+        # Served from the archive before the state is restored
+        graph = server.app.test_client().get('/graph-data/team').get_json()
+        assert (graph['title'], graph['version']) == ('Path', version)
+        assert len(graph['elements']['nodes']) == 5
+
+        server.start(background=True)
+        deadline = time.monotonic() + 5
+        while server._restoring and time.monotonic() < deadline:
+            time.sleep(0.01)
+        state = server.channels.get('team')
+        assert state.version == version
+        assert sorted(state.nodes) == ['0', '1', '2', '3', '4']
+    finally:
+        server.stop()
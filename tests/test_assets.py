@@ -0,0 +1,98 @@
+"""Tests of schnauzer.assets."""
+import os
+
+import pytest
+from werkzeug.datastructures import Accept
+
+from schnauzer import assets
+from schnauzer.assets import BundleError, StaticAssets, build, bundle_modules
+
+PACKAGE_STATIC = os.path.join(os.path.dirname(assets.__file__), 'static')
+
+
+def _write(root, path, text):
+    path = root / path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+@pytest.fixture
+def static(tmp_path):
+    _write(tmp_path, 'js/app.js', "import { greet as hello } from './lib/greet.js';\n"
+                                  "// Entry point\n"
+                                  "export const message = hello(`world`);\n")
+    _write(tmp_path, 'js/lib/greet.js', "/* Greeting */\n"
+                                        "export function greet(name) {\n"
+                                        "    return `Hello,   ${name}!`;\n"
+                                        "}\n"
+                                        f"export const padding = '{'.' * 1000}';\n")
+    _write(tmp_path, 'css/styles.css', "@font-face { src: url('fonts/icons.woff2?v=1'); }\n")
+    (tmp_path / 'css/fonts').mkdir()
+    (tmp_path / 'css/fonts/icons.woff2').write_bytes(b'\x00font')
+    return tmp_path
+
+
+def test_committed_bundles_are_current():
+    loaded = StaticAssets.load(PACKAGE_STATIC)
+    assert loaded is not None, "static/dist is out of date, run `python -m schnauzer.assets build`"
+    assert loaded.has('app.js') and loaded.has('app.css')
+    assert loaded.has('vendor.js') == loaded.vendored
+
+
+def test_bundle_modules_scopes_each_module(static):
+    source = bundle_modules(str(static / 'js/app.js'))
+    assert 'import' not in source
+    assert source.index('__schnauzer_greet = ') < source.index('__schnauzer_app = ')
+    assert 'const { greet: hello } = __schnauzer_greet;' in source
+
+
+def test_bundle_modules_rejects_circular_imports(tmp_path):
+    _write(tmp_path, 'a.js', "import { b } from './b.js';\nexport const a = 1;\n")
+    _write(tmp_path, 'b.js', "import { a } from './a.js';\nexport const b = 2;\n")
+    with pytest.raises(BundleError):
+        bundle_modules(str(tmp_path / 'a.js'))
+
+
+def test_build_minifies_hashes_and_compresses(static):
+    pytest.importorskip('rjsmin')
+    manifest = build(str(static))
+
+    assert not manifest['vendored']
+    assert set(manifest['bundles']) == {'app.js', 'app.css'}
+    dist = static / 'dist'
+    app = (dist / manifest['bundles']['app.js']).read_text()
+    assert 'Entry point' not in app and 'Greeting' not in app
+    assert '`Hello,   ${name}!`' in app
+    assert 'gzip' in manifest['files'][manifest['bundles']['app.js']]
+
+    css = (dist / manifest['bundles']['app.css']).read_text()
+    font = next(name for name in manifest['files'] if name.startswith('icons.'))
+    assert f'url("{font}")' in css
+    assert (dist / font).read_bytes() == b'\x00font'
+
+
+def test_load_serves_best_encoding(static):
+    pytest.importorskip('rjsmin')
+    build(str(static))
+    loaded = StaticAssets.load(str(static))
+    filename = loaded.filename('app.js')
+
+    data, encoding, mimetype = loaded.get(filename, Accept([('gzip', 1)]))
+    assert encoding == 'gzip' and 'javascript' in mimetype
+    data, encoding, _ = loaded.get(filename, Accept([]))
+    assert encoding == 'identity' and b'Hello' in data
+    with pytest.raises(KeyError):
+        loaded.get('app.0000000000000000.js', Accept([]))
+
+
+def test_edited_sources_outdate_the_build(static):
+    pytest.importorskip('rjsmin')
+    build(str(static))
+    _write(static, 'js/lib/greet.js', "export function greet(name) { return name; }\n")
+    assert StaticAssets.load(str(static)) is None
+
+
+def test_partial_vendor_directory_is_rejected(static):
+    _write(static, f'vendor/{assets.VENDOR[0][0]}', '')
+    with pytest.raises(BundleError):
+        build(str(static))
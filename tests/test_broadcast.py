@@ -0,0 +1,132 @@
+"""Tests of schnauzer.broadcast."""
+import threading
+import time
+
+import pytest
+
+from schnauzer.broadcast import Broadcaster
+from schnauzer.delta import diff
+
+
+def _nodes(*ids):
+    return {nid: {'data': {'id': nid}} for nid in ids}
+
+
+def _patch(base, version, old, new):
+    return {'base_version': base, 'version': version, 'delta': diff(_nodes(*old), {}, _nodes(*new), {})}
+
+
+class _Viewers:
+    """Records what the broadcaster sends, as the Socket.IO emit would."""
+
+    def __init__(self):
+        self.sent = []
+        self._condition = threading.Condition()
+
+    def send(self, event, data, viewer):
+        with self._condition:
+            self.sent.append((time.monotonic(), event, data, viewer))
+            self._condition.notify_all()
+
+    def wait(self, count, timeout=5):
+        with self._condition:
+            assert self._condition.wait_for(lambda: len(self.sent) >= count, timeout), self.sent
+            return self.sent[:count]
+
+
+@pytest.fixture
+def viewers():
+    return _Viewers()
+
+
+def _broadcaster(viewers, full_state=lambda channel: None, **kwargs):
+    broadcaster = Broadcaster(viewers.send, full_state, **kwargs)
+    broadcaster.start()
+    return broadcaster
+
+
+def test_viewer_receives_patch(viewers):
+    broadcaster = _broadcaster(viewers, max_fps=0)
+    broadcaster.add_viewer('v', 'c', 1)
+    broadcaster.acknowledge('v', 1)
+
+    patch = _patch(1, 2, 'a', 'ab')
+    broadcaster.notify('c', 2, patch)
+    (_, event, data, viewer), = viewers.wait(1)
+    broadcaster.stop()
+
+    assert (event, data, viewer) == ('graph_patch', patch, 'v')
+    assert broadcaster.stats['patch'] == 1
+
+
+def test_unacknowledged_viewer_gets_composed_patch(viewers):
+    broadcaster = _broadcaster(viewers, max_fps=0, max_unacked=1)
+    broadcaster.add_viewer('v', 'c', 1)
+
+    # Held back until the viewer acknowledges version 1
+    broadcaster.notify('c', 2, _patch(1, 2, 'a', 'ab'))
+    broadcaster.notify('c', 3, _patch(2, 3, 'ab', 'bc'))
+    time.sleep(0.1)
+    assert viewers.sent == []
+    assert broadcaster.lagging() == 1
+
+    broadcaster.acknowledge('v', 1)
+    (_, event, data, _), = viewers.wait(1)
+    broadcaster.stop()
+
+    assert event == 'graph_patch'
+    assert (data['base_version'], data['version']) == (1, 3)
+    assert data['delta'] == diff(_nodes('a'), {}, _nodes('b', 'c'), {})
+    assert broadcaster.stats['composed'] == 1
+    assert broadcaster.stats['skipped'] == 1
+
+
+def test_full_graph_when_patches_are_unknown(viewers):
+    broadcaster = _broadcaster(viewers, lambda channel: ({'channel': channel}, 5), max_fps=0)
+    broadcaster.add_viewer('v', 'c', 1)
+    broadcaster.acknowledge('v', 1)
+
+    # The chain of patches does not start at the viewer's version
+    broadcaster.notify('c', 5, _patch(4, 5, 'a', 'ab'))
+    (_, event, data, _), = viewers.wait(1)
+    broadcaster.stop()
+
+    assert (event, data) == ('graph_update', {'channel': 'c'})
+    assert broadcaster.stats['full'] == 1
+
+
+def test_slow_viewer_does_not_hold_back_others(viewers):
+    broadcaster = _broadcaster(viewers, max_fps=0, max_unacked=1)
+    broadcaster.add_viewer('fast', 'c', 1)
+    broadcaster.add_viewer('slow', 'c', 1)
+    broadcaster.acknowledge('fast', 1)
+
+    broadcaster.notify('c', 2, _patch(1, 2, 'a', 'ab'))
+    (_, _, _, viewer), = viewers.wait(1)
+    time.sleep(0.1)
+    broadcaster.stop()
+
+    assert viewer == 'fast'
+    assert len(viewers.sent) == 1
+    assert broadcaster.lagging() == 2
+
+
+def test_max_fps_limits_updates_per_viewer(viewers):
+    broadcaster = _broadcaster(viewers, max_fps=10, max_unacked=1000)
+    broadcaster.add_viewer('v', 'c', 0)
+
+    for version in range(1, 31):
+        broadcaster.notify('c', version, _patch(version - 1, version, [str(version - 1)], [str(version)]))
+        time.sleep(0.01)
+
+    # The last update arrives although most versions were skipped
+    deadline = time.monotonic() + 5
+    while not viewers.sent or viewers.sent[-1][2]['version'] != 30:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    broadcaster.stop()
+
+    times = [at for at, _, _, _ in viewers.sent]
+    assert len(times) < 10
+    assert all(later - earlier >= 0.09 for earlier, later in zip(times, times[1:]))
+    assert broadcaster.stats['skipped'] == 30 - len(times)
@@ -0,0 +1,49 @@
+"""Tests of schnauzer.client against an embedded server."""
+import networkx as nx
+import pytest
+
+from schnauzer.server import Server
+
+
+@pytest.fixture
+def server():
+    server = Server(web_port=0, backend_port=0)
+    server.start(background=True)
+    yield server
+    server.stop()
+
+
+@pytest.mark.parametrize('encoding', ['json', 'columnar'])
+def test_unserializable_graph_does_not_stop_sender(server, encoding):
+    client = server.client(blocking=False, encoding=encoding)
+    bad = nx.Graph()
+    bad.add_node('a', tags={'x', 'y'})
+    good = nx.path_graph(3)
+
+    # Wait for each result, the queue would otherwise replace bad with good
+    assert client.send_graph(bad).result(timeout=10) is False
+    assert client.send_graph(good).result(timeout=10) is True
+    assert client.flush(timeout=10)
+    assert client.stats['failed'] == 1 and client.stats['sent'] == 1
+    assert sorted(server.channels.get('default').nodes) == ['0', '1', '2']
+    client.disconnect()
+
+
+def test_unserializable_graph_fails_blocking_send(server):
+    client = server.client()
+    bad = nx.Graph()
+    bad.add_node('a', tags={'x'})
+
+    assert client.send_graph(bad) is False
+    assert client.send_graph(nx.path_graph(2)) is True
+    client.disconnect()
+
+
+def test_latency_after_disconnect(server):
+    client = server.client()
+    assert client.send_graph(nx.path_graph(2)) is True
+    assert client.latency() is not None
+    client.disconnect()
+
+    with pytest.raises(ConnectionError):
+        client.latency()
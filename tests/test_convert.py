@@ -0,0 +1,137 @@
+"""Tests of schnauzer.convert."""
+import networkx as nx
+import pytest
+
+from schnauzer.convert import chunks, edge_data, encode_graph, node_data, to_elements
+from schnauzer.delta import index_elements
+from schnauzer.wire import decode_message, decode_sections
+
+
+def _reference(graph):
+    """Elements of nx.cytoscape_data, with the endpoints as Cytoscape ids."""
+    elements = nx.cytoscape_data(graph)['elements']
+    for element in elements['edges']:
+        data = element['data']
+        data['source'] = str(data['source'])
+        data['target'] = str(data['target'])
+    return index_elements(elements)
+
+
+def _sample(cls):
+    graph = cls()
+    graph.add_node('a', kind='source', load=0.5)
+    graph.add_node('b', name='Bee', tags=['x', 'y'])
+    graph.add_node('c')
+    graph.add_edge('a', 'b', weight=2)
+    graph.add_edge('b', 'c', label='next')
+    graph.add_edge('c', 'a')
+    return graph
+
+
+@pytest.mark.parametrize('cls', [nx.Graph, nx.DiGraph])
+def test_matches_cytoscape_data(cls):
+    assert to_elements(_sample(cls)) == _reference(_sample(cls))
+
+
+@pytest.mark.parametrize('cls', [nx.MultiGraph, nx.MultiDiGraph])
+def test_matches_cytoscape_data_with_multi_edge_keys(cls):
+    graph = _sample(cls)
+    graph.add_edge('a', 'b', weight=3)
+    graph.add_edge('a', 'b', key='extra')
+
+    nodes, edges = to_elements(graph)
+    assert (nodes, edges) == _reference(graph)
+    assert {'a->b#0', 'a->b#1', 'a->b#extra'} <= set(edges)
+    assert edges['a->b#1']['data']['key'] == 1
+
+
+def test_non_string_node_ids():
+    graph = nx.Graph()
+    graph.add_edge(1, (2, 'x'))
+    graph.add_edge(1, 2.5)
+
+    nodes, edges = to_elements(graph)
+    assert nodes['1']['data'] == {'id': '1', 'value': 1, 'name': '1'}
+    assert nodes["(2, 'x')"]['data']['value'] == (2, 'x')
+    assert set(edges) == {"1->(2, 'x')", '1->2.5'}
+    # Endpoints are ids, not the raw NetworkX nodes
+    assert edges['1->2.5']['data'] == {'id': '1->2.5', 'source': '1', 'target': '2.5'}
+
+
+def test_explicit_node_ids_connect_edges():
+    graph = nx.Graph()
+    graph.add_node(1, id='first')
+    graph.add_node(2)
+    graph.add_edge(1, 2)
+
+    nodes, edges = to_elements(graph)
+    assert set(nodes) == {'first', '2'}
+    assert edges == {'first->2': {'data': {'id': 'first->2', 'source': 'first', 'target': '2'}}}
+
+
+def test_unserializable_values():
+    graph = nx.Graph()
+    node = frozenset({1})
+    graph.add_node(node, when={'a', 'b'})
+
+    data, = node_data(graph)
+    assert data['value'] == str(node)
+    # Only the node value is converted; attributes are passed on as they are
+    assert data['when'] == {'a', 'b'}
+
+
+def test_attribute_projection():
+    graph = _sample(nx.Graph)
+
+    nodes, edges = to_elements(graph, node_attrs=['kind', 'missing'], edge_attrs=['weight'])
+    assert nodes['a']['data'] == {'id': 'a', 'value': 'a', 'name': 'a', 'kind': 'source'}
+    # 'name' is always set, from the attribute when there is one
+    assert nodes['b']['data'] == {'id': 'b', 'value': 'b', 'name': 'Bee'}
+    assert edges['a->b']['data'] == {'id': 'a->b', 'source': 'a', 'target': 'b', 'weight': 2}
+    assert edges['b->c']['data'] == {'id': 'b->c', 'source': 'b', 'target': 'c'}
+
+    nodes, edges = to_elements(graph, node_attrs=(), edge_attrs=())
+    assert all(set(element['data']) == {'id', 'value', 'name'} for element in nodes.values())
+    assert all(set(element['data']) == {'id', 'source', 'target'} for element in edges.values())
+
+
+def test_edge_data_without_ids():
+    graph = nx.MultiGraph()
+    graph.add_edge('a', 'b')
+    graph.add_edge('a', 'b', id='named')
+
+    assert list(edge_data(graph, ids=False)) == [
+        {'source': 'a', 'target': 'b', 'key': 0},
+        {'source': 'a', 'target': 'b', 'key': 1, 'id': 'named'},
+    ]
+
+
+def test_chunks():
+    assert list(chunks(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(chunks(range(4), 2)) == [[0, 1], [2, 3]]
+    assert list(chunks([], 2)) == []
+
+
+@pytest.mark.parametrize('chunk_size, sections', [(1, 4), (3, 2), (4, 1), (5, 1)])
+def test_encode_graph_chunk_boundaries(chunk_size, sections):
+    graph = nx.path_graph(4)
+    nx.set_node_attributes(graph, {0: 'first', 3: 'last'}, 'label')
+
+    frames = encode_graph(graph, {'title': 'Path'}, chunk_size=chunk_size)
+    header, decoded = decode_sections(frames)
+    assert [len(section) for section in decoded['nodes']] == [min(chunk_size, 4 - i) for i in range(0, 4, chunk_size)]
+    assert len(decoded['nodes']) == sections
+    assert sum(len(section) for section in decoded['edges']) == 3
+
+    message = decode_message(frames)
+    assert message['type'] == 'full'
+    assert message['title'] == 'Path'
+    assert message['elements']['nodes'] == [{'data': data} for data in node_data(graph)]
+    assert message['elements']['edges'] == [{'data': data} for data in edge_data(graph, ids=False)]
+    # The server derives the same edge ids
+    assert index_elements(message['elements']) == to_elements(graph)
+
+
+def test_encode_empty_graph():
+    message = decode_message(encode_graph(nx.Graph(), {}))
+    assert message['elements'] == {'nodes': [], 'edges': []}
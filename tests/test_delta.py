@@ -0,0 +1,127 @@
+"""Tests of schnauzer.delta."""
+import random
+
+import pytest
+
+from schnauzer.delta import compose, diff, edge_id, index_elements, invert, snapshot
+from schnauzer.store import GraphState
+
+
+def _graph(nodes, edges=()):
+    """Cytoscape elements from node data dicts and (source, target, attrs) tuples."""
+    return {
+        'nodes': [{'data': dict(data)} for data in nodes],
+        'edges': [{'data': {'source': source, 'target': target, **attrs}} for source, target, attrs in edges],
+    }
+
+
+def test_edge_id_derived_from_endpoints_and_key():
+    assert edge_id({'source': 'a', 'target': 'b'}) == 'a->b'
+    assert edge_id({'source': 'a', 'target': 'b', 'key': 0}) == 'a->b#0'
+    assert edge_id({'source': 'a', 'target': 'b', 'id': 'e1'}) == 'e1'
+
+
+def test_index_elements_writes_edge_ids():
+    nodes, edges = index_elements(_graph([{'id': 'a'}, {'id': 'b'}], [('a', 'b', {})]))
+    assert list(nodes) == ['a', 'b']
+    assert edges['a->b']['data']['id'] == 'a->b'
+
+
+def test_diff_classifies_added_changed_removed():
+    old_nodes, old_edges = index_elements(_graph(
+        [{'id': 'a', 'w': 1}, {'id': 'b'}, {'id': 'c'}], [('a', 'b', {}), ('b', 'c', {})]))
+    new_nodes, new_edges = index_elements(_graph(
+        [{'id': 'a', 'w': 2}, {'id': 'b'}, {'id': 'd'}], [('a', 'b', {}), ('b', 'd', {})]))
+
+    delta = diff(old_nodes, old_edges, new_nodes, new_edges)
+
+    assert [element['data']['id'] for element in delta['nodes']['added']] == ['d']
+    assert [element['data'] for element in delta['nodes']['changed']] == [{'id': 'a', 'w': 2}]
+    assert delta['nodes']['removed'] == ['c']
+    assert [element['data']['id'] for element in delta['edges']['added']] == ['b->d']
+    assert delta['edges']['changed'] == []
+    assert delta['edges']['removed'] == ['b->c']
+
+
+def test_diff_of_identical_graphs_is_empty():
+    nodes, edges = index_elements(_graph([{'id': 'a'}], [('a', 'a', {})]))
+    delta = diff(nodes, edges, snapshot(nodes), snapshot(edges))
+    assert all(not ops for group in delta.values() for ops in group.values())
+
+
+def test_snapshot_sees_in_place_changes():
+    tags = ['x']
+    nodes, edges = index_elements(_graph([{'id': 'a', 'tags': tags, 'meta': {'n': 1}}]))
+    acked = snapshot(nodes)
+
+    tags.append('y')
+    nodes['a']['data']['meta']['n'] = 2
+
+    assert acked['a']['data'] == {'id': 'a', 'tags': ['x'], 'meta': {'n': 1}}
+    delta = diff(acked, {}, nodes, edges)
+    assert [element['data']['id'] for element in delta['nodes']['changed']] == ['a']
+
+
+def _apply(delta, nodes, edges):
+    """Apply a delta to copies of two indexes the way GraphState does."""
+    state = GraphState()
+    state.nodes, state.edges = snapshot(nodes), snapshot(edges)
+    state.apply_patch({'base_version': 0, 'delta': delta})
+    return state.nodes, state.edges
+
+
+def _data(index):
+    return {eid: element['data'] for eid, element in index.items()}
+
+
+def _random_graphs(seed, count):
+    """A sequence of random graphs over a small id space, so elements come and go."""
+    rng = random.Random(seed)
+    graphs = []
+    for _ in range(count):
+        ids = sorted(rng.sample('abcdefgh', rng.randint(0, 8)))
+        nodes = [{'id': nid, 'w': rng.randint(0, 2)} for nid in ids]
+        edges = [(source, target, {'w': rng.randint(0, 2)})
+                 for source in ids for target in ids if source < target and rng.random() < 0.3]
+        graphs.append(index_elements(_graph(nodes, edges)))
+    return graphs
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_invert_undoes_delta(seed):
+    (old_nodes, old_edges), (new_nodes, new_edges) = _random_graphs(seed, 2)
+    delta = diff(old_nodes, old_edges, new_nodes, new_edges)
+    inverse = invert(delta, old_nodes, old_edges)
+
+    nodes, edges = _apply(delta, old_nodes, old_edges)
+    assert (_data(nodes), _data(edges)) == (_data(new_nodes), _data(new_edges))
+    nodes, edges = _apply(inverse, nodes, edges)
+    assert (_data(nodes), _data(edges)) == (_data(old_nodes), _data(old_edges))
+
+
+def test_invert_of_change_to_unknown_element_removes_it():
+    delta = {'nodes': {'added': [], 'changed': [{'data': {'id': 'x'}}], 'removed': ['y']}, 'edges': {}}
+    inverse = invert(delta, {}, {})
+    assert inverse['nodes'] == {'added': [], 'changed': [], 'removed': ['x']}
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_compose_equals_applying_in_order(seed):
+    graphs = _random_graphs(seed, 5)
+    deltas = [diff(*old, *new) for old, new in zip(graphs, graphs[1:])]
+
+    nodes, edges = _apply(compose(deltas), *graphs[0])
+
+    last_nodes, last_edges = graphs[-1]
+    assert (_data(nodes), _data(edges)) == (_data(last_nodes), _data(last_edges))
+
+
+def test_compose_drops_elements_added_and_removed_again():
+    add = {'nodes': {'added': [{'data': {'id': 'x'}}], 'changed': [], 'removed': []}}
+    change = {'nodes': {'added': [], 'changed': [{'data': {'id': 'x', 'w': 1}}], 'removed': []}}
+    remove = {'nodes': {'added': [], 'changed': [], 'removed': ['x']}}
+
+    assert compose([add, change, remove])['nodes'] == {'added': [], 'changed': [], 'removed': []}
+    assert compose([add, change])['nodes']['added'] == [{'data': {'id': 'x', 'w': 1}}]
+    assert compose([remove, add])['nodes'] == {'added': [], 'changed': [{'data': {'id': 'x'}}], 'removed': []}
+    assert compose([])['edges'] == {'added': [], 'changed': [], 'removed': []}
@@ -0,0 +1,121 @@
+"""Tests of schnauzer.payload."""
+import gzip
+import json
+
+import networkx as nx
+import pytest
+from werkzeug.datastructures import Accept
+
+from schnauzer import payload as payload_module
+from schnauzer.payload import MIN_COMPRESS_SIZE, Payload, available_encodings
+from schnauzer.server import Server
+
+
+def _graph(size=200):
+    return {'elements': {'nodes': [{'data': {'id': str(i), 'name': f'node {i}'}} for i in range(size)], 'edges': []}}
+
+
+def test_from_graph():
+    graph = _graph()
+    payload = Payload.from_graph(graph)
+
+    assert json.loads(payload.body) == graph
+    assert payload.size == len(payload.body)
+    assert payload.etag == Payload.from_graph(_graph()).etag
+    assert payload.etag != Payload.from_graph(_graph(201)).etag
+
+
+@pytest.mark.parametrize('encoding', available_encodings())
+def test_encoded_round_trip(encoding):
+    payload = Payload.from_graph(_graph())
+    data = payload.encoded(encoding)
+
+    decompress = gzip.decompress if encoding == 'gzip' else payload_module.brotli.decompress
+    assert decompress(data) == payload.body
+    assert len(data) < payload.size
+    # Compressed once, then cached
+    assert payload.encoded(encoding) is data
+    assert payload.encoded('identity') is payload.body
+
+
+def test_unavailable_encoding(monkeypatch):
+    monkeypatch.setattr(payload_module, 'brotli', None)
+    payload = Payload.from_graph(_graph())
+
+    assert available_encodings() == ['gzip']
+    assert payload.negotiate(Accept([('br', 1), ('gzip', 0.5)])) == 'gzip'
+    with pytest.raises(ValueError):
+        payload.encoded('br')
+    with pytest.raises(ValueError):
+        payload.encoded('deflate')
+
+
+def test_negotiate():
+    payload = Payload.from_graph(_graph())
+    assert payload.size >= MIN_COMPRESS_SIZE
+
+    assert payload.negotiate(Accept([('gzip', 1)])) == 'gzip'
+    assert payload.negotiate(Accept([('deflate', 1)])) == 'identity'
+    assert payload.negotiate(Accept([])) == 'identity'
+    if payload_module.brotli is not None:
+        assert payload.negotiate(Accept([('gzip', 1), ('br', 1)])) == 'br'
+        assert payload.negotiate(Accept([('gzip', 1), ('br', 0.5)])) == 'gzip'
+
+    # Small bodies are not worth compressing
+    small = Payload.from_graph(_graph(1))
+    assert small.size < MIN_COMPRESS_SIZE
+    assert small.negotiate(Accept([('gzip', 1)])) == 'identity'
+
+
+def test_entity_tags_differ_per_encoding():
+    payload = Payload.from_graph(_graph())
+    tags = {payload.entity_tag(encoding) for encoding in ['identity', 'gzip', 'br']}
+
+    assert payload.entity_tag('identity') == payload.etag
+    assert len(tags) == 3
+
+
+def test_from_gzip():
+    original = Payload.from_graph(_graph())
+    payload = Payload.from_gzip(original.encoded('gzip'), original.size, original.etag)
+
+    assert payload.encoded('gzip') == original.encoded('gzip')
+    assert payload._body is None
+    assert payload.body == original.body
+    assert payload.size == original.size and payload.etag == original.etag
+
+
+@pytest.fixture
+def server():
+    server = Server(web_port=0, backend_port=0)
+    server.start(background=True)
+    yield server
+    server.stop()
+
+
+def test_graph_data_endpoint(server):
+    client = server.client()
+    assert client.send_graph(nx.path_graph(200), title='Path') is True
+    client.disconnect()
+    http = server.app.test_client()
+
+    plain = http.get('/graph-data', headers={'Accept-Encoding': 'identity'})
+    assert plain.status_code == 200
+    assert plain.content_encoding is None
+    assert plain.headers['Vary'] == 'Accept-Encoding'
+    graph = plain.get_json()
+    assert graph['title'] == 'Path'
+    assert len(graph['elements']['nodes']) == 200
+
+    compressed = http.get('/graph-data', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.content_encoding == 'gzip'
+    assert json.loads(gzip.decompress(compressed.data)) == graph
+    assert compressed.get_etag() != plain.get_etag()
+
+    # Reloading an unchanged graph is answered without a body
+    etag, _ = compressed.get_etag()
+    cached = http.get('/graph-data', headers={'Accept-Encoding': 'gzip', 'If-None-Match': f'"{etag}"'})
+    assert cached.status_code == 304
+    assert cached.data == b''
+    stale = http.get('/graph-data', headers={'Accept-Encoding': 'identity', 'If-None-Match': f'"{etag}"'})
+    assert stale.status_code == 200
@@ -0,0 +1,137 @@
+"""Tests of schnauzer.replication, with the sockets replaced by recorders."""
+import json
+
+import pytest
+
+from schnauzer import replication
+from schnauzer.replication import IngestServer, WebWorker
+from schnauzer.store import ChannelStore, DEFAULT_CHANNEL
+
+
+class _Socket:
+    """Records the messages sent on a socket."""
+
+    def __init__(self):
+        self.sent = []
+
+    def send_multipart(self, frames):
+        self.sent.append(frames)
+
+
+def _graph(*node_ids):
+    return {'elements': {'nodes': [{'data': {'id': nid}} for nid in node_ids], 'edges': []}}
+
+
+@pytest.fixture
+def ingest():
+    ingest = IngestServer(web_port=0, max_channels=3)
+    ingest._publisher = _Socket()
+    return ingest
+
+
+@pytest.fixture
+def worker():
+    worker = WebWorker(web_port=0, max_channels=2, channel_idle_timeout=0.5)
+    worker._snapshots = _Socket()
+    return worker
+
+
+def _update(ingest, channel, *node_ids):
+    """Replace a channel's graph on the ingest and publish it."""
+    ingest.channels.get(channel, create=True).replace(_graph(*node_ids))
+    ingest._on_graph_update(channel)
+
+
+def _load_snapshot(worker, *channels, sequence=0):
+    """Answer the worker's pending snapshot request with the given (channel, graph) pairs."""
+    request = worker._snapshots.sent[-1][2].decode('utf-8')
+    for channel, graph in channels:
+        header = {'channel': channel, 'request': request}
+        worker._receive_snapshot([b'', json.dumps(header).encode(), json.dumps(graph).encode()])
+    end = {replication._END: True, 'request': request, 'sequence': sequence}
+    worker._receive_snapshot([b'', json.dumps(end).encode(), b''])
+
+
+def _replay(ingest, worker):
+    """Deliver everything the ingest published to the worker."""
+    published, ingest._publisher.sent = ingest._publisher.sent, []
+    for frames in published:
+        worker._receive_update(frames)
+
+
+def test_channel_store_reports_evictions():
+    store = ChannelStore(max_channels=2, idle_timeout=10)
+    evicted = []
+    store.on_evict = evicted.append
+
+    store.get('a', create=True)
+    store.get('b', create=True)
+    assert evicted == ['a']
+
+    assert store.evict_idle(now=store.get('b').last_update + 11) == ['b']
+    assert evicted == ['a', 'b']
+    assert store.names() == [DEFAULT_CHANNEL]
+
+
+def test_channel_store_never_removes_default():
+    store = ChannelStore()
+    store.get('a', create=True)
+    assert store.remove('a') and not store.remove('a')
+    assert not store.remove(DEFAULT_CHANNEL)
+    assert store.names() == [DEFAULT_CHANNEL]
+
+
+def test_worker_does_not_evict_on_its_own(worker):
+    assert worker.channels.max_channels is None
+    assert worker.channels.idle_timeout is None
+
+
+def test_worker_follows_ingest_evictions(ingest, worker):
+    worker._request_snapshot()
+    _load_snapshot(worker)
+
+    _update(ingest, 'x', 'a')
+    _update(ingest, 'y', 'b')
+    _replay(ingest, worker)
+    assert worker.channels.names() == [DEFAULT_CHANNEL, 'x', 'y']
+
+    # The ingest's limit of three channels evicts x for z
+    _update(ingest, 'z', 'c')
+    assert ingest.channels.names() == [DEFAULT_CHANNEL, 'y', 'z']
+    _replay(ingest, worker)
+
+    assert worker.channels.names() == [DEFAULT_CHANNEL, 'y', 'z']
+    assert worker.channels.get('z').version == ingest.channels.get('z').version
+    assert worker.stats_replication['gaps'] == 0
+
+
+def test_snapshot_removes_channels_missing_on_ingest(ingest, worker):
+    worker._request_snapshot()
+    _load_snapshot(worker)
+    _update(ingest, 'x', 'a')
+    _update(ingest, 'y', 'b')
+    _replay(ingest, worker)
+
+    worker._request_snapshot()
+    _load_snapshot(worker, ('y', ingest.channels.get('y').export()), sequence=ingest.sequence)
+
+    assert worker.channels.names() == [DEFAULT_CHANNEL, 'y']
+
+
+def test_buffer_overflow_requests_fresh_snapshot(ingest, worker, monkeypatch):
+    monkeypatch.setattr(replication, 'MAX_BUFFERED', 2)
+    worker._request_snapshot()
+    _update(ingest, 'a', 'n')
+    _update(ingest, 'a', 'n', 'm')
+    _update(ingest, 'b', 'n')
+    _replay(ingest, worker)
+
+    assert worker.stats_replication['overflows'] == 1
+    assert len(worker._snapshots.sent) == 2
+    assert len(worker._buffer) == 1
+
+    # The fresh snapshot holds the dropped updates, the buffered one follows it
+    _load_snapshot(worker, ('a', ingest.channels.get('a').export()), sequence=2)
+    assert worker.channels.names() == [DEFAULT_CHANNEL, 'a', 'b']
+    assert sorted(worker.channels.get('a').nodes) == ['m', 'n']
+    assert worker.sequence == 3
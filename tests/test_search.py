@@ -0,0 +1,82 @@
+"""Tests of schnauzer.search."""
+import random
+import re
+
+import pytest
+
+from schnauzer.delta import diff, index_elements
+from schnauzer.search import SearchIndex, _text, parse_query
+
+
+def _nodes(*datas):
+    return index_elements({'nodes': [{'data': data} for data in datas]})[0]
+
+
+NODES = _nodes(
+    {'id': 'db1', 'name': 'Orders DB', 'type': 'database', 'Region': 'eu-west'},
+    {'id': 'srv1', 'name': 'order-service', 'type': 'service', 'replicas': 3, 'tags': ['api', 'public']},
+    {'id': 'srv2', 'name': 'Billing', 'type': 'service', 'healthy': False, 'meta': {'team': 'pay'}},
+    {'id': 'q', 'name': 'queue', 'type': 'queue', 'load': 0.75},
+)
+
+
+def _matches(data, filters, terms):
+    """The query rules, checked element by element."""
+    if not filters and not terms:
+        return False
+    texts = {key.lower(): _text(value) for key, value in data.items()}
+    words = [word for text in texts.values() for word in re.findall(r'\w+', text)]
+    return (all(key in texts and value in texts[key] for key, value in filters)
+            and all(any(word.startswith(term) for word in words) for term in terms))
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('type:service', {'srv1', 'srv2'}),
+    ('TYPE:Serv', {'srv1', 'srv2'}),
+    ('region:eu', {'db1'}),
+    ('ord', {'db1', 'srv1'}),
+    ('order serv', {'srv1'}),
+    ('type:service bill', {'srv2'}),
+    ('replicas:3', {'srv1'}),
+    ('tags:pub', {'srv1'}),
+    ('healthy:false', {'srv2'}),
+    ('pay', {'srv2'}),
+    ('load:0.7', {'q'}),
+    ('nothing', set()),
+    ('', set()),
+    ('type:', set()),
+])
+def test_queries(query, expected):
+    assert SearchIndex.build(NODES).search(*parse_query(query)) == expected
+
+
+def test_index_agrees_with_element_scan():
+    index = SearchIndex.build(NODES)
+    queries = ['type:service', 'ord', 'o', 's', 'name:order', 'id:srv', 'e', 'eu west', 'api public', 'x',
+               'name:der', 'name:rder-s', 'id:rv1', 'type:abase', 'meta:team']
+    for query in queries:
+        filters, terms = parse_query(query)
+        expected = {eid for eid, element in NODES.items() if _matches(element['data'], filters, terms)}
+        assert index.search(filters, terms) == expected, query
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_updated_index_equals_rebuilt_index(seed):
+    rng = random.Random(seed)
+    words = ['alpha', 'beta', 'alps', 'gamma', 'be']
+
+    def graph():
+        return _nodes(*({'id': f'n{i}', 'name': rng.choice(words), 'type': rng.choice(words[:2])}
+                        for i in rng.sample(range(10), rng.randint(0, 10))))
+
+    old = graph()
+    index = SearchIndex.build(old)
+    for _ in range(5):
+        new = graph()
+        index.apply(diff(old, {}, new, {})['nodes'], new)
+        rebuilt = SearchIndex.build(new)
+        for query in ['al', 'alp', 'b', 'type:beta', 'name:a', 'name:lph', 'name:eta', 'id:n1', 'gamma', 'n1']:
+            assert index.search(*parse_query(query)) == rebuilt.search(*parse_query(query)), query
+        # Trigrams of filtered keys are kept current
+        assert index._trigrams == rebuilt._trigrams
+        old = new
@@ -0,0 +1,148 @@
+"""Tests of schnauzer.shm."""
+import json
+
+import networkx as nx
+import pytest
+import zmq
+
+from schnauzer.server import Server
+from schnauzer.shm import (MIN_SEGMENT_BYTES, SHM_MAGIC, LocalTransport, SegmentError, SegmentWriter, _attach,
+                           is_shared, read_frames, same_host)
+
+
+def _exists(name):
+    try:
+        _attach(name).close()
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def _descriptor(name, frames):
+    return SHM_MAGIC + json.dumps({'name': name, 'frames': frames}).encode('utf-8')
+
+
+@pytest.fixture
+def writer():
+    writer = SegmentWriter()
+    yield writer
+    writer.discard()
+
+
+def test_round_trip(writer):
+    frames = [b'header', b'', b'x' * 13, bytes(range(256))]
+    descriptor = writer.write(frames)
+
+    assert is_shared(descriptor)
+    assert all(offset % 8 == 0 for offset, _ in json.loads(descriptor[0][len(SHM_MAGIC):])['frames'])
+    with read_frames(descriptor[0]) as views:
+        assert [bytes(view) for view in views] == frames
+
+
+def test_segment_is_reused_until_it_is_too_small(writer):
+    writer.write([b'a' * 100])
+    first = writer.segment.name
+    writer.write([b'b' * 1000, b'c'])
+    assert writer.segment.name == first
+
+    large = [b'd' * MIN_SEGMENT_BYTES, b'e' * 10]
+    descriptor = writer.write(large)
+    assert writer.segment.name != first
+    assert writer.segment.size >= MIN_SEGMENT_BYTES * 1.5
+    # The replaced segment is unlinked
+    assert not _exists(first)
+    with read_frames(descriptor[0]) as views:
+        assert [bytes(view) for view in views] == large
+
+
+def test_discard(writer):
+    writer.write([b'data'])
+    name = writer.segment.name
+
+    writer.discard()
+    assert writer.segment is None
+    assert not _exists(name)
+    writer.discard()
+
+    # The next message gets a new segment
+    descriptor = writer.write([b'more'])
+    assert writer.segment.name != name
+    with read_frames(descriptor[0]) as views:
+        assert bytes(views[0]) == b'more'
+
+
+@pytest.mark.parametrize('layout', [
+    [[0, MIN_SEGMENT_BYTES + 1]],
+    [[MIN_SEGMENT_BYTES, 1]],
+    [[0, 4], [-1, 2]],
+    [[0, -1]],
+])
+def test_read_frames_rejects_frames_outside_the_segment(writer, layout):
+    writer.write([b'data'])
+    with pytest.raises(SegmentError, match='outside'):
+        with read_frames(_descriptor(writer.segment.name, layout)):
+            pass
+
+
+@pytest.mark.parametrize('frame', [
+    SHM_MAGIC + b'not json',
+    SHM_MAGIC + b'{"frames": []}',
+    _descriptor('x', [[0]]),
+    _descriptor('schnz_missing', [[0, 1]]),
+])
+def test_read_frames_rejects_malformed_descriptors(frame):
+    with pytest.raises(SegmentError):
+        with read_frames(frame):
+            pass
+
+
+def test_same_host():
+    transport = LocalTransport()
+    try:
+        description = transport.describe()
+        assert same_host(description)
+        assert not same_host(dict(description, token='00' * 16))
+        assert not same_host(dict(description, token='not hex'))
+        assert not same_host(dict(description, probe='schnz_missing'))
+        assert not same_host({})
+    finally:
+        transport.close()
+    assert not same_host(description)
+
+
+class _FailingSocket:
+    """Socket whose sends fail, as on a lost connection."""
+
+    def __init__(self, socket):
+        self.socket = socket
+        self.socket_type = socket.socket_type
+
+    def send_multipart(self, frames):
+        raise zmq.error.ZMQError(zmq.EHOSTUNREACH)
+
+    def close(self):
+        self.socket.close()
+
+
+def test_client_discards_segment_after_failed_request():
+    server = Server(web_port=0, backend_port=0)
+    server.start(background=True)
+    try:
+        client = server.client(shared_memory=True, encoding='columnar')
+        graph = nx.path_graph(20000)
+        assert client.send_graph(graph) is True
+        name = client._segments.segment.name
+        assert len(server.channels.get('default').nodes) == 20000
+
+        client.socket = _FailingSocket(client.socket)
+        assert client.send_graph(nx.path_graph(20001)) is False
+        assert client._segments is None
+        assert not _exists(name)
+
+        # The client reconnects and writes into a new segment
+        assert client.send_graph(nx.path_graph(20002)) is True
+        assert client._segments.segment.name != name
+        assert len(server.channels.get('default').nodes) == 20002
+        client.disconnect()
+    finally:
+        server.stop()
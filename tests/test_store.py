@@ -0,0 +1,98 @@
+"""Tests of schnauzer.store."""
+import pytest
+
+from schnauzer.store import GraphState, VersionMismatch
+
+
+def _elements(*node_ids, edges=()):
+    return {
+        'nodes': [{'data': {'id': nid}} for nid in node_ids],
+        'edges': [{'data': {'source': source, 'target': target}} for source, target in edges],
+    }
+
+
+def _patch(base_version, added=(), removed=()):
+    return {
+        'base_version': base_version,
+        'delta': {
+            'nodes': {'added': [{'data': {'id': nid}} for nid in added], 'changed': [], 'removed': list(removed)},
+            'edges': {'added': [], 'changed': [], 'removed': []},
+        },
+    }
+
+
+def test_apply_patch_moves_to_next_version():
+    state = GraphState()
+    base = state.replace({'elements': _elements('a')})
+
+    version = state.apply_patch(_patch(base, added=['b']))
+
+    assert version == base + 1 == state.version
+    assert sorted(state.nodes) == ['a', 'b']
+
+
+def test_apply_patch_rejects_other_base_version():
+    state = GraphState()
+    base = state.replace({'elements': _elements('a')})
+    state.apply_patch(_patch(base, added=['b']))
+
+    with pytest.raises(VersionMismatch) as raised:
+        state.apply_patch(_patch(base, removed=['a']))
+
+    assert (raised.value.expected, raised.value.actual) == (base, base + 1)
+    assert sorted(state.nodes) == ['a', 'b']
+    assert state.version == base + 1
+
+
+def test_apply_patch_to_empty_graph_needs_version_zero():
+    state = GraphState()
+    with pytest.raises(VersionMismatch):
+        state.apply_patch(_patch(None, added=['a']))
+    assert state.apply_patch(_patch(0, added=['a'])) == 1
+
+
+def test_replica_keeps_given_version():
+    state = GraphState()
+    state.replace({'elements': _elements('a')}, version=7)
+    assert state.apply_patch(_patch(7, added=['b']), version=9) == 9
+    with pytest.raises(VersionMismatch):
+        state.apply_patch(_patch(8, added=['c']))
+
+
+def test_apply_events_returns_equivalent_patch():
+    state = GraphState()
+    base = state.replace({'elements': _elements('a')})
+
+    version, patch = state.apply_events({'events': [
+        ['add_edge', 'a', 'b', None, {'w': 1}],
+        ['update_node', 'a', {'x': 1}],
+        ['update_node', 'a', {'x': 2}],
+    ]})
+
+    assert version == base + 1 == state.version
+    assert patch['base_version'] == base
+    assert [element['data']['id'] for element in patch['delta']['nodes']['added']] == ['b']
+    assert [element['data']['x'] for element in patch['delta']['nodes']['changed']] == [2]
+    assert state.edges['a->b']['data']['w'] == 1
+
+    replica = GraphState()
+    replica.replace({'elements': _elements('a')}, version=base)
+    replica.apply_patch(patch, version=version)
+    assert replica.nodes == state.nodes and replica.edges == state.edges
+
+
+def test_apply_events_without_effect_keeps_version():
+    state = GraphState()
+    base = state.replace({'elements': _elements('a')})
+
+    assert state.apply_events({'events': [['remove_node', 'x'], ['update_node', 'y', {'z': 1}]]}) == (base, None)
+    assert state.version == base
+
+
+def test_patch_against_version_before_events_is_rejected():
+    state = GraphState()
+    base = state.replace({'elements': _elements('a')})
+    state.apply_events({'events': [['add_node', 'b', 'b', {}]]})
+
+    with pytest.raises(VersionMismatch):
+        state.apply_patch(_patch(base, removed=['a']))
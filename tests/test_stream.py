@@ -0,0 +1,123 @@
+"""Tests of schnauzer.stream."""
+from types import SimpleNamespace
+
+import pytest
+
+from schnauzer.store import GraphState
+from schnauzer.stream import GraphStream
+
+
+class _Server:
+    """Stands in for the server: applies every batch a stream sends to a GraphState."""
+
+    def __init__(self):
+        self.state = GraphState()
+        self.batches = []
+
+    def stream(self, **kwargs):
+        # Streams deregister from their client when closed
+        stream = GraphStream(SimpleNamespace(_streams=set()), **kwargs)
+
+        def send(events, produced):
+            self.batches.append(events)
+            stream.version, _ = self.state.apply_events({'events': events})
+            return True
+
+        stream._send = send
+        return stream
+
+    def node(self, nid):
+        return self.state.nodes[nid]['data']
+
+    def edge(self, eid):
+        return self.state.edges[eid]['data']
+
+
+@pytest.fixture
+def server():
+    return _Server()
+
+
+def test_batch_sent_when_max_events_buffered(server):
+    stream = server.stream(interval_ms=60_000, max_events=3)
+    for nid in 'abc':
+        stream.add_node(nid)
+
+    with stream._condition:
+        assert stream._condition.wait_for(lambda: stream.stats['batches'] == 1, timeout=5)
+    assert server.batches == [[['add_node', nid, nid, {}] for nid in 'abc']]
+    stream.close(timeout=5)
+
+
+def test_batch_sent_after_interval(server):
+    stream = server.stream(interval_ms=10)
+    stream.add_node('a')
+
+    with stream._condition:
+        assert stream._condition.wait_for(lambda: stream.stats['batches'] == 1, timeout=5)
+    assert sorted(server.state.nodes) == ['a']
+    stream.close(timeout=5)
+
+
+def test_flush_and_close_send_everything(server):
+    with server.stream(interval_ms=60_000) as stream:
+        stream.add_edge('a', 'b', weight=1)
+        assert stream.flush(timeout=5)
+        assert stream.version == server.state.version
+        stream.remove_edge('a', 'b')
+
+    assert len(server.batches) == 2
+    assert sorted(server.state.nodes) == ['a', 'b'] and not server.state.edges
+    with pytest.raises(RuntimeError):
+        stream.add_node('c')
+
+
+def test_updates_of_waiting_element_are_merged(server):
+    with server.stream(interval_ms=60_000) as stream:
+        stream.add_node('a')
+        stream.update_attrs('a', x=1)
+        stream.update_attrs('a', y=2)
+        stream.update_attrs('a', x=3)
+        stream.add_edge('a', 'b')
+        stream.update_attrs('a', 'b', w=1)
+        stream.update_attrs('a', 'b', w=2)
+
+    assert server.batches == [[
+        ['add_node', 'a', 'a', {}],
+        ['update_node', 'a', {'x': 3, 'y': 2}],
+        ['add_edge', 'a', 'b', None, {}],
+        ['update_edge', 'a', 'b', None, {'w': 2}],
+    ]]
+    assert stream.stats['coalesced'] == 3
+    assert server.node('a')['x'] == 3 and server.edge('a->b')['w'] == 2
+
+
+def test_updates_are_not_merged_across_adding_the_element(server):
+    with server.stream(interval_ms=60_000) as stream:
+        stream.update_attrs('a', y=1)
+        stream.add_edge('a', 'b')
+        stream.update_attrs('a', y=2)
+
+    assert len(server.batches[0]) == 3
+    assert server.node('a')['y'] == 2
+
+
+def test_edge_updates_are_not_merged_across_removing_an_endpoint(server):
+    with server.stream(interval_ms=60_000) as stream:
+        stream.add_edge('a', 'b')
+        stream.flush(timeout=5)
+
+        stream.update_attrs('a', 'b', z=1)
+        stream.remove_node('a')
+        stream.add_edge('a', 'b')
+        stream.update_attrs('a', 'b', z=3)
+
+    assert len(server.batches[1]) == 4
+    assert server.edge('a->b') == {'id': 'a->b', 'source': 'a', 'target': 'b', 'z': 3}
+
+
+def test_invalid_settings_are_rejected():
+    with pytest.raises(ValueError):
+        GraphStream(client=None, interval_ms=-1)
+    with pytest.raises(ValueError):
+        GraphStream(client=None, max_events=0)
@@ -0,0 +1,99 @@
+"""Tests of schnauzer.traces."""
+import networkx as nx
+import pytest
+
+from schnauzer.convert import to_elements
+from schnauzer.server import Server
+from schnauzer.traces import TraceError, compile_traces, message_key, validate_traces
+
+
+def _pipeline():
+    graph = nx.DiGraph()
+    graph.add_edge('Sensor', 'Filter', msg_id=1)
+    graph.add_edge('Filter', 'Analyzer', msg_id=2)
+    graph.add_edge('Analyzer', 'Storage', msg_id=3)
+    graph.add_edge('Sensor', 'Archive', msg_id=1)
+    graph.add_edge('Filter', 'Storage', msg_id=2)
+    return graph
+
+
+TRACES = {
+    '3': [[[1, 'Sensor', []], [2, 'Filter', [1]], [3, 'Analyzer', [2]]]],
+    2.0: [[[1, 'Sensor', None], [2, 'Filter', ['1']]], [[2, 'Filter', []]]],
+}
+
+
+@pytest.mark.parametrize('msg_id, key', [(3, '3'), (3.0, '3'), ('3', '3'), ('03', '3'), (2.5, '2.5'), ('a', 'a')])
+def test_message_key(msg_id, key):
+    assert message_key(msg_id) == key
+
+
+@pytest.mark.parametrize('traces, error', [
+    ([], 'must be a dict'),
+    ({'1': 'path'}, 'must be a list'),
+    ({'1': ['step']}, 'list of steps'),
+    ({'1': [[[1, 'a']]]}, r'\[msg_id, component, consumed_ids\]'),
+    ({'1': [[[1, 'a', 2]]]}, 'Consumed ids'),
+])
+def test_validate_rejects_malformed_traces(traces, error):
+    with pytest.raises(TraceError, match=error):
+        validate_traces(traces)
+
+
+def test_validate_accepts_traces():
+    validate_traces(TRACES)
+    validate_traces({})
+
+
+def test_compile_into_edge_ids():
+    nodes, edges = to_elements(_pipeline())
+    compiled = compile_traces(TRACES, nodes, edges)
+
+    assert compiled == {
+        '3': [['Sensor->Filter', 'Filter->Analyzer']],
+        '2': [['Sensor->Filter'], []],
+    }
+    assert all(eid in edges for paths in compiled.values() for path in paths for eid in path)
+
+
+def test_compile_matches_components_by_name():
+    graph = nx.DiGraph()
+    graph.add_node('s', name='Sensor')
+    graph.add_node('f', name='Filter')
+    graph.add_edge('s', 'f', msg_id='1', id='copy')
+    graph.add_edge('f', 's', msg_id=1)
+    nodes, edges = to_elements(graph)
+
+    # Each carrying edge is listed once, however many steps consume the message
+    traces = {1: [[[1, 'Sensor', []], [2, 'Filter', [1, 1.0]], [3, 'Filter', ['1']]]]}
+    assert compile_traces(traces, nodes, edges) == {'1': [['copy']]}
+    assert compile_traces(traces, {}, edges) == {'1': [[]]}
+
+
+@pytest.fixture
+def server():
+    server = Server(web_port=0, backend_port=0)
+    server.start(background=True)
+    yield server
+    server.stop()
+
+
+def test_traces_endpoint(server):
+    client = server.client()
+    assert client.send_graph(_pipeline(), traces=TRACES) is True
+    first = server.channels.get('default').version
+
+    graph = _pipeline()
+    graph.remove_edge('Filter', 'Analyzer')
+    assert client.send_graph(graph, traces=TRACES) is True
+    # Malformed traces are rejected and leave the graph as it is
+    assert client.send_graph(nx.path_graph(2), traces={'3': 'path'}) is False
+    client.disconnect()
+    http = server.app.test_client()
+
+    current = http.get('/traces/default/3').get_json()
+    assert current == {'paths': [['Sensor->Filter']], 'version': first + 1}
+    earlier = http.get(f'/traces/default/3?version={first}').get_json()
+    assert earlier == {'paths': [['Sensor->Filter', 'Filter->Analyzer']], 'version': first}
+    assert http.get('/traces/default/4').get_json()['paths'] == []
+    assert http.get('/traces/default/3?version=1000').status_code == 404
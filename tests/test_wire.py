@@ -0,0 +1,114 @@
+"""Tests of schnauzer.wire."""
+import json
+
+import pytest
+
+from schnauzer.wire import (ColumnarWriter, WireFormatError, decode_message, decode_sections,
+                            encode_message, is_columnar)
+
+
+def _full():
+    return {
+        'type': 'full',
+        'title': 'Pipeline',
+        'version': 3,
+        'directed': True,
+        'elements': {
+            'nodes': [
+                {'data': {'id': 'a', 'name': 'a', 'type': 'source', 'load': 0.5, 'active': True}},
+                {'data': {'id': 'b', 'name': 'b', 'type': 'source', 'load': 1, 'tags': ['x', 'y']}},
+                {'data': {'id': 'c', 'name': 'Zürich', 'meta': {'n': [1, 2]}, 'note': None}},
+                {'data': {'id': 'd', 'weird': 'nul\x00inside', 'count': 1.0}},
+            ],
+            'edges': [
+                {'data': {'id': 'a->b', 'source': 'a', 'target': 'b', 'weight': 2}},
+                {'data': {'id': 'b->c', 'source': 'b', 'target': 'c'}},
+            ],
+        },
+    }
+
+
+def _decoded(message):
+    """Encode and decode a message as it travels over the backend channel."""
+    frames = encode_message(message)
+    assert is_columnar(frames)
+    return decode_message(frames)
+
+
+def test_full_message_round_trip():
+    message = _full()
+    assert _decoded(message) == message
+
+
+def test_round_trip_keeps_value_types():
+    nodes = _decoded(_full())['elements']['nodes']
+    assert nodes[0]['data']['active'] is True
+    assert type(nodes[1]['data']['load']) is int
+    assert type(nodes[3]['data']['count']) is float
+
+
+def test_patch_message_round_trip():
+    message = {
+        'type': 'patch',
+        'base_version': 3,
+        'title': 'Pipeline',
+        'delta': {
+            'nodes': {'added': [{'data': {'id': 'e', 'type': 'sink'}}],
+                      'changed': [{'data': {'id': 'a', 'load': 0.7}}],
+                      'removed': ['d']},
+            'edges': {'added': [{'data': {'id': 'a->e', 'source': 'a', 'target': 'e'}}],
+                      'changed': [],
+                      'removed': ['b->c']},
+        },
+    }
+    assert _decoded(message) == message
+
+
+def test_empty_graph_round_trip():
+    message = {'type': 'full', 'elements': {'nodes': [], 'edges': []}}
+    assert _decoded(message) == message
+
+
+def test_strings_are_stored_once():
+    frames = encode_message(_full())
+    strings = bytes(frames[1]).decode('utf-8').split('\x00')
+    assert strings.count('source') == 1
+    assert 'nul\x00inside' in json.loads(frames[2])
+
+
+def test_chunked_sections_are_concatenated():
+    writer = ColumnarWriter()
+    writer.add_section('nodes', 2, [[('id', 'a')], [('id', 'b'), ('type', 'x')]])
+    writer.add_section('nodes', 1, [[('id', 'c')]])
+    writer.add_section('edges', 0, [])
+
+    header, sections = decode_sections(writer.frames({'type': 'full'}))
+    assert [len(section) for section in sections['nodes']] == [2, 1]
+    assert sections['nodes'][0].column('type') == [None, 'x']
+
+    message = decode_message(writer.frames({'type': 'full'}))
+    assert [node['data'] for node in message['elements']['nodes']] == [{'id': 'a'}, {'id': 'b', 'type': 'x'}, {'id': 'c'}]
+
+
+def test_section_with_too_many_rows_is_rejected():
+    with pytest.raises(WireFormatError):
+        ColumnarWriter().add_section('nodes', 1, [[('id', 'a')], [('id', 'b')]])
+
+
+def test_json_messages_are_not_columnar():
+    assert not is_columnar([json.dumps(_full()).encode('utf-8')])
+    with pytest.raises(WireFormatError):
+        decode_message([b'{}'])
+
+
+@pytest.mark.parametrize('damage', ['column', 'reference', 'values'])
+def test_damaged_frames_are_rejected(damage):
+    frames = encode_message(_full())
+    if damage == 'column':
+        frames[3] = frames[3][:-4]
+    elif damage == 'reference':
+        frames[3] = (10 ** 6).to_bytes(4, 'little') + frames[3][4:]
+    else:
+        frames[2] = b'[not json'
+    with pytest.raises(WireFormatError):
+        decode_message(frames)